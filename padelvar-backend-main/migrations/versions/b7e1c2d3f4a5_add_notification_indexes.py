@@ -0,0 +1,28 @@
+"""add_notification_indexes
+
+Revision ID: b7e1c2d3f4a5
+Revises: 16fd90a3a998
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e1c2d3f4a5'
+down_revision = '16fd90a3a998'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Non lues d'un utilisateur + pagination keyset (created_at, id)
+    op.create_index('ix_notifications_user_read_created', 'notifications',
+                    ['user_id', 'is_read', 'created_at'])
+    op.create_index('ix_notifications_user_created_id', 'notifications',
+                    ['user_id', 'created_at', 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_notifications_user_created_id', table_name='notifications')
+    op.drop_index('ix_notifications_user_read_created', table_name='notifications')
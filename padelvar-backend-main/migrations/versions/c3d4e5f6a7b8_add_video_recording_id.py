@@ -0,0 +1,28 @@
+"""add_video_recording_id
+
+Revision ID: c3d4e5f6a7b8
+Revises: b7e1c2d3f4a5
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d4e5f6a7b8'
+down_revision = 'b7e1c2d3f4a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Lien vidéo -> enregistrement: la finalisation en arrière-plan y écrit
+    # l'URL de la playlist HLS
+    op.add_column('video', sa.Column('recording_id', sa.String(length=100), nullable=True))
+    op.create_index('ix_video_recording_id', 'video', ['recording_id'])
+
+
+def downgrade():
+    op.drop_index('ix_video_recording_id', table_name='video')
+    op.drop_column('video', 'recording_id')
@@ -77,6 +77,20 @@ def create_celery_app(app=None):
                 'options': {'queue': 'maintenance'}
             },
             
+            # Classement des clubs populaires (dashboard joueur) toutes les 10 minutes
+            'refresh-popular-clubs': {
+                'task': 'src.tasks.maintenance_tasks.refresh_popular_clubs',
+                'schedule': crontab(minute='*/10'),
+                'options': {'queue': 'maintenance'}
+            },
+            
+            # Reconstruction des classements joueurs chaque nuit à 3h
+            'rebuild-leaderboards': {
+                'task': 'src.tasks.maintenance_tasks.rebuild_leaderboards',
+                'schedule': crontab(hour=3, minute=0),
+                'options': {'queue': 'maintenance'}
+            },
+            
             # Nettoyage des notifications archivées chaque jour à 2h
             'cleanup-old-notifications': {
                 'task': 'src.tasks.maintenance_tasks.cleanup_old_notifications',
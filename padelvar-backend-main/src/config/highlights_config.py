@@ -71,6 +71,9 @@ class HighlightsConfig:
     SIMPLE_MODE = not ENABLE_AI_DETECTION
     SIMPLE_INTERVAL_SECONDS = 30  # Extract clip every N seconds
     SIMPLE_CLIPS_COUNT = 6  # Number of clips to extract
+    # Keyframe-aware extraction: one ffmpeg run with -c copy, clips snapped to GOPs
+    # (per-clip libx264 re-encode is kept as a fallback)
+    SIMPLE_STREAM_COPY = os.getenv('HIGHLIGHTS_STREAM_COPY', 'true').lower() == 'true'
 
 # Export configuration
 HIGHLIGHTS_CONFIG = {
@@ -47,6 +47,7 @@ from .routes.analytics_routes import analytics_bp  # 🆕 Analytics dashboard
 from .routes.system_settings_routes import system_settings_bp  # 🆕 System settings
 from .routes.clip_routes import clip_bp  # 🆕 Manual clip creation and social sharing
 from .routes.tutorial_routes import tutorial_bp  # 🆕 Tutorial system for new players
+from .routes.events import events_bp  # 🆕 Événements temps réel (SSE)
 
 def create_app(config_name=None):
     """
@@ -129,6 +130,7 @@ def create_app(config_name=None):
     app.register_blueprint(analytics_bp, url_prefix='/api/analytics')  # 🆕 Analytics dashboard
     app.register_blueprint(clip_bp)  # 🆕 Manual clips (prefix in blueprint)
     app.register_blueprint(tutorial_bp, url_prefix='/api/tutorial')  # 🆕 Tutorial system
+    app.register_blueprint(events_bp)  # 🆕 Événements temps réel SSE (prefix in blueprint)
     app.register_blueprint(password_reset_bp)
     # Frontend blueprint en dernier pour éviter d'intercepter les routes API
     app.register_blueprint(frontend_bp)
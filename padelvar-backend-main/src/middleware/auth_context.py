@@ -0,0 +1,132 @@
+# padelvar-backend/src/middleware/auth_context.py
+
+"""
+Contexte d'authentification de la requête
+
+- get_current_user(): l'utilisateur de la session est chargé une seule fois
+  par requête et gardé dans flask.g (les helpers d'accès et la route
+  l'appellent souvent plusieurs fois)
+- get_current_user_snapshot(): vue compacte (id, rôle, statut, club,
+  crédits) pour les vérifications d'accès, en cache entre requêtes pendant
+  SNAPSHOT_TTL_SECONDS; invalidée après commit de toute modification ou
+  suppression d'un User (et dans les autres processus via Redis, voir
+  services/config_cache.py)
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from functools import wraps
+from typing import Optional
+
+from flask import g, jsonify, session
+from sqlalchemy import event, inspect
+
+from ..models.database import db, on_commit, register_on_commit
+from ..models.user import User, UserRole, UserStatus
+from ..services.config_cache import ConfigCache
+
+logger = logging.getLogger(__name__)
+
+# 0 désactive le cache des snapshots entre requêtes
+SNAPSHOT_TTL_SECONDS = float(os.getenv('AUTH_SNAPSHOT_TTL', '10'))
+
+G_USER = '_auth_user'
+SESSION_KEY = 'auth_context_changed_users'
+
+user_snapshots = ConfigCache(ttl=SNAPSHOT_TTL_SECONDS, channel='auth:user:invalidate',
+                             version_key='auth:user:version')
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Champs d'un utilisateur utiles aux contrôles d'accès"""
+    id: int
+    role: UserRole
+    status: UserStatus
+    club_id: Optional[int]
+    credits_balance: int
+
+    @classmethod
+    def from_user(cls, user: User) -> 'UserSnapshot':
+        return cls(user.id, user.role, user.status, user.club_id, user.credits_balance or 0)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role == UserRole.SUPER_ADMIN
+
+
+def get_current_user() -> Optional[User]:
+    """
+    Utilisateur connecté (session) ou None
+
+    Une seule requête SQL par requête HTTP; un changement de session pendant
+    la requête (login, logout) est pris en compte.
+    """
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    cached = g.get(G_USER)
+    if cached is not None and cached[0] == user_id:
+        return cached[1]
+    user = db.session.get(User, user_id)
+    setattr(g, G_USER, (user_id, user))
+    return user
+
+
+def get_current_user_snapshot() -> Optional[UserSnapshot]:
+    """Snapshot de l'utilisateur connecté (sans requête si déjà en cache)"""
+    user_id = session.get('user_id')
+    if not user_id:
+        return None
+    cached = g.get(G_USER)
+    if cached is not None and cached[0] == user_id:
+        return UserSnapshot.from_user(cached[1]) if cached[1] is not None else None
+    return user_snapshots.get(user_id, lambda: _load_snapshot(user_id))
+
+
+def _load_snapshot(user_id: int) -> Optional[UserSnapshot]:
+    row = db.session.query(User.id, User.role, User.status, User.club_id, User.credits_balance) \
+        .filter(User.id == user_id).first()
+    return UserSnapshot(row.id, row.role, row.status, row.club_id, row.credits_balance or 0) if row else None
+
+
+def require_auth(f):
+    """Décorateur: utilisateur connecté requis"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not get_current_user_snapshot():
+            return jsonify({'error': 'Authentification requise'}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def require_admin(f):
+    """Décorateur: privilèges administrateur (super admin) requis"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        snapshot = get_current_user_snapshot()
+        if not snapshot:
+            return jsonify({'error': 'Authentification requise'}), 401
+        if not snapshot.is_admin:
+            return jsonify({'error': 'Privilèges administrateur requis'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# ----------------------------------------------------------------------
+# Invalidation des snapshots après commit
+# ----------------------------------------------------------------------
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _queue_invalidation(mapper, connection, target):
+    on_commit(inspect(target).session, SESSION_KEY, target.id)
+
+
+def _publish_changes(user_ids):
+    for user_id in set(user_ids):
+        user_snapshots.publish_change(user_id)
+
+
+register_on_commit(SESSION_KEY, _publish_changes)
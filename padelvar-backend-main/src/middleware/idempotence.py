@@ -1,7 +1,8 @@
-
 # Export for import in __init__.py
 __all__ = [
     "IdempotenceMiddleware",
+    "IdempotencyStore",
+    "idempotency_store",
     "with_idempotence",
     "require_idempotence_key"
 ]
@@ -9,23 +10,261 @@ __all__ = [
 """
 Middleware d'idempotence pour les requêtes critiques
 Évite les doublons lors de requêtes sensibles (paiements, enregistrements, etc.)
+
+Stockage à deux niveaux:
+- Redis (chemin rapide): SET NX + TTL sur idem:<clé> sert à la fois de verrou
+  "en cours" et de cache de la réponse. Les doublons concurrents attendent la
+  réponse du premier au lieu de s'exécuter une seconde fois.
+- Table IdempotencyKey: même protocole (ligne sans réponse = en cours) quand
+  Redis est indisponible, et copie durable écrite en arrière-plan
+  (write-behind) pour les endpoints de paiement (persist=True).
 """
 
 import json
 import logging
+import threading
+import time
 import uuid
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import wraps
+from typing import Dict, Optional
 
-from flask import request, jsonify, g
+from flask import request, jsonify, g, session, make_response, current_app
 from sqlalchemy.exc import IntegrityError
 
 from ..models.database import db
 from ..models.user import IdempotencyKey
+from ..services.redis_client import ScriptCache, get_redis_client
 
 logger = logging.getLogger(__name__)
 
+REDIS_PREFIX = 'idem:'
+IN_FLIGHT_LOCK_SECONDS = 60   # Verrou "en cours" (libéré plus tôt à la fin de la requête)
+IN_FLIGHT_WAIT_SECONDS = 30   # Attente max d'un doublon avant 409
+POLL_INTERVAL_SECONDS = 0.05
+REPLAYED_HEADERS = ('Content-Type', 'Location')
+
+# Suppression du verrou seulement par son propriétaire
+_RELEASE = """
+local value = redis.call('GET', KEYS[1])
+if value and cjson.decode(value)['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class _RedisTier:
+    """Verrou et réponses dans Redis"""
+
+    def __init__(self, client, release_script):
+        self.client = client
+        self.release_script = release_script
+
+    def acquire(self, key: str, token: str, lock_seconds: int) -> bool:
+        pending = json.dumps({'state': 'pending', 'token': token})
+        return bool(self.client.set(REDIS_PREFIX + key, pending, nx=True, ex=lock_seconds))
+
+    def get(self, key: str) -> Optional[Dict]:
+        value = self.client.get(REDIS_PREFIX + key)
+        return json.loads(value) if value else None
+
+    def complete(self, key: str, record: Dict, ttl_seconds: int, **_):
+        self.client.set(REDIS_PREFIX + key, json.dumps(record), ex=ttl_seconds)
+
+    def release(self, key: str, token: str):
+        self.release_script(keys=[REDIS_PREFIX + key], args=[token])
+
+
+class _DatabaseTier:
+    """Même protocole sur la table IdempotencyKey (ligne sans réponse = en cours)"""
+
+    def acquire(self, key: str, token: str, lock_seconds: int, user_id=None, endpoint: str = '') -> bool:
+        for _ in range(2):
+            try:
+                db.session.add(IdempotencyKey(
+                    key=key, user_id=user_id, endpoint=endpoint[:100],
+                    expires_at=datetime.utcnow() + timedelta(seconds=lock_seconds)
+                ))
+                db.session.commit()
+                return True
+            except IntegrityError:
+                db.session.rollback()
+            # Clé expirée (verrou abandonné ou réponse périmée): la remplacer
+            expired = IdempotencyKey.query.filter(
+                IdempotencyKey.key == key, IdempotencyKey.expires_at <= datetime.utcnow()
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if not expired:
+                return False
+        return False
+
+    def get(self, key: str) -> Optional[Dict]:
+        record = db.session.query(
+            IdempotencyKey.response_status_code, IdempotencyKey.response_body, IdempotencyKey.response_headers
+        ).filter(IdempotencyKey.key == key, IdempotencyKey.expires_at > datetime.utcnow()).first()
+        db.session.rollback()  # Pas de snapshot figé pendant l'attente d'un doublon
+        if record is None:
+            return None
+        if record.response_status_code is None:
+            return {'state': 'pending'}
+        return {
+            'state': 'done',
+            'status': record.response_status_code,
+            'body': record.response_body,
+            'headers': json.loads(record.response_headers) if record.response_headers else {},
+        }
+
+    def complete(self, key: str, record: Dict, ttl_seconds: int, user_id=None, endpoint: str = ''):
+        values = {
+            'response_status_code': record['status'],
+            'response_body': record['body'],
+            'response_headers': json.dumps(record['headers']),
+            'expires_at': datetime.utcnow() + timedelta(seconds=ttl_seconds),
+        }
+        updated = IdempotencyKey.query.filter_by(key=key).update(values, synchronize_session=False)
+        if not updated:
+            db.session.add(IdempotencyKey(key=key, user_id=user_id, endpoint=endpoint[:100], **values))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(key=key).update(values, synchronize_session=False)
+            db.session.commit()
+
+    def release(self, key: str, token: str):
+        IdempotencyKey.query.filter(
+            IdempotencyKey.key == key, IdempotencyKey.response_status_code.is_(None)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+
+class IdempotencyStore:
+    """
+    Exécution idempotente d'une vue: une seule exécution par clé, les doublons
+    reçoivent la réponse stockée (en-tête X-Idempotent: true)
+    """
+
+    def __init__(self):
+        self.database = _DatabaseTier()
+        self._scripts = ScriptCache()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='IdempotencyWriter')
+        self._pending_writes = []
+        self._writes_lock = threading.Lock()
+
+    def _tier(self):
+        client = get_redis_client()
+        if client is None:
+            return self.database
+        return _RedisTier(client, self._scripts.get(client, _RELEASE))
+
+    def run(self, key: str, view, user_id=None, endpoint: str = '', ttl_hours: int = 24,
+            persist: bool = False, wait_timeout: float = IN_FLIGHT_WAIT_SECONDS):
+        """Exécuter `view` une seule fois pour `key` et rejouer sa réponse"""
+        tier = self._tier()
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait_timeout
+        delay = POLL_INTERVAL_SECONDS / 5
+
+        while True:
+            if self._acquire(tier, key, token, user_id, endpoint):
+                # Redis a pu perdre la clé (éviction, redémarrage): copie durable
+                stored = self.database.get(key) if persist and tier is not self.database else None
+                if stored and stored['state'] == 'done':
+                    tier.complete(key, stored, int(ttl_hours * 3600))
+                    return self._replay(key, stored)
+                return self._execute(tier, key, token, view, user_id, endpoint, ttl_hours, persist)
+
+            stored = tier.get(key)
+            if stored and stored['state'] == 'done':
+                return self._replay(key, stored)
+            # En cours ailleurs: attendre la réponse (ou la libération du verrou)
+            if time.monotonic() >= deadline:
+                logger.warning(f"⚠️ Requête idempotente toujours en cours: {key}")
+                response = jsonify({
+                    'error': 'Request already in progress',
+                    'message': 'Une requête identique est en cours de traitement'
+                })
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                response.headers['X-Idempotent-Key'] = key
+                return response
+            time.sleep(delay)
+            delay = min(delay * 2, POLL_INTERVAL_SECONDS)
+
+    def _acquire(self, tier, key, token, user_id, endpoint) -> bool:
+        if tier is self.database:
+            return tier.acquire(key, token, IN_FLIGHT_LOCK_SECONDS, user_id=user_id, endpoint=endpoint)
+        return tier.acquire(key, token, IN_FLIGHT_LOCK_SECONDS)
+
+    def _execute(self, tier, key, token, view, user_id, endpoint, ttl_hours, persist):
+        try:
+            response = make_response(view())
+        except Exception:
+            tier.release(key, token)
+            raise
+
+        # Seules les réponses réussies sont rejouées; une erreur libère la clé
+        # pour que le client puisse réessayer
+        if response.status_code >= 400 or response.is_streamed:
+            tier.release(key, token)
+            return response
+
+        record = {
+            'state': 'done',
+            'status': response.status_code,
+            'body': response.get_data(as_text=True),
+            'headers': {name: response.headers[name] for name in REPLAYED_HEADERS if name in response.headers},
+        }
+        ttl_seconds = int(ttl_hours * 3600)
+        tier.complete(key, record, ttl_seconds, user_id=user_id, endpoint=endpoint)
+        if persist and tier is not self.database:
+            self._write_behind(key, record, ttl_seconds, user_id, endpoint)
+
+        response.headers['X-Idempotent-Key'] = key
+        return response
+
+    def _write_behind(self, key, record, ttl_seconds, user_id, endpoint):
+        app = current_app._get_current_object()
+
+        def write():
+            with app.app_context():
+                try:
+                    self.database.complete(key, record, ttl_seconds, user_id=user_id, endpoint=endpoint)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"❌ Copie durable de la clé d'idempotence {key}: {e}")
+                finally:
+                    db.session.remove()
+
+        future = self._writer.submit(write)
+        with self._writes_lock:
+            self._pending_writes = [f for f in self._pending_writes if not f.done()] + [future]
+
+    def flush(self, timeout: float = 10):
+        """Attendre les écritures différées (tests, arrêt du worker)"""
+        with self._writes_lock:
+            pending, self._pending_writes = self._pending_writes, []
+        for future in pending:
+            future.result(timeout=timeout)
+
+    @staticmethod
+    def _replay(key: str, stored: Dict):
+        logger.info(f"Réponse idempotente retournée pour clé: {key}")
+        response = current_app.response_class(stored['body'], status=stored['status'])
+        for name, value in stored.get('headers', {}).items():
+            response.headers[name] = value
+        # Ajouter un header pour indiquer que c'est une réponse idempotente
+        response.headers['X-Idempotent'] = 'true'
+        response.headers['X-Idempotent-Key'] = key
+        return response
+
+
+idempotency_store = IdempotencyStore()
+
+
 class IdempotenceMiddleware:
     """
     Middleware pour gérer l'idempotence des requêtes
@@ -36,20 +275,19 @@ class IdempotenceMiddleware:
     @staticmethod
     def generate_key(user_id=None, endpoint=None, data=None):
         """
-        Génère une clé d'idempotence unique
+        Génère une clé d'idempotence déterministe
         
         Args:
             user_id (int): ID de l'utilisateur (optionnel)
             endpoint (str): Endpoint concerné
             data (dict): Données de la requête pour inclure dans la clé
-            
+        
         Returns:
-            str: Clé d'idempotence unique
+            str: Clé d'idempotence (identique pour une même requête)
         """
         base_data = {
             'user_id': user_id,
-            'endpoint': endpoint,
-            'timestamp': datetime.utcnow().isoformat()
+            'endpoint': endpoint
         }
         
         if data:
@@ -57,7 +295,7 @@ class IdempotenceMiddleware:
             base_data.update(data)
         
         # Génération d'UUID basé sur le contenu
-        content_string = json.dumps(base_data, sort_keys=True)
+        content_string = json.dumps(base_data, sort_keys=True, default=str)
         return str(uuid.uuid5(uuid.NAMESPACE_URL, content_string))
     
     @staticmethod
@@ -68,7 +306,7 @@ class IdempotenceMiddleware:
         Args:
             content_data (dict): Données de contenu à hasher
             user_id (int): ID utilisateur optionnel
-            
+        
         Returns:
             str: Clé d'idempotence basée sur le contenu
         """
@@ -85,7 +323,7 @@ class IdempotenceMiddleware:
     @staticmethod
     def store_response(key, user_id, endpoint, status_code, response_body, headers=None, ttl_hours=DEFAULT_TTL_HOURS):
         """
-        Stocke la réponse pour une clé d'idempotence
+        Stocke la réponse pour une clé d'idempotence (table IdempotencyKey)
         
         Args:
             key (str): Clé d'idempotence
@@ -97,27 +335,14 @@ class IdempotenceMiddleware:
             ttl_hours (int): Durée de vie en heures
         """
         try:
-            expires_at = datetime.utcnow() + timedelta(hours=ttl_hours)
-            
-            idempotency_record = IdempotencyKey(
-                key=key,
-                user_id=user_id,
-                endpoint=endpoint,
-                response_status_code=status_code,
-                response_body=response_body,
-                response_headers=json.dumps(headers) if headers else None,
-                expires_at=expires_at
-            )
-            
-            db.session.add(idempotency_record)
-            db.session.commit()
+            idempotency_store.database.complete(key, {
+                'status': status_code,
+                'body': response_body,
+                'headers': headers or {},
+            }, int(ttl_hours * 3600), user_id=user_id, endpoint=endpoint)
             
             logger.info(f"Réponse stockée pour clé d'idempotence: {key}")
-            
-        except IntegrityError:
-            # La clé existe déjà, ce qui est normal dans un contexte concurrent
-            db.session.rollback()
-            logger.debug(f"Clé d'idempotence déjà existante: {key}")
+        
         except Exception as e:
             logger.error(f"Erreur lors du stockage de la réponse d'idempotence: {e}")
             db.session.rollback()
@@ -127,40 +352,25 @@ class IdempotenceMiddleware:
         """
         Récupère la réponse stockée pour une clé d'idempotence
         
+        Les clés expirées sont ignorées (supprimées par cleanup_expired_keys).
+        
         Args:
             key (str): Clé d'idempotence
-            
+        
         Returns:
-            dict|None: Réponse stockée ou None si non trouvée/expirée
+            dict|None: Réponse stockée ou None si non trouvée/expirée/en cours
         """
         try:
-            record = IdempotencyKey.query.filter_by(key=key).first()
-            
-            if not record:
+            stored = idempotency_store.database.get(key)
+            if not stored or stored['state'] != 'done':
                 return None
             
-            # Vérifier si la clé a expiré
-            if record.is_expired():
-                # Nettoyer la clé expirée
-                db.session.delete(record)
-                db.session.commit()
-                logger.debug(f"Clé d'idempotence expirée supprimée: {key}")
-                return None
-            
-            headers = {}
-            if record.response_headers:
-                try:
-                    headers = json.loads(record.response_headers)
-                except:
-                    pass
-            
             return {
-                'status_code': record.response_status_code,
-                'response_body': record.response_body,
-                'headers': headers,
-                'created_at': record.created_at
+                'status_code': stored['status'],
+                'response_body': stored['body'],
+                'headers': stored['headers']
             }
-            
+        
         except Exception as e:
             logger.error(f"Erreur lors de la récupération de la réponse d'idempotence: {e}")
             return None
@@ -181,23 +391,39 @@ class IdempotenceMiddleware:
                 logger.info(f"Nettoyage: {expired_count} clés d'idempotence expirées supprimées")
             
             return expired_count
-            
+        
         except Exception as e:
             logger.error(f"Erreur lors du nettoyage des clés d'idempotence: {e}")
             db.session.rollback()
             return 0
 
-def with_idempotence(ttl_hours=24, key_fields=None):
+
+def _current_user_id():
+    return getattr(g, 'current_user_id', None) or session.get('user_id')
+
+
+def _scoped_key(user_id, endpoint, client_key):
+    """Clé client limitée à l'utilisateur et à l'endpoint"""
+    return hashlib.sha256(f"{user_id}:{endpoint}:{client_key}".encode('utf-8')).hexdigest()[:64]
+
+
+def with_idempotence(ttl_hours=24, key_fields=None, persist=False, wait_timeout=IN_FLIGHT_WAIT_SECONDS):
     """
     Décorateur pour rendre un endpoint idempotent
     
+    La clé vient de l'en-tête Idempotency-Key, ou à défaut des champs
+    `key_fields` du corps JSON. Sans l'un ni l'autre, la requête passe
+    telle quelle.
+    
     Args:
         ttl_hours (int): Durée de vie de la clé en heures
         key_fields (list): Champs de la requête à inclure dans la génération de clé
-        
+        persist (bool): Copie durable en base (endpoints de paiement)
+        wait_timeout (float): Attente max d'un doublon concurrent avant 409
+    
     Usage:
-        @with_idempotence(ttl_hours=1, key_fields=['amount', 'package_id'])
         @app.route('/payment', methods=['POST'])
+        @with_idempotence(ttl_hours=1, key_fields=['amount', 'package_id'], persist=True)
         def create_payment():
             return jsonify({'status': 'success'})
     """
@@ -208,87 +434,38 @@ def with_idempotence(ttl_hours=24, key_fields=None):
             if request.method not in ['POST', 'PUT', 'PATCH']:
                 return f(*args, **kwargs)
             
-            # Extraire l'utilisateur actuel s'il existe
-            user_id = getattr(g, 'current_user_id', None) if hasattr(g, 'current_user_id') else None
-            
-            # Données pour la génération de clé
-            key_data = {}
-            if key_fields and request.is_json:
-                request_data = request.get_json() or {}
-                key_data = {field: request_data.get(field) for field in key_fields if field in request_data}
-            
-            # Générer la clé d'idempotence
+            user_id = _current_user_id()
             endpoint = f"{request.method}:{request.endpoint}"
-            idempotence_key = IdempotenceMiddleware.generate_key(
-                user_id=user_id,
-                endpoint=endpoint,
-                data=key_data
-            )
-            
-            return f"{idempotence_key}:{str(uuid.uuid4())[:8]}"
-            
-            # Vérifier si une réponse existe déjà
-            stored_response = IdempotenceMiddleware.get_stored_response(idempotence_key)
             
-            if stored_response:
-                logger.info(f"Réponse idempotente retournée pour clé: {idempotence_key}")
-                
-                # Retourner la réponse stockée
-                response_body = stored_response['response_body']
-                status_code = stored_response['status_code']
-                
-                try:
-                    # Essayer de parser le JSON
-                    json_response = json.loads(response_body)
-                    response = jsonify(json_response)
-                except:
-                    # Si ce n'est pas du JSON, retourner tel quel
-                    response = response_body
-                
-                response.status_code = status_code
-                
-                # Ajouter un header pour indiquer que c'est une réponse idempotente
-                response.headers['X-Idempotent'] = 'true'
-                response.headers['X-Idempotent-Key'] = idempotence_key
-                
-                return response
+            client_key = request.headers.get('Idempotency-Key')
+            if client_key:
+                idempotence_key = _scoped_key(user_id, endpoint, client_key)
+            elif key_fields and request.is_json:
+                request_data = request.get_json(silent=True) or {}
+                key_data = {field: request_data.get(field) for field in key_fields if field in request_data}
+                idempotence_key = IdempotenceMiddleware.generate_key(
+                    user_id=user_id,
+                    endpoint=endpoint,
+                    data=key_data
+                )
+            else:
+                return f(*args, **kwargs)
             
             # Stocker la clé pour traçabilité
             g.idempotence_key = idempotence_key
             
-            # Exécuter la fonction originale
-            try:
-                result = f(*args, **kwargs)
-                
-                # Stocker la réponse si elle est réussie
-                if hasattr(result, 'status_code') and result.status_code < 400:
-                    response_body = result.get_data(as_text=True)
-                    
-                    IdempotenceMiddleware.store_response(
-                        key=idempotence_key,
-                        user_id=user_id,
-                        endpoint=endpoint,
-                        status_code=result.status_code,
-                        response_body=response_body,
-                        headers=dict(result.headers),
-                        ttl_hours=ttl_hours
-                    )
-                    
-                    # Ajouter des headers informatifs
-                    result.headers['X-Idempotent-Key'] = idempotence_key
-                
-                return result
-                
-            except Exception as e:
-                logger.error(f"Erreur lors de l'exécution de la fonction idempotente: {e}")
-                raise
-            
+            return idempotency_store.run(
+                idempotence_key, lambda: f(*args, **kwargs),
+                user_id=user_id, endpoint=endpoint, ttl_hours=ttl_hours,
+                persist=persist, wait_timeout=wait_timeout
+            )
+        
         return decorated_function
     return decorator
 
-def require_idempotence_key():
+def require_idempotence_key(ttl_hours=24, persist=False):
     """
-    Décorateur qui exige une clé d'idempotence dans les headers
+    Décorateur qui exige une clé d'idempotence (UUID) dans les headers
     """
     def decorator(f):
         @wraps(f)
@@ -310,31 +487,15 @@ def require_idempotence_key():
                     'message': 'La clé d\'idempotence doit être un UUID valide'
                 }), 400
             
-            # Vérifier si la clé a déjà été utilisée
-            stored_response = IdempotenceMiddleware.get_stored_response(idempotence_key)
-            
-            if stored_response:
-                logger.info(f"Clé d'idempotence déjà utilisée: {idempotence_key}")
-                
-                response_body = stored_response['response_body']
-                status_code = stored_response['status_code']
-                
-                try:
-                    json_response = json.loads(response_body)
-                    response = jsonify(json_response)
-                except:
-                    response = response_body
-                
-                response.status_code = status_code
-                response.headers['X-Idempotent'] = 'true'
-                response.headers['X-Idempotent-Key'] = idempotence_key
-                
-                return response
-            
             # Stocker la clé pour utilisation dans la fonction
             g.idempotence_key = idempotence_key
             
-            return f(*args, **kwargs)
-            
+            user_id = _current_user_id()
+            endpoint = f"{request.method}:{request.endpoint}"
+            return idempotency_store.run(
+                _scoped_key(user_id, endpoint, idempotence_key), lambda: f(*args, **kwargs),
+                user_id=user_id, endpoint=endpoint, ttl_hours=ttl_hours, persist=persist
+            )
+        
         return decorated_function
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,161 @@
+# src/middleware/rate_limit_engine.py
+
+"""
+Moteur de rate limiting GCRA (Generic Cell Rate Algorithm)
+
+Équivalent à une fenêtre glissante de `requests` requêtes par `window`
+secondes, mais avec UNE seule valeur par clé: l'instant d'arrivée théorique
+(TAT) de la prochaine requête. Pas de liste d'horodatages ni de ZSET.
+
+- Redis: un seul script Lua par requête vérifie toutes les limites
+  applicables (globale, endpoint, méthode) et ne consomme que si toutes
+  passent. Horloge du serveur Redis (TIME): pas de dérive entre workers.
+- Mémoire (fallback): LRU borné à MEMORY_MAX_KEYS clés, les clients
+  inactifs sont évincés en premier.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from ..services.redis_client import ScriptCache
+
+logger = logging.getLogger(__name__)
+
+MEMORY_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MEMORY_MAX_KEYS', '100000'))
+
+# KEYS: clés des limites; ARGV: requests_1, window_ms_1, requests_2, window_ms_2...
+# Retour: {autorisé (0/1), index de la limite déterminante, restant, retry_after_ms, reset_after_ms}
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local new_tats = {}
+local decisive, remaining, reset_after = 1, -1, 0
+
+for i, key in ipairs(KEYS) do
+    local requests = tonumber(ARGV[2 * i - 1])
+    local window = tonumber(ARGV[2 * i])
+    local interval = window / requests
+    local tat = tonumber(redis.call('GET', key)) or now
+    if tat < now then
+        tat = now
+    end
+    local new_tat = math.ceil(tat + interval)
+    local allow_at = new_tat - window
+    if now < allow_at then
+        return {0, i, 0, allow_at - now, tat - now}
+    end
+    new_tats[i] = new_tat
+    local left = math.floor((window - (new_tat - now)) / interval)
+    if remaining < 0 or left < remaining then
+        decisive, remaining, reset_after = i, left, new_tat - now
+    end
+end
+
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, new_tats[i], 'PX', math.max(1, new_tats[i] - now))
+end
+return {1, decisive, remaining, 0, reset_after}
+"""
+
+
+@dataclass(frozen=True)
+class Limit:
+    """`requests` requêtes par `window` secondes pour `key`"""
+    key: str
+    requests: int
+    window: int
+
+
+@dataclass
+class RateLimitResult:
+    allowed: bool
+    limit: Optional[Limit]  # Limite déterminante (refus ou plus proche du seuil)
+    remaining: int
+    retry_after: float      # Secondes avant la prochaine requête autorisée (si refus)
+    reset_after: float      # Secondes avant le retour au quota complet
+
+
+class MemoryGcraStore:
+    """TAT par clé dans un LRU borné (thread-safe)"""
+
+    def __init__(self, max_keys: int = MEMORY_MAX_KEYS):
+        self.max_keys = max_keys
+        self._tats: 'OrderedDict[str, float]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tats)
+
+    def check(self, limits: Sequence[Limit], now: float = None) -> RateLimitResult:
+        now = time.time() if now is None else now
+        with self._lock:
+            new_tats = []
+            decisive, remaining, reset_after = None, -1, 0.0
+            for limit in limits:
+                interval = limit.window / limit.requests
+                tat = max(self._tats.get(limit.key, now), now)
+                new_tat = tat + interval
+                allow_at = new_tat - limit.window
+                if now < allow_at:
+                    return RateLimitResult(False, limit, 0, allow_at - now, tat - now)
+                new_tats.append(new_tat)
+                left = math.floor((limit.window - (new_tat - now)) / interval + 1e-6)  # arrondi flottant
+                if remaining < 0 or left < remaining:
+                    decisive, remaining, reset_after = limit, left, new_tat - now
+
+            for limit, new_tat in zip(limits, new_tats):
+                self._tats[limit.key] = new_tat
+                self._tats.move_to_end(limit.key)
+            while len(self._tats) > self.max_keys:
+                self._tats.popitem(last=False)
+
+        return RateLimitResult(True, decisive, max(remaining, 0), 0.0, reset_after)
+
+
+class RateLimiter:
+    """
+    Vérification atomique d'un ensemble de limites
+
+    Redis si disponible (client fixe ou `redis_provider`), sinon mémoire.
+    """
+
+    def __init__(self, redis_client=None, redis_provider: Callable = None,
+                 max_memory_keys: int = MEMORY_MAX_KEYS):
+        self.redis_client = redis_client
+        self.redis_provider = redis_provider
+        self.memory = MemoryGcraStore(max_memory_keys)
+        self._scripts = ScriptCache()
+
+    def _redis(self):
+        if self.redis_client is not None:
+            return self.redis_client
+        return self.redis_provider() if self.redis_provider else None
+
+    def check(self, limits: Sequence[Limit]) -> RateLimitResult:
+        if not limits:
+            return RateLimitResult(True, None, 0, 0.0, 0.0)
+
+        client = self._redis()
+        if client is not None:
+            try:
+                return self._check_redis(client, limits)
+            except Exception as e:
+                logger.error(f"Erreur Redis rate limit: {e}, fallback mémoire")
+        return self.memory.check(limits)
+
+    def _check_redis(self, client, limits: Sequence[Limit]) -> RateLimitResult:
+        script = self._scripts.get(client, _GCRA_SCRIPT)
+        args = []
+        for limit in limits:
+            args += [limit.requests, limit.window * 1000]
+        allowed, index, remaining, retry_after_ms, reset_after_ms = script(
+            keys=[limit.key for limit in limits], args=args
+        )
+        return RateLimitResult(bool(allowed), limits[int(index) - 1], int(remaining),
+                               int(retry_after_ms) / 1000, int(reset_after_ms) / 1000)
@@ -8,16 +8,14 @@ Middleware de rate limiting pour PadelVar
 Protège contre les abus et attaques par déni de service
 """
 
-import time
+import math
 import logging
-import hashlib
-from datetime import datetime, timedelta
 from functools import wraps
-from collections import defaultdict
 from flask import request, jsonify, g
-import redis
 
 from ..config import Config
+from ..services.redis_client import get_redis_client
+from .rate_limit_engine import Limit, RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -101,7 +99,7 @@ class RateLimitMiddleware:
     
     def __init__(self, app=None, redis_client=None):
         self.redis_client = redis_client
-        self.memory_store = defaultdict(dict)  # Fallback si Redis non disponible
+        self.limiter = RateLimiter(redis_client)  # Fallback mémoire (LRU borné) si Redis non disponible
         
         if app:
             self.init_app(app)
@@ -113,6 +111,7 @@ class RateLimitMiddleware:
             try:
                 redis_url = Config.RATELIMIT_STORAGE_URL or Config.CELERY_BROKER_URL
                 if redis_url:
+                    import redis
                     self.redis_client = redis.from_url(redis_url, decode_responses=True)
                     # Test de connexion
                     self.redis_client.ping()
@@ -123,7 +122,9 @@ class RateLimitMiddleware:
                 logger.warning(f"Impossible de se connecter à Redis: {e}, utilisation du stockage mémoire")
                 self.redis_client = None
         
+        self.limiter.redis_client = self.redis_client
         app.before_request(self.before_request)
+        app.after_request(self.after_request)
     
     def before_request(self):
         """Vérifie les limites de taux avant chaque requête"""
@@ -137,17 +138,13 @@ class RateLimitMiddleware:
             if not identifier:
                 return None
             
-            # Obtenir les limites pour cette requête
-            limits = self._get_limits_for_request()
-            
-            # Vérifier chaque limite
-            for limit_name, limit_config in limits.items():
-                if self._is_rate_limited(identifier, limit_name, limit_config):
-                    return self._rate_limit_response(limit_config)
-            
-            # Enregistrer la requête
-            self._record_request(identifier, limits)
+            # Toutes les limites vérifiées et consommées en un seul appel
+            limits = self._build_limits(identifier, self._get_limits_for_request())
+            result = self.limiter.check(limits)
+            if not result.allowed:
+                return self._rate_limit_response(result)
             
+            g.rate_limit_result = result
             return None
             
         except Exception as e:
@@ -155,6 +152,15 @@ class RateLimitMiddleware:
             # En cas d'erreur, laisser passer la requête pour ne pas bloquer l'application
             return None
     
+    def after_request(self, response):
+        """Ajoute les en-têtes X-RateLimit-* de la limite la plus proche du seuil"""
+        result = g.pop('rate_limit_result', None)
+        if result and result.limit:
+            response.headers['X-RateLimit-Limit'] = str(result.limit.requests)
+            response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+            response.headers['X-RateLimit-Reset'] = str(math.ceil(result.reset_after))
+        return response
+    
     def _should_skip_rate_limit(self):
         """Détermine si le rate limiting doit être ignoré pour cette requête"""
         skip_paths = [
@@ -214,82 +220,22 @@ class RateLimitMiddleware:
         
         return limits
     
-    def _is_rate_limited(self, identifier, limit_name, limit_config):
-        """Vérifie si une limite est dépassée"""
-        # Déterminer quel identifiant utiliser
-        key_identifier = identifier['user_id'] if limit_config.get('per') == 'user' and identifier['user_id'] else identifier['ip']
-        if not key_identifier:
-            return False
-        
-        # Construire la clé Redis/mémoire
-        key = f"rate_limit:{limit_name}:{key_identifier}"
-        window = limit_config['window']
-        max_requests = limit_config['requests']
-        
-        current_time = int(time.time())
-        window_start = current_time - window
-        
-        if self.redis_client:
-            return self._check_redis_limit(key, window_start, current_time, max_requests)
-        else:
-            return self._check_memory_limit(key, window_start, current_time, max_requests)
+    def _build_limits(self, identifier, limits):
+        """Construit les limites du moteur (une clé par limite et par client)"""
+        built = []
+        for limit_name, limit_config in limits.items():
+            # Déterminer quel identifiant utiliser
+            key_identifier = identifier['user_id'] if limit_config.get('per') == 'user' and identifier['user_id'] else identifier['ip']
+            if not key_identifier:
+                continue
+            built.append(Limit(f"rate_limit:{limit_name}:{key_identifier}",
+                               limit_config['requests'], limit_config['window']))
+        return built
     
-    def _check_redis_limit(self, key, window_start, current_time, max_requests):
-        """Vérifie la limite avec Redis (sliding window)"""
-        try:
-            pipe = self.redis_client.pipeline()
-            
-            # Supprimer les entrées expirées
-            pipe.zremrangebyscore(key, 0, window_start)
-            
-            # Compter les requêtes dans la fenêtre
-            pipe.zcard(key)
-            
-            # Ajouter la requête actuelle
-            pipe.zadd(key, {str(current_time): current_time})
-            
-            # Définir l'expiration de la clé
-            pipe.expire(key, int(max(3600, window_start)))
-            
-            results = pipe.execute()
-            current_count = results[1]
-            
-            return current_count >= max_requests
-            
-        except Exception as e:
-            logger.error(f"Erreur Redis rate limit: {e}")
-            return False
-    
-    def _check_memory_limit(self, key, window_start, current_time, max_requests):
-        """Vérifie la limite avec le stockage mémoire"""
-        if key not in self.memory_store:
-            self.memory_store[key] = []
-        
-        # Nettoyer les anciennes entrées
-        self.memory_store[key] = [
-            timestamp for timestamp in self.memory_store[key]
-            if timestamp > window_start
-        ]
-        
-        # Vérifier la limite
-        current_count = len(self.memory_store[key])
-        
-        if current_count >= max_requests:
-            return True
-        
-        # Ajouter la requête actuelle
-        self.memory_store[key].append(current_time)
-        return False
-    
-    def _record_request(self, identifier, limits):
-        """Enregistre la requête (déjà fait dans _is_rate_limited)"""
-        # Cette méthode est appelée après vérification, l'enregistrement
-        # est déjà fait dans _is_rate_limited
-        pass
-    
-    def _rate_limit_response(self, limit_config):
+    def _rate_limit_response(self, result):
         """Retourne une réponse de rate limiting"""
-        retry_after = limit_config.get('window', 3600)
+        # Délai exact avant la prochaine requête autorisée (GCRA), pas la fenêtre entière
+        retry_after = max(1, math.ceil(result.retry_after))
         
         response = jsonify({
             'error': 'Rate limit exceeded',
@@ -298,13 +244,17 @@ class RateLimitMiddleware:
         })
         response.status_code = 429
         response.headers['Retry-After'] = str(retry_after)
-        response.headers['X-RateLimit-Limit'] = str(limit_config['requests'])
-        response.headers['X-RateLimit-Window'] = str(limit_config['window'])
+        response.headers['X-RateLimit-Limit'] = str(result.limit.requests)
+        response.headers['X-RateLimit-Window'] = str(result.limit.window)
+        response.headers['X-RateLimit-Remaining'] = '0'
         
         logger.warning(f"Rate limit dépassé - IP: {request.remote_addr}, Path: {request.path}")
         
         return response
 
+# Limiteur des vues décorées: client Redis partagé, fallback mémoire
+_custom_limiter = RateLimiter(redis_provider=get_redis_client)
+
 def rate_limit(requests=100, window=3600, per='ip', skip_if_authenticated=False):
     """
     Décorateur pour appliquer un rate limiting spécifique à une vue
@@ -324,8 +274,9 @@ def rate_limit(requests=100, window=3600, per='ip', skip_if_authenticated=False)
             
             # Logique de rate limiting personnalisée
             identifier = _get_custom_identifier(per)
-            if identifier and _check_custom_limit(identifier, f.__name__, requests, window):
-                retry_after = window
+            result = _check_custom_limit(identifier, f.__name__, requests, window) if identifier else None
+            if result and not result.allowed:
+                retry_after = max(1, math.ceil(result.retry_after))
                 response = jsonify({
                     'error': 'Rate limit exceeded',
                     'message': f'Too many requests to this endpoint. Please try again in {retry_after} seconds.',
@@ -353,14 +304,6 @@ def _get_custom_identifier(per):
     return None
 
 def _check_custom_limit(identifier, endpoint, max_requests, window):
-    """Vérifie une limite personnalisée (version simplifiée)"""
-    # Cette implémentation simplifiée utilise la mémoire
-    # En production, utiliser Redis comme dans la classe principale
+    """Vérifie et consomme une limite personnalisée (GCRA, un seul aller-retour Redis)"""
     key = f"custom_rate_limit:{endpoint}:{identifier}"
-    
-    current_time = int(time.time())
-    window_start = current_time - window
-    
-    # Simulation simple (en production, utiliser Redis)
-    # Pour l'instant, on autorise tout (le middleware principal gère déjà)
-    return False
\ No newline at end of file
+    return _custom_limiter.check([Limit(key, max_requests, window)])
\ No newline at end of file
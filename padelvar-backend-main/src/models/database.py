@@ -1,4 +1,48 @@
+"""
+Instance SQLAlchemy partagée et effets appliqués après commit
+
+on_commit(session, key, item) accumule `item` dans la session (événements
+mapper, pendant le flush); après le commit, l'applicateur enregistré pour
+`key` (register_on_commit) reçoit la liste des éléments. Un rollback les
+abandonne: rien n'est publié pour des écritures annulées.
+"""
+
+import logging
+from typing import Any, Callable, Dict, List
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+SESSION_KEY = 'on_commit'
+
+_appliers: Dict[str, Callable[[List[Any]], None]] = {}
+
+
+def register_on_commit(key: str, apply: Callable[[List[Any]], None]):
+    """Applicateur des éléments accumulés sous `key` (appelé après chaque commit)"""
+    _appliers[key] = apply
+
+
+def on_commit(session, key: str, item: Any):
+    """Accumuler `item` pour le prochain commit de `session`"""
+    if session is not None:
+        session.info.setdefault(SESSION_KEY, {}).setdefault(key, []).append(item)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    for key, items in session.info.pop(SESSION_KEY, {}).items():
+        try:
+            _appliers[key](items)
+        except Exception as e:
+            logger.error(f"❌ Application après commit ({key}): {e}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop(SESSION_KEY, None)
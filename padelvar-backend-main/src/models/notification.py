@@ -31,6 +31,13 @@ class Notification(db.Model):
     # Relations
     user = db.relationship('User', backref='user_notifications', foreign_keys=[user_id])
     
+    __table_args__ = (
+        # Non lues d'un utilisateur (filtre unread_only, compteur de secours)
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        # Pagination keyset (created_at, id) des notifications d'un utilisateur
+        db.Index('ix_notifications_user_created_id', 'user_id', 'created_at', 'id'),
+    )
+    
     def to_dict(self):
         """Convertir en dictionnaire"""
         return {
@@ -90,7 +97,12 @@ class Notification(db.Model):
     @staticmethod
     def mark_all_as_read(user_id):
         """Marquer toutes les notifications comme lues"""
-        Notification.query.filter_by(user_id=user_id, is_read=False).update({'is_read': True})
+        from src.services.notification_counters import record_delta
+        
+        marked = Notification.query.filter_by(user_id=user_id, is_read=False).update(
+            {'is_read': True}, synchronize_session=False
+        )
+        record_delta(db.session(), user_id, unread=-marked)
         db.session.commit()
 
 
@@ -2,6 +2,7 @@
 
 from datetime import datetime
 from .database import db
+from .user import User
 from enum import Enum
 import logging
 import base64
@@ -36,7 +37,7 @@ class SystemConfiguration(db.Model):
     updated_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     
     # Relations
-    updated_by_user = db.relationship('User', foreign_keys=[updated_by], backref='config_updates')
+    updated_by_user = db.relationship(User, foreign_keys=[updated_by], backref='config_updates')
     
     # Clé de chiffrement (stockée en variable d'environnement)
     ENCRYPTION_KEY = os.environ.get('CONFIG_ENCRYPTION_KEY', Fernet.generate_key().decode())
@@ -140,11 +141,18 @@ class SystemConfiguration(db.Model):
         
         Returns:
             Valeur de configuration ou default
+
+        La valeur (déchiffrée) est gardée en mémoire du processus, voir
+        services/config_cache.py; set_config l'invalide partout.
         """
-        config = SystemConfiguration.query.filter_by(config_key=key).first()
-        if config:
-            return config.get_value(decrypt=decrypt)
-        return default
+        from src.services.config_cache import config_cache
+
+        def load():
+            config = SystemConfiguration.query.filter_by(config_key=key).first()
+            return config.get_value(decrypt=decrypt) if config else None
+
+        value = config_cache.get((key, decrypt), load)
+        return default if value is None else value
     
     @staticmethod
     def set_config(key: str, value: str, config_type: ConfigType = ConfigType.GENERAL, 
@@ -184,6 +192,9 @@ class SystemConfiguration(db.Model):
             db.session.add(config)
         
         db.session.commit()
+
+        from src.services.config_cache import config_cache
+        config_cache.publish_change(key)
         return config
     
     @staticmethod
@@ -102,7 +102,8 @@ class User(db.Model):
             'tutorial_step': self.tutorial_step
         }
         if self.role == UserRole.CLUB and self.club_id:
-            club = Club.query.get(self.club_id)
+            # Relation: réutilise le club déjà chargé dans la requête
+            club = self.club
             if club:
                 user_dict['club'] = club.to_dict()
         return user_dict
@@ -199,6 +200,7 @@ class Video(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     cdn_migrated_at = db.Column(db.DateTime, nullable=True)  # Date de migration vers Bunny Stream
     bunny_video_id = db.Column(db.String(100), nullable=True)  # ID vidéo Bunny Stream (GUID)
+    recording_id = db.Column(db.String(100), nullable=True, index=True)  # Enregistrement d'origine (RecordingSession)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     court_id = db.Column(db.Integer, db.ForeignKey('court.id'), nullable=True)
     
@@ -215,7 +217,7 @@ class Video(db.Model):
             "recorded_at": self.recorded_at.isoformat() if self.recorded_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "cdn_migrated_at": self.cdn_migrated_at.isoformat() if self.cdn_migrated_at else None,
-            "bunny_video_id": self.bunny_video_id,
+            "bunny_video_id": self.bunny_video_id, "recording_id": self.recording_id,
             "club_id": self.court.club_id if self.court else None
         }
 
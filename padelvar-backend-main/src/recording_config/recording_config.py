@@ -73,6 +73,21 @@ class RecordingConfig:
         "-pix_fmt", "yuv420p",      # Compatibilité maximale
     ]
     
+    # ==================== SEGMENTS / UPLOAD CONTINU ====================
+    
+    # Enregistrement en segments HLS envoyés vers Bunny Storage pendant le match
+    # (activé par défaut si le mot de passe de la zone de stockage est défini)
+    SEGMENT_STREAMING_UPLOAD = os.environ.get(
+        'RECORDING_SEGMENT_UPLOAD',
+        'true' if os.environ.get('BUNNY_STORAGE_PASSWORD') else 'false'
+    ).lower() == 'true'
+    
+    # Durée d'un segment (secondes): délai stop -> lecture ≈ upload d'un segment
+    SEGMENT_DURATION_SECONDS = int(os.environ.get('RECORDING_SEGMENT_SECONDS', 60))
+    
+    # Uploads de segments simultanés (tous enregistrements confondus)
+    SEGMENT_UPLOAD_WORKERS = 4
+    
     # ==================== VALIDATION ET SÉCURITÉ ====================
     
     # Taille minimale d'un fichier vidéo valide (bytes)
@@ -1,10 +1,13 @@
 # padelvar-backend/src/routes/admin.py
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
 from src.models.user import db, User, Club, Court, Video, UserRole, ClubActionHistory, RecordingSession, ClubOverlay
 from src.models.system_configuration import SystemConfiguration, ConfigType
 from src.models.notification import Notification, NotificationType
+from src.services.logging_service import tail_lines
+from src.services.recording_state import recording_registry
 from werkzeug.security import generate_password_hash
+from sqlalchemy import func, or_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased, joinedload
 import uuid
@@ -681,6 +684,8 @@ def toggle_court_status(court_id):
         # Inverser l'état is_recording
         court.is_recording = not court.is_recording
         db.session.commit()
+        if not court.is_recording:
+            recording_registry.release_court(court.id)
         
         status_text = "Indisponible" if court.is_recording else "Disponible"
         
@@ -726,6 +731,7 @@ def admin_stop_recording(recording_id):
         # Libérer le terrain
         court.is_recording = False
         court.current_recording_id = None
+        recording_registry.release_court(court.id, active_recording.recording_id)
         logger.info(f"🔓 Terrain {court.name} libéré (enregistrement admin)")
 
         # Calculer la durée estimée
@@ -919,62 +925,123 @@ def get_all_active_recordings():
 
 # --- ROUTES VIDÉOS & HISTORIQUE ---
 
+ADMIN_VIDEOS_PAGE_SIZE = 100
+ADMIN_VIDEOS_MAX_PAGE_SIZE = 1000
+ADMIN_VIDEOS_EXPORT_BATCH = 1000
+
+def _admin_videos_page(after_id, limit, q=None):
+    """
+    Page de vidéos (id décroissant) en une requête: colonnes utiles + noms joueur/terrain/club
+    
+    q: recherche (ILIKE) sur le titre, le nom du joueur et le nom du club
+    """
+    query = db.session.query(
+        Video.id, Video.title, Video.description, Video.file_url, Video.thumbnail_url,
+        Video.duration, Video.file_size, Video.is_unlocked, Video.credits_cost,
+        Video.recorded_at, Video.created_at, Video.user_id, Video.court_id,
+        User.name.label('player_name'), Court.name.label('court_name'), Club.name.label('club_name')
+    ).outerjoin(User, User.id == Video.user_id) \
+     .outerjoin(Court, Court.id == Video.court_id) \
+     .outerjoin(Club, Club.id == Court.club_id)
+    if q:
+        pattern = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(or_(
+            Video.title.ilike(pattern, escape='\\'),
+            User.name.ilike(pattern, escape='\\'),
+            Club.name.ilike(pattern, escape='\\')
+        ))
+    if after_id is not None:
+        query = query.filter(Video.id < after_id)
+    return query.order_by(Video.id.desc()).limit(limit).all()
+
+def _admin_video_dict(row):
+    return {
+        "id": row.id,
+        "title": row.title,
+        "description": row.description,
+        "file_url": row.file_url,
+        "thumbnail_url": row.thumbnail_url,
+        "duration": row.duration,
+        "file_size": row.file_size,
+        "is_unlocked": row.is_unlocked if row.is_unlocked is not None else True,
+        "credits_cost": row.credits_cost if row.credits_cost is not None else 1,
+        "recorded_at": row.recorded_at.isoformat() if row.recorded_at else None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "user_id": row.user_id,
+        "court_id": row.court_id,
+        "player_name": row.player_name or "Utilisateur supprimé",
+        "court_name": row.court_name or "Terrain inconnu",
+        "club_name": row.club_name or "Club inconnu"
+    }
+
 @admin_bp.route("/videos", methods=["GET"])
 def get_all_clubs_videos():
+    """
+    Vidéos de tous les clubs, paginées par curseur (id décroissant)
+    
+    ?limit=100&cursor=<next_cursor>&q=<recherche>; ?format=ndjson pour un export
+    complet en flux (une ligne JSON par vidéo, lots de ADMIN_VIDEOS_EXPORT_BATCH)
+    
+    Le curseur ('<id>' ou '<id>:<recherche>') porte la recherche: les pages
+    suivantes restent filtrées. Les totaux (stats) portent sur tout le catalogue.
+    """
     if not require_super_admin(): 
         return jsonify({"error": "Accès non autorisé"}), 403
     
     try:
-        # Requête simplifiée sans les colonnes problématiques
-        videos = db.session.query(Video).all()
-
-        videos_data = []
-        for video in videos:
-            video_dict = {
-                "id": video.id,
-                "title": video.title,
-                "description": video.description,
-                "file_url": video.file_url,
-                "thumbnail_url": video.thumbnail_url,
-                "duration": getattr(video, 'duration', None),
-                "file_size": getattr(video, 'file_size', None),
-                "is_unlocked": getattr(video, 'is_unlocked', True),
-                "credits_cost": getattr(video, 'credits_cost', 1),
-                "recorded_at": video.recorded_at.isoformat() if video.recorded_at else None,
-                "created_at": video.created_at.isoformat() if video.created_at else None,
-                "user_id": video.user_id,
-                "court_id": video.court_id
-            }
-            
-            # Ajouter les informations relationnelles
-            if hasattr(video, 'owner') and video.owner:
-                video_dict['player_name'] = video.owner.name
-            else:
-                # Requête manuelle si la relation ne fonctionne pas
-                user = User.query.get(video.user_id)
-                video_dict['player_name'] = user.name if user else "Utilisateur supprimé"
+        q = request.args.get('q', '').strip()
+        
+        if request.args.get('format') == 'ndjson' or request.accept_mimetypes.best == 'application/x-ndjson':
+            def export():
+                after_id = None
+                while True:
+                    rows = _admin_videos_page(after_id, ADMIN_VIDEOS_EXPORT_BATCH, q)
+                    if rows:
+                        yield "".join(json.dumps(_admin_video_dict(row)) + "\n" for row in rows)
+                    if len(rows) < ADMIN_VIDEOS_EXPORT_BATCH:
+                        return
+                    after_id = rows[-1].id
             
-            if hasattr(video, 'court') and video.court:
-                video_dict['court_name'] = video.court.name
-                if hasattr(video.court, 'club') and video.court.club:
-                    video_dict['club_name'] = video.court.club.name
-                else:
-                    club = Club.query.get(video.court.club_id)
-                    video_dict['club_name'] = club.name if club else "Club inconnu"
-            else:
-                # Requête manuelle si la relation ne fonctionne pas
-                court = Court.query.get(video.court_id)
-                if court:
-                    video_dict['court_name'] = court.name
-                    club = Club.query.get(court.club_id)
-                    video_dict['club_name'] = club.name if club else "Club inconnu"
-                else:
-                    video_dict['court_name'] = "Terrain inconnu"
-                    video_dict['club_name'] = "Club inconnu"
-            
-            videos_data.append(video_dict)
+            return Response(stream_with_context(export()), mimetype='application/x-ndjson', headers={
+                'Content-Disposition': 'attachment; filename=videos.ndjson'
+            })
+        
+        limit = min(max(request.args.get('limit', ADMIN_VIDEOS_PAGE_SIZE, type=int), 1), ADMIN_VIDEOS_MAX_PAGE_SIZE)
+        after_id = None
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_id, _, cursor_q = cursor.partition(':')
+            if not cursor_id.isdigit() or (q and q != cursor_q):
+                return jsonify({"error": "Curseur invalide"}), 400
+            after_id, q = int(cursor_id), cursor_q
+        
+        rows = _admin_videos_page(after_id, limit + 1, q)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more:
+            next_cursor = f"{rows[-1].id}:{q}" if q else str(rows[-1].id)
+        
+        response = {
+            "videos": [_admin_video_dict(row) for row in rows],
+            "next_cursor": next_cursor
+        }
+        
+        # Totaux sur la première page seulement (une requête d'agrégat)
+        if after_id is None:
+            total_videos, total_duration, total_size = db.session.query(
+                func.count(Video.id),
+                func.coalesce(func.sum(Video.duration), 0),
+                func.coalesce(func.sum(Video.file_size), 0)
+            ).one()
+            response["stats"] = {
+                "total_videos": total_videos,
+                "total_duration": int(total_duration),
+                "total_size": int(total_size)
+            }
         
-        return jsonify({"videos": videos_data}), 200
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des vidéos: {e}")
@@ -2260,28 +2327,38 @@ def get_system_logs():
         if not log_file_path:
             return jsonify({"logs": [], "message": "Fichier de log introuvable"}), 200
         
-        with open(log_file_path, 'r', encoding='utf-8', errors='ignore') as f:
-            all_lines = f.readlines()
-        
-        recent_lines = all_lines[-lines:]
-        
-        if log_level != 'all':
-            recent_lines = [line for line in recent_lines if log_level.upper() in line]
+        # Lecture depuis la fin du fichier (pas de chargement complet)
+        recent_lines = []
+        for line in tail_lines(log_file_path):
+            if log_level == 'all' or log_level.upper() in line:
+                recent_lines.append(line)
+                if len(recent_lines) >= lines:
+                    break
+        recent_lines.reverse()
         
         parsed_logs = []
         for line in recent_lines:
-            level = 'INFO'
-            if 'ERROR' in line:
-                level = 'ERROR'
-            elif 'WARNING' in line:
-                level = 'WARNING'
-            elif 'DEBUG' in line:
-                level = 'DEBUG'
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                entry = None
+            if isinstance(entry, dict) and 'level' in entry:
+                level = entry['level']
+                message = entry.get('message', '')
+            else:
+                level = 'INFO'
+                if 'ERROR' in line:
+                    level = 'ERROR'
+                elif 'WARNING' in line:
+                    level = 'WARNING'
+                elif 'DEBUG' in line:
+                    level = 'DEBUG'
+                message = line.strip()
             
             parsed_logs.append({
                 'raw': line.strip(),
                 'level': level,
-                'message': line.strip()
+                'message': message
             })
         
         return jsonify({
@@ -7,7 +7,8 @@ All routes require super admin authentication
 import logging
 from flask import Blueprint, jsonify, request, session
 from functools import wraps
-from src.models.user import User, UserRole
+from src.models.user import UserRole
+from src.middleware.auth_context import get_current_user_snapshot
 from src.services import analytics_service
 
 logger = logging.getLogger(__name__)
@@ -26,7 +27,7 @@ def require_super_admin(f):
                 logger.warning(f"Unauthorized analytics access attempt - no session")
                 return jsonify({'error': 'Authentication required'}), 401
             
-            user = User.query.get(user_id)
+            user = get_current_user_snapshot()
             
             if not user or user.role != UserRole.SUPER_ADMIN:
                 logger.warning(f"Unauthorized analytics access attempt by user {user_id}")
@@ -27,6 +27,9 @@ GOOGLE_REDIRECT_URI = os.environ.get('GOOGLE_REDIRECT_URI', 'http://localhost:50
 # La définition du Blueprint doit être ici, avant les routes
 auth_bp = Blueprint('auth', __name__)
 
+# Helpers d'authentification réexportés (voir middleware.auth_context)
+__all__ = ["auth_bp", "get_current_user", "require_auth", "require_admin"]
+
 def validate_email(email):
     pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(pattern, email) is not None
@@ -153,9 +156,8 @@ def logout():
         return jsonify({'message': 'Déconnexion effectuée'}), 200
 
 
-@auth_bp.route('/me', methods=['GET'])
-def get_current_user():
-    # ... (code de la fonction get_current_user inchangé)
+@auth_bp.route('/me', methods=['GET'], endpoint='get_current_user')
+def get_me():
     try:
         user_id = session.get("user_id")
         if not user_id:
@@ -340,43 +342,9 @@ def google_authenticate():
 
 
 # Fonctions utilitaires pour l'authentification
-from functools import wraps
-
-def get_current_user():
-    """
-    Récupère l'utilisateur actuellement connecté depuis la session
-    Retourne None si aucun utilisateur n'est connecté
-    """
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
-
-def require_auth(f):
-    """
-    Décorateur pour protéger les routes qui nécessitent une authentification
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user = get_current_user()
-        if not current_user:
-            return jsonify({'error': 'Authentification requise'}), 401
-        return f(*args, **kwargs)
-    return decorated_function
-
-def require_admin(f):
-    """
-    Décorateur pour protéger les routes qui nécessitent des privilèges admin
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        current_user = get_current_user()
-        if not current_user:
-            return jsonify({'error': 'Authentification requise'}), 401
-        if current_user.role not in [UserRole.ADMIN, UserRole.SUPER_ADMIN]:
-            return jsonify({'error': 'Privilèges administrateur requis'}), 403
-        return f(*args, **kwargs)
-    return decorated_function
+# (utilisateur chargé une fois par requête, snapshot pour les contrôles d'accès)
+# Réexportées pour les blueprints qui les importent depuis routes.auth (__all__)
+from ..middleware.auth_context import get_current_user, require_auth, require_admin  # noqa: F401
 
 
 # ====================================================================
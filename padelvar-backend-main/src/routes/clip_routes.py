@@ -4,7 +4,8 @@ Routes API pour la gestion des clips vidéo manuels
 
 from flask import Blueprint, request, jsonify, session
 from src.models.database import db
-from src.models.user import UserClip, Video, User
+from src.models.user import UserClip, Video
+from src.middleware.auth_context import get_current_user
 from src.models.notification import Notification, NotificationType
 from src.services.manual_clip_service import manual_clip_service
 from src.services.social_share_service import social_share_service
@@ -21,7 +22,7 @@ def login_required(f):
         if 'user_id' not in session:
             return jsonify({'error': 'Non authentifié'}), 401
         
-        current_user = User.query.get(session['user_id'])
+        current_user = get_current_user()
         if not current_user:
             return jsonify({'error': 'Utilisateur non trouvé'}), 401
         
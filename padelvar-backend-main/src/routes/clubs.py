@@ -1,15 +1,19 @@
 from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, Club, Court, UserRole, ClubActionHistory, Video, RecordingSession
+from src.models.user import db, User, Club, Court, UserRole, ClubActionHistory, Video, RecordingSession, player_club_follows
 from src.models.system_settings import SystemSettings
 from src.models.notification import Notification, NotificationType
 from src.routes.admin import log_club_action
+from src.middleware.idempotence import with_idempotence
+from src.middleware.auth_context import get_current_user, get_current_user_snapshot
+from src.services.recording_state import recording_registry
 from datetime import datetime, timedelta
 import json
 import os
 import random
 import logging
 from werkzeug.security import generate_password_hash
-from sqlalchemy.orm import joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, selectinload
 
 # Logger pour tracer les actions
 logger = logging.getLogger(__name__)
@@ -17,11 +21,9 @@ logger = logging.getLogger(__name__)
 # Définition du blueprint pour les routes des clubs
 clubs_bp = Blueprint('clubs', __name__)
 
-def get_current_user():
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
+# Nombre de vidéos récentes affichées sur le tableau de bord
+CLUB_DASHBOARD_RECENT_VIDEOS = 100
+
 
 # Route pour récupérer la liste des clubs
 @clubs_bp.route('/', methods=['GET'])
@@ -217,6 +219,12 @@ def diagnostic_club_data(club_id):
 # Route pour récupérer les informations du tableau de bord du club
 @clubs_bp.route('/dashboard', methods=['GET'])
 def get_club_dashboard():
+    """Tableau de bord du club en lecture seule, nombre de requêtes constant
+
+    Les sessions expirées sont clôturées en arrière-plan (scheduler de
+    nettoyage, tâche cleanup_zombie_sessions): une session encore marquée
+    active mais expirée est simplement affichée comme terrain disponible.
+    """
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
@@ -225,66 +233,28 @@ def get_club_dashboard():
         return jsonify({'error': 'Accès réservé aux clubs'}), 403
         
     try:
-        # Récupérer le club associé à l'utilisateur
-        club = Club.query.get(user.club_id)
+        club = Club.query.options(selectinload(Club.overlays)).filter_by(id=user.club_id).first()
         if not club:
             return jsonify({'error': 'Club non trouvé'}), 404
         
-        print(f"Récupération du tableau de bord pour le club ID: {club.id}, nom: {club.name}")
-        
-        # 1. Compter les joueurs associés au club - Méthode similaire à admin.py
         players = User.query.filter_by(club_id=club.id, role=UserRole.PLAYER).all()
-        players_count = len(players)
-        print(f"Nombre de joueurs: {players_count}")
-        
-        # Debug: afficher les joueurs trouvés
-        for player in players[:3]:
-            print(f"  Joueur: {player.name} (ID: {player.id}, club_id: {player.club_id})")
-        
-        # 2. Compter les terrains du club et vérifier leur statut d'occupation
-        courts = Court.query.filter_by(club_id=club.id).all()
-        courts_count = len(courts)
-        print(f"Nombre de terrains: {courts_count}")
-        
-        # ACTIVATION: Nettoyer automatiquement les sessions expirées
-        # pour libérer les terrains qui ne sont plus réellement occupés
-        try:
-            # Nettoyer les sessions expirées
-            expired_sessions = RecordingSession.query.filter_by(status='active').all()
-            cleaned_count = 0
-            
-            for session in expired_sessions:
-                if session.is_expired():
-                    session.status = 'completed'
-                    
-                    # 🔧 LIBÉRER LE TERRAIN (FIX CRITIQUE)
-                    court = Court.query.get(session.court_id)
-                    if court:
-                        court.is_recording = False
-                        print(f"🔓 Terrain {court.name} (ID:{court.id}) libéré")
-                    
-                    cleaned_count += 1
-                    print(f"Nettoyage session expirée {session.id} (Court {session.court_id})")
-            
-            if cleaned_count > 0:
-                db.session.commit()
-                print(f"✅ {cleaned_count} session(s) expirée(s) nettoyée(s)")
-                
-        except Exception as e:
-            print(f"Erreur lors du nettoyage des sessions expirées: {e}")
+        courts = Court.query.filter_by(club_id=club.id).order_by(Court.id).all()
+        
+        # Occupation des terrains: toutes les sessions actives du club en une requête
+        active_sessions = {}
+        sessions = RecordingSession.query.options(joinedload(RecordingSession.user)).filter(
+            RecordingSession.club_id == club.id,
+            RecordingSession.status == 'active'
+        ).order_by(RecordingSession.start_time.desc()).all()
+        for recording in sessions:
+            if not recording.is_expired():
+                active_sessions.setdefault(recording.court_id, recording)
         
-        # Enrichir les informations des terrains avec le statut d'occupation
         courts_with_status = []
         for court in courts:
             court_dict = court.to_dict()
-            
-            # Vérifier s'il y a un enregistrement actif sur ce terrain
-            active_recording = RecordingSession.query.filter_by(
-                court_id=court.id,
-                status='active'
-            ).first()
-            
-            if active_recording and not active_recording.is_expired():
+            active_recording = active_sessions.get(court.id)
+            if active_recording:
                 court_dict.update({
                     'is_occupied': True,
                     'occupation_status': 'Occupé - Enregistrement en cours',
@@ -300,92 +270,39 @@ def get_club_dashboard():
                     'recording_remaining': None,
                     'recording_total': None
                 })
-            
             courts_with_status.append(court_dict)
-            print(f"  Terrain: {court.name} (ID: {court.id}) - {court_dict['occupation_status']}")
-        
-        courts = courts_with_status
-        
-        # 3. Compter les vidéos - Requête similaire à admin.py avec jointures explicites
-        court_ids = [court_data['id'] if isinstance(court_data, dict) else court_data.id for court_data in courts]
-        videos_count = 0
-        
-        if court_ids:
-            # Utiliser une requête avec joinedload pour éviter le problème N+1
-            videos = db.session.query(Video).options(joinedload(Video.owner)).join(Court, Video.court_id == Court.id).filter(
-                Court.club_id == club.id
-            ).all()
-            videos_count = len(videos)
-            
-            # Debug: afficher les vidéos trouvées
-            print(f"Nombre de vidéos: {videos_count}")
-            for video in videos[:3]:
-                player_name = video.owner.name if video.owner else 'Joueur inconnu'
-                print(f"  Vidéo: {video.title} (ID: {video.id}, joueur: {player_name})")
-        else:
-            videos = []
-            print("Aucun terrain trouvé, donc aucune vidéo")
         
-        # 4. Compter les followers - Correction de la méthode
-        followers_count = 0
-        try:
-            # Utiliser une requête directe comme dans admin.py
-            followers = db.session.query(User).join(
-                club.followers.property.secondary
-            ).filter(
-                club.followers.property.secondary.c.club_id == club.id
-            ).all()
-            followers_count = len(followers)
-            
-            print(f"Nombre de followers: {followers_count}")
-            # Debug: afficher les followers trouvés
-            for follower in followers[:3]:
-                print(f"  Follower: {follower.name} (ID: {follower.id})")
-                
-        except Exception as e:
-            # Fallback: utiliser la relation directe
-            try:
-                followers_list = club.followers.all()
-                followers_count = len(followers_list)
-                print(f"Nombre de followers (fallback): {followers_count}")
-            except Exception as e2:
-                print(f"Erreur lors du comptage des followers: {e}, fallback: {e2}")
-                followers_count = 0
-        
-        # 5. Compter les crédits offerts - Amélioration de la méthode
+        # Compteurs agrégés en SQL (une seule requête)
+        club_videos = db.session.query(func.count(Video.id)).join(Court, Video.court_id == Court.id).filter(
+            Court.club_id == club.id
+        ).scalar_subquery()
+        club_followers = db.session.query(func.count()).select_from(player_club_follows).filter(
+            player_club_follows.c.club_id == club.id
+        ).scalar_subquery()
+        videos_count, followers_count = db.session.query(club_videos, club_followers).one()
+        
+        # Vidéos récentes avec leur joueur; la liste complète est servie par /api/clubs/videos
+        videos = Video.query.options(joinedload(Video.owner)).join(Court, Video.court_id == Court.id).filter(
+            Court.club_id == club.id
+        ).order_by(Video.id.desc()).limit(CLUB_DASHBOARD_RECENT_VIDEOS).all()
+        
+        # Crédits offerts: seule la colonne de détails est chargée
         credits_given = 0
-        try:
-            # Récupérer toutes les entrées d'historique de type 'add_credits' pour ce club
-            credit_entries = db.session.query(ClubActionHistory).filter_by(
-                club_id=club.id,
-                action_type='add_credits'
-            ).all()
-            
-            print(f"Entrées de crédits trouvées: {len(credit_entries)}")
-            
-            # Parcourir chaque entrée pour extraire les crédits
-            for entry in credit_entries:
-                try:
-                    if entry.action_details:
-                        details = json.loads(entry.action_details)
-                        credits_added = details.get('credits_added', 0)
-                        if isinstance(credits_added, (int, float)):
-                            credits_given += int(credits_added)
-                            print(f"  Entrée {entry.id}: +{credits_added} crédits")
-                        else:
-                            print(f"  Entrée {entry.id}: valeur de crédits invalide: {credits_added}")
-                    else:
-                        print(f"  Entrée {entry.id}: pas de détails")
-                except (json.JSONDecodeError, KeyError, ValueError, TypeError) as e:
-                    print(f"  Erreur parsing entrée {entry.id}: {e}")
-            
-            print(f"Total des crédits offerts: {credits_given}")
-            
-        except Exception as e:
-            print(f"Erreur lors du calcul des crédits: {e}")
-            credits_given = 0
+        credit_details = db.session.query(ClubActionHistory.action_details).filter_by(
+            club_id=club.id,
+            action_type='add_credits'
+        )
+        for (action_details,) in credit_details:
+            try:
+                if action_details:
+                    credits_added = json.loads(action_details).get('credits_added', 0)
+                    if isinstance(credits_added, (int, float)):
+                        credits_given += int(credits_added)
+            except (json.JSONDecodeError, AttributeError, ValueError, TypeError) as e:
+                logger.warning(f"⚠️ Détails de crédits illisibles pour le club {club.id}: {e}")
         
-        # Statistiques finales - CORRIGER LES NOMS POUR CORRESPONDRE AU FRONTEND
+        players_count = len(players)
+        courts_count = len(courts)
         stats = {
             'total_players': players_count,      # Frontend attend 'total_players'
             'total_courts': courts_count,        # Frontend attend 'total_courts'
@@ -399,42 +316,35 @@ def get_club_dashboard():
             'credits_given': credits_given
         }
         
-        print(f"Statistiques finales: {stats}")
-        
-        # Enrichir les vidéos avec le nom du joueur
+        # Enrichir les vidéos avec le nom du joueur (terrains déjà en session pour club_id)
         videos_enriched = []
-        if videos:
-            for video in videos:
-                video_dict = video.to_dict()
-                # Ajouter le nom du joueur
-                if video.owner:
-                    video_dict['player_name'] = video.owner.name
-                else:
-                    video_dict['player_name'] = 'Joueur inconnu'
-                videos_enriched.append(video_dict)
+        for video in videos:
+            video_dict = video.to_dict()
+            video_dict['player_name'] = video.owner.name if video.owner else 'Joueur inconnu'
+            videos_enriched.append(video_dict)
         
         return jsonify({
             'club': club.to_dict(),
             'stats': stats,
             'players': [player.to_dict() for player in players],  # Ajouter les joueurs pour le frontend
-            'courts': courts,      # Ajouter les terrains avec statut d'occupation pour le frontend
-            'videos': videos_enriched,  # Vidéos enrichies avec nom du joueur
+            'courts': courts_with_status,      # Terrains avec statut d'occupation pour le frontend
+            'videos': videos_enriched,  # Vidéos récentes enrichies avec nom du joueur
             'debug_info': {
                 'user_id': user.id,
                 'club_id': user.club_id,
                 'role': user.role.value,
-                'court_ids': court_ids
+                'court_ids': [court.id for court in courts]
             }
         }), 200
         
     except Exception as e:
-        print(f"Erreur lors de la récupération du tableau de bord: {e}")
+        logger.error(f"❌ Erreur lors de la récupération du tableau de bord: {e}")
         return jsonify({'error': 'Erreur lors de la récupération du tableau de bord'}), 500
 
 # Route pour récupérer les informations du club
 @clubs_bp.route('/info', methods=['GET'])
 def get_club_info():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -455,7 +365,7 @@ def get_club_info():
 # Route pour récupérer les terrains du club
 @clubs_bp.route('/courts', methods=['GET'])
 def get_club_courts():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -477,7 +387,7 @@ def get_club_courts():
 # Route pour récupérer les joueurs du club
 @clubs_bp.route('/players', methods=['GET'])
 def get_club_players():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -499,7 +409,7 @@ def get_club_players():
 # Route pour récupérer les abonnés du club
 @clubs_bp.route('/followers', methods=['GET'])
 def get_club_followers():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -521,7 +431,7 @@ def get_club_followers():
 
 @clubs_bp.route('/history', methods=['GET'])
 def get_club_history():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -636,6 +546,7 @@ def get_club_credit_packages():
 
 # Route pour qu'un club achète des crédits
 @clubs_bp.route('/credits/buy', methods=['POST'])
+@with_idempotence(persist=True)
 def buy_club_credits():
     """Acheter des crédits en tant que club"""
     user = get_current_user()
@@ -901,7 +812,7 @@ def update_player(player_id):
 # Route pour récupérer les vidéos enregistrées sur les terrains du club
 @clubs_bp.route('/videos', methods=['GET'])
 def get_club_videos():
-    user = get_current_user()
+    user = get_current_user_snapshot()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
@@ -1634,6 +1545,7 @@ def stop_court_recording(court_id):
         # IMPORTANT: Libérer le terrain pour que le joueur le voit comme disponible
         court.is_recording = False
         court.current_recording_id = None
+        recording_registry.release_court(court.id, active_recording.recording_id)
         
         # Calculer la durée de l'enregistrement avec debug
         start_time = active_recording.start_time
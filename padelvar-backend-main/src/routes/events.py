@@ -0,0 +1,100 @@
+# src/routes/events.py
+
+"""
+Flux Server-Sent Events de l'utilisateur connecté
+
+Un seul abonnement par onglet remplace le polling des notifications, du
+statut d'enregistrement et de la progression des highlights/clips.
+
+Événements: notification, recording, highlight_job, clip
+Reprise: le navigateur renvoie l'en-tête Last-Event-ID à la reconnexion
+(ou ?last_event_id=... au premier chargement).
+"""
+
+import logging
+import os
+import time
+
+from flask import Blueprint, Response, jsonify, request, session, stream_with_context
+
+from ..routes.auth import require_auth
+from ..services.event_stream import event_broker, event_id_key
+
+logger = logging.getLogger(__name__)
+
+events_bp = Blueprint('events', __name__, url_prefix='/api/events')
+
+KEEPALIVE_SECONDS = 15
+# Les connexions sont recyclées pour libérer les threads gunicorn; le
+# navigateur se reconnecte seul avec Last-Event-ID
+MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS', '300'))
+# Une connexion occupe un thread gunicorn: rester sous --threads.
+# Au-delà, le client garde son polling (503 + Retry-After)
+MAX_CONNECTIONS = int(os.environ.get('SSE_MAX_CONNECTIONS', '16'))
+RETRY_MS = 5000
+
+
+def event_stream(subscription, last_event_id, max_seconds=None, keepalive=KEEPALIVE_SECONDS):
+    """Générateur SSE: rejoue depuis last_event_id puis diffuse en direct"""
+    max_seconds = max_seconds or MAX_STREAM_SECONDS
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+
+        last_key = event_id_key(last_event_id)
+        for live_event in event_broker.replay(subscription.user_id, last_event_id):
+            last_key = event_id_key(live_event.id)
+            yield live_event.format()
+
+        deadline = time.monotonic() + max_seconds
+        while not subscription.overflowed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            live_event = subscription.get(timeout=min(keepalive, remaining))
+            if live_event is None:
+                yield ": keepalive\n\n"
+                continue
+            # Déjà envoyé par la relecture (abonnement pris avant la relecture)
+            if event_id_key(live_event.id) <= last_key:
+                continue
+            last_key = event_id_key(live_event.id)
+            yield live_event.format()
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+@events_bp.route('/stream', methods=['GET'])
+@require_auth
+def stream_events():
+    """
+    Abonnement SSE aux événements de l'utilisateur
+
+    Headers:
+    - Last-Event-ID: dernier événement reçu (reprise automatique du navigateur)
+
+    Query params:
+    - last_event_id: équivalent pour la première connexion
+    """
+    user_id = session.get('user_id')
+    if event_broker.connection_count() >= MAX_CONNECTIONS:
+        logger.warning(f"⚠️ Limite de flux SSE atteinte ({MAX_CONNECTIONS}), utilisateur {user_id}")
+        response = jsonify({'error': 'Too many event streams', 'fallback': 'polling'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    # Abonnement avant la relecture: aucun événement perdu entre les deux
+    subscription = event_broker.subscribe(user_id)
+
+    response = Response(
+        stream_with_context(event_stream(subscription, last_event_id)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # Pas de buffering nginx
+        }
+    )
+    # Client parti avant le premier octet: le générateur n'a jamais démarré
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription))
+    return response
@@ -5,6 +5,7 @@ Routes API pour le système de notifications
 Gère les notifications utilisateur temps réel
 """
 
+import base64
 import logging
 from flask import Blueprint, request, jsonify, session
 from datetime import datetime, timedelta
@@ -14,12 +15,29 @@ from ..models.database import db
 from ..models.user import User
 from ..models.notification import Notification, NotificationType  # FIX: Importer depuis notification.py
 from ..routes.auth import require_auth
+from ..services.notification_counters import notification_counters, record_delta
 # from ..tasks.notification_tasks import send_notification, send_bulk_notification
 
 logger = logging.getLogger(__name__)
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
+
+def encode_cursor(notification):
+    """Curseur opaque (created_at, id) de la dernière notification d'une page"""
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) depuis un curseur; ValueError si invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, _, notification_id = raw.partition('|')
+        return datetime.fromisoformat(created_at), int(notification_id)
+    except (UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
 @notifications_bp.route('', methods=['GET'])
 @require_auth
 def get_user_notifications():
@@ -28,7 +46,8 @@ def get_user_notifications():
     
     Query params:
     - limit: nombre de notifications (default: 20, max: 100)
-    - offset: décalage pour pagination (default: 0)
+    - offset: décalage pour pagination (default: 0, ignoré si cursor)
+    - cursor: curseur keyset renvoyé dans pagination.next_cursor
     - unread_only: true pour ne récupérer que les non lues (default: false)
     - type: filtrer par type de notification (optionnel)
     - include_archived: true pour inclure les archivées (default: false)
@@ -42,6 +61,7 @@ def get_user_notifications():
         # Paramètres de requête
         limit = min(int(request.args.get('limit', 20)), 100)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
         notification_type = request.args.get('type')
         include_archived = request.args.get('include_archived', 'false').lower() == 'true'
@@ -49,10 +69,6 @@ def get_user_notifications():
         # Construire la requête
         query = Notification.query.filter_by(user_id=user_id)
         
-        # DEBUG
-        logger.info(f"[NOTIF DEBUG] user_id from session: {user_id}")
-        logger.info(f"[NOTIF DEBUG] Total notifications in DB for user {user_id}: {Notification.query.filter_by(user_id=user_id).count()}")
-        
         # Filtres
         if unread_only:
             query = query.filter_by(is_read=False)
@@ -64,20 +80,31 @@ def get_user_notifications():
             except ValueError:
                 return jsonify({'error': f'Invalid notification type: {notification_type}'}), 400
         
-        # Appliquer la pagination et l'ordre (plus récentes en premier)
-        notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(limit).all()
-        
-        # DEBUG
-        logger.info(f"[NOTIF DEBUG] Query returned {len(notifications)} notifications")
-        
-        # Compter le total pour la pagination
-        total = query.count()
-        
-        # Statistiques rapides
-        unread_count = Notification.query.filter_by(
-            user_id=user_id,
-            is_read=False
-        ).count()
+        # Pagination keyset sur (created_at, id) si un curseur est fourni,
+        # OFFSET conservé pour les anciens clients
+        page_query = query
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            page_query = page_query.filter(or_(
+                Notification.created_at < cursor_created_at,
+                and_(Notification.created_at == cursor_created_at, Notification.id < cursor_id)
+            ))
+        elif offset:
+            page_query = page_query.offset(offset)
+        
+        # Une ligne de plus pour savoir s'il reste une page (sans COUNT)
+        rows = page_query.order_by(
+            Notification.created_at.desc(), Notification.id.desc()
+        ).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        notifications = rows[:limit]
+        
+        # Compteurs matérialisés (Redis), COUNT uniquement pour un filtre par type
+        counts = notification_counters.get(user_id)
+        if notification_type:
+            total = query.count()
+        else:
+            total = counts['unread'] if unread_only else counts['total']
         
         result = {
             'notifications': [notification.to_dict() for notification in notifications],
@@ -85,10 +112,11 @@ def get_user_notifications():
                 'total': total,
                 'limit': limit,
                 'offset': offset,
-                'has_more': offset + limit < total
+                'has_more': has_more,
+                'next_cursor': encode_cursor(notifications[-1]) if has_more else None
             },
             'stats': {
-                'unread_count': unread_count
+                'unread_count': counts['unread']
             }
         }
         
@@ -160,25 +188,22 @@ def mark_all_notifications_read():
         
         current_time = datetime.utcnow()
         
-        # Récupérer toutes les notifications non lues de l'utilisateur
-        unread_notifications = Notification.query.filter_by(
+        # Marquer toutes les non lues en un seul UPDATE
+        marked_count = Notification.query.filter_by(
             user_id=user_id,
             is_read=False
-        ).all()
+        ).update({'is_read': True}, synchronize_session=False)
         
-        if not unread_notifications:
+        if not marked_count:
+            db.session.rollback()
             return jsonify({
                 'status': 'no_unread_notifications',
                 'marked_count': 0
             }), 200
         
-        # Marquer toutes comme lues
-        for notification in unread_notifications:
-            notification.is_read = True
-        
+        record_delta(db.session, user_id, unread=-marked_count)
         db.session.commit()
         
-        marked_count = len(unread_notifications)
         logger.info(f"{marked_count} notifications marquées comme lues pour utilisateur {user_id}")
         
         return jsonify({
@@ -194,7 +219,7 @@ def mark_all_notifications_read():
 
 @notifications_bp.route('/<int:notification_id>/archive', methods=['POST'])
 @require_auth
-def archive_notification(current_user, notification_id):
+def archive_notification(notification_id):
     """
     Archive une notification
     """
@@ -231,7 +256,7 @@ def archive_notification(current_user, notification_id):
 
 @notifications_bp.route('/<int:notification_id>', methods=['DELETE'])
 @require_auth
-def delete_notification(current_user, notification_id):
+def delete_notification(notification_id):
     """
     Supprime une notification
     """
@@ -267,7 +292,7 @@ def delete_notification(current_user, notification_id):
 
 @notifications_bp.route('/stats', methods=['GET'])
 @require_auth
-def get_notification_stats(current_user):
+def get_notification_stats():
     """
     Récupère les statistiques des notifications de l'utilisateur
     """
@@ -279,26 +304,23 @@ def get_notification_stats(current_user):
         
         current_time = datetime.utcnow()
         
-        # Compter par statut (sans les champs qui n'existent pas encore)
-        total = Notification.query.filter_by(user_id=user_id).count()
-        
-        unread = Notification.query.filter_by(
-            user_id=user_id,
-            is_read=False
-        ).count()
+        # Compteurs matérialisés (sans les champs qui n'existent pas encore)
+        counts = notification_counters.get(user_id)
+        total = counts['total']
+        unread = counts['unread']
         
-        # Compter par type (derniers 30 jours)
+        # Compter par type (derniers 30 jours), agrégé en base
+        from sqlalchemy import func
         last_month = current_time - timedelta(days=30)
-        type_counts = {}
-        
-        recent_notifications = Notification.query.filter(
-            Notification.user_id == user_id,
-            Notification.created_at >= last_month
-        ).all()
-        
-        for notification in recent_notifications:
-            type_name = notification.notification_type.value
-            type_counts[type_name] = type_counts.get(type_name, 0) + 1
+        type_counts = {
+            notification_type.value: count
+            for notification_type, count in db.session.query(
+                Notification.notification_type, func.count(Notification.id)
+            ).filter(
+                Notification.user_id == user_id,
+                Notification.created_at >= last_month
+            ).group_by(Notification.notification_type)
+        }
         
         result = {
             'total_notifications': total,
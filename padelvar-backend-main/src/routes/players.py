@@ -4,15 +4,19 @@ Philosophie d'optimisation appliquée selon clubs.py et admin.py
 """
 
 from flask import Blueprint, request, jsonify, session
-from sqlalchemy.orm import joinedload
-from sqlalchemy import desc, func, and_, or_
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy import case, desc, func, and_, or_
 from datetime import datetime, timedelta
 import json
 import time
 import logging
 
 from ..models.database import db
+from ..middleware.idempotence import with_idempotence
+from ..middleware.auth_context import get_current_user
 from ..models.user import User, Club, Court, Video, ClubActionHistory, player_club_follows
+from ..services.leaderboard import leaderboard
+from ..services.popular_clubs import popular_clubs
 
 logger = logging.getLogger(__name__)
 
@@ -44,8 +48,8 @@ def require_player_access():
             logger.warning("Tentative d'accès sans session")
             return None
         
-        # Optimisation: requête simple sans jointure pour la vérification d'accès
-        user = User.query.filter_by(id=session['user_id']).first()
+        # Utilisateur chargé une seule fois par requête (contexte d'authentification)
+        user = get_current_user()
         
         if not user:
             logger.warning(f"Utilisateur {session.get('user_id')} non trouvé")
@@ -383,37 +387,41 @@ def get_player_dashboard():
         # 1. Informations de base du joueur
         player_info = user.to_dict()
         
-        # 2. Statistiques des clubs suivis
-        followed_clubs_count = user.followed_clubs.count()  # count() pour dynamic relationship
+        # 2. Statistiques des clubs suivis (une requête: identifiants suivis)
+        followed_ids = [row.club_id for row in db.session.query(player_club_follows.c.club_id).filter(
+            player_club_follows.c.player_id == user.id
+        )]
+        followed_clubs_count = len(followed_ids)
         primary_club = None
         if user.club_id:
-            primary_club = Club.query.get(user.club_id)
-        
-        # 3. Statistiques des vidéos du joueur
-        player_videos = Video.query.filter_by(user_id=user.id).all()
+            primary_club = Club.query.options(selectinload(Club.overlays)).filter_by(id=user.club_id).first()
+        
+        # 3. Statistiques des vidéos du joueur (agrégats SQL, sans charger les vidéos)
+        total_videos, unlocked_videos, total_duration = db.session.query(
+            func.count(Video.id),
+            func.coalesce(func.sum(case((Video.is_unlocked.is_(True), 1), else_=0)), 0),
+            func.coalesce(func.sum(Video.duration), 0)
+        ).filter(Video.user_id == user.id).one()
+        recent_videos = Video.query.filter_by(user_id=user.id).order_by(desc(Video.id)).limit(5).all()
         videos_stats = {
-            "total_videos": len(player_videos),
-            "unlocked_videos": len([v for v in player_videos if v.is_unlocked]),
-            "total_duration": sum(v.duration for v in player_videos if v.duration),
-            "recent_videos": [v.to_dict() for v in player_videos[-5:]]  # 5 dernières
+            "total_videos": total_videos,
+            "unlocked_videos": int(unlocked_videos),
+            "total_duration": int(total_duration),
+            "recent_videos": [v.to_dict() for v in reversed(recent_videos)]  # 5 dernières
         }
         
-        # 4. Historique d'activité récente
-        recent_activity = ClubActionHistory.query.filter_by(
+        # 4. Historique d'activité récente (clubs chargés dans la même requête)
+        recent_activity = ClubActionHistory.query.options(
+            joinedload(ClubActionHistory.club)
+        ).filter_by(
             user_id=user.id
         ).order_by(desc(ClubActionHistory.performed_at)).limit(10).all()
         
         activity_data = []
         for activity in recent_activity:
-            club_name = "Club inconnu"
-            if activity.club_id:
-                club = Club.query.get(activity.club_id)
-                if club:
-                    club_name = club.name
-            
             activity_data.append({
                 "action_type": activity.action_type,
-                "club_name": club_name,
+                "club_name": activity.club.name if activity.club else "Club inconnu",
                 "performed_at": activity.performed_at.isoformat(),
                 "details": activity.action_details
             })
@@ -425,9 +433,9 @@ def get_player_dashboard():
             "credits_spent_this_month": 0     # À calculer depuis l'historique
         }
         
-        # Calculer les crédits du mois
+        # Calculer les crédits du mois (détails JSON seulement)
         month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_credits = ClubActionHistory.query.filter(
+        monthly_credits = db.session.query(ClubActionHistory.action_details).filter(
             ClubActionHistory.user_id == user.id,
             ClubActionHistory.action_type == 'add_credits',
             ClubActionHistory.performed_at >= month_start
@@ -443,27 +451,10 @@ def get_player_dashboard():
             except:
                 pass
         
-        # 6. Recommandations de clubs
+        # 6. Recommandations de clubs (classement précalculé, voir services/popular_clubs)
         recommended_clubs = []
         try:
-            # Recommander des clubs populaires non suivis
-            all_clubs = Club.query.all()
-            followed_ids = {c.id for c in user.followed_clubs.all()}  # .all() pour dynamic relationship
-            
-            for club in all_clubs:
-                if club.id not in followed_ids:
-                    followers_count = club.followers.count()  # count() pour dynamic relationship
-                    courts_count = len(club.courts) if hasattr(club, 'courts') else 0
-                    
-                    if followers_count > 0 or courts_count > 0:  # Clubs actifs
-                        club_dict = club.to_dict()
-                        club_dict["followers_count"] = followers_count
-                        club_dict["courts_count"] = courts_count
-                        recommended_clubs.append(club_dict)
-            
-            # Trier par popularité et prendre les 5 premiers
-            recommended_clubs.sort(key=lambda x: x.get("followers_count", 0), reverse=True)
-            recommended_clubs = recommended_clubs[:5]
+            recommended_clubs = popular_clubs.recommend(followed_ids, limit=5)
         except Exception as e:
             logger.error(f"Erreur lors du calcul des recommandations: {e}")
         
@@ -608,6 +599,7 @@ def unlock_video(video_id):
 # --- ROUTES DE GESTION DES CRÉDITS OPTIMISÉES ---
 
 @players_bp.route("/credits/buy", methods=["POST"])
+@with_idempotence(persist=True)
 def buy_credits():
     """Acheter des crédits avec les tarifs tunisiens"""
     user = require_player_access()
@@ -1192,56 +1184,27 @@ def get_leaderboard():
         club_id = request.args.get('club_id', type=int)
         limit = request.args.get('limit', 10, type=int)
         
-        # Construire la requête de base
-        if club_id:
-            # Classement par club
-            players_query = User.query.filter(
-                User.role == 'PLAYER',
-                User.club_id == club_id
-            )
-        else:
-            # Classement global
-            players_query = User.query.filter(User.role == 'PLAYER')
-        
-        # Tri selon le critère choisi
-        if sort_by == 'credits':
-            players = players_query.order_by(desc(User.credits_balance)).limit(limit).all()
-        elif sort_by == 'videos':
-            # Trier par nombre de vidéos (nécessite une jointure)
-            players = db.session.query(User).join(Video).filter(
-                User.role == 'PLAYER'
-            ).group_by(User.id).order_by(
-                desc(func.count(Video.id))
-            ).limit(limit).all()
-        else:
-            # Trier par activité récente
-            players = players_query.order_by(desc(User.last_login)).limit(limit).all()
+        # Classement Redis (sorted sets), fallback SQL agrégé
+        metric = sort_by if sort_by in ('credits', 'videos') else 'activity'
+        entries, current_user_rank = leaderboard.page(metric, club_id, limit, user.id)
         
         leaderboard_data = []
-        for i, player in enumerate(players, 1):
+        for i, entry in enumerate(entries, 1):
+            player = entry["user"]
             player_data = {
                 "rank": i,
                 "name": player.name,
                 "credits_balance": player.credits_balance,
-                "videos_count": Video.query.filter_by(user_id=player.id).count(),
+                "videos_count": entry["videos_count"],
                 "is_current_user": (player.id == user.id)
             }
             
             # Ajouter le club si disponible
-            if player.club_id:
-                club = Club.query.get(player.club_id)
-                if club:
-                    player_data["club_name"] = club.name
+            if player.club:
+                player_data["club_name"] = player.club.name
             
             leaderboard_data.append(player_data)
         
-        # Position du joueur actuel
-        current_user_rank = None
-        for i, player_data in enumerate(leaderboard_data):
-            if player_data["is_current_user"]:
-                current_user_rank = i + 1
-                break
-        
         return jsonify({
             "leaderboard": leaderboard_data,
             "current_user_rank": current_user_rank,
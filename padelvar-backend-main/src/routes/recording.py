@@ -3,7 +3,7 @@ Routes pour la gestion avancée des enregistrements
 Fonctionnalités : durée sélectionnable, arrêt automatique, gestion par club
 """
 
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, current_app
 from datetime import datetime, timedelta
 import uuid
 import logging
@@ -15,6 +15,8 @@ from ..models.user import (
     User, Club, Court, Video, RecordingSession, 
     ClubActionHistory, UserRole
 )
+from ..services.recording_state import recording_registry
+from ..middleware.auth_context import get_current_user
 # from ..services.video_capture_service_ultimate import (
 #     DirectVideoCaptureService
 # )
@@ -27,13 +29,6 @@ logger = logging.getLogger(__name__)
 
 recording_bp = Blueprint('recording', __name__, url_prefix='/api/recording')
 
-def get_current_user():
-    """Récupérer l'utilisateur actuel"""
-    user_id = session.get('user_id')
-    if not user_id:
-        return None
-    return User.query.get(user_id)
-
 def log_recording_action(session_obj, action_type, action_details, performed_by_id):
     """Log d'action pour les enregistrements avec gestion d'erreur améliorée"""
     try:
@@ -97,6 +92,7 @@ def start_recording_with_duration():
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
     
+    court_claim = None
     try:
         data = request.get_json()
         court_id = data.get('court_id')
@@ -115,9 +111,6 @@ def start_recording_with_duration():
         # Nettoyer les sessions expirées pour ce club avant de vérifier la disponibilité
         cleanup_expired_sessions(court.club_id)
         
-        # Note: La vérification de disponibilité du terrain est gérée par RecordingSession
-        # L'ancien système utilisait court.is_recording qui n'existe plus
-        
         # Vérifier que l'utilisateur a des crédits
         if user.credits_balance < 1:
             return jsonify({'error': 'Crédits insuffisants'}), 400
@@ -145,6 +138,12 @@ def start_recording_with_duration():
         # Générer un ID unique pour l'enregistrement
         recording_id = f"rec_{user.id}_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}"
         
+        # Réservation atomique du terrain pour la durée planifiée (pas d'enregistreur pour le heartbeat)
+        if not recording_registry.claim_court(court_id, recording_id, club_id=court.club_id, user_id=user.id,
+                                              ttl=planned_duration * 60):
+            return jsonify({'error': 'Terrain déjà en cours d\'enregistrement'}), 409
+        court_claim = (court_id, recording_id)
+        
         # Récupérer le club pour le titre
         club = Club.query.get(court.club_id)
         
@@ -166,9 +165,6 @@ def start_recording_with_duration():
             status='active'
         )
         
-        # Note: Le terrain est réservé via RecordingSession status='active'
-        # L'ancien système utilisait court.is_recording qui n'existe plus
-        
         #Débiter un crédit
         user.credits_balance -= 1
         
@@ -205,6 +201,8 @@ def start_recording_with_duration():
         
     except Exception as e:
         db.session.rollback()
+        if court_claim:
+            recording_registry.release_court(*court_claim)
         logger.error(f"Erreur lors du démarrage d'enregistrement: {str(e)}")
         logger.error(f"Type d'erreur: {type(e).__name__}")
         logger.error(f"Traceback: ", exc_info=True)
@@ -296,6 +294,7 @@ def _stop_recording_session(recording_session, stopped_by, performed_by_id):
         if court:
             court.is_recording = False
             logger.info(f"🔓 Terrain {court.name} libéré (enregistrement {stopped_by})")
+        recording_registry.release_court(recording_session.court_id, recording_session.recording_id)
         
         # Créer la vidéo
         elapsed_minutes = recording_session.get_elapsed_minutes()
@@ -314,15 +313,19 @@ def _stop_recording_session(recording_session, stopped_by, performed_by_id):
         logger.info(f"   💾 Stockage en DB: {final_duration:.0f} secondes = {final_duration/60:.2f} minutes")
         # Source: Calcul DB (temps start → end)
         
-        video = Video(
-            user_id=recording_session.user_id,
-            court_id=recording_session.court_id,
-            title=recording_session.title,
-            description=recording_session.description,
-            duration=final_duration,  # ✅ DURÉE RÉELLE du fichier vidéo
-            file_url=f'/videos/rec_{recording_session.recording_id}.mp4',
-            is_unlocked=True
-        )
+        # Vidéo déjà créée par la finalisation v3 (playlist HLS publiée)?
+        video = Video.query.filter_by(recording_id=recording_session.recording_id).first()
+        if video is None:
+            video = Video(
+                user_id=recording_session.user_id,
+                court_id=recording_session.court_id,
+                title=recording_session.title,
+                description=recording_session.description,
+                duration=final_duration,  # ✅ DURÉE RÉELLE du fichier vidéo
+                file_url=f'/videos/rec_{recording_session.recording_id}.mp4',
+                recording_id=recording_session.recording_id,
+                is_unlocked=True
+            )
         
         # 📦 Calculer la taille du fichier si disponible
         try:
@@ -361,6 +364,20 @@ def _stop_recording_session(recording_session, stopped_by, performed_by_id):
         
         logger.info(f"Enregistrement arrêté: {recording_session.recording_id} par {stopped_by}")
 
+        # Enregistrement lancé par /v3/start: arrêt FFmpeg, playlist HLS
+        # publiée sur la vidéo en arrière-plan
+        from src.services.recording_manager_v2 import get_recording_manager
+        recording_manager = get_recording_manager()
+        manager_info = recording_manager.get_recording_info(recording_session.recording_id)
+        if manager_info and manager_info['status'] == 'recording':
+            app = current_app._get_current_object()
+            recording_manager.stop_recording(
+                recording_id=recording_session.recording_id,
+                reason=stopped_by,
+                wait=False,
+                on_playback_ready=lambda recording: _save_playback_url(app, recording)
+            )
+
         # 🚀 UPLOAD BUNNY CDN AUTOMATIQUE
         try:
             # Déterminer le chemin local du fichier
@@ -517,38 +534,34 @@ def get_club_active_recordings():
 
 @recording_bp.route('/v3/clubs/<int:club_id>/courts', methods=['GET'])
 def get_available_courts(club_id):
-    """Récupérer les terrains disponibles d'un club"""
-    print(f"=== DEBUG TERRAINS DISPONIBLES ===")
-    print(f"Club ID demandé: {club_id}")
+    """Récupérer les terrains disponibles d'un club
     
+    Les enregistrements expirés sont clôturés en arrière-plan; un terrain dont
+    l'enregistreur ne bat plus est libéré à l'expiration de sa réservation.
+    """
     user = get_current_user()
     if not user:
-        print("❌ Utilisateur non authentifié")
         return jsonify({'error': 'Non authentifié'}), 401
     
-    print(f"👤 Utilisateur: {user.email} (ID: {user.id})")
-    
     try:
-        # Nettoyer automatiquement les enregistrements expirés pour ce club
-        cleanup_expired_sessions(club_id)
-        
         # Récupérer tous les terrains du club
         courts = Court.query.filter_by(club_id=club_id).all()
-        print(f"🏟️ Terrains trouvés pour club {club_id}: {len(courts)}")
+        
+        # Occupation lue dans le registre partagé (cache local), sans refresh par terrain
+        recordings = recording_registry.get_courts([court.id for court in courts])
         
         courts_data = []
         for court in courts:
-            # 🔍 DEBUG: Forcer un refresh depuis la BD
-            db.session.refresh(court)
-            print(f"🔍 DEBUG Court {court.id}: is_recording={court.is_recording}")
-            
             court_data = court.to_dict()
-            print(f"📍 Terrain '{court.name}' (ID: {court.id}) - Disponible: {court_data['available']}")
+            recording = recordings.get(court.id)
+            if recording:
+                court_data.update({
+                    'is_recording': True,
+                    'current_recording_id': recording['recording_id'],
+                    'available': False
+                })
             courts_data.append(court_data)
         
-        print(f"✅ Réponse API: {len(courts_data)} terrains retournés")
-        print(f"📋 Terrains: {[c['name'] for c in courts_data]}")
-        
         # Créer la réponse avec headers anti-cache
         response = jsonify({'courts': courts_data})
         response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -658,7 +671,11 @@ def recording_v3_test():
 
 @recording_bp.route('/v3/start', methods=['POST'])
 def start_recording_v3():
-    """🆕 ADAPTATEUR: Redirige vers le nouveau système vidéo stable"""
+    """
+    🆕 ADAPTATEUR: session vidéo (proxy + preview) et enregistrement par
+    recording_manager_v2 (segments HLS envoyés pendant le match si
+    SEGMENT_STREAMING_UPLOAD), arrêté par /v3/stop
+    """
     user = get_current_user()
     if not user:
         return jsonify({'error': 'Non authentifié'}), 401
@@ -666,7 +683,7 @@ def start_recording_v3():
     try:
         # 🆕 Utiliser le NOUVEAU système vidéo stable
         from src.video_system.session_manager import session_manager
-        from src.video_system.recording import video_recorder
+        from src.services.recording_manager_v2 import get_recording_manager
         
         data = request.get_json()
         court_id = data.get('court_id')
@@ -697,34 +714,52 @@ def start_recording_v3():
                 'error': 'Crédits insuffisants. Vous devez avoir au moins 1 crédit pour démarrer un enregistrement.'
             }), 400
         
+        # Réservation atomique du terrain, partagée entre workers
+        session_id = session_manager.new_session_id(court.club_id, court_id)
+        if not recording_registry.claim_court(court_id, session_id, club_id=court.club_id, user_id=user.id):
+            return jsonify({
+                'success': False,
+                'error': 'Terrain déjà en cours d\'enregistrement'
+            }), 409
+        
         # 1. Créer session caméra
         try:
             session = session_manager.create_session(
                 terrain_id=court_id,
                 camera_url=court.camera_url,
                 club_id=court.club_id,
-                user_id=user.id
+                user_id=user.id,
+                session_id=session_id
             )
             logger.info(f"✅ Session créée: {session.session_id}")
         except Exception as e:
             logger.error(f"❌ Erreur création session: {e}", exc_info=True)
+            recording_registry.release_court(court_id, session_id)
             return jsonify({
                 'success': False,
                 'error': f'Erreur création session: {str(e)}'
             }), 500
         
-        # 2. Démarrer enregistrement avec la durée en secondes
+        # 2. Démarrer enregistrement avec la durée en secondes, depuis le proxy de la session
+        recording_manager = get_recording_manager()
         try:
-            success = video_recorder.start_recording(
-                session=session,
-                duration_seconds=duration_minutes * 60  # Convertir minutes → secondes pour FFmpeg
+            success, message, _ = recording_manager.start_recording(
+                recording_id=session.session_id,
+                match_id=session.session_id,
+                terrain_id=court_id,
+                club_id=court.club_id,
+                user_id=user.id,
+                camera_url=court.camera_url,
+                duration_seconds=duration_minutes * 60,  # Convertir minutes → secondes pour FFmpeg
+                stream_url=session.local_url
             )
             
             if not success:
                 session_manager.close_session(session.session_id)
+                recording_registry.release_court(court_id, session.session_id)
                 return jsonify({
                     'success': False,
-                    'error': 'Échec démarrage enregistrement'
+                    'error': f'Échec démarrage enregistrement: {message}'
                 }), 500
             
             # 3. 🆕 Mettre à jour l'état du terrain dans la DB
@@ -769,8 +804,9 @@ def start_recording_v3():
                 logger.error(f"⚠️ Erreur mise à jour DB: {db_err}")
                 # Rollback et arrêter enregistrement proprement
                 db.session.rollback()
-                video_recorder.stop_recording(session.session_id)
+                recording_manager.stop_recording(session.session_id, reason='error', wait=False)
                 session_manager.close_session(session.session_id)
+                recording_registry.release_court(court_id, session.session_id)
                 return jsonify({
                     'success': False,
                     'error': f'Erreur base de données: {str(db_err)}'
@@ -795,10 +831,11 @@ def start_recording_v3():
             logger.error(f"❌ Erreur démarrage enregistrement: {e}", exc_info=True)
             # Arrêter enregistrement si démarré
             try:
-                video_recorder.stop_recording(session.session_id)
+                recording_manager.stop_recording(session.session_id, reason='error', wait=False)
                 session_manager.close_session(session.session_id)
             except:
                 pass
+            recording_registry.release_court(court_id, session.session_id)
             return jsonify({
                 'success': False,
                 'error': f'Erreur enregistrement: {str(e)}'
@@ -821,6 +858,7 @@ def stop_recording_v3():
     
     try:
         from src.services.recording_manager_v2 import get_recording_manager
+        from src.video_system.session_manager import session_manager
         
         data = request.get_json()
         recording_id = data.get('recording_id')
@@ -829,10 +867,15 @@ def stop_recording_v3():
             return jsonify({'error': 'recording_id requis'}), 400
         
         recording_manager = get_recording_manager()
+        app = current_app._get_current_object()
         
+        # Finalisation (playlist HLS, concaténation locale) en arrière-plan:
+        # l'URL de lecture est enregistrée sur la vidéo dès sa publication
         success, message = recording_manager.stop_recording(
             recording_id=recording_id,
-            reason='manual'
+            reason='manual',
+            wait=False,
+            on_playback_ready=lambda recording: _save_playback_url(app, recording)
         )
         
         if not success:
@@ -841,6 +884,22 @@ def stop_recording_v3():
                 'error': message
             }), 500
         
+        # FFmpeg arrêté: session en base terminée, terrain et proxy libérés
+        recording_session = RecordingSession.query.filter_by(
+            recording_id=recording_id,
+            status='active'
+        ).first()
+        if recording_session:
+            recording_session.status = 'stopped'
+            recording_session.stopped_by = 'club' if user.role == UserRole.CLUB else 'player'
+            recording_session.end_time = datetime.utcnow()
+            court = Court.query.get(recording_session.court_id)
+            if court:
+                court.is_recording = False
+            db.session.commit()
+        if session_manager.get_session(recording_id):
+            session_manager.close_session(recording_id)
+        
         # Get final recording info
         recording_info = recording_manager.get_recording_info(recording_id)
         
@@ -851,14 +910,10 @@ def stop_recording_v3():
         }
         
         if recording_info:
-            response['final_video_path'] = recording_info.get('final_video_path')
+            # 'finalizing': suivre /v3/status/<recording_id>; la playlist HLS
+            # (playback_url) est aussi écrite dans video.file_url
             response['status'] = recording_info.get('status')
-            
-            # Calculate file size if video exists
-            final_path = recording_info.get('final_video_path')
-            if final_path and os.path.exists(final_path):
-                file_size = os.path.getsize(final_path)
-                response['file_size_mb'] = file_size / (1024**2)
+            response['playback_url'] = recording_info.get('playback_url')
         
         logger.info(f"✅ V3 Recording stopped: {recording_id}")
         
@@ -872,6 +927,36 @@ def stop_recording_v3():
         }), 500
 
 
+def _save_playback_url(app, recording):
+    """Enregistrer la playlist HLS comme URL de lecture de la vidéo (thread de finalisation)"""
+    with app.app_context():
+        try:
+            video = Video.query.filter_by(recording_id=recording.recording_id).first()
+            if video is None:
+                recording_session = RecordingSession.query.filter_by(
+                    recording_id=recording.recording_id
+                ).first()
+                video = Video(
+                    user_id=recording.user_id,
+                    court_id=recording.terrain_id,
+                    title=(recording_session.title if recording_session and recording_session.title
+                           else f"Enregistrement {recording.recording_id}"),
+                    duration=int((datetime.now() - recording.start_time).total_seconds()),
+                    recording_id=recording.recording_id,
+                    is_unlocked=True
+                )
+                db.session.add(video)
+            
+            video.file_url = recording.playback_url
+            db.session.commit()
+            logger.info(f"▶️ URL de lecture enregistrée pour la vidéo {video.id}: {video.file_url}")
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"❌ Enregistrement de l'URL de lecture {recording.recording_id}: {e}")
+        finally:
+            db.session.remove()
+
+
 @recording_bp.route('/v3/status/<recording_id>', methods=['GET'])
 def get_recording_status_v3(recording_id):
     """Get status of a recording"""
@@ -897,6 +982,7 @@ def get_recording_status_v3(recording_id):
             'expected_end_time': recording_info.get('expected_end_time'),
             'segments_written': recording_info.get('segments_written', []),
             'final_video_path': recording_info.get('final_video_path'),
+            'playback_url': recording_info.get('playback_url'),
             'errors': recording_info.get('errors', [])
         }
         
@@ -7,7 +7,8 @@ from src.models.notification import (
     SupportMessage, SupportMessageStatus, SupportMessagePriority,
     Notification, NotificationType
 )
-from src.models.user import User, UserRole
+from src.models.user import UserRole
+from src.middleware.auth_context import get_current_user_snapshot
 import logging
 import os
 import json
@@ -32,7 +33,7 @@ def require_admin():
     if not user_id:
         return False
     
-    user = User.query.get(user_id)
+    user = get_current_user_snapshot()
     if not user:
         return False
     
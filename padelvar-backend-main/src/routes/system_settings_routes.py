@@ -4,7 +4,8 @@ Routes pour gérer les paramètres système (Super Admin uniquement)
 from flask import Blueprint, request, jsonify, session
 from src.models.database import db
 from src.models.system_settings import SystemSettings
-from src.models.user import User, UserRole
+from src.models.user import UserRole
+from src.middleware.auth_context import get_current_user
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,7 +18,7 @@ def require_super_admin():
     if not user_id:
         return None, jsonify({'error': 'Non authentifié'}), 401
     
-    user = User.query.get(user_id)
+    user = get_current_user()
     if not user or user.role != UserRole.SUPER_ADMIN:
         return None, jsonify({'error': 'Accès super admin requis'}), 403
     
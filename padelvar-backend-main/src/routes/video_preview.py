@@ -6,13 +6,24 @@ Endpoints pour:
 - Preview MJPEG (streaming continu)
 - Snapshot JPEG (image unique)
 - Support multi-viewers
+
+Les viewers ne se connectent plus au proxy local: le PreviewHub garde une
+seule connexion amont par session et sert snapshots et streams depuis
+la dernière frame en mémoire.
+
+Le stream MJPEG est redirigé vers le serveur de fan-out du hub
+(PREVIEW_HUB_PORT, actif par défaut). Avec PREVIEW_HUB_PORT=0 (hébergeur
+n'exposant qu'un port, ex. Render), Flask sert le stream: chaque viewer
+occupe un thread gunicorn, d'où la limite PREVIEW_MAX_CLIENTS par session.
 """
 
 import logging
-from flask import Blueprint, Response, jsonify, request
+from flask import Blueprint, Response, jsonify, request, redirect, current_app
 import requests
 
 from ..video_system import session_manager
+from ..video_system.config import VideoConfig
+from ..video_system.preview import preview_hub
 from ..models.user import UserRole
 from ..routes.auth import get_current_user
 
@@ -22,6 +33,15 @@ logger = logging.getLogger(__name__)
 preview_bp = Blueprint('preview', __name__, url_prefix='/api/preview')
 
 
+def _can_view(user, session) -> bool:
+    """Super admin, club propriétaire du terrain ou joueur de la session"""
+    if user.role == UserRole.SUPER_ADMIN:
+        return True
+    if user.role == UserRole.CLUB and session.club_id == user.club_id:
+        return True
+    return session.user_id == user.id
+
+
 @preview_bp.route('/<session_id>/stream.mjpeg', methods=['GET'])
 def stream_mjpeg(session_id: str):
     """
@@ -41,31 +61,25 @@ def stream_mjpeg(session_id: str):
         return jsonify({'error': 'Session non trouvée'}), 404
     
     # Vérifier les droits
-    if user.role not in [UserRole.SUPER_ADMIN, UserRole.CLUB_ADMIN]:
-        if session.user_id != user.id:
-            return jsonify({'error': 'Accès non autorisé'}), 403
+    if not _can_view(user, session):
+        return jsonify({'error': 'Accès non autorisé'}), 403
     
-    # Proxy le stream depuis le proxy local
     try:
         logger.info(f"📡 Stream preview demandé pour {session_id} par user {user.id}")
         
-        # Connexion au proxy local
-        proxy_response = requests.get(session.local_url, stream=True, timeout=30)
-        
-        if proxy_response.status_code != 200:
-            return jsonify({'error': 'Proxy non disponible'}), 503
+        # Serveur de fan-out asyncio: le stream ne mobilise pas de worker Flask
+        hub_url = _hub_stream_url(session)
+        if hub_url:
+            return redirect(hub_url, code=307)
         
-        # Re-stream vers le client
-        def generate():
-            try:
-                for chunk in proxy_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        yield chunk
-            except Exception as e:
-                logger.error(f"❌ Erreur streaming: {e}")
+        # Hub désactivé: flux partagé servi par Flask (un thread par viewer)
+        feed = preview_hub.feeds.get(session.session_id)
+        if feed is not None and feed.viewers >= VideoConfig.PREVIEW_MAX_CLIENTS:
+            return jsonify({'error': 'Trop de viewers pour cette session'}), 503
         
         return Response(
-            generate(),
+            preview_hub.iter_mjpeg(session.session_id, session.local_url,
+                                   max_viewers=VideoConfig.PREVIEW_MAX_CLIENTS),
             mimetype='multipart/x-mixed-replace; boundary=frame',
             headers={
                 'Cache-Control': 'no-cache, no-store, must-revalidate',
@@ -79,6 +93,26 @@ def stream_mjpeg(session_id: str):
         return jsonify({'error': str(e)}), 500
 
 
+def _hub_stream_url(session):
+    """URL signée du stream sur le serveur de fan-out (None si désactivé)"""
+    if not VideoConfig.PREVIEW_HUB_PORT:
+        return None
+    
+    secret_key = current_app.config['SECRET_KEY']
+    preview_hub.start_server(secret_key)
+    token = preview_hub.make_stream_token(secret_key, session.session_id, session.local_url)
+    
+    if VideoConfig.PREVIEW_HUB_PUBLIC_URL:
+        base_url = VideoConfig.PREVIEW_HUB_PUBLIC_URL.rstrip('/')
+    else:
+        # Même hôte que l'API, port du hub
+        host = request.host
+        if host.rsplit(':', 1)[-1].isdigit():
+            host = host.rsplit(':', 1)[0]
+        base_url = f"{request.scheme}://{host}:{VideoConfig.PREVIEW_HUB_PORT}"
+    return f"{base_url}/preview/{session.session_id}/stream.mjpeg?token={token}"
+
+
 @preview_bp.route('/<session_id>/snapshot.jpg', methods=['GET'])
 def snapshot(session_id: str):
     """
@@ -98,28 +132,29 @@ def snapshot(session_id: str):
         return jsonify({'error': 'Session non trouvée'}), 404
     
     # Vérifier les droits
-    if user.role not in [UserRole.SUPER_ADMIN, UserRole.CLUB_ADMIN]:
-        if session.user_id != user.id:
-            return jsonify({'error': 'Accès non autorisé'}), 403
+    if not _can_view(user, session):
+        return jsonify({'error': 'Accès non autorisé'}), 403
     
     try:
-        # Construire l'URL du snapshot depuis le proxy
-        snapshot_url = session.local_url.replace('/stream.mjpg', '/snapshot.jpg')
+        # Dernière frame en cache (pas d'aller-retour HTTP vers le proxy)
+        jpeg, etag = preview_hub.get_snapshot(session.session_id, session.local_url)
         
-        # Récupérer le snapshot
-        response = requests.get(snapshot_url, timeout=5)
-        
-        if response.status_code != 200:
+        if jpeg is None:
             return jsonify({'error': 'Snapshot non disponible'}), 503
         
+        cache_headers = {
+            'ETag': etag,
+            'Cache-Control': f'private, max-age={VideoConfig.PREVIEW_SNAPSHOT_MAX_AGE}'
+        }
+        
+        # Frame inchangée depuis le dernier poll du client
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=304, headers=cache_headers)
+        
         return Response(
-            response.content,
+            jpeg,
             mimetype='image/jpeg',
-            headers={
-                'Cache-Control': 'no-cache, no-store, must-revalidate',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=cache_headers
         )
         
     except Exception as e:
@@ -142,9 +177,8 @@ def preview_info(session_id: str):
         return jsonify({'error': 'Session non trouvée'}), 404
     
     # Vérifier les droits
-    if user.role not in [UserRole.SUPER_ADMIN, UserRole.CLUB_ADMIN]:
-        if session.user_id != user.id:
-            return jsonify({'error': 'Accès non autorisé'}), 403
+    if not _can_view(user, session):
+        return jsonify({'error': 'Accès non autorisé'}), 403
     
     try:
         # Vérifier la santé du proxy
@@ -164,7 +198,8 @@ def preview_info(session_id: str):
             'proxy_url': session.local_url,
             'stream_url': f'/api/preview/{session_id}/stream.mjpeg',
             'snapshot_url': f'/api/preview/{session_id}/snapshot.jpg',
-            'recording_active': session.recording_active
+            'recording_active': session.recording_active,
+            'preview': preview_hub.feeds[session_id].to_dict() if session_id in preview_hub.feeds else None
         }), 200
         
     except Exception as e:
@@ -3,6 +3,7 @@ Routes pour le partage de vidéos entre utilisateurs
 """
 from flask import Blueprint, request, jsonify, session
 from src.models.user import db, User, Video, SharedVideo
+from src.middleware.auth_context import get_current_user
 from functools import wraps
 import logging
 
@@ -18,11 +19,6 @@ def login_required(f):
         return f(*args, **kwargs)
     return wrapper
 
-def get_current_user():
-    """Récupère l'utilisateur courant depuis la session"""
-    uid = session.get('user_id')
-    return User.query.get(uid) if uid else None
-
 def api_response(data=None, message=None, status=200, error=None):
     """Format de réponse API standardisé"""
     resp = {}
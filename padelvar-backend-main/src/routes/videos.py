@@ -2,10 +2,14 @@
 Module vidéos (nettoyé). Les endpoints start/stop internes sont dépréciés.
 Utiliser /api/recording/start et /api/recording/stop.
 """
-from flask import Blueprint, request, jsonify, session
-from src.models.user import db, User, Video, Court, Club
+from flask import Blueprint, request, jsonify, session, send_from_directory, redirect
+from src.models.user import db, Video, Court, Club
+from src.middleware.auth_context import get_current_user
+from src.services.thumbnail_pipeline import thumbnail_pipeline
+from src.services.video_file_service import local_path_from_url, resolve_local_video, serve_video_file
 from functools import wraps
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 videos_bp = Blueprint('videos', __name__)
@@ -21,11 +25,6 @@ def login_required(f):
     return w
 
 
-def get_current_user():
-    uid = session.get('user_id')
-    return User.query.get(uid) if uid else None
-
-
 def api_response(data=None, message=None, status=200, error=None):
     resp = {}
     if data is not None:
@@ -166,6 +165,99 @@ def watch_video(video_id):
     }})
 
 
+@videos_bp.route('/stream/<filename>', methods=['GET'])
+@login_required
+def stream_video(filename):
+    """
+    Sert un fichier vidéo local avec support HTTP Range
+
+    - Range simple ou multiple, If-Range, ETag / Last-Modified
+    - ?t=début-fin: ne sert que les octets couvrant cet intervalle (secondes),
+      calculés depuis l'index moov du MP4
+    """
+    user = get_current_user()
+    video = _video_for_file(filename)
+    if not video:
+        return api_response(error='Vidéo introuvable', status=404)
+    if video.user_id != user.id and not video.is_unlocked:
+        return api_response(error='Accès non autorisé', status=403)
+
+    path = resolve_local_video(filename)
+    if not path:
+        return api_response(error='Vidéo introuvable', status=404)
+    return serve_video_file(path)
+
+
+def _video_for_file(filename):
+    """Vidéo dont le file_url désigne ce fichier (ou video_<id>.mp4 sans file_url, cf. watch)"""
+    candidates = Video.query.filter(Video.file_url.like(f'%{filename}')).all()
+    for video in candidates:
+        if video.file_url.rstrip('/').split('/')[-1] == filename:
+            return video
+    match = re.fullmatch(r'video_(\d+)\.mp4', filename)
+    if match:
+        return Video.query.filter_by(id=int(match.group(1)), file_url=None).first()
+    return None
+
+
+@videos_bp.route('/download/<int:video_id>', methods=['GET'])
+@login_required
+def download_video(video_id):
+    """Télécharge une vidéo (reprise possible via Range)"""
+    user = get_current_user()
+    video = Video.query.get_or_404(video_id)
+    if video.user_id != user.id and not video.is_unlocked:
+        return api_response(error='Accès non autorisé', status=403)
+
+    # Vidéo hébergée sur le CDN: le client télécharge directement depuis Bunny
+    if video.file_url and video.file_url.startswith(('http://', 'https://')):
+        return redirect(video.file_url)
+
+    path = local_path_from_url(video.file_url)
+    if not path:
+        return api_response(error='Fichier vidéo introuvable', status=404)
+    return serve_video_file(path, download_name=f"{video.title or path.stem}.mp4", as_attachment=True)
+
+
+@videos_bp.route('/<int:video_id>/previews', methods=['GET'])
+@login_required
+def get_video_previews(video_id):
+    """Poster, sprite WebVTT et bande de la vidéo (202 tant qu'ils sont en génération)"""
+    user = get_current_user()
+    video = Video.query.get_or_404(video_id)
+    if video.user_id != user.id and not video.is_unlocked:
+        return api_response(error='Accès non autorisé', status=403)
+
+    # Seuls les fichiers locaux passent par le pipeline (le CDN fournit ses miniatures)
+    path = local_path_from_url(video.file_url)
+    if not path:
+        return api_response({'previews': None, 'status': 'unavailable'})
+
+    manifest = thumbnail_pipeline.cached(str(path))
+    if manifest is None:
+        thumbnail_pipeline.submit(str(path))
+        return api_response({'previews': None, 'status': 'processing'}, status=202)
+
+    base = f"/api/videos/previews/{manifest['key']}/"
+    return api_response({'status': 'ready', 'previews': {
+        'duration': manifest['duration'],
+        'poster_url': base + manifest['poster'],
+        'poster_time': manifest['poster_time'],
+        'vtt_url': base + manifest['vtt'],
+        'strip_url': base + manifest['strip'] if manifest.get('strip') else None,
+        'strip_frames': manifest['strip_frames'],
+        'sprite_interval': manifest['sprite_interval'],
+    }})
+
+
+@videos_bp.route('/previews/<key>/<filename>', methods=['GET'])
+def get_preview_file(key, filename):
+    """Fichiers du pipeline de vignettes (adressés par contenu: cache long)"""
+    if not re.fullmatch(r'[0-9a-f]{64}', key):
+        return api_response(error='Aperçu introuvable', status=404)
+    return send_from_directory(thumbnail_pipeline.directory_for(key), filename, max_age=31536000)
+
+
 # Courts
 @videos_bp.route('/courts/available', methods=['GET'])
 @login_required
@@ -0,0 +1,210 @@
+"""
+Envoi de notifications en masse par lots
+
+Au lieu d'une tâche Celery et d'une transaction par destinataire:
+- les ids sont découpés en lots de NOTIFICATION_BATCH_SIZE
+- chaque lot = 1 requête de vérification des utilisateurs + 1 INSERT
+  multi-lignes (bulk_insert_mappings) + 1 commit
+- les emails sont envoyés par groupes sur une seule connexion SMTP
+"""
+
+import logging
+import os
+import smtplib
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from ..models.database import db
+from ..models.user import Notification, NotificationType, User
+from .event_stream import event_broker
+from .notification_counters import notification_counters
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', '1000'))
+EMAIL_BATCH_SIZE = int(os.environ.get('NOTIFICATION_EMAIL_BATCH_SIZE', '200'))
+
+# Configuration SMTP (même variables que les autres services d'email)
+SMTP_SERVER = os.environ.get('SMTP_SERVER', 'smtp.gmail.com')
+SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
+SMTP_USERNAME = os.environ.get('SMTP_USERNAME', '')
+SMTP_PASSWORD = os.environ.get('SMTP_PASSWORD', '')
+SMTP_FROM_EMAIL = os.environ.get('SMTP_FROM_EMAIL', 'noreply@mysmash.tn')
+
+EMAIL_PRIORITIES = ('high', 'urgent')
+
+Recipient = Tuple[int, str, str]  # (user_id, email, nom)
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    """Découper une séquence en lots de `size` éléments"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def insert_notification_batch(user_ids: Sequence[int], notification_type, title: str, message: str,
+                              priority: str = 'normal', related_resource_type: Optional[str] = None,
+                              related_resource_id=None, action_url: Optional[str] = None,
+                              action_label: Optional[str] = None,
+                              expires_in_hours: Optional[int] = 24) -> List[Recipient]:
+    """
+    Créer les notifications d'un lot en une transaction
+
+    Les ids inexistants sont ignorés (comme send_notification).
+
+    Returns:
+        Destinataires effectivement notifiés (id, email, nom)
+    """
+    if isinstance(notification_type, str):
+        notification_type = NotificationType(notification_type)
+
+    recipients = db.session.query(User.id, User.email, User.name).filter(
+        User.id.in_(list(user_ids))
+    ).all()
+    if not recipients:
+        return []
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(hours=expires_in_hours) if expires_in_hours else None
+    related_resource_id = str(related_resource_id) if related_resource_id is not None else None
+    db.session.bulk_insert_mappings(Notification, [{
+        'user_id': user_id,
+        'title': title,
+        'message': message,
+        'notification_type': notification_type,
+        'priority': priority,
+        'is_read': False,
+        'is_archived': False,
+        'related_resource_type': related_resource_type,
+        'related_resource_id': related_resource_id,
+        'action_url': action_url,
+        'action_label': action_label,
+        'created_at': now,
+        'expires_at': expires_at,
+    } for user_id, _, _ in recipients])
+    db.session.commit()
+
+    # bulk_insert_mappings ne déclenche pas les événements mapper: compteurs
+    # notif:counts des destinataires supprimés (recalcul à la prochaine
+    # lecture) et publication explicite vers le flux SSE (un seul aller-retour
+    # Redis par opération pour le lot)
+    notification_counters.invalidate(*(user_id for user_id, _, _ in recipients))
+    event_broker.publish_many([(user_id, 'notification', {
+        'type': notification_type.value,
+        'title': title,
+        'message': message,
+        'is_read': False,
+        'link': action_url,
+        'created_at': now.isoformat(),
+    }) for user_id, _, _ in recipients])
+
+    return [tuple(r) for r in recipients]
+
+
+def render_notification_email(name: str, title: str, message: str) -> str:
+    return f"""
+        Bonjour {name},
+
+        {title}
+
+        {message}
+
+        Cordialement,
+        L'équipe MySmash
+        """
+
+
+class SmtpBatchSender:
+    """
+    Connexion SMTP partagée pour un groupe d'emails
+
+    Sans identifiants SMTP (développement), les envois sont simulés et
+    journalisés comme send_email_notification.
+
+    Usage:
+        with SmtpBatchSender() as sender:
+            for email, subject, body in messages:
+                sender.send(email, subject, body)
+    """
+
+    def __init__(self, server: str = None, port: int = None, username: str = None,
+                 password: str = None, from_email: str = None, use_tls: bool = True):
+        self.server = server or SMTP_SERVER
+        self.port = port or SMTP_PORT
+        self.username = SMTP_USERNAME if username is None else username
+        self.password = SMTP_PASSWORD if password is None else password
+        self.from_email = from_email or SMTP_FROM_EMAIL
+        self.use_tls = use_tls
+        self._smtp: Optional[smtplib.SMTP] = None
+        self.sent = 0
+        self.failed = 0
+        self.connections = 0
+
+    @property
+    def simulated(self) -> bool:
+        return not self.username or not self.password
+
+    def _connect(self):
+        self._smtp = smtplib.SMTP(self.server, self.port, timeout=30)
+        if self.use_tls:
+            self._smtp.starttls()
+        self._smtp.login(self.username, self.password)
+        self.connections += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except smtplib.SMTPException:
+                pass
+            self._smtp = None
+
+    def send(self, to_email: str, subject: str, body: str) -> bool:
+        if self.simulated:
+            logger.info(f"Email simulé envoyé à {to_email}: {subject}")
+            self.sent += 1
+            return True
+
+        msg = MIMEText(body, 'plain', 'utf-8')
+        msg['From'] = self.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+
+        # Une reconnexion si le serveur a fermé la connexion partagée
+        for attempt in range(2):
+            try:
+                if self._smtp is None:
+                    self._connect()
+                self._smtp.send_message(msg)
+                self.sent += 1
+                return True
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                if attempt:
+                    break
+            except (smtplib.SMTPException, OSError) as e:
+                logger.warning(f"⚠️ Email non envoyé à {to_email}: {e}")
+                break
+        self.failed += 1
+        return False
+
+
+def send_email_batch(recipients: Iterable[Sequence], title: str, message: str,
+                     sender: Optional[SmtpBatchSender] = None) -> Dict[str, int]:
+    """Envoyer un groupe d'emails sur une seule connexion SMTP"""
+    own_sender = sender is None
+    sender = sender or SmtpBatchSender()
+    try:
+        for _, email, name in recipients:
+            sender.send(email, title, render_notification_email(name, title, message))
+    finally:
+        if own_sender:
+            sender.close()
+    return {'sent': sender.sent, 'failed': sender.failed}
@@ -0,0 +1,355 @@
+"""
+Upload reprenable vers Bunny Stream (protocole TUS 1.0.0)
+
+- Offsets persistés sur disque par tâche (reprise après redémarrage du worker)
+- Upload par chunks: seul le chunk en échec est renvoyé, à partir de l'offset
+  confirmé par le serveur (HEAD)
+- Upload parallèle en plusieurs parties si le serveur annonce l'extension
+  TUS "concatenation"
+- requests.Session partagée (keep-alive, pool de connexions)
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = '1.0.0'
+BUNNY_TUS_ENDPOINT = 'https://video.bunnycdn.com/tusupload'
+SIGNATURE_TTL = 24 * 3600  # Validité de la signature TUS Bunny (secondes)
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_STATE_DIR = BACKEND_ROOT / 'instance' / 'bunny_uploads'
+
+
+class ResumableUploadError(Exception):
+    """Échec d'upload (l'état persisté permet une reprise ultérieure)"""
+
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    """Session HTTP partagée avec pool de connexions keep-alive"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def resume_key_for(path: str) -> str:
+    """
+    Clé stable d'un fichier (chemin absolu + taille + date de modification)
+
+    Identique d'un processus à l'autre: un fichier remis en queue après un
+    redémarrage retrouve son état d'upload.
+    """
+    stat = os.stat(path)
+    raw = f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def bunny_tus_headers(library_id: str, api_key: str, video_id: str) -> Dict[str, str]:
+    """Headers d'authentification TUS de Bunny Stream (signature SHA256)"""
+    expire = int(time.time()) + SIGNATURE_TTL
+    signature = hashlib.sha256(f"{library_id}{api_key}{expire}{video_id}".encode()).hexdigest()
+    return {
+        'AuthorizationSignature': signature,
+        'AuthorizationExpire': str(expire),
+        'VideoId': video_id,
+        'LibraryId': str(library_id),
+    }
+
+
+class UploadStateStore:
+    """États d'upload persistés en JSON (un fichier par tâche, écriture atomique)"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = Path(directory or os.environ.get('BUNNY_UPLOAD_STATE_DIR', DEFAULT_STATE_DIR))
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ État d'upload illisible ({key}): {e}")
+            return None
+
+    def save(self, key: str, state: Dict[str, Any]):
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+
+    def delete(self, key: str):
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def list_states(self) -> List[Dict[str, Any]]:
+        """États en cours (uploads interrompus)"""
+        if not self.directory.is_dir():
+            return []
+        states = []
+        for path in self.directory.glob('*.json'):
+            state = self.load(path.stem)
+            if state:
+                states.append(state)
+        return states
+
+
+class ResumableUploader:
+    """
+    Client TUS avec reprise
+
+    L'état d'une tâche (URL d'upload, parties, offsets confirmés) est
+    sauvegardé après chaque chunk accepté par le serveur.
+    """
+
+    def __init__(self, session: requests.Session, state_store: UploadStateStore,
+                 endpoint: str = BUNNY_TUS_ENDPOINT, chunk_size: int = 8 * 1024 * 1024,
+                 chunk_retries: int = 5, retry_delay: float = 0.5,
+                 parallel_parts: int = 1, timeout: float = 300):
+        self.session = session
+        self.state_store = state_store
+        self.endpoint = endpoint
+        self.chunk_size = chunk_size
+        self.chunk_retries = chunk_retries
+        self.retry_delay = retry_delay
+        self.parallel_parts = max(1, parallel_parts)
+        self.timeout = timeout
+        self._extensions: Optional[List[str]] = None
+
+        self.stats = {
+            'chunks_sent': 0,
+            'chunks_retried': 0,
+            'bytes_sent': 0,
+            'uploads_resumed': 0,
+        }
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name: str, value: int = 1):
+        with self._stats_lock:
+            self.stats[name] += value
+
+    # Découverte / création
+
+    def server_extensions(self) -> List[str]:
+        """Extensions TUS annoncées par le serveur (OPTIONS, mis en cache)"""
+        if self._extensions is None:
+            try:
+                response = self.session.options(self.endpoint, timeout=30)
+                header = response.headers.get('Tus-Extension', '')
+                self._extensions = [e.strip() for e in header.split(',') if e.strip()]
+            except requests.exceptions.RequestException:
+                return []
+        return self._extensions
+
+    @staticmethod
+    def _encode_metadata(metadata: Dict[str, str]) -> str:
+        return ','.join(f"{key} {base64.b64encode(str(value).encode()).decode()}"
+                        for key, value in metadata.items() if value is not None)
+
+    def _create_upload(self, length: int, headers: Dict[str, str],
+                       metadata: Dict[str, str], concat: Optional[str] = None) -> str:
+        request_headers = {**headers, 'Tus-Resumable': TUS_VERSION}
+        if concat and concat.startswith('final'):
+            request_headers['Upload-Concat'] = concat
+        else:
+            request_headers['Upload-Length'] = str(length)
+            if concat:
+                request_headers['Upload-Concat'] = concat
+        if metadata:
+            request_headers['Upload-Metadata'] = self._encode_metadata(metadata)
+
+        response = self.session.post(self.endpoint, headers=request_headers, timeout=30)
+        location = response.headers.get('Location')
+        if response.status_code not in (200, 201) or not location:
+            raise ResumableUploadError(f"Création upload TUS: {response.status_code} - {response.text[:200]}")
+        return urljoin(self.endpoint, location)
+
+    def _server_offset(self, url: str, headers: Dict[str, str]) -> Optional[int]:
+        """Offset confirmé par le serveur, None si l'upload n'existe plus"""
+        response = self.session.head(url, headers={**headers, 'Tus-Resumable': TUS_VERSION}, timeout=30)
+        if response.status_code in (404, 410):
+            return None
+        if response.status_code not in (200, 204) or 'Upload-Offset' not in response.headers:
+            raise ResumableUploadError(f"HEAD upload TUS: {response.status_code}")
+        return int(response.headers['Upload-Offset'])
+
+    # Upload
+
+    def _plan_parts(self, size: int, use_concat: bool) -> List[Dict[str, Any]]:
+        """Découpe du fichier en parties alignées sur chunk_size"""
+        count = self.parallel_parts if use_concat else 1
+        chunks = max(1, -(-size // self.chunk_size))
+        count = min(count, chunks)
+        per_part = -(-chunks // count) * self.chunk_size
+        parts = []
+        start = 0
+        while start < size or not parts:
+            length = min(per_part, size - start)
+            parts.append({'start': start, 'length': length, 'offset': 0, 'url': None})
+            start += length
+        return parts
+
+    def _upload_part(self, path: str, part: Dict[str, Any], headers: Dict[str, str],
+                     metadata: Dict[str, str], concat: bool, save: Callable[[], None],
+                     on_progress: Optional[Callable[[int], None]]):
+        """Envoyer une partie chunk par chunk; seul le chunk en échec est rejoué"""
+        if part['url'] and part['offset'] < part['length']:
+            offset = self._server_offset(part['url'], headers)
+            if offset is None:
+                part['url'] = None
+            else:
+                part['offset'] = offset
+
+        if not part['url']:
+            part['url'] = self._create_upload(part['length'], headers, metadata,
+                                              concat='partial' if concat else None)
+            part['offset'] = 0
+            save()
+
+        with open(path, 'rb') as f:
+            failures = 0
+            while part['offset'] < part['length']:
+                length = min(self.chunk_size, part['length'] - part['offset'])
+                f.seek(part['start'] + part['offset'])
+                chunk = f.read(length)
+                try:
+                    response = self.session.patch(
+                        part['url'],
+                        data=chunk,
+                        headers={
+                            **headers,
+                            'Tus-Resumable': TUS_VERSION,
+                            'Upload-Offset': str(part['offset']),
+                            'Content-Type': 'application/offset+octet-stream',
+                        },
+                        timeout=self.timeout,
+                    )
+                    if response.status_code != 204:
+                        raise ResumableUploadError(f"PATCH {response.status_code}")
+                    new_offset = int(response.headers.get('Upload-Offset', part['offset'] + len(chunk)))
+                except (requests.exceptions.RequestException, ResumableUploadError, ValueError) as e:
+                    failures += 1
+                    self._count('chunks_retried')
+                    if failures > self.chunk_retries:
+                        raise ResumableUploadError(
+                            f"Chunk à l'offset {part['start'] + part['offset']} en échec: {e}")
+                    time.sleep(min(self.retry_delay * (2 ** (failures - 1)), 10))
+                    # Réaligner sur ce que le serveur a réellement reçu
+                    try:
+                        offset = self._server_offset(part['url'], headers)
+                    except (requests.exceptions.RequestException, ResumableUploadError):
+                        continue
+                    if offset is None:
+                        raise ResumableUploadError("Upload TUS expiré côté serveur")
+                    sent = offset - part['offset']
+                    if sent > 0:
+                        # Le serveur a gardé une partie du chunk: seul le reste est renvoyé
+                        failures = 0
+                        self._count('bytes_sent', sent)
+                        if on_progress:
+                            on_progress(sent)
+                    part['offset'] = offset
+                    save()
+                    continue
+
+                failures = 0
+                sent = new_offset - part['offset']
+                part['offset'] = new_offset
+                save()
+                self._count('chunks_sent')
+                self._count('bytes_sent', sent)
+                if on_progress:
+                    on_progress(sent)
+
+    def upload(self, path: str, key: str, headers: Dict[str, str],
+               metadata: Optional[Dict[str, str]] = None,
+               extra_state: Optional[Dict[str, Any]] = None,
+               on_progress: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+        """
+        Uploader (ou reprendre) un fichier
+
+        Args:
+            path: Fichier local
+            key: Clé de l'état persisté (voir resume_key_for)
+            headers: Headers d'authentification (voir bunny_tus_headers)
+            metadata: Upload-Metadata TUS (title, filetype...)
+            extra_state: Données conservées avec l'état (ex: bunny_video_id)
+            on_progress: Callback(octets confirmés)
+
+        Returns:
+            État final de l'upload
+        """
+        size = os.path.getsize(path)
+        state = self.state_store.load(key)
+        if state and state.get('size') == size and state.get('parts'):
+            self._count('uploads_resumed')
+            done = sum(p['offset'] for p in state['parts'])
+            logger.info(f"🔁 Reprise upload {Path(path).name} à {done}/{size} octets")
+            if on_progress and done:
+                on_progress(done)
+        else:
+            use_concat = (self.parallel_parts > 1 and size > self.chunk_size
+                          and 'concatenation' in self.server_extensions())
+            state = {
+                'key': key,
+                'local_path': str(path),
+                'size': size,
+                'parts': self._plan_parts(size, use_concat),
+                'concat': use_concat,
+                'final_url': None,
+                'created_at': time.time(),
+            }
+        state.update(extra_state or {})
+
+        lock = threading.Lock()
+
+        def save():
+            with lock:
+                self.state_store.save(key, state)
+
+        save()
+        metadata = metadata or {}
+        parts = state['parts']
+
+        if len(parts) == 1:
+            self._upload_part(path, parts[0], headers, metadata, state['concat'], save, on_progress)
+        else:
+            with ThreadPoolExecutor(max_workers=len(parts), thread_name_prefix="TusPart") as pool:
+                futures = [pool.submit(self._upload_part, path, part, headers, metadata,
+                                       True, save, on_progress) for part in parts]
+                for future in futures:
+                    future.result()
+
+        if state['concat'] and not state['final_url']:
+            urls = ' '.join(part['url'] for part in parts)
+            state['final_url'] = self._create_upload(size, headers, metadata, concat=f"final;{urls}")
+            save()
+
+        self.state_store.delete(key)
+        return state
@@ -12,9 +12,17 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Tuple, List
 import requests
 from pathlib import Path
-from queue import Queue, Empty
+from queue import Empty
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import uuid
+
+from .bunny_resumable_upload import (
+    ResumableUploader, ResumableUploadError, UploadStateStore,
+    bunny_tus_headers, create_session, resume_key_for
+)
+from .upload_queue import HISTORY_CAP, PersistentUploadQueue
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -29,7 +37,9 @@ class BunnyStorageConfig:
         self.cdn_hostname = os.environ.get('BUNNY_CDN_HOSTNAME', 'vz-f6fd0c7d-d70.b-cdn.net')  # Updated
         
         # URLs API
-        self.api_base_url = f"https://video.bunnycdn.com/library/{self.library_id}"
+        self.api_host = os.environ.get('BUNNY_API_HOST', 'https://video.bunnycdn.com').rstrip('/')
+        self.api_base_url = f"{self.api_host}/library/{self.library_id}"
+        self.tus_endpoint = os.environ.get('BUNNY_TUS_ENDPOINT', f"{self.api_host}/tusupload")
         
         # Headers API
         self.headers = {
@@ -44,6 +54,12 @@ class BunnyStorageConfig:
         self.retry_delay = 5  # secondes
         self.timeout = 300  # 5 minutes
         self.max_concurrent_uploads = 2
+        
+        # Upload reprenable (TUS): offsets persistés, retry par chunk
+        self.resumable_uploads = os.environ.get('BUNNY_RESUMABLE_UPLOADS', 'true').lower() == 'true'
+        self.upload_state_dir = os.environ.get('BUNNY_UPLOAD_STATE_DIR')
+        self.parallel_parts = int(os.environ.get('BUNNY_UPLOAD_PARALLEL_PARTS', 1))
+        self.chunk_retries = 5
     
     def is_valid(self) -> bool:
         """Vérifie si la configuration est valide"""
@@ -70,8 +86,10 @@ class UploadStatus:
 class UploadTask:
     """Tâche d'upload avec métadonnées"""
     
-    def __init__(self, local_path: str, title: str = None, metadata: Dict = None):
-        self.id = f"upload_{int(time.time())}_{hashlib.md5(local_path.encode()).hexdigest()[:8]}"
+    def __init__(self, local_path: str, title: str = None, metadata: Dict = None,
+                 task_id: str = None):
+        self.id = task_id or (f"upload_{int(time.time())}_{hashlib.md5(local_path.encode()).hexdigest()[:8]}"
+                              f"_{uuid.uuid4().hex[:6]}")
         self.local_path = local_path
         self.title = title or Path(local_path).stem
         self.metadata = metadata or {}
@@ -90,6 +108,12 @@ class UploadTask:
         self.bytes_uploaded = 0
         self.total_bytes = 0
         
+        # Clé de reprise (stable entre redémarrages pour un même fichier)
+        try:
+            self.resume_key = resume_key_for(local_path)
+        except OSError:
+            self.resume_key = None
+        
         # Lock pour thread safety
         self._lock = threading.Lock()
     
@@ -131,9 +155,10 @@ class BunnyStorageService:
             raise ValueError("Configuration Bunny CDN invalide")
         
         # Queue et workers
-        self.upload_queue = Queue()
+        # File persistante (SQLite WAL): survit aux redémarrages
+        self.upload_queue = PersistentUploadQueue()
         self.active_uploads: Dict[str, UploadTask] = {}
-        self.completed_uploads: Dict[str, UploadTask] = {}
+        self.completed_uploads: 'OrderedDict[str, UploadTask]' = OrderedDict()
         
         # Thread management
         self.executor = ThreadPoolExecutor(
@@ -143,6 +168,20 @@ class BunnyStorageService:
         self.is_running = True
         self._lock = threading.RLock()
         
+        # Session HTTP partagée (keep-alive) et moteur d'upload reprenable
+        pool_size = self.config.max_concurrent_uploads * max(1, self.config.parallel_parts) + 2
+        self.session = create_session(pool_size)
+        self.state_store = UploadStateStore(self.config.upload_state_dir)
+        self.uploader = ResumableUploader(
+            self.session,
+            self.state_store,
+            endpoint=self.config.tus_endpoint,
+            chunk_size=self.config.chunk_size,
+            chunk_retries=self.config.chunk_retries,
+            parallel_parts=self.config.parallel_parts,
+            timeout=self.config.timeout
+        )
+        
         # Statistiques
         self.stats = {
             'uploads_started': 0,
@@ -151,6 +190,11 @@ class BunnyStorageService:
             'bytes_uploaded': 0
         }
         
+        # Remettre en file les uploads interrompus par un arrêt du processus
+        recovered = self.upload_queue.recover()
+        if recovered:
+            logger.info(f"🔁 {len(recovered)} upload(s) interrompu(s) remis en queue")
+        
         # Démarrer le worker
         self._start_workers()
         
@@ -167,17 +211,20 @@ class BunnyStorageService:
         
         while self.is_running:
             try:
-                # Récupérer la prochaine tâche (timeout pour permettre shutdown)
-                task = self.upload_queue.get(timeout=5)
+                # Réserver la prochaine tâche (timeout pour permettre shutdown)
+                row = self.upload_queue.get(timeout=5)
                 
-                if task is None:  # Signal d'arrêt
+                if not self.is_running:  # Arrêt: rendre la tâche à la file
+                    self.upload_queue.put(row['id'], row['local_path'], row['title'],
+                                          row['metadata'], row['total_bytes'], row['priority'])
                     break
                 
+                task = UploadTask(row['local_path'], row['title'], row['metadata'], task_id=row['id'])
+                task.retries = row['retries']
+                
                 logger.info(f"📤 {worker_name} commence upload: {task.title}")
                 self._process_upload(task, worker_name)
                 
-                self.upload_queue.task_done()
-                
             except Empty:
                 continue  # Timeout normal, continuer
             except Exception as e:
@@ -233,11 +280,23 @@ class BunnyStorageService:
             with self._lock:
                 self.stats['uploads_failed'] += 1
         
-        # Déplacer vers completed
+        # Historique persistant (plafonné) puis déplacement vers completed
+        self.upload_queue.finish(
+            task.id,
+            task.status,
+            retries=task.retries,
+            total_bytes=task.total_bytes,
+            bunny_video_id=task.bunny_video_id,
+            bunny_url=task.bunny_url,
+            error_message=task.error_message
+        )
+        
         with self._lock:
             if task.id in self.active_uploads:
                 del self.active_uploads[task.id]
             self.completed_uploads[task.id] = task
+            while len(self.completed_uploads) > HISTORY_CAP:
+                self.completed_uploads.popitem(last=False)
     
     def _upload_file_to_bunny(self, task: UploadTask, worker_name: str) -> bool:
         """Upload effectif vers Bunny CDN avec gestion des chunks"""
@@ -249,56 +308,83 @@ class BunnyStorageService:
                 return False
             
             task.total_bytes = task.get_file_size()
+            task.bytes_uploaded = 0
             
-            # 1. Créer la vidéo sur Bunny Stream
-            logger.debug(f"📝 {worker_name}: Création vidéo Bunny: {task.title}")
-            
-            create_response = requests.post(
-                f"{self.config.api_base_url}/videos",
-                headers=self.config.headers,
-                json={"title": task.title},
-                timeout=30
-            )
-            
-            if create_response.status_code not in [200, 201]:
-                task.error_message = f"Erreur création: {create_response.status_code} - {create_response.text}"
-                return False
-            
-            video_data = create_response.json()
-            task.bunny_video_id = video_data.get("guid")
-            
-            if not task.bunny_video_id:
-                task.error_message = "Pas d'ID vidéo retourné"
-                return False
+            # Reprise: réutiliser la vidéo Bunny déjà créée pour ce fichier
+            state = None
+            if self.config.resumable_uploads and task.resume_key:
+                state = self.state_store.load(task.resume_key)
+            if state and state.get('bunny_video_id'):
+                task.bunny_video_id = state['bunny_video_id']
+                logger.info(f"🔁 {worker_name}: Reprise upload {task.title} (vidéo {task.bunny_video_id})")
+            else:
+                # 1. Créer la vidéo sur Bunny Stream
+                logger.debug(f"📝 {worker_name}: Création vidéo Bunny: {task.title}")
+                
+                create_response = self.session.post(
+                    f"{self.config.api_base_url}/videos",
+                    headers=self.config.headers,
+                    json={"title": task.title},
+                    timeout=30
+                )
+                
+                if create_response.status_code not in [200, 201]:
+                    task.error_message = f"Erreur création: {create_response.status_code} - {create_response.text}"
+                    return False
+                
+                video_data = create_response.json()
+                task.bunny_video_id = video_data.get("guid")
+                
+                if not task.bunny_video_id:
+                    task.error_message = "Pas d'ID vidéo retourné"
+                    return False
             
             # 2. Upload du fichier
             logger.debug(f"📤 {worker_name}: Upload fichier {task.local_path}")
             
-            upload_headers = {
-                "AccessKey": self.config.api_key,
-                "Content-Type": "application/octet-stream"
-            }
-            
-            upload_url = f"{self.config.api_base_url}/videos/{task.bunny_video_id}"
-            
-            with open(task.local_path, 'rb') as file:
-                # Upload avec monitoring de progression
-                upload_response = requests.put(
-                    upload_url,
-                    headers=upload_headers,
-                    data=self._file_iterator(file, task),
-                    timeout=self.config.timeout
+            if self.config.resumable_uploads and task.resume_key:
+                self.uploader.upload(
+                    task.local_path,
+                    task.resume_key,
+                    headers=bunny_tus_headers(self.config.library_id, self.config.api_key, task.bunny_video_id),
+                    metadata={'title': task.title, 'filetype': 'video/mp4'},
+                    extra_state={
+                        'bunny_video_id': task.bunny_video_id,
+                        'title': task.title,
+                        'metadata': task.metadata
+                    },
+                    on_progress=lambda sent: self._on_progress(task, sent)
                 )
-            
-            if upload_response.status_code not in [200, 201, 204]:
-                task.error_message = f"Erreur upload: {upload_response.status_code} - {upload_response.text}"
-                return False
+            else:
+                upload_headers = {
+                    "AccessKey": self.config.api_key,
+                    "Content-Type": "application/octet-stream"
+                }
+                
+                upload_url = f"{self.config.api_base_url}/videos/{task.bunny_video_id}"
+                
+                with open(task.local_path, 'rb') as file:
+                    # Upload avec monitoring de progression
+                    upload_response = self.session.put(
+                        upload_url,
+                        headers=upload_headers,
+                        data=self._file_iterator(file, task),
+                        timeout=self.config.timeout
+                    )
+                
+                if upload_response.status_code not in [200, 201, 204]:
+                    task.error_message = f"Erreur upload: {upload_response.status_code} - {upload_response.text}"
+                    return False
             
             # 3. Générer l'URL finale
             task.bunny_url = f"https://{self.config.cdn_hostname}/{task.bunny_video_id}/play.mp4"
             
             return True
             
+        except ResumableUploadError as e:
+            # L'état reste sur disque: la prochaine tentative reprend à l'offset confirmé
+            task.error_message = f"Upload interrompu: {str(e)}"
+            return False
         except requests.exceptions.RequestException as e:
             task.error_message = f"Erreur réseau: {str(e)}"
             return False
@@ -306,6 +392,28 @@ class BunnyStorageService:
             task.error_message = f"Erreur inattendue: {str(e)}"
             return False
     
+    def _on_progress(self, task: UploadTask, sent: int):
+        """Progression confirmée par le serveur TUS"""
+        with task._lock:
+            task.bytes_uploaded += sent
+            uploaded = task.bytes_uploaded
+        self._heartbeat(task)
+        
+        # Log de progression (tous les 10MB)
+        if task.total_bytes and uploaded // (10 * 1024 * 1024) != (uploaded - sent) // (10 * 1024 * 1024):
+            progress = (uploaded / task.total_bytes) * 100
+            logger.debug(f"📊 Upload {task.title}: {progress:.1f}%")
+    
+    def _heartbeat(self, task: UploadTask, interval: float = 30):
+        """Prolonger la réservation de la tâche dans la file persistante"""
+        now = time.monotonic()
+        if now - getattr(task, '_last_heartbeat', 0) >= interval:
+            task._last_heartbeat = now
+            try:
+                self.upload_queue.heartbeat(task.id)
+            except Exception as e:
+                logger.debug(f"Heartbeat upload {task.id}: {e}")
+    
     def _file_iterator(self, file, task: UploadTask):
         """Itérateur de fichier avec suivi de progression"""
         while True:
@@ -314,6 +422,7 @@ class BunnyStorageService:
                 break
             
             task.bytes_uploaded += len(chunk)
+            self._heartbeat(task)
             
             # Log de progression (tous les 10MB)
             if task.bytes_uploaded % (10 * 1024 * 1024) == 0:
@@ -427,14 +536,22 @@ class BunnyStorageService:
     
     # API publique
     
-    def queue_upload(self, local_path: str, title: str = None, metadata: Dict = None) -> str:
+    def _enqueue(self, task: UploadTask, priority: Optional[int] = None):
+        """Persister la tâche dans la file"""
+        self.upload_queue.put(task.id, task.local_path, task.title, task.metadata,
+                              task.get_file_size(), priority)
+    
+    def queue_upload(self, local_path: str, title: str = None, metadata: Dict = None,
+                     priority: Optional[int] = None) -> str:
         """
         Ajoute un fichier à la queue d'upload.
         
         Args:
             local_path: Chemin local du fichier
             title: Titre de la vidéo
-            metadata: Métadonnées (ex: video_id pour BDD)
+            metadata: Métadonnées (ex: video_id pour BDD, club_id pour l'équité,
+                      priority 'clip'/'match' pour forcer la voie)
+            priority: Voie explicite (upload_queue.PRIORITY_*), sinon selon la taille
         
         Returns:
             ID de la tâche d'upload
@@ -444,7 +561,7 @@ class BunnyStorageService:
             raise FileNotFoundError(f"Fichier introuvable: {local_path}")
         
         task = UploadTask(local_path, title, metadata)
-        self.upload_queue.put(task)
+        self._enqueue(task, priority)
         
         logger.info(f"📋 Tâche ajoutée à la queue: {task.title} (ID: {task.id})")
         return task.id
@@ -463,6 +580,31 @@ class BunnyStorageService:
         else:
             return False, None, task.error_message
     
+    def resume_interrupted_uploads(self) -> List[str]:
+        """
+        Remettre en queue les uploads interrompus (état TUS présent sur disque)
+        
+        Returns:
+            IDs des tâches remises en queue
+        """
+        task_ids = []
+        for state in self.state_store.list_states():
+            local_path = state.get('local_path')
+            if not local_path or not Path(local_path).exists():
+                self.state_store.delete(state.get('key', ''))
+                continue
+            if self.upload_queue.is_queued(local_path):
+                continue  # Déjà repris par la file persistante
+            task = UploadTask(local_path, state.get('title'), state.get('metadata'))
+            if task.resume_key != state.get('key'):
+                # Fichier modifié depuis: l'état n'est plus valide
+                self.state_store.delete(state.get('key', ''))
+                continue
+            self._enqueue(task)
+            task_ids.append(task.id)
+            logger.info(f"🔁 Upload interrompu remis en queue: {task.title}")
+        return task_ids
+    
     def get_upload_status(self, upload_id: str) -> Optional[Dict[str, Any]]:
         """Retourne le statut d'un upload"""
         
@@ -471,8 +613,10 @@ class BunnyStorageService:
             task = self.active_uploads[upload_id]
         elif upload_id in self.completed_uploads:
             task = self.completed_uploads[upload_id]
+            self.completed_uploads.move_to_end(upload_id)
         else:
-            return None
+            # En attente, ou traitée par un autre processus
+            return self._status_from_queue(upload_id)
         
         progress = 0
         if task.total_bytes > 0:
@@ -492,14 +636,40 @@ class BunnyStorageService:
             'completed_at': task.completed_at.isoformat() if task.completed_at else None
         }
     
+    def _status_from_queue(self, upload_id: str) -> Optional[Dict[str, Any]]:
+        """Statut d'une tâche depuis la file persistante"""
+        row = self.upload_queue.get_task(upload_id)
+        if row is None:
+            return None
+        
+        def iso(timestamp):
+            return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+        
+        return {
+            'id': row['id'],
+            'status': row['status'],
+            'title': row['title'],
+            'progress': 100.0 if row['status'] == UploadStatus.COMPLETED else 0,
+            'retries': row['retries'],
+            'bunny_video_id': row['bunny_video_id'],
+            'bunny_url': row['bunny_url'],
+            'error_message': row['error_message'],
+            'created_at': iso(row['created_at']),
+            'started_at': iso(row['started_at']),
+            'completed_at': iso(row['finished_at']) if row['status'] == UploadStatus.COMPLETED else None
+        }
+    
     def get_stats(self) -> Dict[str, Any]:
         """Retourne les statistiques du service"""
+        queue_stats = self.upload_queue.get_stats()
         with self._lock:
             return {
                 **self.stats,
+                **queue_stats,
                 'active_uploads': len(self.active_uploads),
-                'queue_size': self.upload_queue.qsize(),
-                'completed_uploads': len(self.completed_uploads)
+                'queue_size': queue_stats['queue_depth'],
+                'completed_uploads': len(self.completed_uploads),
+                'resumable': dict(self.uploader.stats)
             }
     
     def shutdown(self):
@@ -508,12 +678,12 @@ class BunnyStorageService:
         
         self.is_running = False
         
-        # Arrêter les workers
-        for _ in range(self.config.max_concurrent_uploads):
-            self.upload_queue.put(None)  # Signal d'arrêt
+        # Réveiller les workers (les tâches en attente restent dans la file persistante)
+        self.upload_queue.wake_all()
         
         # Attendre la fin des uploads en cours
         self.executor.shutdown(wait=True)
+        self.session.close()
         
         logger.info("✅ Service Bunny Storage arrêté")
 
@@ -0,0 +1,155 @@
+"""
+Cache en mémoire des valeurs SystemConfiguration (déchiffrées)
+
+- lecture: une requête SQL + un déchiffrement Fernet par clé et par TTL,
+  au lieu d'un par appel (get_bunny_cdn_config en fait quatre par appel)
+- les valeurs déchiffrées restent dans la mémoire du processus: Redis ne
+  transporte que le nom de la clé invalidée, jamais sa valeur
+- invalidation versionnée: chaque écriture incrémente la version locale;
+  une lecture commencée avant l'écriture ne remet pas l'ancienne valeur en
+  cache
+- entre processus: set_config incrémente VERSION_KEY et publie la clé sur
+  CHANNEL, un thread d'écoute par processus l'invalide; à la reconnexion,
+  le cache est vidé si la version a bougé (messages manqués). Sans Redis,
+  le TTL borne la péremption.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'config:invalidate'
+VERSION_KEY = 'config:version'
+# 0 désactive le cache
+TTL_SECONDS = float(os.getenv('CONFIG_CACHE_TTL', '300'))
+
+_MISSING = object()
+
+
+class ConfigCache:
+    """Valeurs par clé, avec TTL et invalidation versionnée (canal Redis propre à chaque cache)"""
+
+    def __init__(self, ttl: float = TTL_SECONDS, channel: str = CHANNEL, version_key: str = VERSION_KEY):
+        self.ttl = ttl
+        self.channel = channel
+        self.version_key = version_key
+        self._entries: Dict[Hashable, Tuple[object, float]] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        # Dernière version Redis vue (None: jamais abonné)
+        self._remote_version: Optional[str] = None
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def get(self, cache_key: Hashable, load: Callable[[], object]):
+        """Valeur en cache ou chargée par `load()` (mise en cache si aucune écriture entre-temps)"""
+        if self.ttl <= 0:
+            return load()
+        self._ensure_listener()
+        now = time.monotonic()
+        with self._lock:
+            value, expires_at = self._entries.get(cache_key, (_MISSING, 0.0))
+            if value is not _MISSING and expires_at > now:
+                self.stats['hits'] += 1
+                return value
+            self.stats['misses'] += 1
+            version = self._version
+
+        value = load()
+        with self._lock:
+            if self._version == version:
+                self._entries[cache_key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, config_key: Optional[str] = None):
+        """Oublier `config_key` (toutes ses variantes) ou tout le cache"""
+        with self._lock:
+            self._version += 1
+            self.stats['invalidations'] += 1
+            if config_key is None:
+                self._entries.clear()
+            else:
+                for cache_key in [k for k in self._entries if _config_key(k) == config_key]:
+                    del self._entries[cache_key]
+
+    def publish_change(self, config_key: str):
+        """Invalider localement puis dans les autres processus"""
+        self.invalidate(config_key)
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            version = client.incr(self.version_key)
+            client.publish(self.channel, json.dumps({'key': config_key, 'version': version}))
+        except Exception as e:
+            logger.warning(f"⚠️ Invalidation {config_key} non diffusée sur {self.channel}: {e}")
+
+    def clear(self):
+        self.invalidate()
+
+    # Pub/sub
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener.is_alive():
+            return
+        if get_redis_client() is None:
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='ConfigCacheListener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(5)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                # Écritures éventuellement manquées avant l'abonnement
+                remote_version = client.get(self.version_key)
+                if self._remote_version is None or remote_version != self._remote_version:
+                    self.invalidate()
+                self._remote_version = remote_version
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    self._on_message(message['data'])
+            except Exception as e:
+                logger.warning(f"⚠️ Écoute des invalidations {self.channel} perdue: {e}")
+                time.sleep(1)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _on_message(self, payload: str):
+        try:
+            message = json.loads(payload)
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Invalidation invalide sur {self.channel}: {payload!r}")
+            return
+        self._remote_version = str(message.get('version'))
+        self.invalidate(message.get('key'))
+
+
+def _config_key(cache_key: Hashable) -> Hashable:
+    return cache_key[0] if isinstance(cache_key, tuple) else cache_key
+
+
+config_cache = ConfigCache()
@@ -0,0 +1,347 @@
+"""
+Flux d'événements temps réel (Server-Sent Events) par utilisateur
+
+Remplace le polling des notifications, du statut d'enregistrement et de la
+progression des highlights/clips:
+
+- publish_event(user_id, 'notification', {...}) ajoute l'événement au journal
+  de l'utilisateur (stream Redis padelvar:events:log:<user_id>, borné) puis le
+  publie sur le canal pub/sub padelvar:events:<user_id>, en un seul aller-retour
+  (script Lua). L'id du stream sert d'id SSE (Last-Event-ID).
+- chaque processus web n'ouvre qu'UNE connexion pub/sub (PSUBSCRIBE) et
+  redistribue les événements aux connexions SSE locales (une file par onglet).
+- à la reconnexion, les événements postérieurs à Last-Event-ID sont rejoués
+  depuis le journal.
+- les changements de modèles (Notification, HighlightJob.progress/status,
+  UserClip.status, RecordingSession.status) sont publiés après commit.
+
+Sans Redis (développement, un seul processus), le journal et la diffusion
+restent en mémoire.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event, inspect
+
+from ..models.database import on_commit, register_on_commit
+from .redis_client import ScriptCache, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'padelvar:events:'
+LOG_PREFIX = 'padelvar:events:log:'
+LOG_MAXLEN = int(os.environ.get('SSE_EVENT_LOG_MAXLEN', '200'))
+LOG_TTL_SECONDS = int(os.environ.get('SSE_EVENT_LOG_TTL', '3600'))
+SUBSCRIBER_QUEUE_SIZE = 256
+SESSION_KEY = 'live_events'
+
+# XADD + EXPIRE + PUBLISH atomiques; retourne l'id de l'événement
+_PUBLISH = """
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'event', ARGV[2], 'data', ARGV[3])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('PUBLISH', KEYS[2], cjson.encode({id = id, event = ARGV[2], data = ARGV[3]}))
+return id
+"""
+
+
+@dataclass
+class LiveEvent:
+    id: str
+    event: str
+    data: str  # JSON déjà sérialisé
+
+    def format(self) -> str:
+        """Trame SSE"""
+        return f"id: {self.id}\nevent: {self.event}\ndata: {self.data}\n\n"
+
+
+def event_id_key(event_id: Optional[str]) -> Tuple[int, int]:
+    """Clé de tri d'un id de stream Redis ('<ms>-<seq>')"""
+    try:
+        ms, _, seq = event_id.partition('-')
+        return int(ms), int(seq or 0)
+    except (AttributeError, ValueError):
+        return 0, 0
+
+
+class Subscription:
+    """File d'événements d'une connexion SSE"""
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.queue: queue.Queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Client trop lent: la connexion est fermée et le client rejoue
+        # depuis son Last-Event-ID à la reconnexion
+        self.overflowed = False
+
+    def put(self, live_event: LiveEvent):
+        try:
+            self.queue.put_nowait(live_event)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout: float) -> Optional[LiveEvent]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Diffusion des événements aux connexions SSE du processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, List[Subscription]] = defaultdict(list)
+        self._listener: Optional[threading.Thread] = None
+        self._scripts = ScriptCache()
+        # Mode sans Redis
+        self._local_log: Dict[int, deque] = defaultdict(lambda: deque(maxlen=LOG_MAXLEN))
+        self._local_seq = 0
+
+    # ------------------------------------------------------------------
+    # Publication
+    # ------------------------------------------------------------------
+
+    def publish_many(self, events: Iterable[Tuple[int, str, dict]]) -> List[Optional[str]]:
+        """Publier [(user_id, event, data)] (un seul aller-retour Redis)"""
+        events = [(user_id, name, json.dumps(data, default=str)) for user_id, name, data in events]
+        if not events:
+            return []
+
+        client = get_redis_client()
+        if client is None:
+            return [self._publish_local(user_id, name, data) for user_id, name, data in events]
+
+        try:
+            script = self._scripts.get(client, _PUBLISH)
+            pipe = client.pipeline(transaction=False)
+            for user_id, name, data in events:
+                script(keys=[f"{LOG_PREFIX}{user_id}", f"{CHANNEL_PREFIX}{user_id}"],
+                       args=[LOG_MAXLEN, name, data, LOG_TTL_SECONDS], client=pipe)
+            return pipe.execute()
+        except Exception as e:
+            # Les clients retrouveront l'état au prochain chargement
+            logger.warning(f"⚠️ Publication de {len(events)} événement(s) impossible: {e}")
+            return [None] * len(events)
+
+    def _publish_local(self, user_id: int, name: str, data: str) -> str:
+        with self._lock:
+            self._local_seq += 1
+            live_event = LiveEvent(f"{int(time.time() * 1000)}-{self._local_seq}", name, data)
+            self._local_log[user_id].append(live_event)
+        self._dispatch(user_id, live_event)
+        return live_event.id
+
+    # ------------------------------------------------------------------
+    # Abonnements
+    # ------------------------------------------------------------------
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].append(subscription)
+        self._ensure_listener()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id, [])
+            if subscription in subscribers:
+                subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.user_id, None)
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def replay(self, user_id: int, last_event_id: Optional[str]) -> List[LiveEvent]:
+        """Événements du journal postérieurs à last_event_id"""
+        if not last_event_id:
+            return []
+        client = get_redis_client()
+        if client is None:
+            with self._lock:
+                log = list(self._local_log.get(user_id, ()))
+            after = event_id_key(last_event_id)
+            return [e for e in log if event_id_key(e.id) > after]
+        try:
+            entries = client.xrange(f"{LOG_PREFIX}{user_id}", min=f"({last_event_id}", max='+')
+        except Exception as e:
+            logger.warning(f"⚠️ Relecture des événements de {user_id} impossible: {e}")
+            return []
+        return [LiveEvent(entry_id, fields.get('event', 'message'), fields.get('data', '{}'))
+                for entry_id, fields in entries]
+
+    def _dispatch(self, user_id: int, live_event: LiveEvent):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.put(live_event)
+
+    # ------------------------------------------------------------------
+    # Connexion pub/sub unique du processus
+    # ------------------------------------------------------------------
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener.is_alive():
+            return
+        if get_redis_client() is None:
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='EventBrokerListener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            client = get_redis_client()
+            if client is None:
+                time.sleep(5)
+                continue
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                logger.info("📡 Écoute des événements temps réel")
+                for message in pubsub.listen():
+                    if message.get('type') != 'pmessage':
+                        continue
+                    self._on_message(message['channel'], message['data'])
+            except Exception as e:
+                logger.warning(f"⚠️ Connexion pub/sub des événements perdue: {e}")
+                time.sleep(1)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+    def _on_message(self, channel: str, payload: str):
+        try:
+            user_id = int(channel[len(CHANNEL_PREFIX):])
+            message = json.loads(payload)
+            live_event = LiveEvent(message['id'], message['event'], message['data'])
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Événement invalide sur {channel}: {e}")
+            return
+        self._dispatch(user_id, live_event)
+
+
+event_broker = EventBroker()
+
+
+def publish_event(user_id: int, name: str, data: dict) -> Optional[str]:
+    """Publier un événement pour un utilisateur; retourne son id"""
+    if not user_id:
+        return None
+    return event_broker.publish_many([(user_id, name, data)])[0]
+
+
+# ----------------------------------------------------------------------
+# Changements de modèles publiés après commit
+# ----------------------------------------------------------------------
+
+def queue_event(session, user_id: int, name: str, data: dict):
+    """Publier un événement au prochain commit de `session` (rien si rollback)"""
+    if user_id:
+        on_commit(session, SESSION_KEY, (user_id, name, data))
+
+
+def _changed(target, *attributes) -> bool:
+    state = inspect(target)
+    return any(state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+
+def _publish_changes(model, name: str, payload, *attributes):
+    """Publier `name` à la création de `model` et quand `attributes` changent"""
+    def created(mapper, connection, target):
+        queue_event(inspect(target).session, target.user_id, name, payload(target))
+
+    def updated(mapper, connection, target):
+        if _changed(target, *attributes):
+            created(mapper, connection, target)
+
+    event.listen(model, 'after_insert', created)
+    if attributes:
+        event.listen(model, 'after_update', updated)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def _notification_payload(target) -> dict:
+    kind = target.notification_type
+    return {
+        'id': target.id,
+        'type': getattr(kind, 'value', kind),
+        'title': target.title,
+        'message': target.message,
+        'is_read': target.is_read,
+        'link': getattr(target, 'link', None) or getattr(target, 'action_url', None),
+        'created_at': _isoformat(target.created_at),
+    }
+
+
+def _highlight_job_payload(target) -> dict:
+    return {
+        'id': target.id,
+        'video_id': target.video_id,
+        'status': target.status,
+        'progress': target.progress,
+        'error_message': target.error_message,
+        'highlight_video_id': target.highlight_video_id,
+    }
+
+
+def _clip_payload(target) -> dict:
+    return {
+        'id': target.id,
+        'video_id': target.video_id,
+        'status': target.status,
+        'file_url': target.file_url,
+        'thumbnail_url': target.thumbnail_url,
+        'error_message': target.error_message,
+    }
+
+
+def _recording_payload(target) -> dict:
+    return {
+        'recording_id': target.recording_id,
+        'court_id': target.court_id,
+        'status': target.status,
+        'stopped_by': target.stopped_by,
+        'planned_duration': target.planned_duration,
+        'start_time': _isoformat(target.start_time),
+        'end_time': _isoformat(target.end_time),
+    }
+
+
+def _register_model_events():
+    from ..models import notification as notification_models
+    from ..models.user import HighlightJob, Notification, RecordingSession, UserClip
+
+    # Notifications: routes (models.notification) et tâches Celery (models.user)
+    _publish_changes(notification_models.Notification, 'notification', _notification_payload)
+    _publish_changes(Notification, 'notification', _notification_payload)
+    _publish_changes(HighlightJob, 'highlight_job', _highlight_job_payload, 'status', 'progress')
+    _publish_changes(UserClip, 'clip', _clip_payload, 'status')
+    _publish_changes(RecordingSession, 'recording', _recording_payload, 'status')
+
+
+def _publish_events(events):
+    event_broker.publish_many(events)
+
+
+register_on_commit(SESSION_KEY, _publish_events)
+_register_model_events()
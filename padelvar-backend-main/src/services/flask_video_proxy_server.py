@@ -10,6 +10,8 @@ from typing import Optional
 from urllib.parse import urlparse
 import re
 
+from ..video_system.mjpeg_passthrough import MJPEGPassthroughReader
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,7 +24,9 @@ class FlaskVideoProxyServer:
         self.cap: Optional[cv2.VideoCapture] = None
         self.running = False
         self.last_frame = None
+        self.last_jpeg: Optional[bytes] = None  # Passthrough MJPEG (octets caméra)
         self.last_frame_time = 0
+        self.passthrough = True
         self.frame_lock = threading.Lock()
         self.reconnect_attempts = 0
         self.max_reconnect_delay = 5.0
@@ -31,6 +35,7 @@ class FlaskVideoProxyServer:
         self.low_fps_threshold = 5
         self.low_fps_count = 0
         self.capture_thread: Optional[threading.Thread] = None
+        self._generation = 0  # Incrémenté à chaque démarrage: un ancien thread ne publie plus
     
     async def set_camera_url(self, url: str):
         """Définir l'URL de la caméra et démarrer la capture"""
@@ -47,7 +52,8 @@ class FlaskVideoProxyServer:
             return
         
         self.running = True
-        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._generation += 1
+        self.capture_thread = threading.Thread(target=self._capture_loop, args=(self._generation,), daemon=True)
         self.capture_thread.start()
         logger.info(f"[Court {self.court_id}] Capture started")
     
@@ -66,11 +72,25 @@ class FlaskVideoProxyServer:
         if self.cap:
             self.cap.release()
             self.cap = None
+        # Pas de dernière image de l'ancienne caméra après un arrêt / changement d'URL
+        self._clear_frames()
         logger.info(f"[Court {self.court_id}] Capture stopped")
     
-    def _capture_loop(self):
+    def _clear_frames(self):
+        with self.frame_lock:
+            self.last_jpeg = None
+            self.last_frame = None
+            self.last_frame_time = 0
+    
+    def _is_current(self, generation: int) -> bool:
+        return self.running and generation == self._generation
+    
+    def _capture_loop(self, generation: int):
         """Boucle de capture vidéo"""
-        while self.running:
+        if self.passthrough and self.camera_url and self.camera_url.startswith(("http://", "https://")):
+            self._passthrough_loop(generation)
+        
+        while self._is_current(generation):
             try:
                 if not self.cap or not self.cap.isOpened():
                     self._connect_camera()
@@ -82,6 +102,8 @@ class FlaskVideoProxyServer:
                         current_time = time.time()
                         
                         with self.frame_lock:
+                            if generation != self._generation:
+                                break
                             self.last_frame = frame
                             self.last_frame_time = current_time
                         
@@ -101,6 +123,38 @@ class FlaskVideoProxyServer:
                 logger.error(f"[Court {self.court_id}] Capture error: {e}")
                 self._handle_connection_loss()
     
+    def _passthrough_loop(self, generation: int):
+        """
+        Capture MJPEG sans décodage: les JPEG originaux sont conservés
+        et relayés tels quels. Retourne si la source n'est pas multipart.
+        """
+        reader = MJPEGPassthroughReader(self.camera_url)
+        
+        try:
+            while self._is_current(generation):
+                try:
+                    for jpeg in reader.iter_frames():
+                        with self.frame_lock:
+                            if not self._is_current(generation):
+                                return
+                            self.last_jpeg = jpeg
+                            self.last_frame_time = time.time()
+                        self.reconnect_attempts = 0
+                except ValueError as e:
+                    logger.info(f"[Court {self.court_id}] {e}, using OpenCV capture")
+                    return
+                except Exception as e:
+                    logger.error(f"[Court {self.court_id}] MJPEG passthrough error: {e}")
+                
+                if self._is_current(generation):
+                    self._handle_connection_loss()
+        finally:
+            # Le JPEG de cette caméra ne doit plus être relayé (OpenCV, arrêt, autre URL)
+            with self.frame_lock:
+                if generation == self._generation:
+                    self.last_jpeg = None
+                    self.last_frame_time = 0
+    
     def _connect_camera(self):
         """Connecter à la caméra"""
         if not self.camera_url:
@@ -154,12 +208,18 @@ class FlaskVideoProxyServer:
                 continue
             
             with self.frame_lock:
-                if self.last_frame is not None:
+                jpeg = self.last_jpeg
+                if jpeg is None and self.last_frame is not None:
                     frame = self.last_frame.copy()
                 else:
                     frame = None
             
-            if frame is not None:
+            if jpeg is not None:
+                # Passthrough: JPEG caméra envoyé sans ré-encodage
+                last_yield_time = current_time
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+            elif frame is not None:
                 ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
                 if ret:
                     last_yield_time = current_time
@@ -174,7 +234,9 @@ class FlaskVideoProxyServer:
             "status": "ok",
             "court_id": self.court_id,
             "camera_url": self._mask_credentials(self.camera_url) if self.camera_url else None,
-            "connected": self.cap is not None and self.cap.isOpened() if self.cap else False,
+            "connected": (self.cap is not None and self.cap.isOpened() if self.cap else False)
+                         or (self.last_jpeg is not None and time.time() - self.last_frame_time < 5),
+            "passthrough": self.last_jpeg is not None,
             "running": self.running
         }
     
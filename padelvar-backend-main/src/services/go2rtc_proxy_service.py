@@ -10,6 +10,7 @@ Service proxy vidéo inspiré de go2rtc (https://github.com/AlexxIT/go2rtc)
 
 import asyncio
 import logging
+import os
 import signal
 import subprocess
 import threading
@@ -18,13 +19,24 @@ from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from typing import Optional
 import shutil
+import sys
 
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import StreamingResponse
 import uvicorn
 
+try:
+    from ..video_system.mjpeg_passthrough import JPEGFrameParser
+except ImportError:
+    # Lancé comme script: python go2rtc_proxy_service.py
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'video_system'))
+    from mjpeg_passthrough import JPEGFrameParser
+
 logger = logging.getLogger(__name__)
 
+# Taille de lecture sur stdout FFmpeg (read1: retourne dès que des octets sont disponibles)
+STDOUT_READ_SIZE = 64 * 1024
+
 
 @dataclass
 class ProxyConfig:
@@ -273,6 +285,10 @@ class Go2RTCProxyService:
         """
         Générateur MJPEG inspiré de go2rtc
         Lit les frames depuis FFmpeg et les stream en format MJPEG
+        
+        La lecture bloquante de stdout est faite dans un thread pour ne pas
+        bloquer la boucle asyncio (et donc les autres streams), et les
+        frames sont découpées par JPEGFrameParser sans recopier le buffer.
         """
         boundary = "frame"
         
@@ -280,56 +296,35 @@ class Go2RTCProxyService:
             logger.error("Processus FFmpeg non disponible")
             return
         
-        buffer = b""
+        stdout = self._ffmpeg_process.stdout
+        read = getattr(stdout, "read1", stdout.read)
+        parser = JPEGFrameParser(max_buffer_size=self.config.buffer_size)
         
         try:
-            while self._is_streaming and self._ffmpeg_process.poll() is None:
-                # Lire les données de FFmpeg
-                chunk = self._ffmpeg_process.stdout.read(8192)
+            while self._is_streaming and self._ffmpeg_process and self._ffmpeg_process.poll() is None:
+                # Lire les données de FFmpeg hors de la boucle d'événements
+                chunk = await asyncio.to_thread(read, STDOUT_READ_SIZE)
                 
                 if not chunk:
                     await asyncio.sleep(0.01)
                     continue
                 
-                buffer += chunk
-                
-                # Chercher les marqueurs JPEG (SOI: 0xFFD8, EOI: 0xFFD9)
-                while True:
-                    # Chercher le début d'une image JPEG
-                    start_idx = buffer.find(b'\xff\xd8')
-                    if start_idx == -1:
-                        break
-                    
-                    # Chercher la fin de l'image JPEG
-                    end_idx = buffer.find(b'\xff\xd9', start_idx)
-                    if end_idx == -1:
-                        break
-                    
-                    # Extraire l'image complète
-                    jpeg_frame = buffer[start_idx:end_idx + 2]
-                    
-                    # Envoyer la frame au format MJPEG
-                    if len(jpeg_frame) > 0:
-                        yield (
-                            f"--{boundary}\r\n"
-                            "Content-Type: image/jpeg\r\n"
-                            f"Content-Length: {len(jpeg_frame)}\r\n\r\n"
-                        ).encode() + jpeg_frame + b"\r\n"
-                    
-                    # Supprimer la frame traitée du buffer
-                    buffer = buffer[end_idx + 2:]
-                
-                # Éviter l'accumulation de données
-                if len(buffer) > self.config.buffer_size:
-                    logger.warning("Buffer overflow, reset")
-                    buffer = b""
-                
-                await asyncio.sleep(0.001)  # Petit délai pour éviter la surcharge CPU
+                # Envoyer chaque frame complète au format MJPEG (memoryview, zéro copie)
+                for jpeg_frame in parser.feed(chunk):
+                    yield (
+                        f"--{boundary}\r\n"
+                        "Content-Type: image/jpeg\r\n"
+                        f"Content-Length: {len(jpeg_frame)}\r\n\r\n"
+                    ).encode()
+                    yield jpeg_frame
+                    yield b"\r\n"
                 
         except Exception as e:
             logger.error(f"Erreur dans le générateur MJPEG: {e}")
         finally:
-            logger.info("Générateur MJPEG terminé")
+            if parser.overflows:
+                logger.warning(f"Buffer overflow x{parser.overflows}, {parser.bytes_discarded} octets ignorés")
+            logger.info(f"Générateur MJPEG terminé ({parser.frames_parsed} frames)")
     
     async def _h264_generator(self):
         """Générateur H.264 pour des besoins spécifiques"""
@@ -0,0 +1,323 @@
+"""
+Classement des joueurs (crédits, vidéos, activité) sur des sorted sets Redis
+
+Un sorted set par critère, global et par club:
+    leaderboard:<critère>                 (credits, videos, activity)
+    leaderboard:<critère>:club:<club_id>
+    leaderboard:members                   hash joueur -> club ('' si aucun)
+
+- lecture: top N (ZREVRANGE) et rang du joueur courant (ZREVRANK, O(log n))
+  même hors du top N
+- mises à jour incrémentales: les changements de User (crédits, club,
+  dernière connexion, rôle) et les créations/suppressions de Video sont
+  collectés pendant le flush puis appliqués à Redis après le commit
+- reconstruction complète depuis la base (tâche rebuild_leaderboards):
+  écriture dans des clés temporaires puis RENAME; tant que le classement
+  n'est pas construit (ou sans Redis), lecture par requêtes SQL agrégées
+"""
+
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import joinedload
+
+from ..models.database import db, on_commit, register_on_commit
+from ..models.user import User, UserRole, Video
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'leaderboard:'
+METRICS = ('credits', 'videos', 'activity')
+MEMBERS_KEY = PREFIX + 'members'
+CLUBS_KEY = PREFIX + 'clubs'          # clubs ayant un classement (pour le rebuild)
+BUILT_KEY = PREFIX + 'built'
+REBUILD_LOCK_KEY = PREFIX + 'rebuild:lock'
+REBUILD_LOCK_SECONDS = 1800
+SESSION_KEY = 'leaderboard_changes'
+
+
+def board_key(metric: str, club_id=None, prefix: str = PREFIX) -> str:
+    if club_id:
+        return f"{prefix}{metric}:club:{club_id}"
+    return f"{prefix}{metric}"
+
+
+def _activity_score(last_login_at) -> int:
+    return int(last_login_at.timestamp()) if last_login_at else 0
+
+
+class Leaderboard:
+    """Classements globaux et par club"""
+
+    # --- Lecture ---
+
+    def page(self, metric: str, club_id: Optional[int], limit: int,
+             user_id: int) -> Tuple[List[Dict], Optional[int]]:
+        """Top `limit` [{user, videos_count}] et rang (1-based) de `user_id`"""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                result = self._page_from_redis(client, metric, club_id, limit, user_id)
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.warning(f"⚠️ Lecture du classement Redis impossible: {e}")
+        return self._page_from_db(metric, club_id, limit, user_id)
+
+    def _page_from_redis(self, client, metric, club_id, limit, user_id):
+        key = board_key(metric, club_id)
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(BUILT_KEY)
+        pipe.zrevrange(key, 0, limit - 1)
+        pipe.zrevrank(key, user_id)
+        built, member_ids, user_rank = pipe.execute()
+        if not built:
+            self.rebuild_in_background()
+            return None
+
+        ranked_ids = [int(member) for member in member_ids]
+        pipe = client.pipeline(transaction=False)
+        for ranked_id in ranked_ids:
+            pipe.zscore(board_key('videos'), ranked_id)
+        videos = pipe.execute()
+
+        users = {u.id: u for u in User.query.options(joinedload(User.club)).filter(User.id.in_(ranked_ids))}
+        entries = [{'user': users[ranked_id], 'videos_count': int(count or 0)}
+                   for ranked_id, count in zip(ranked_ids, videos) if ranked_id in users]
+        return entries, (user_rank + 1 if user_rank is not None else None)
+
+    def _page_from_db(self, metric, club_id, limit, user_id):
+        """Fallback SQL: une requête pour le top, une pour le rang"""
+        videos_count = db.session.query(
+            Video.user_id.label('user_id'), func.count(Video.id).label('videos_count')
+        ).group_by(Video.user_id).subquery()
+        count_column = func.coalesce(videos_count.c.videos_count, 0)
+        score = {
+            'credits': func.coalesce(User.credits_balance, 0),
+            'videos': count_column,
+        }.get(metric, func.coalesce(User.last_login_at, '1970-01-01'))
+
+        def players():
+            query = db.session.query(User, count_column).outerjoin(videos_count, videos_count.c.user_id == User.id) \
+                .filter(User.role == UserRole.PLAYER)
+            return query.filter(User.club_id == club_id) if club_id else query
+
+        rows = players().options(joinedload(User.club)).order_by(score.desc(), User.id.desc()).limit(limit).all()
+        entries = [{'user': user, 'videos_count': int(count)} for user, count in rows]
+
+        user_rank = None
+        current = players().with_entities(score).filter(User.id == user_id).first()
+        if current is not None:
+            user_rank = players().filter(score > current[0]).with_entities(func.count(User.id)).scalar() + 1
+        return entries, user_rank
+
+    # --- Mises à jour incrémentales (après commit) ---
+
+    def apply(self, players: Dict[int, Optional[Tuple]], videos: Dict[int, int]):
+        """players: {user_id: (club_id, credits, activity) ou None si retiré}; videos: {user_id: delta}"""
+        client = get_redis_client()
+        if client is None:
+            return
+        try:
+            if players:
+                self._apply_players(client, players)
+            videos = {user_id: delta for user_id, delta in videos.items() if delta}
+            if videos:
+                self._apply_videos(client, videos)
+        except Exception as e:
+            # Classement incertain: il sera corrigé par la prochaine reconstruction
+            logger.warning(f"⚠️ Mise à jour du classement: {e}")
+
+    def _apply_players(self, client, players):
+        user_ids = list(players)
+        previous = client.hmget(MEMBERS_KEY, user_ids)
+        pipe = client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zscore(board_key('videos'), user_id)
+        video_counts = pipe.execute()
+
+        pipe = client.pipeline()
+        for user_id, old_club, video_count in zip(user_ids, previous, video_counts):
+            values = players[user_id]
+            new_club = str(values[0]) if values and values[0] else ''
+            if old_club and old_club != new_club:
+                for metric in METRICS:
+                    pipe.zrem(board_key(metric, old_club), user_id)
+            if values is None:
+                for metric in METRICS:
+                    pipe.zrem(board_key(metric), user_id)
+                pipe.hdel(MEMBERS_KEY, user_id)
+                continue
+
+            _, credits, activity = values
+            scores = {'credits': credits, 'videos': video_count or 0, 'activity': activity}
+            pipe.hset(MEMBERS_KEY, user_id, new_club)
+            for metric, value in scores.items():
+                pipe.zadd(board_key(metric), {user_id: value})
+                if new_club:
+                    pipe.zadd(board_key(metric, new_club), {user_id: value})
+            if new_club:
+                pipe.sadd(CLUBS_KEY, new_club)
+        pipe.execute()
+
+    def _apply_videos(self, client, videos):
+        user_ids = list(videos)
+        clubs = client.hmget(MEMBERS_KEY, user_ids)
+        pipe = client.pipeline()
+        for user_id, club in zip(user_ids, clubs):
+            if club is None:
+                continue  # Pas un joueur classé
+            pipe.zincrby(board_key('videos'), videos[user_id], user_id)
+            if club:
+                pipe.zincrby(board_key('videos', club), videos[user_id], user_id)
+        pipe.execute()
+
+    # --- Reconstruction ---
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """Reconstruit tous les classements depuis la base; retourne le nombre de joueurs"""
+        client = get_redis_client()
+        if client is None:
+            return 0
+
+        tmp = f"{PREFIX}tmp:{uuid.uuid4().hex}:"
+        videos_count = db.session.query(
+            Video.user_id.label('user_id'), func.count(Video.id).label('videos_count')
+        ).group_by(Video.user_id).subquery()
+        rows = db.session.query(
+            User.id, User.club_id, User.credits_balance, User.last_login_at,
+            func.coalesce(videos_count.c.videos_count, 0)
+        ).outerjoin(videos_count, videos_count.c.user_id == User.id) \
+            .filter(User.role == UserRole.PLAYER).order_by(User.id) \
+            .execution_options(yield_per=batch_size)
+
+        total = 0
+        clubs = set()
+        boards, members = defaultdict(dict), {}
+
+        def flush():
+            pipe = client.pipeline(transaction=False)
+            for key, mapping in boards.items():
+                pipe.zadd(key, mapping)
+            if members:
+                pipe.hset(tmp + 'members', mapping=members)
+            pipe.execute()
+            boards.clear()
+            members.clear()
+
+        for user_id, club_id, credits, last_login_at, video_count in rows:
+            scores = {'credits': credits or 0, 'videos': video_count, 'activity': _activity_score(last_login_at)}
+            for metric, value in scores.items():
+                boards[board_key(metric, prefix=tmp)][user_id] = value
+                if club_id:
+                    boards[board_key(metric, club_id, prefix=tmp)][user_id] = value
+            members[user_id] = club_id or ''
+            if club_id:
+                clubs.add(str(club_id))
+            total += 1
+            if total % batch_size == 0:
+                flush()
+        flush()
+
+        # Bascule atomique des clés temporaires vers les clés publiées
+        stale_clubs = set(client.smembers(CLUBS_KEY) or ()) - clubs
+        pipe = client.pipeline()
+        if total:
+            for club_id in [None] + sorted(clubs):
+                for metric in METRICS:
+                    pipe.rename(board_key(metric, club_id, prefix=tmp), board_key(metric, club_id))
+            pipe.rename(tmp + 'members', MEMBERS_KEY)
+        else:
+            pipe.delete(MEMBERS_KEY, *(board_key(metric) for metric in METRICS))
+        for club_id in stale_clubs:
+            pipe.delete(*(board_key(metric, club_id) for metric in METRICS))
+        pipe.delete(CLUBS_KEY)
+        if clubs:
+            pipe.sadd(CLUBS_KEY, *clubs)
+        pipe.set(BUILT_KEY, 1)
+        pipe.execute()
+
+        logger.info(f"🏆 Classements reconstruits: {total} joueurs, {len(clubs)} clubs")
+        return total
+
+    def rebuild_in_background(self):
+        """Reconstruction unique (verrou Redis) dans un thread, avec contexte applicatif"""
+        client = get_redis_client()
+        if client is None or not client.set(REBUILD_LOCK_KEY, 1, nx=True, ex=REBUILD_LOCK_SECONDS):
+            return
+        app = current_app._get_current_object()
+
+        def run():
+            with app.app_context():
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    logger.error(f"❌ Reconstruction des classements échouée: {e}")
+                finally:
+                    client.delete(REBUILD_LOCK_KEY)
+
+        threading.Thread(target=run, name='leaderboard-rebuild', daemon=True).start()
+
+
+leaderboard = Leaderboard()
+
+
+def _apply_changes(changes):
+    """[('player', user_id, état ou None) | ('video', user_id, delta)] -> leaderboard.apply"""
+    players, videos = {}, {}
+    for kind, user_id, value in changes:
+        if kind == 'player':
+            players[user_id] = value
+        else:
+            videos[user_id] = videos.get(user_id, 0) + value
+    leaderboard.apply(players, videos)
+
+
+register_on_commit(SESSION_KEY, _apply_changes)
+
+
+def _record_player(target):
+    if target.role == UserRole.PLAYER:
+        state = (target.club_id, target.credits_balance or 0, _activity_score(target.last_login_at))
+    else:
+        state = None
+    on_commit(inspect(target).session, SESSION_KEY, ('player', target.id, state))
+
+
+@event.listens_for(User, 'after_insert')
+def _on_user_insert(mapper, connection, target):
+    _record_player(target)
+
+
+@event.listens_for(User, 'after_update')
+def _on_user_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes()
+           for name in ('credits_balance', 'club_id', 'last_login_at', 'role')):
+        _record_player(target)
+
+
+@event.listens_for(User, 'after_delete')
+def _on_user_delete(mapper, connection, target):
+    on_commit(inspect(target).session, SESSION_KEY, ('player', target.id, None))
+
+
+def _record_video(target, delta):
+    if target.user_id:
+        on_commit(inspect(target).session, SESSION_KEY, ('video', target.user_id, delta))
+
+
+@event.listens_for(Video, 'after_insert')
+def _on_video_insert(mapper, connection, target):
+    _record_video(target, 1)
+
+
+@event.listens_for(Video, 'after_delete')
+def _on_video_delete(mapper, connection, target):
+    _record_video(target, -1)
@@ -3,16 +3,71 @@
 """
 Service de logging avec détection automatique des problèmes
 Version complète avec monitoring système
+
+Pipeline asynchrone borné:
+- log() ne fait que créer l'enregistrement et le déposer dans une file
+  bornée (QueueHandler); si la file est pleine les messages < ERROR sont
+  perdus (comptés dans dropped_logs), ERROR/CRITICAL attendent au plus
+  ERROR_PUT_TIMEOUT secondes
+- un seul thread (QueueListener) écrit les lignes JSON par lots dans un
+  fichier gardé ouvert, avec rotation par taille (LOG_MAX_BYTES,
+  LOG_BACKUP_COUNT), et fait la détection des problèmes
+- tail_lines() lit un fichier depuis la fin, par blocs, sans le charger
 """
+import atexit
+import itertools
 import logging
 import json
 import os
+import queue
 import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
-from typing import Dict, List, Optional, Any
-import psutil
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Iterator, List, Optional, Any
+
+QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '256'))
+MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(50 * 1024 * 1024)))
+BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+ERROR_PUT_TIMEOUT = 1.0
+
+# Lecture depuis la fin: taille des blocs et volume maximal parcouru par fichier
+TAIL_BLOCK_SIZE = 64 * 1024
+TAIL_MAX_SCAN_BYTES = 64 * 1024 * 1024
+
+
+def tail_lines(path: str, max_scan_bytes: Optional[int] = TAIL_MAX_SCAN_BYTES,
+               block_size: int = TAIL_BLOCK_SIZE) -> Iterator[str]:
+    """
+    Lignes non vides d'un fichier, de la plus récente à la plus ancienne
+
+    Lit par blocs en remontant depuis la fin du fichier: le coût dépend du
+    nombre de lignes consommées, pas de la taille du fichier. Au plus
+    max_scan_bytes sont parcourus (None: tout le fichier).
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        limit = max(0, position - max_scan_bytes) if max_scan_bytes else 0
+        remainder = b''
+        while position > limit:
+            size = min(block_size, position - limit)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + remainder).split(b'\n')
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                line = line.rstrip(b'\r')
+                if line.strip():
+                    yield line.decode('utf-8', errors='replace')
+        # Première ligne du fichier (ligne coupée si la limite est atteinte: ignorée)
+        if position == 0 and remainder.strip():
+            yield remainder.rstrip(b'\r').decode('utf-8', errors='replace')
 
 
 class LogLevel(Enum):
@@ -37,42 +92,167 @@ class ProblemType(Enum):
     HIGH_CPU = "HIGH_CPU"
 
 
+LEVELS = {
+    LogLevel.DEBUG: logging.DEBUG,
+    LogLevel.INFO: logging.INFO,
+    LogLevel.WARNING: logging.WARNING,
+    LogLevel.ERROR: logging.ERROR,
+    LogLevel.CRITICAL: logging.CRITICAL,
+}
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler non bloquant: les messages sont perdus (et comptés) si la file est pleine"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # queue.Queue est thread-safe: pas de verrou du handler (contention entre appelants)
+        if self.filter(record):
+            self.emit(record)
+            return True
+        return False
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Même processus: ni copie ni formatage sur le thread appelant
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if record.levelno >= logging.ERROR:
+                self.queue.put(record, timeout=ERROR_PUT_TIMEOUT)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener qui vide les tampons des handlers quand la file est vide"""
+
+    def dequeue(self, block: bool):
+        try:
+            return self.queue.get_nowait()
+        except queue.Empty:
+            for handler in self.handlers:
+                handler.flush()
+            return self.queue.get(block)
+
+
+class JsonLinesHandler(RotatingFileHandler):
+    """
+    Écrit les enregistrements en lignes JSON, par lots, dans un fichier
+    gardé ouvert, avec rotation par taille
+    """
+
+    def __init__(self, filename: str, max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT,
+                 batch_size: int = BATCH_SIZE):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.batch_size = batch_size
+        self._pending: List[str] = []
+        self._encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+    def format(self, record: logging.LogRecord) -> str:
+        log_entry = {
+            "timestamp": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+            "process_id": record.process
+        }
+        extra_data = getattr(record, 'extra_data', None)
+        if extra_data:
+            log_entry["extra_data"] = extra_data
+        return self._encoder.encode(log_entry)
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._pending.append(self.format(record))
+            if len(self._pending) >= self.batch_size:
+                self._write_pending()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            try:
+                self._write_pending()
+            except Exception as e:
+                print(f"Erreur écriture log: {e}")
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def _write_pending(self):
+        if not self._pending:
+            return
+        data = '\n'.join(self._pending) + '\n'
+        self._pending.clear()
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes > 0 and self.stream.tell() > 0 and self.stream.tell() + len(data) >= self.maxBytes:
+            self.doRollover()
+            self.stream = self._open()
+        self.stream.write(data)
+        self.stream.flush()
+
+
+class ProblemDetectionHandler(logging.Handler):
+    """Détection des problèmes sur le thread d'écriture (hors du thread appelant)"""
+
+    def __init__(self, system_logger: 'SystemLogger'):
+        super().__init__(logging.DEBUG)
+        self.system_logger = system_logger
+
+    def emit(self, record: logging.LogRecord):
+        if getattr(record, 'problem', False):
+            return
+        try:
+            self.system_logger._detect_problems(LogLevel[record.levelname], record.getMessage(),
+                                                getattr(record, 'extra_data', None))
+        except Exception:
+            self.handleError(record)
+
+
 class SystemLogger:
     """Logger système avec détection automatique des problèmes"""
     
-    def __init__(self, logs_dir: str = "logs"):
+    def __init__(self, logs_dir: str = "logs", queue_size: int = QUEUE_SIZE, max_bytes: int = MAX_BYTES,
+                 backup_count: int = BACKUP_COUNT, batch_size: int = BATCH_SIZE, console: bool = True):
         self.logs_dir = logs_dir
         self.log_file = os.path.join(logs_dir, f"system_{datetime.now().strftime('%Y%m%d')}.log")
         self.problems_file = os.path.join(logs_dir, f"problems_{datetime.now().strftime('%Y%m%d')}.log")
-        
+        self.backup_count = backup_count
+
         # Créer le dossier logs s'il n'existe pas
         os.makedirs(logs_dir, exist_ok=True)
-        
-        # Configuration du logger Python standard
+
+        # Logger Python standard (fabrique des enregistrements, sans handler:
+        # tout passe par la file)
         self.logger = logging.getLogger("PadelVar")
         self.logger.setLevel(logging.DEBUG)
-        
-        # Handler pour fichier
-        file_handler = logging.FileHandler(self.log_file, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        
-        # Handler pour console
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
-        # Format des logs
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        # Éviter les doublons
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-            self.logger.addHandler(console_handler)
-        
+
+        # File bornée + écrivain unique (fichier JSON, console, détection)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._queue_handler = BoundedQueueHandler(self._queue)
+        self._json_handler = JsonLinesHandler(self.log_file, max_bytes, backup_count, batch_size)
+        handlers = [self._json_handler]
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setLevel(logging.INFO)
+            console_handler.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                datefmt='%Y-%m-%d %H:%M:%S'
+            ))
+            handlers.append(console_handler)
+        handlers.append(ProblemDetectionHandler(self))
+        self._listener = BatchingQueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.close)
+
         # Monitoring système (désactivé en développement)
         self.monitoring_active = False
         self.system_metrics = {}
@@ -93,46 +273,40 @@ class SystemLogger:
         self.log(LogLevel.INFO, "🔧 SystemLogger initialisé avec monitoring automatique")
     
     def log(self, level: LogLevel, message: str, extra_data: Optional[Dict] = None):
-        """Log un message avec niveau et données supplémentaires"""
-        
-        # Préparer les données du log
-        log_entry = {
-            "timestamp": datetime.now().isoformat(),
-            "level": level.value,
-            "message": message,
-            "thread": threading.current_thread().name,
-            "process_id": os.getpid()
-        }
-        
-        if extra_data:
-            log_entry["extra_data"] = extra_data
-        
-        # Logger Python standard
-        if level == LogLevel.DEBUG:
-            self.logger.debug(message)
-        elif level == LogLevel.INFO:
-            self.logger.info(message)
-        elif level == LogLevel.WARNING:
-            self.logger.warning(message)
-        elif level == LogLevel.ERROR:
-            self.logger.error(message)
-        elif level == LogLevel.CRITICAL:
-            self.logger.critical(message)
-        
-        # Log JSON structuré
-        self._write_json_log(log_entry)
-        
-        # Détection automatique de problèmes
-        self._detect_problems(level, message, extra_data)
-    
-    def _write_json_log(self, log_entry: Dict):
-        """Écrire un log au format JSON"""
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
-        except Exception as e:
-            print(f"Erreur écriture log: {e}")
-    
+        """
+        Log un message avec niveau et données supplémentaires
+
+        Non bloquant: l'écriture JSON, la console et la détection des
+        problèmes se font sur le thread d'écriture.
+        """
+        self._enqueue(LEVELS[level], message, extra_data)
+
+    def _enqueue(self, levelno: int, message: str, extra_data: Optional[Dict] = None, problem: bool = False):
+        record = self.logger.makeRecord(self.logger.name, levelno, '', 0, message, None, None,
+                                        extra={'extra_data': extra_data, 'problem': problem})
+        self._queue_handler.handle(record)
+
+    @property
+    def dropped_logs(self) -> int:
+        """Messages perdus parce que la file était pleine"""
+        return self._queue_handler.dropped
+
+    def flush(self):
+        """Attendre que les messages en file soient écrits sur disque"""
+        if self._listener is not None and self._listener._thread is not None:
+            self._queue.join()
+        self._json_handler.flush()
+
+    def close(self):
+        """Arrêter le thread d'écriture après avoir vidé la file"""
+        listener, self._listener = self._listener, None
+        if listener is not None and listener._thread is not None:
+            try:
+                listener.stop()
+            except queue.Full:
+                pass
+        self._json_handler.close()
+
     def _detect_problems(self, level: LogLevel, message: str, extra_data: Optional[Dict]):
         """Détection automatique de problèmes"""
         
@@ -184,13 +358,14 @@ class SystemLogger:
             print(f"Erreur écriture problème: {e}")
         
         # Log du problème détecté
-        self.logger.critical(f"🚨 PROBLÈME DÉTECTÉ: {problem_type.value} - {message}")
+        self._enqueue(logging.CRITICAL, f"🚨 PROBLÈME DÉTECTÉ: {problem_type.value} - {message}", problem=True)
     
     def _start_monitoring(self):
         """Démarrer le monitoring système en arrière-plan"""
         def monitoring_loop():
             while self.monitoring_active:
                 try:
+                    import psutil  # seulement si le monitoring est actif
                     # Métriques système
                     cpu_percent = psutil.cpu_percent(interval=1)
                     memory = psutil.virtual_memory()
@@ -244,41 +419,55 @@ class SystemLogger:
             "problems_count": len(self.problems_detected),
             "recent_problems": self.problems_detected[-5:] if self.problems_detected else [],
             "monitoring_active": self.monitoring_active,
+            "dropped_logs": self.dropped_logs,
             "thresholds": self.thresholds
         }
     
-    def get_recent_logs(self, count: int = 50) -> List[Dict]:
-        """Obtenir les logs récents"""
+    def get_recent_logs(self, count: int = 50, level: Optional[str] = None,
+                        hours: Optional[float] = None) -> List[Dict]:
+        """
+        Obtenir les logs récents (du plus ancien au plus récent)
+
+        Lecture depuis la fin du fichier courant puis des fichiers archivés,
+        filtrée par niveau et/ou par ancienneté.
+        """
+        self.flush()
+        since = (datetime.now() - timedelta(hours=hours)).isoformat() if hours else None
+        wanted = level.upper() if level else None
         logs = []
-        try:
-            with open(self.log_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                for line in lines[-count:]:
-                    try:
-                        log_entry = json.loads(line.strip())
-                        logs.append(log_entry)
-                    except json.JSONDecodeError:
-                        continue
-        except FileNotFoundError:
-            pass
+        for line in self._iter_log_lines():
+            try:
+                log_entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if since and log_entry.get("timestamp", "") < since:
+                break
+            if wanted and log_entry.get("level") != wanted:
+                continue
+            logs.append(log_entry)
+            if len(logs) >= count:
+                break
+        logs.reverse()
         return logs
-    
+
+    def _iter_log_lines(self) -> Iterator[str]:
+        """Lignes du journal, de la plus récente à la plus ancienne, fichiers archivés compris"""
+        paths = [self.log_file] + [f"{self.log_file}.{n}" for n in range(1, self.backup_count + 1)]
+        return itertools.chain.from_iterable(tail_lines(path) for path in paths)
+
     def get_problems(self, count: int = 20) -> List[Dict]:
         """Obtenir les problèmes récents"""
         problems = []
-        try:
-            with open(self.problems_file, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                for line in lines[-count:]:
-                    try:
-                        problem_entry = json.loads(line.strip())
-                        problems.append(problem_entry)
-                    except json.JSONDecodeError:
-                        continue
-        except FileNotFoundError:
-            pass
+        for line in tail_lines(self.problems_file):
+            try:
+                problems.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            if len(problems) >= count:
+                break
+        problems.reverse()
         return problems
-    
+
     def stop_monitoring(self):
         """Arrêter le monitoring système"""
         self.monitoring_active = False
@@ -7,24 +7,40 @@ import os
 import subprocess
 import tempfile
 import logging
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 from src.models.database import db
 from src.models.user import UserClip, Video
+from src.services.thumbnail_pipeline import thumbnail_pipeline
 from src.config.bunny_config import BUNNY_CONFIG
+from src.services.mp4_index import HttpRangeReader, Mp4Index, Mp4IndexError, build_index
 import requests
 
 logger = logging.getLogger(__name__)
 
+# Lecture partielle (HTTP Range) de l'original au lieu du téléchargement complet
+PARTIAL_FETCH_ENABLED = os.getenv('CLIP_PARTIAL_FETCH', 'true').lower() == 'true'
+# Marge après end_time (B-frames: un échantillon présenté avant end peut être décodé après)
+PARTIAL_FETCH_MARGIN_SECONDS = 1.0
+# Index moov distants gardés en mémoire (clé: bunny_video_id)
+REMOTE_INDEX_CACHE_SIZE = 16
+
 
 class ManualClipService:
     """Service pour gérer la création manuelle de clips vidéo"""
     
     def __init__(self):
         self.temp_dir = tempfile.gettempdir()
+        self.api_host = os.environ.get('BUNNY_API_HOST', 'https://video.bunnycdn.com').rstrip('/')
+        self.session = requests.Session()
+        # bunny_video_id -> (index, blocs d'en-tête lus: ftyp, moov...)
+        self._index_cache: "OrderedDict[str, Tuple[Mp4Index, Dict[int, bytes]]]" = OrderedDict()
+        self._index_lock = threading.Lock()
     
     def _get_bunny_config(self):
-        """Charge la config Bunny depuis la DB (comme bunny_storage_service)"""
+        """Charge la config Bunny depuis la DB (valeurs en cache, voir config_cache)"""
         try:
             from src.models.system_configuration import SystemConfiguration
             config = SystemConfiguration.get_bunny_cdn_config()  # ✅ Correct method name
@@ -35,7 +51,7 @@ class ManualClipService:
             # Une API key Bunny valide fait ~40-60 chars
             # Si >100 = probablement chiffrée → rejeter
             if api_key and len(api_key) < 100:
-                logger.info(f"✅ Using Bunny config from DB (api_key length: {len(api_key)})")
+                logger.debug(f"✅ Using Bunny config from DB (api_key length: {len(api_key)})")
                 return config
             else:
                 if api_key:
@@ -48,7 +64,7 @@ class ManualClipService:
         fallback_config = BunnyConfig.load_config()
         
         api_key_len = len(fallback_config.get('api_key', ''))
-        logger.info(f"✅ Using Bunny config from BunnyConfig fallback (api_key length: {api_key_len})")
+        logger.debug(f"✅ Using Bunny config from BunnyConfig fallback (api_key length: {api_key_len})")
         return fallback_config
     
     def create_clip(
@@ -136,12 +152,10 @@ class ManualClipService:
             logger.info(f"Creating clip from Bunny video: {video.bunny_video_id}")
             logger.info(f"Cutting from {clip.start_time}s to {clip.end_time}s")
             
-            # Télécharger la vidéo source via API (utilise méthode existante)
-            source_path = self._download_bunny_video(video.bunny_video_id)
-            
-            # Découper localement
-            duration = clip.end_time - clip.start_time
-            clip_path = self._cut_video_local(source_path, clip.start_time, clip.end_time)
+            # Récupérer (partiellement si possible) la source puis découper
+            clip_path = self._cut_video_from_bunny_api(
+                video.bunny_video_id, clip.start_time, clip.end_time, config
+            )
             
             # Générer miniature
             logger.info("Generating thumbnail")
@@ -225,28 +239,102 @@ class ManualClipService:
         
         return temp_file
     
-    def _cut_video_from_bunny_api(self, video_id: str, start_time: float, end_time: float, config: dict) -> str:
+    def _get_remote_index(self, video_id: str, url: str, headers: dict) -> Tuple[Mp4Index, Dict[int, bytes], HttpRangeReader]:
         """
-        Télécharge vidéo via API Bunny (avec auth) puis découpe
-        ✅ Résout 403 Forbidden
+        Index moov de l'original Bunny, lu par requêtes Range puis mis en cache
+        
+        Les clips suivants du même match ne relisent ni ne re-parsent le moov.
         """
-        output_path = os.path.join(self.temp_dir, f"clip_{datetime.now().timestamp()}.mp4")
+        with self._index_lock:
+            cached = self._index_cache.get(video_id)
+            if cached is not None:
+                self._index_cache.move_to_end(video_id)
+        
+        reader = HttpRangeReader(self.session, url, headers)
+        if cached is not None and cached[0].file_size == reader.file_size:
+            return cached[0], cached[1], reader
+        
+        index = build_index(reader.read_at, reader.file_size)
+        blocks = dict(reader.blocks)
+        logger.info(f"📑 moov indexé pour {video_id}: {index.moov_size} octets, "
+                    f"{reader.requests} requêtes Range")
+        
+        with self._index_lock:
+            self._index_cache[video_id] = (index, blocks)
+            while len(self._index_cache) > REMOTE_INDEX_CACHE_SIZE:
+                self._index_cache.popitem(last=False)
+        return index, blocks, reader
+    
+    def _fetch_partial_source(self, video_id: str, start_time: float, end_time: float,
+                              url: str, headers: dict) -> str:
+        """
+        Reconstituer localement un MP4 "creux" contenant seulement ce qu'il faut
         
-        # Télécharger via API - URL CORRECTE pour MP4 complet
-        logger.info(f"Downloading from Bunny API: {video_id}")
-        download_url = f"https://video.bunnycdn.com/library/{config['library_id']}/videos/{video_id}/mp4/original"
+        Fichier sparse de la taille de l'original: atomes d'en-tête (ftyp, moov)
+        et plage d'octets de [keyframe précédant start_time, end_time] aux mêmes
+        offsets. FFmpeg (-ss / -t) ne lit que ces échantillons.
+        """
+        index, blocks, reader = self._get_remote_index(video_id, url, headers)
+        end = min(end_time + PARTIAL_FETCH_MARGIN_SECONDS, index.duration)
+        first_byte, last_byte, actual_start = index.byte_range_for_time(start_time, end)
         
-        headers = {'AccessKey': config['api_key']}
-        response = requests.get(download_url, headers=headers, stream=True)
+        temp_source = os.path.join(self.temp_dir, f"source_{datetime.now().timestamp()}.mp4")
+        try:
+            with open(temp_source, 'wb') as f:
+                f.truncate(index.file_size)
+                for offset, data in blocks.items():
+                    f.seek(offset)
+                    f.write(data)
+                f.seek(first_byte)
+                for chunk in reader.iter_range(first_byte, last_byte):
+                    f.write(chunk)
+        except BaseException:
+            self._cleanup_files([temp_source])
+            raise
+        
+        logger.info(f"📥 Partial fetch {video_id}: {reader.bytes_fetched} / {index.file_size} octets "
+                    f"(keyframe à {actual_start:.2f}s, {reader.requests} requêtes)")
+        return temp_source
+    
+    def _download_full_source(self, url: str, headers: dict) -> str:
+        """Téléchargement complet de l'original (fallback)"""
+        response = self.session.get(url, headers=headers, stream=True)
         response.raise_for_status()
         
         temp_source = os.path.join(self.temp_dir, f"source_{datetime.now().timestamp()}.mp4")
         
         with open(temp_source, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
                 f.write(chunk)
         
-        logger.info(f"Downloaded source ({os.path.getsize(temp_source)} bytes), cutting clip...")
+        logger.info(f"Downloaded source ({os.path.getsize(temp_source)} bytes)")
+        return temp_source
+    
+    def _cut_video_from_bunny_api(self, video_id: str, start_time: float, end_time: float, config: dict) -> str:
+        """
+        Récupère la source via API Bunny (avec auth) puis découpe
+        ✅ Résout 403 Forbidden
+        ✅ Ne récupère que le moov et la plage d'octets du clip (HTTP Range),
+           téléchargement complet en fallback
+        """
+        output_path = os.path.join(self.temp_dir, f"clip_{datetime.now().timestamp()}.mp4")
+        
+        # URL CORRECTE pour MP4 complet
+        download_url = f"{self.api_host}/library/{config['library_id']}/videos/{video_id}/mp4/original"
+        headers = {'AccessKey': config['api_key']}
+        
+        temp_source = None
+        if PARTIAL_FETCH_ENABLED:
+            try:
+                temp_source = self._fetch_partial_source(video_id, start_time, end_time, download_url, headers)
+            except (Mp4IndexError, requests.RequestException, OSError) as e:
+                logger.warning(f"⚠️ Partial fetch impossible pour {video_id} ({e}), téléchargement complet")
+        
+        if temp_source is None:
+            logger.info(f"Downloading from Bunny API: {video_id}")
+            temp_source = self._download_full_source(download_url, headers)
+        
+        logger.info("Cutting clip...")
         
         # Découper
         duration = end_time - start_time
@@ -342,31 +430,15 @@ class ManualClipService:
         
         return output_path
     
-    def _generate_thumbnail(self, video_path: str) -> str:
-        """Génère une miniature à partir de la vidéo"""
-        thumbnail_path = os.path.join(
-            self.temp_dir,
-            f"thumb_{datetime.now().timestamp()}.jpg"
-        )
-        
-        # Extraire une frame à 1 seconde
-        cmd = [
-            'ffmpeg',
-            '-i', video_path,
-            '-ss', '1',
-            '-vframes', '1',
-            '-q:v', '2',  # Qualité
-            thumbnail_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode != 0:
-            logger.warning(f"Thumbnail generation failed: {result.stderr}")
+    def _generate_thumbnail(self, video_path: str) -> Optional[str]:
+        """Génère une miniature à partir de la vidéo (poster du pipeline de vignettes)"""
+        try:
+            previews = thumbnail_pipeline.generate(video_path)
+            return str(thumbnail_pipeline.poster_path(previews))
+        except Exception as e:
+            logger.warning(f"Thumbnail generation failed: {e}")
             # Utiliser une image par défaut
-            thumbnail_path = None
-        
-        return thumbnail_path
+            return None
     
     def _upload_to_bunny(self, file_path: str, filename: str) -> tuple:
         """
@@ -0,0 +1,491 @@
+"""
+Index MP4 (atome moov) sans FFmpeg
+Permet de convertir un intervalle de temps en plage d'octets du fichier
+
+- Lecture des atomes via une fonction read_at(offset, size): fonctionne
+  aussi bien sur un fichier local que sur des requêtes HTTP Range
+- Tables stts / stss / stsc / stsz / stco / co64 de chaque piste
+- ctts / elst: instants de présentation des keyframes (tels que vus par FFmpeg)
+- Recherche de la keyframe précédente pour démarrer sur un GOP complet
+- HttpRangeReader: index d'un MP4 distant sans le télécharger
+"""
+
+import logging
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ReadAt = Callable[[int, int], bytes]
+
+# Atomes conteneurs à parcourir pour atteindre les tables d'échantillons
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl', b'edts'}
+
+# Taille max de moov acceptée (protection mémoire)
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+
+class Mp4IndexError(ValueError):
+    """Fichier MP4 invalide ou non indexable"""
+
+
+class Mp4Track:
+    """Table d'échantillons d'une piste (offsets, tailles, temps, keyframes)"""
+
+    def __init__(self, track_id: int, handler: str, timescale: int):
+        self.track_id = track_id
+        self.handler = handler          # 'vide', 'soun', ...
+        self.timescale = timescale
+        self.sample_times = array('q')  # Temps de décodage (unités timescale)
+        self.sample_offsets = array('q')
+        self.sample_sizes = array('l')
+        self.sync_samples: Optional[List[int]] = None  # Index 0-based, None = toutes
+        self.composition_offsets: Optional[array] = None  # ctts (PTS - DTS)
+        self.media_time = 0             # elst: décalage de présentation
+        self.duration = 0               # Unités timescale
+
+    @property
+    def is_video(self) -> bool:
+        return self.handler == 'vide'
+
+    @property
+    def sample_count(self) -> int:
+        return len(self.sample_sizes)
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.duration / self.timescale if self.timescale else 0.0
+
+    def sample_at(self, seconds: float) -> int:
+        """Index du dernier échantillon qui démarre avant ou à `seconds`"""
+        ticks = int(seconds * self.timescale)
+        return max(0, bisect_right(self.sample_times, ticks) - 1)
+
+    def keyframe_before(self, index: int) -> int:
+        """Index de la keyframe (sync sample) au plus proche avant `index`"""
+        if self.sync_samples is None:
+            return index
+        pos = bisect_right(self.sync_samples, index) - 1
+        return self.sync_samples[pos] if pos >= 0 else 0
+
+    def keyframe_times(self) -> List[float]:
+        """Instants (secondes) des keyframes de la piste"""
+        indexes = self.sync_samples if self.sync_samples is not None else range(self.sample_count)
+        return [self.sample_times[i] / self.timescale for i in indexes]
+
+    def keyframe_presentation_times(self) -> List[float]:
+        """Instants de présentation (PTS, secondes) des keyframes, liste d'édition appliquée"""
+        indexes = self.sync_samples if self.sync_samples is not None else range(self.sample_count)
+        ctts = self.composition_offsets
+        return [
+            (self.sample_times[i] + (ctts[i] if ctts is not None and i < len(ctts) else 0)
+             - self.media_time) / self.timescale
+            for i in indexes
+        ]
+
+    def time_of(self, index: int) -> float:
+        return self.sample_times[index] / self.timescale
+
+
+class Mp4Index:
+    """Index complet d'un fichier MP4"""
+
+    def __init__(self, tracks: List[Mp4Track], moov_offset: int, moov_size: int,
+                 mdat_offset: Optional[int], file_size: int):
+        self.tracks = tracks
+        self.moov_offset = moov_offset
+        self.moov_size = moov_size
+        self.mdat_offset = mdat_offset
+        self.file_size = file_size
+
+    @property
+    def video_track(self) -> Optional[Mp4Track]:
+        for track in self.tracks:
+            if track.is_video and track.sample_count:
+                return track
+        return None
+
+    @property
+    def duration(self) -> float:
+        return max((t.duration_seconds for t in self.tracks), default=0.0)
+
+    @property
+    def faststart(self) -> bool:
+        """moov avant mdat (lecture progressive possible)"""
+        return self.mdat_offset is None or self.moov_offset < self.mdat_offset
+
+    def byte_range_for_time(self, start: float, end: float) -> Tuple[int, int, float]:
+        """
+        Plage d'octets couvrant [start, end] sur toutes les pistes
+
+        Le début est recalé sur la keyframe vidéo précédente pour que la
+        plage soit décodable.
+
+        Returns:
+            (premier_octet, dernier_octet_inclus, début_effectif_secondes)
+        """
+        if end <= start:
+            raise Mp4IndexError(f"Intervalle invalide: {start}-{end}")
+
+        video = self.video_track
+        if video is not None:
+            first = video.keyframe_before(video.sample_at(start))
+            start = video.time_of(first)
+
+        first_byte = None
+        last_byte = None
+        for track in self.tracks:
+            if not track.sample_count:
+                continue
+            # Échantillon en cours à `start` (l'audio peut démarrer juste avant la keyframe)
+            begin = max(0, bisect_right(track.sample_times, int(start * track.timescale)) - 1)
+            stop = bisect_right(track.sample_times, int(end * track.timescale))
+            begin = min(begin, track.sample_count - 1)
+            stop = max(stop, begin + 1)
+
+            offsets = track.sample_offsets[begin:stop]
+            sizes = track.sample_sizes[begin:stop]
+            low = min(offsets)
+            high = max(o + s for o, s in zip(offsets, sizes))
+            first_byte = low if first_byte is None else min(first_byte, low)
+            last_byte = high if last_byte is None else max(last_byte, high)
+
+        if first_byte is None:
+            raise Mp4IndexError("Aucun échantillon dans le fichier")
+
+        return first_byte, last_byte - 1, start
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """Parcourir les atomes d'un buffer: yields (type, payload_start, box_end)"""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            raise Mp4IndexError(f"Atome {box_type!r} invalide à {pos}")
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def find_top_level_boxes(read_at: ReadAt, file_size: int) -> Dict[bytes, Tuple[int, int]]:
+    """
+    Localiser les atomes de premier niveau en ne lisant que leurs en-têtes
+
+    Returns:
+        {type: (offset, taille)} pour la première occurrence de chaque type
+    """
+    boxes = {}
+    pos = 0
+    while pos + 8 <= file_size:
+        header = read_at(pos, 16)
+        if len(header) < 8:
+            break
+        size, box_type = struct.unpack_from('>I4s', header, 0)
+        if size == 1:
+            if len(header) < 16:
+                break
+            size = struct.unpack_from('>Q', header, 8)[0]
+        elif size == 0:
+            size = file_size - pos
+        if size < 8:
+            raise Mp4IndexError(f"Atome {box_type!r} invalide à {pos}")
+        boxes.setdefault(box_type, (pos, size))
+        pos += size
+    return boxes
+
+
+def _full_box(data: bytes, pos: int) -> Tuple[int, int]:
+    """(version, position après version/flags)"""
+    return data[pos], pos + 4
+
+
+def _parse_track(data: bytes, start: int, end: int) -> Optional[Mp4Track]:
+    tables = {}
+    track_id = 0
+    timescale = 0
+    duration = 0
+    handler = ''
+
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for box_type, payload, box_end in _iter_boxes(data, s, e):
+            if box_type in _CONTAINER_BOXES:
+                stack.append((payload, box_end))
+            elif box_type == b'tkhd':
+                version, p = _full_box(data, payload)
+                track_id = struct.unpack_from('>I', data, p + (16 if version == 1 else 8))[0]
+            elif box_type == b'mdhd':
+                version, p = _full_box(data, payload)
+                if version == 1:
+                    timescale, duration = struct.unpack_from('>IQ', data, p + 16)
+                else:
+                    timescale, duration = struct.unpack_from('>II', data, p + 8)
+            elif box_type == b'hdlr':
+                handler = data[payload + 8:payload + 12].decode('latin-1')
+            elif box_type in (b'stts', b'stss', b'stsc', b'stsz', b'stco', b'co64', b'ctts', b'elst'):
+                tables[box_type] = payload
+
+    if not timescale or b'stsz' not in tables or not (b'stco' in tables or b'co64' in tables):
+        return None
+
+    track = Mp4Track(track_id, handler, timescale)
+
+    # stsz: tailles des échantillons
+    _, p = _full_box(data, tables[b'stsz'])
+    sample_size, count = struct.unpack_from('>II', data, p)
+    if sample_size:
+        track.sample_sizes = array('l', [sample_size]) * count
+    else:
+        track.sample_sizes = array('l', struct.unpack_from(f'>{count}I', data, p + 8))
+
+    # stts: durées -> temps de décodage cumulés
+    if b'stts' in tables:
+        _, p = _full_box(data, tables[b'stts'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        raw = struct.unpack_from(f'>{entries * 2}I', data, p + 4)
+        times = array('q')
+        t = 0
+        for i in range(0, len(raw), 2):
+            sample_count, delta = raw[i], raw[i + 1]
+            times.extend(range(t, t + sample_count * delta, delta) if delta else [t] * sample_count)
+            t += sample_count * delta
+        track.sample_times = times[:count]
+        track.duration = max(duration, t)
+    else:
+        track.duration = duration
+
+    # stss: keyframes (1-based dans le fichier)
+    if b'stss' in tables:
+        _, p = _full_box(data, tables[b'stss'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        track.sync_samples = [i - 1 for i in struct.unpack_from(f'>{entries}I', data, p + 4)]
+
+    # ctts: décalages de composition (B-frames)
+    if b'ctts' in tables:
+        version, p = _full_box(data, tables[b'ctts'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        raw = struct.unpack_from(f">{entries * 2}{'i' if version else 'I'}", data, p + 4)
+        offsets = array('l')
+        for i in range(0, len(raw), 2):
+            offsets.extend([raw[i + 1]] * raw[i])
+        track.composition_offsets = offsets[:count]
+
+    # elst: première entrée non vide (media_time en unités de la piste)
+    if b'elst' in tables:
+        version, p = _full_box(data, tables[b'elst'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        for i in range(entries):
+            if version == 1:
+                _, media_time = struct.unpack_from('>Qq', data, p + 4 + i * 20)
+            else:
+                _, media_time = struct.unpack_from('>Ii', data, p + 4 + i * 12)
+            if media_time >= 0:
+                track.media_time = media_time
+                break
+
+    # stco / co64: offsets des chunks
+    if b'co64' in tables:
+        _, p = _full_box(data, tables[b'co64'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        chunk_offsets = struct.unpack_from(f'>{entries}Q', data, p + 4)
+    else:
+        _, p = _full_box(data, tables[b'stco'])
+        entries = struct.unpack_from('>I', data, p)[0]
+        chunk_offsets = struct.unpack_from(f'>{entries}I', data, p + 4)
+
+    # stsc: échantillons par chunk -> offset de chaque échantillon
+    _, p = _full_box(data, tables[b'stsc'])
+    entries = struct.unpack_from('>I', data, p)[0]
+    stsc = [struct.unpack_from('>II', data, p + 4 + i * 12) for i in range(entries)]
+
+    offsets = array('q')
+    sizes = track.sample_sizes
+    sample = 0
+    for i, (first_chunk, per_chunk) in enumerate(stsc):
+        last_chunk = stsc[i + 1][0] - 1 if i + 1 < len(stsc) else len(chunk_offsets)
+        for chunk in range(first_chunk - 1, last_chunk):
+            offset = chunk_offsets[chunk]
+            for _ in range(per_chunk):
+                if sample >= count:
+                    break
+                offsets.append(offset)
+                offset += sizes[sample]
+                sample += 1
+    track.sample_offsets = offsets
+
+    if len(offsets) != count or len(track.sample_times) != count:
+        logger.warning(f"⚠️ Piste {track_id}: tables incohérentes ({len(offsets)}/{len(track.sample_times)}/{count})")
+        n = min(len(offsets), len(track.sample_times), count)
+        track.sample_offsets = offsets[:n]
+        track.sample_times = track.sample_times[:n]
+        track.sample_sizes = sizes[:n]
+
+    return track
+
+
+def parse_moov(moov: bytes) -> List[Mp4Track]:
+    """Parser le contenu d'un atome moov (en-tête inclus)"""
+    tracks = []
+    for box_type, payload, box_end in _iter_boxes(moov):
+        if box_type != b'moov':
+            continue
+        for child, child_payload, child_end in _iter_boxes(moov, payload, box_end):
+            if child == b'trak':
+                track = _parse_track(moov, child_payload, child_end)
+                if track is not None:
+                    tracks.append(track)
+    return tracks
+
+
+def build_index(read_at: ReadAt, file_size: int) -> Mp4Index:
+    """
+    Construire l'index d'un MP4 à partir d'une fonction de lecture aléatoire
+
+    Ne lit que les en-têtes des atomes de premier niveau puis l'atome moov.
+    """
+    boxes = find_top_level_boxes(read_at, file_size)
+    if b'moov' not in boxes:
+        raise Mp4IndexError("Atome moov introuvable")
+
+    moov_offset, moov_size = boxes[b'moov']
+    if moov_size > MAX_MOOV_SIZE:
+        raise Mp4IndexError(f"Atome moov trop grand ({moov_size} octets)")
+
+    moov = read_at(moov_offset, moov_size)
+    if len(moov) < moov_size:
+        raise Mp4IndexError("Atome moov tronqué")
+
+    tracks = parse_moov(moov)
+    if not tracks:
+        raise Mp4IndexError("Aucune piste indexable")
+
+    mdat = boxes.get(b'mdat')
+    return Mp4Index(tracks, moov_offset, moov_size, mdat[0] if mdat else None, file_size)
+
+
+def file_reader(path: str) -> Tuple[ReadAt, Callable[[], None]]:
+    """read_at() sur un fichier local (os.pread si disponible)"""
+    fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+    if hasattr(os, 'pread'):
+        def read_at(offset: int, size: int) -> bytes:
+            return os.pread(fd, size, offset)
+    else:
+        lock = threading.Lock()
+
+        def read_at(offset: int, size: int) -> bytes:
+            with lock:
+                os.lseek(fd, offset, os.SEEK_SET)
+                return os.read(fd, size)
+
+    return read_at, lambda: os.close(fd)
+
+
+class HttpRangeReader:
+    """
+    read_at() par requêtes HTTP Range sur un MP4 distant
+
+    Le premier bloc (HEAD_SIZE) est lu d'emblée: ftyp et, pour un fichier
+    faststart, les en-têtes suivants y sont servis sans requête. Les blocs
+    lus sont conservés dans `blocks` (offset -> octets) pour pouvoir
+    reconstituer localement les atomes d'en-tête.
+    """
+
+    HEAD_SIZE = 64 * 1024
+
+    def __init__(self, session, url: str, headers: Optional[Dict[str, str]] = None,
+                 timeout: float = 30):
+        self.session = session
+        self.url = url
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.requests = 0
+        self.bytes_fetched = 0
+        self.blocks: Dict[int, bytes] = {}
+
+        response = self._get(0, self.HEAD_SIZE - 1)
+        content_range = response.headers.get('Content-Range', '')
+        total = content_range.rpartition('/')[2]
+        if not total.isdigit():
+            raise Mp4IndexError(f"Content-Range invalide: {content_range!r}")
+        self.file_size = int(total)
+        # Suivre une éventuelle redirection (CDN) une seule fois
+        self.url = response.url
+        self.blocks[0] = response.content
+        self.bytes_fetched += len(self.blocks[0])
+
+    def _get(self, first: int, last: int, stream: bool = False):
+        headers = dict(self.headers, Range=f"bytes={first}-{last}")
+        response = self.session.get(self.url, headers=headers, stream=stream, timeout=self.timeout)
+        self.requests += 1
+        if response.status_code != 206:
+            response.close()
+            if response.status_code == 200:
+                raise Mp4IndexError("Le serveur ne supporte pas les requêtes Range")
+            response.raise_for_status()
+            raise Mp4IndexError(f"Réponse inattendue: {response.status_code}")
+        return response
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        head = self.blocks[0]
+        if offset + size <= len(head):
+            return head[offset:offset + size]
+        last = min(offset + size, self.file_size) - 1
+        if last < offset:
+            return b''
+        data = self._get(offset, last).content
+        self.bytes_fetched += len(data)
+        self.blocks[offset] = data
+        return data
+
+    def iter_range(self, first: int, last: int, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Octets [first, last] en flux (un seul GET)"""
+        response = self._get(first, last, stream=True)
+        try:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                self.bytes_fetched += len(chunk)
+                yield chunk
+        finally:
+            response.close()
+
+
+_file_index_cache: "OrderedDict[Tuple[str, int, int], Mp4Index]" = OrderedDict()
+_file_index_lock = threading.Lock()
+FILE_INDEX_CACHE_SIZE = 32
+
+
+def load_file_index(path: str) -> Mp4Index:
+    """Index d'un MP4 local, mis en cache par (chemin, mtime, taille)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    with _file_index_lock:
+        index = _file_index_cache.get(key)
+        if index is not None:
+            _file_index_cache.move_to_end(key)
+            return index
+
+    read_at, close = file_reader(path)
+    try:
+        index = build_index(read_at, stat.st_size)
+    finally:
+        close()
+
+    with _file_index_lock:
+        _file_index_cache[key] = index
+        while len(_file_index_cache) > FILE_INDEX_CACHE_SIZE:
+            _file_index_cache.popitem(last=False)
+    return index
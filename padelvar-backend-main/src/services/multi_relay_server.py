@@ -7,11 +7,16 @@ Each terrain has:
 - Frame buffer (default 120 frames)
 - HTTP endpoint: http://localhost:8000/video/<terain_id>
 - Automatic reconnection on camera failure
+- Shared encode mode (default): each captured frame is JPEG-encoded once
+  into a versioned slot shared by every viewer of the terrain
+- MJPEG passthrough: multipart MJPEG cameras are relayed without any
+  decode/re-encode, the original JPEG bytes go straight to viewers
 """
 
 import threading
 import time
 import os
+import sys
 from collections import deque
 from pathlib import Path
 
@@ -20,6 +25,13 @@ import cv2
 import yaml
 import logging
 
+try:
+    from ..video_system.mjpeg_passthrough import MJPEGPassthroughReader
+except ImportError:
+    # Lancé comme script: python multi_relay_server.py
+    sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'video_system'))
+    from mjpeg_passthrough import MJPEGPassthroughReader
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -27,6 +39,14 @@ logging.basicConfig(
 )
 log = logging.getLogger("multi_relay")
 
+# Modes de relay
+RELAY_MODE_SHARED = 'shared'          # 1 encodage par frame, partagé entre viewers
+RELAY_MODE_PER_VIEWER = 'per_viewer'  # Ancien mode: 1 encodage par viewer
+RELAY_MODES = (RELAY_MODE_SHARED, RELAY_MODE_PER_VIEWER)
+
+# Fenêtre glissante (secondes) pour le calcul des encodages/seconde
+ENCODE_RATE_WINDOW = 5.0
+
 app = Flask(__name__)
 
 
@@ -34,17 +54,38 @@ class TerrainRelay:
     """
     Relay vidéo pour un terrain
     Lit frames depuis caméra avec OpenCV et maintient un buffer
+    
+    En mode 'shared', le thread lecteur encode chaque frame une seule fois
+    dans un slot JPEG versionné (numéro de séquence). Les viewers attendent
+    la séquence suivante sur une Condition au lieu de ré-encoder et de poller.
     """
     
-    def __init__(self, terrain_id, name, source_url, buffer_frames=120):
+    def __init__(self, terrain_id, name, source_url, buffer_frames=120,
+                 mode=RELAY_MODE_SHARED, jpeg_quality=90, passthrough=True):
+        if mode not in RELAY_MODES:
+            raise ValueError(f"Invalid relay mode '{mode}', expected one of {RELAY_MODES}")
+        
         self.terrain_id = terrain_id
         self.name = name
         self.source_url = source_url
         self.buffer_frames = buffer_frames
+        self.mode = mode
+        self.jpeg_quality = jpeg_quality
+        
+        # Passthrough MJPEG: uniquement pour les sources HTTP, désactivé
+        # automatiquement si la caméra n'envoie pas de multipart
+        self.passthrough = passthrough and source_url.lower().startswith(('http://', 'https://'))
+        self.frame_shape = None  # (H, W)
         
-        # Buffer circulaire de frames
+        # Buffer circulaire de frames (numpy, ou JPEG bruts en passthrough)
         self.buffer = deque(maxlen=buffer_frames)
         
+        # Slot JPEG partagé (mode shared): dernière frame encodée + séquence
+        self._frame_cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._viewers = 0
+        
         # Threading
         self._stop = threading.Event()
         self.thread = threading.Thread(target=self._reader, daemon=True)
@@ -54,6 +95,9 @@ class TerrainRelay:
         self.frames_received = 0
         self.reconnections = 0
         self.is_connected = False
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+        self._encode_times = deque()
     
     def start(self):
         """Démarre le thread de lecture"""
@@ -64,12 +108,21 @@ class TerrainRelay:
         """Arrête le thread de lecture"""
         log.info(f"🛑 Stopping relay '{self.name}'")
         self._stop.set()
+        
+        # Réveiller les viewers en attente pour qu'ils se terminent
+        with self._frame_cond:
+            self._frame_cond.notify_all()
     
     def _reader(self):
         """
         Thread principal de lecture des frames
         Gère la reconnexion automatique
         """
+        if self.passthrough:
+            self._passthrough_reader()
+            if self._stop.is_set():
+                return
+        
         cap = None
         
         while not self._stop.is_set():
@@ -109,6 +162,10 @@ class TerrainRelay:
                 self.buffer.append(frame)
                 self.frames_received += 1
                 self.last_frame_time = time.time()
+                self.frame_shape = frame.shape[:2]
+                
+                if self.mode == RELAY_MODE_SHARED:
+                    self._publish_frame(frame)
                 
             except Exception as e:
                 log.exception(f"❌ {self.name}: Reader exception: {e}")
@@ -124,30 +181,148 @@ class TerrainRelay:
         
         log.info(f"🏁 {self.name}: Reader stopped")
     
+    def _passthrough_reader(self):
+        """
+        Lecture MJPEG sans décodage: les JPEG caméra sont publiés tels quels
+        Retourne si la source n'est pas du MJPEG multipart (fallback OpenCV)
+        """
+        reader = MJPEGPassthroughReader(self.source_url)
+        
+        while not self._stop.is_set():
+            try:
+                log.info(f"🔌 Connecting to {self.name} (MJPEG passthrough)...")
+                for jpeg in reader.iter_frames(self._stop):
+                    if not self.is_connected:
+                        self.is_connected = True
+                        self.reconnections += 1
+                        log.info(f"✅ {self.name} connected (attempt #{self.reconnections})")
+                    
+                    self.buffer.append(jpeg)
+                    self.frames_received += 1
+                    self.last_frame_time = time.time()
+                    self.frame_shape = reader.last_shape
+                    self._publish_jpeg(jpeg)
+                
+            except ValueError as e:
+                log.warning(f"⚠️ {self.name}: {e}, falling back to OpenCV decode")
+                self.passthrough = False
+                self.buffer.clear()
+                return
+            except Exception as e:
+                log.warning(f"❌ {self.name}: MJPEG stream lost ({e}), reconnecting...")
+            
+            self.is_connected = False
+            if not self._stop.is_set():
+                time.sleep(1)
+        
+        log.info(f"🏁 {self.name}: Reader stopped")
+    
+    def _encode(self, frame):
+        """Encode une frame en JPEG, retourne les bytes ou None"""
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return None
+        
+        now = time.time()
+        self.frames_encoded += 1
+        self._encode_times.append(now)
+        while self._encode_times and now - self._encode_times[0] > ENCODE_RATE_WINDOW:
+            self._encode_times.popleft()
+        
+        return jpeg.tobytes()
+    
+    def _publish_frame(self, frame):
+        """
+        Encode la frame une seule fois et la publie dans le slot partagé
+        Pas d'encodage si aucun viewer n'est connecté
+        """
+        if self._viewers == 0:
+            return
+        
+        data = self._encode(frame)
+        if data is None:
+            return
+        
+        self._publish_jpeg(data)
+    
+    def _publish_jpeg(self, data):
+        """Publie des octets JPEG dans le slot partagé et réveille les viewers"""
+        with self._frame_cond:
+            self._jpeg = data
+            self._seq += 1
+            self._frame_cond.notify_all()
+    
+    def _wait_for_frame(self, last_seq, timeout=1.0):
+        """
+        Attend une frame plus récente que last_seq
+        Returns: (seq, jpeg) ou (last_seq, None) si timeout / arrêt
+        """
+        with self._frame_cond:
+            self._frame_cond.wait_for(
+                lambda: self._seq > last_seq or self._stop.is_set(),
+                timeout=timeout
+            )
+            if self._seq > last_seq and self._jpeg is not None:
+                return self._seq, self._jpeg
+        return last_seq, None
+    
     def generate_mjpeg(self):
         """
         Générateur MJPEG pour Flask Response
         Yields: bytes pour stream multipart/x-mixed-replace
         """
-        while True:
-            # Attendre qu'il y ait des frames
-            if len(self.buffer) == 0:
-                time.sleep(0.05)
-                continue
-            
-            # Prendre la dernière frame du buffer
-            frame = self.buffer[-1]
-            
-            # Encoder en JPEG
-            ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
-            if not ok:
-                continue
-            
-            data = jpeg.tobytes()
-            
-            # Format MJPEG
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+        if self.mode == RELAY_MODE_PER_VIEWER:
+            yield from self._generate_per_viewer()
+            return
+        
+        with self._frame_cond:
+            self._viewers += 1
+            last_seq = self._seq
+        
+        # Encoder tout de suite la dernière frame connue pour ne pas
+        # attendre la prochaine capture
+        if self._jpeg is None and len(self.buffer) > 0 and not self.passthrough:
+            self._publish_frame(self.buffer[-1])
+        
+        try:
+            while not self._stop.is_set():
+                seq, data = self._wait_for_frame(last_seq)
+                if data is None:
+                    continue
+                
+                # Frames sautées par ce viewer (client trop lent)
+                if last_seq and seq - last_seq > 1:
+                    self.frames_dropped += seq - last_seq - 1
+                last_seq = seq
+                
+                # Format MJPEG
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+        finally:
+            with self._frame_cond:
+                self._viewers -= 1
+    
+    def _generate_per_viewer(self):
+        """Ancien mode: chaque viewer ré-encode la dernière frame du buffer"""
+        self._viewers += 1
+        try:
+            while True:
+                # Attendre qu'il y ait des frames
+                if len(self.buffer) == 0:
+                    time.sleep(0.05)
+                    continue
+                
+                # Prendre la dernière frame du buffer et l'encoder en JPEG
+                frame = self.buffer[-1]
+                data = frame if self.passthrough else self._encode(frame)
+                if data is None:
+                    continue
+                
+                # Format MJPEG
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + data + b'\r\n')
+        finally:
+            self._viewers -= 1
     
     def get_stats(self):
         """Retourne les stats du relay"""
@@ -164,8 +339,24 @@ class TerrainRelay:
             'reconnections': self.reconnections,
             'buffer_size': len(self.buffer),
             'buffer_max': self.buffer_frames,
-            'last_frame_seconds_ago': uptime
+            'last_frame_seconds_ago': uptime,
+            'mode': self.mode,
+            'passthrough': self.passthrough,
+            'frame_shape': self.frame_shape,
+            'viewers': self._viewers,
+            'frames_encoded': self.frames_encoded,
+            'encodes_per_sec': round(self.get_encode_rate(), 2),
+            'frames_dropped': self.frames_dropped,
+            'sequence': self._seq
         }
+    
+    def get_encode_rate(self):
+        """Encodages JPEG par seconde sur la fenêtre glissante"""
+        now = time.time()
+        recent = [t for t in list(self._encode_times) if now - t <= ENCODE_RATE_WINDOW]
+        if not recent:
+            return 0.0
+        return len(recent) / ENCODE_RATE_WINDOW
 
 
 class RelayManager:
@@ -197,12 +388,16 @@ class RelayManager:
             name = entry.get('name', f'Terrain {tid}')
             src = entry['source_url']
             buf = int(entry.get('buffer_frames', 120))
+            mode = entry.get('relay_mode', cfg.get('relay_mode', RELAY_MODE_SHARED))
+            passthrough = bool(entry.get('passthrough', cfg.get('passthrough', True)))
             
             relay = TerrainRelay(
                 terrain_id=tid,
                 name=name,
                 source_url=src,
-                buffer_frames=buf
+                buffer_frames=buf,
+                mode=mode,
+                passthrough=passthrough
             )
             
             self.relays[tid] = relay
@@ -259,7 +454,8 @@ def index():
         <li>
             <strong>{stat['name']}</strong> ({status})<br>
             Stream: <a href="/video/{tid}">http://localhost:8000/video/{tid}</a><br>
-            Frames: {stat['frames_received']}, Buffer: {stat['buffer_size']}/{stat['buffer_max']}
+            Frames: {stat['frames_received']}, Buffer: {stat['buffer_size']}/{stat['buffer_max']}<br>
+            Viewers: {stat['viewers']}, Encodes/s: {stat['encodes_per_sec']}, Dropped: {stat['frames_dropped']}
         </li>
         """
     
@@ -0,0 +1,161 @@
+"""
+Compteurs de notifications par utilisateur (total / non lues)
+
+Le frontend interroge la liste des notifications en continu: au lieu de deux
+COUNT(*) par appel, les compteurs sont gardés dans Redis (hash
+notif:counts:<user_id>) et maintenus de façon incrémentale:
+
+- création / passage en lu / suppression d'une Notification: les deltas sont
+  accumulés pendant le flush (événements mapper) puis appliqués à Redis
+  seulement après le commit (rien n'est appliqué en cas de rollback)
+- UPDATE/DELETE en masse (query.update): l'appelant enregistre le delta avec
+  record_delta()
+- clé absente: recalcul en une requête puis remplissage (TTL)
+- sans Redis: une seule requête d'agrégat sur la base
+"""
+
+import logging
+import os
+from typing import Dict, Tuple
+
+from sqlalchemy import case, event, func, inspect
+
+from ..models.database import db, on_commit, register_on_commit
+from ..models.notification import Notification
+from .redis_client import ScriptCache, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+COUNTER_TTL_SECONDS = int(os.environ.get('NOTIFICATION_COUNTER_TTL', '86400'))
+SESSION_KEY = 'notification_counter_deltas'
+
+# Delta appliqué seulement si le compteur existe (sinon il sera recalculé)
+_APPLY_DELTA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HINCRBY', KEYS[1], 'total', ARGV[1])
+    redis.call('HINCRBY', KEYS[1], 'unread', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Remplissage sans écraser un compteur créé entre-temps
+_FILL = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], 'total', ARGV[1], 'unread', ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return redis.call('HMGET', KEYS[1], 'total', 'unread')
+"""
+
+
+def counter_key(user_id) -> str:
+    return f"notif:counts:{user_id}"
+
+
+class NotificationCounters:
+    """Compteurs total / non lues par utilisateur (Redis, fallback base)"""
+
+    def __init__(self, ttl: int = COUNTER_TTL_SECONDS):
+        self.ttl = ttl
+        self._scripts = ScriptCache()
+
+    def count_from_db(self, user_id) -> Dict[str, int]:
+        """Total et non lues en une seule requête"""
+        total, unread = db.session.query(
+            func.count(Notification.id),
+            func.coalesce(func.sum(case((Notification.is_read.is_(False), 1), else_=0)), 0)
+        ).filter(Notification.user_id == user_id).one()
+        return {'total': int(total), 'unread': int(unread)}
+
+    def get(self, user_id) -> Dict[str, int]:
+        client = get_redis_client()
+        if client is None:
+            return self.count_from_db(user_id)
+
+        key = counter_key(user_id)
+        try:
+            total, unread = client.hmget(key, 'total', 'unread')
+            if total is not None and unread is not None:
+                return {'total': max(0, int(total)), 'unread': max(0, int(unread))}
+        except Exception as e:
+            logger.warning(f"⚠️ Lecture compteurs notifications {user_id}: {e}")
+            return self.count_from_db(user_id)
+
+        counts = self.count_from_db(user_id)
+        try:
+            total, unread = self._scripts.get(client, _FILL)(
+                keys=[key], args=[counts['total'], counts['unread'], self.ttl])
+            return {'total': int(total), 'unread': int(unread)}
+        except Exception as e:
+            logger.warning(f"⚠️ Remplissage compteurs notifications {user_id}: {e}")
+            return counts
+
+    def apply(self, deltas: Dict[int, Tuple[int, int]]):
+        """Appliquer {user_id: (delta_total, delta_unread)} (après commit)"""
+        deltas = {user_id: d for user_id, d in deltas.items() if d != (0, 0)}
+        if not deltas:
+            return
+        client = get_redis_client()
+        if client is None:
+            return
+        script = self._scripts.get(client, _APPLY_DELTA)
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id, (total, unread) in deltas.items():
+                script(keys=[counter_key(user_id)], args=[total, unread, self.ttl], client=pipe)
+            pipe.execute()
+        except Exception as e:
+            # Compteurs incertains: les supprimer pour forcer un recalcul
+            logger.warning(f"⚠️ Mise à jour compteurs notifications: {e}")
+            self.invalidate(*deltas)
+
+    def invalidate(self, *user_ids):
+        client = get_redis_client()
+        if client is None or not user_ids:
+            return
+        try:
+            client.delete(*(counter_key(user_id) for user_id in user_ids))
+        except Exception as e:
+            logger.warning(f"⚠️ Invalidation compteurs notifications: {e}")
+
+
+notification_counters = NotificationCounters()
+
+
+def record_delta(session, user_id, total: int = 0, unread: int = 0):
+    """Enregistrer un delta à appliquer au prochain commit de `session`"""
+    on_commit(session, SESSION_KEY, (user_id, total, unread))
+
+
+def _apply_deltas(items):
+    deltas = {}
+    for user_id, total, unread in items:
+        current = deltas.get(user_id, (0, 0))
+        deltas[user_id] = (current[0] + total, current[1] + unread)
+    notification_counters.apply(deltas)
+
+
+register_on_commit(SESSION_KEY, _apply_deltas)
+
+
+@event.listens_for(Notification, 'after_insert')
+def _on_insert(mapper, connection, target):
+    record_delta(inspect(target).session, target.user_id, total=1, unread=0 if target.is_read else 1)
+
+
+@event.listens_for(Notification, 'after_update')
+def _on_update(mapper, connection, target):
+    history = inspect(target).attrs.is_read.history
+    if not history.has_changes():
+        return
+    was_read = bool(history.deleted[0]) if history.deleted else False
+    if was_read != bool(target.is_read):
+        record_delta(inspect(target).session, target.user_id, unread=1 if was_read else -1)
+
+
+@event.listens_for(Notification, 'after_delete')
+def _on_delete(mapper, connection, target):
+    record_delta(inspect(target).session, target.user_id, total=-1, unread=0 if target.is_read else -1)
+
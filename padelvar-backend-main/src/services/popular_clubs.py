@@ -0,0 +1,119 @@
+"""
+Classement des clubs populaires (recommandations du dashboard joueur)
+
+Le dashboard parcourait tous les clubs à chaque chargement (COUNT des
+abonnés et chargement des terrains par club). Le classement est maintenant
+précalculé:
+
+- calcul: une requête d'agrégat (abonnés, terrains par club) + overlays des
+  clubs retenus chargés en une requête (selectinload)
+- stockage: JSON dans Redis (partagé entre workers) + copie locale par
+  processus pendant REFRESH_SECONDS
+- rafraîchissement: tâche Celery refresh_popular_clubs (beat), ou recalcul à
+  la demande si le classement est absent ou périmé
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import selectinload
+
+from ..models.database import db
+from ..models.user import Club, Court, player_club_follows
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY = 'padelvar:popular_clubs'
+RANKING_SIZE = int(os.environ.get('POPULAR_CLUBS_SIZE', '50'))
+REFRESH_SECONDS = int(os.environ.get('POPULAR_CLUBS_REFRESH_SECONDS', '600'))
+
+
+class PopularClubsRanking:
+    """Top des clubs actifs par nombre d'abonnés"""
+
+    def __init__(self, size: int = RANKING_SIZE, max_age: int = REFRESH_SECONDS):
+        self.size = size
+        self.max_age = max_age
+        self._clubs: List[Dict] = []
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def compute(self) -> List[Dict]:
+        """Classement calculé en base (2 requêtes quel que soit le nombre de clubs)"""
+        followers = db.session.query(
+            player_club_follows.c.club_id.label('club_id'),
+            func.count().label('followers_count')
+        ).group_by(player_club_follows.c.club_id).subquery()
+        courts = db.session.query(
+            Court.club_id.label('club_id'),
+            func.count(Court.id).label('courts_count')
+        ).group_by(Court.club_id).subquery()
+
+        followers_count = func.coalesce(followers.c.followers_count, 0)
+        courts_count = func.coalesce(courts.c.courts_count, 0)
+        rows = db.session.query(Club, followers_count, courts_count) \
+            .outerjoin(followers, followers.c.club_id == Club.id) \
+            .outerjoin(courts, courts.c.club_id == Club.id) \
+            .filter(or_(followers_count > 0, courts_count > 0)) \
+            .order_by(followers_count.desc(), Club.id) \
+            .options(selectinload(Club.overlays)) \
+            .limit(self.size).all()
+
+        ranking = []
+        for club, club_followers, club_courts in rows:
+            club_dict = club.to_dict()
+            club_dict['followers_count'] = int(club_followers)
+            club_dict['courts_count'] = int(club_courts)
+            ranking.append(club_dict)
+        return ranking
+
+    def refresh(self) -> List[Dict]:
+        """Recalcule et publie le classement (tâche beat ou cache périmé)"""
+        ranking = self.compute()
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.set(REDIS_KEY, json.dumps(ranking), ex=self.max_age * 2)
+            except Exception as e:
+                logger.warning(f"⚠️ Classement des clubs non publié dans Redis: {e}")
+        with self._lock:
+            self._clubs, self._loaded_at = ranking, time.monotonic()
+        logger.info(f"🏆 Classement des clubs populaires rafraîchi ({len(ranking)} clubs)")
+        return ranking
+
+    def get(self) -> List[Dict]:
+        """Classement courant: copie locale, puis Redis, sinon recalcul"""
+        with self._lock:
+            if self._loaded_at and time.monotonic() - self._loaded_at < self.max_age:
+                return self._clubs
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                cached = client.get(REDIS_KEY)
+                if cached:
+                    ranking = json.loads(cached)
+                    with self._lock:
+                        self._clubs, self._loaded_at = ranking, time.monotonic()
+                    return ranking
+            except Exception as e:
+                logger.warning(f"⚠️ Lecture du classement des clubs impossible: {e}")
+        return self.refresh()
+
+    def recommend(self, exclude_ids, limit: int = 5) -> List[Dict]:
+        """Clubs populaires non suivis par le joueur"""
+        exclude_ids = set(exclude_ids)
+        return [club for club in self.get() if club['id'] not in exclude_ids][:limit]
+
+    def invalidate(self):
+        with self._lock:
+            self._clubs, self._loaded_at = [], 0.0
+
+
+popular_clubs = PopularClubsRanking()
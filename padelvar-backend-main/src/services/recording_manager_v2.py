@@ -13,11 +13,14 @@ import signal
 import platform
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
 
 # Import configuration
 from ..recording_config.recording_config import config
+from .recording_state import recording_registry
+from .segment_uploader import BunnyEdgeStorage, SegmentStreamUploader
 
 # Configuration du logger
 logging.basicConfig(level=logging.INFO)
@@ -44,13 +47,20 @@ class RecordingInfo:
     start_time: datetime
     expected_end_time: datetime
     
-    status: str  # 'recording', 'stopping', 'stopped', 'failed'
+    status: str  # 'recording', 'stopping', 'finalizing', 'stopped', 'failed'
     
     segments_written: List[Path]
     final_video_path: Optional[Path]
     
     errors: List[str]
     
+    # Mode segments HLS (upload continu pendant le match)
+    playlist_path: Optional[Path] = None
+    segment_uploader: Optional[SegmentStreamUploader] = None
+    playback_url: Optional[str] = None
+    # Appelé (thread de finalisation) dès que la playlist HLS est publiée
+    on_playback_ready: Optional[Callable[['RecordingInfo'], None]] = None
+    
     def to_dict(self) -> dict:
         """Convertir en dictionnaire (pour JSON)"""
         # Manually build dict to avoid serializing non-picklable objects
@@ -72,7 +82,9 @@ class RecordingInfo:
             'final_video_path': (
                 str(self.final_video_path)
                 if self.final_video_path else None
-            )
+            ),
+            'segment_mode': self.playlist_path is not None,
+            'playback_url': self.playback_url
         }
 
 class RecordingManager:
@@ -84,10 +96,34 @@ class RecordingManager:
     def __init__(self):
         self.recordings: Dict[str, RecordingInfo] = {}
         self.monitor_thread = None
+        self.monitoring = False
         self.lock = threading.Lock()
         
+        # Relay vidéo externe (multi_relay_server.py) par défaut: aucun
+        # proxy à arrêter, sauf gestionnaire injecté
+        self.proxy_manager = None
+        
+        # Upload continu des segments (pool partagé, créé à la demande)
+        self.segment_storage: Optional[BunnyEdgeStorage] = None
+        self.segment_executor: Optional[ThreadPoolExecutor] = None
+        
         logger.info("🎬 RecordingManager initialisé")
     
+    def _segment_streaming_enabled(self) -> bool:
+        """Mode segments actif si configuré et stockage Bunny disponible"""
+        if not config.SEGMENT_STREAMING_UPLOAD:
+            return False
+        if self.segment_storage is None:
+            self.segment_storage = BunnyEdgeStorage()
+            self.segment_executor = ThreadPoolExecutor(
+                max_workers=config.SEGMENT_UPLOAD_WORKERS,
+                thread_name_prefix="SegmentUpload"
+            )
+        if not self.segment_storage.is_configured():
+            logger.warning("⚠️ Bunny Storage non configuré - enregistrement en fichier unique")
+            return False
+        return True
+    
     def _log_ffmpeg_output(self, process: subprocess.Popen, recording_id: str):
         """Lire et logger la sortie stderr de FFmpeg en temps réel"""
         try:
@@ -117,7 +153,8 @@ class RecordingManager:
         club_id: int,
         user_id: int,
         camera_url: str,
-        duration_seconds: int
+        duration_seconds: int,
+        stream_url: Optional[str] = None
     ) -> Tuple[bool, str, Optional[dict]]:
         """
         Démarrer un enregistrement avec segmentation
@@ -130,6 +167,8 @@ class RecordingManager:
             user_id: ID de l'utilisateur
             camera_url: URL de la caméra IP
             duration_seconds: Durée en secondes
+            stream_url: Flux d'entrée FFmpeg (proxy de la session vidéo);
+                par défaut le relay local multi_relay_server.py
         
         Returns:
             (success: bool, message: str, recording_info: dict ou None)
@@ -171,42 +210,53 @@ class RecordingManager:
                 logger.error(f"❌ {msg}")
                 return False, msg, None
         
-        # 2. Utiliser le relay local pour flux stable
+        # Réservation partagée du terrain (déjà faite par la route le cas échéant)
+        if not recording_registry.claim_court(terrain_id, recording_id,
+                                              club_id=club_id, user_id=user_id):
+            msg = f"Terrain {terrain_id} déjà en cours d'enregistrement"
+            logger.error(f"❌ {msg}")
+            return False, msg, None
+        
+        # 2. Flux d'entrée: proxy de la session (/v3/start) ou relay local
         # Le serveur multi_relay_server.py doit être en cours d'exécution
         # Il sert les streams sur http://127.0.0.1:8000/video/<terrain_id>
         
-        relay_url = f"http://127.0.0.1:8000/video/{terrain_id}"
+        relay_url = stream_url or f"http://127.0.0.1:8000/video/{terrain_id}"
         
-        logger.info(
-            f"🎥 Utilisation du relay MJPEG pour terrain {terrain_id}"
-        )
+        if stream_url:
+            logger.info(f"🎥 Utilisation du proxy de session pour terrain {terrain_id}")
+        else:
+            logger.info(
+                f"🎥 Utilisation du relay MJPEG pour terrain {terrain_id}"
+            )
         logger.info(f"📡 Relay URL: {relay_url}")
         logger.info(f"📹 Source caméra: {camera_url}")
         
         # Vérifier (optionnel) si le relay est accessible
-        try:
-            import requests
-            response = requests.get(
-                f"http://127.0.0.1:8000/api/stats/{terrain_id}",
-                timeout=2
-            )
-            if response.ok:
-                stats = response.json()
-                logger.info(
-                    f"✅ Relay actif - "
-                    f"Connecté: {stats.get('connected')}, "
-                    f"Frames: {stats.get('frames_received', 0)}"
+        if not stream_url:
+            try:
+                import requests
+                response = requests.get(
+                    f"http://127.0.0.1:8000/api/stats/{terrain_id}",
+                    timeout=2
                 )
-            else:
+                if response.ok:
+                    stats = response.json()
+                    logger.info(
+                        f"✅ Relay actif - "
+                        f"Connecté: {stats.get('connected')}, "
+                        f"Frames: {stats.get('frames_received', 0)}"
+                    )
+                else:
+                    logger.warning(
+                        f"⚠️ Relay non accessible - "
+                        f"Assurez-vous que multi_relay_server.py est démarré"
+                    )
+            except Exception as e:
                 logger.warning(
-                    f"⚠️ Relay non accessible - "
-                    f"Assurez-vous que multi_relay_server.py est démarré"
+                    f"⚠️ Impossible de vérifier relay status: {e} - "
+                    f"FFmpeg va quand même essayer de se connecter"
                 )
-        except Exception as e:
-            logger.warning(
-                f"⚠️ Impossible de vérifier relay status: {e} - "
-                f"FFmpeg va quand même essayer de se connecter"
-            )
         
         # 3. Préparer les dossiers
         
@@ -222,7 +272,12 @@ class RecordingManager:
         # 4. Construire la commande FFmpeg avec relay URL
         stream_url = relay_url  # Utiliser relay au lieu de camera directe
         
-        cmd, output_file = self._build_direct_command(
+        segment_mode = self._segment_streaming_enabled()
+        build_command = (
+            self._build_segment_command if segment_mode
+            else self._build_direct_command
+        )
+        cmd, output_file = build_command(
             stream_url,
             tmp_dir,
             recording_id,
@@ -266,7 +321,9 @@ class RecordingManager:
         except Exception as e:
             msg = f"Erreur lancement FFmpeg: {e}"
             logger.error(f"❌ {msg}")
-            self.proxy_manager.stop_proxy(terrain_id)
+            recording_registry.release_court(terrain_id, recording_id)
+            if self.proxy_manager is not None:
+                self.proxy_manager.stop_proxy(terrain_id)
             return False, msg, None
         
         # 6. Créer RecordingInfo
@@ -296,6 +353,17 @@ class RecordingManager:
             errors=[]
         )
         
+        # Mode segments: chaque segment fermé part immédiatement vers Bunny
+        if segment_mode:
+            recording_info.playlist_path = Path(output_file)
+            recording_info.segment_uploader = SegmentStreamUploader(
+                playlist_path=Path(output_file),
+                remote_dir=f"matches/{club_id}/{recording_id}",
+                storage=self.segment_storage,
+                executor=self.segment_executor,
+                on_segment=recording_info.segments_written.append
+            ).start()
+        
         # 7. Enregistrer
         
         with self.lock:
@@ -356,6 +424,57 @@ class RecordingManager:
         
         return cmd, output_file
     
+    def _build_segment_command(
+        self,
+        proxy_url: str,
+        tmp_dir: Path,
+        recording_id: str,
+        duration_seconds: int
+    ) -> Tuple[List[str], str]:
+        """
+        Construire commande FFmpeg en segments HLS de durée fixe
+        
+        Un keyframe est forcé à chaque frontière: les segments sont
+        lisibles indépendamment et concaténables sans réencodage.
+        
+        Returns:
+            (command: List[str], playlist_file: str)
+        """
+        playlist_file = str(tmp_dir / f"{recording_id}.m3u8")
+        segment_pattern = str(tmp_dir / f"segment_{recording_id}_%05d.ts")
+        segment_time = config.SEGMENT_DURATION_SECONDS
+        
+        cmd = [
+            str(config.FFMPEG_PATH),
+            "-hide_banner",
+            "-loglevel", "info"
+        ]
+        
+        if proxy_url.startswith("rtsp"):
+            cmd.extend(["-rtsp_transport", "tcp"])
+        
+        cmd.extend([
+            "-i", proxy_url,
+            "-t", str(duration_seconds),
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", "23",
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_time})",
+            "-an",
+            
+            # HLS: un segment n'apparaît dans la playlist qu'une fois fermé
+            "-f", "hls",
+            "-hls_time", str(segment_time),
+            "-hls_list_size", "0",
+            "-hls_playlist_type", "event",
+            "-hls_flags", "independent_segments+temp_file",
+            "-hls_segment_filename", segment_pattern,
+            "-y",
+            playlist_file
+        ])
+        
+        return cmd, playlist_file
+    
     def _build_single_command(
         self,
         proxy_url: str,
@@ -414,7 +533,9 @@ class RecordingManager:
     def stop_recording(
         self,
         recording_id: str,
-        reason: str = "manual"
+        reason: str = "manual",
+        wait: bool = True,
+        on_playback_ready: Optional[Callable[[RecordingInfo], None]] = None
     ) -> Tuple[bool, str]:
         """
         Arrêter un enregistrement proprement
@@ -422,6 +543,10 @@ class RecordingManager:
         Args:
             recording_id: ID de l'enregistrement
             reason: Raison (manual, timeout, error)
+            wait: False = rendre la main après l'arrêt de FFmpeg, la
+                finalisation (playlist, concaténation) continue en arrière-plan
+            on_playback_ready: Callback(recording) dès la publication de la
+                playlist HLS (mode segments)
         
         Returns:
             (success: bool, message: str)
@@ -441,6 +566,7 @@ class RecordingManager:
         
         # Marquer comme en cours d'arrêt
         recording.status = 'stopping'
+        recording.on_playback_ready = on_playback_ready
         
         # 1. Envoyer signal d'arrêt gracieux à FFmpeg
         logger.info("📤 Arrêt FFmpeg...")
@@ -451,13 +577,42 @@ class RecordingManager:
                 "Arrêt forcé du processus FFmpeg"
             )
         
+        # Capture terminée: le terrain est libre pendant la finalisation
+        recording_registry.release_court(recording.terrain_id, recording_id)
+        
+        if not wait:
+            recording.status = 'finalizing'
+            
+            def finalize():
+                try:
+                    self._complete_stop(recording)
+                except Exception as e:
+                    msg = f"Erreur finalisation: {e}"
+                    logger.error(f"❌ {msg} ({recording_id})")
+                    recording.errors.append(msg)
+                    recording.status = 'failed'
+            
+            # Thread non daemon: un arrêt du worker attend la fin de la finalisation
+            threading.Thread(target=finalize, name=f"Finalize-{recording_id}").start()
+            return True, "Enregistrement arrêté, finalisation en cours"
+        
+        return self._complete_stop(recording)
+    
+    def _complete_stop(
+        self,
+        recording: RecordingInfo
+    ) -> Tuple[bool, str]:
+        """Finaliser puis libérer le proxy (étapes 2 et 3 de l'arrêt)"""
+        recording_id = recording.recording_id
+        
         # 2. Finaliser l'enregistrement (attendre fichier)
         logger.info("🔄 Finalisation...")
         finalize_success = self._finalize_recording(recording)
         
         # 3. Arrêter le proxy APRÈS (comme camera-recorder)
-        logger.info("🛑 Arrêt proxy...")
-        self.proxy_manager.stop_proxy(recording.terrain_id)
+        if self.proxy_manager is not None:
+            logger.info("🛑 Arrêt proxy...")
+            self.proxy_manager.stop_proxy(recording.terrain_id)
         
         if finalize_success:
             recording.status = 'stopped'
@@ -558,6 +713,9 @@ class RecordingManager:
             f"🔄 Finalisation enregistrement {recording.recording_id}"
         )
         
+        if recording.playlist_path is not None:
+            return self._finalize_segmented_recording(recording)
+        
         try:
             # 1. Trouver le fichier MP4 de sortie dans tmp/
             tmp_file = recording.tmp_dir / f"{recording.recording_id}.mp4"
@@ -633,13 +791,68 @@ class RecordingManager:
             recording.errors.append(msg)
             return False
     
+    def _finalize_segmented_recording(
+        self,
+        recording: RecordingInfo
+    ) -> bool:
+        """
+        Finaliser un enregistrement en segments:
+        - Envoyer le dernier segment et publier la playlist HLS (lecture possible)
+        - Concaténer localement les segments (-c copy) vers final/
+        - Nettoyer
+        
+        Returns:
+            success: bool
+        """
+        started = time.perf_counter()
+        
+        try:
+            result = recording.segment_uploader.finish()
+            if result['success']:
+                recording.playback_url = result['playlist_url']
+                logger.info(
+                    f"▶️ Lecture disponible {time.perf_counter() - started:.1f}s "
+                    f"après l'arrêt: {recording.playback_url}"
+                )
+                # Avant la concaténation locale: la vidéo est jouable tout de suite
+                if recording.on_playback_ready:
+                    recording.on_playback_ready(recording)
+            else:
+                recording.errors.append(
+                    f"Segments non envoyés: {result['failed']}"
+                )
+        except Exception as e:
+            msg = f"Erreur publication segments: {e}"
+            logger.error(f"❌ {msg}")
+            recording.errors.append(msg)
+        
+        # Copie locale complète (archive, clips, upload Bunny Stream éventuel)
+        segments = self._find_segments(recording)
+        if not segments:
+            msg = f"Aucun segment trouvé pour {recording.recording_id}"
+            logger.error(f"❌ {msg}")
+            recording.errors.append(msg)
+            return recording.playback_url is not None
+        
+        final_path = self._concatenate_segments(segments, recording)
+        if final_path:
+            recording.final_video_path = str(final_path)
+            self._cleanup_tmp_files(recording)
+        else:
+            recording.errors.append("Échec concaténation des segments")
+        
+        return final_path is not None or recording.playback_url is not None
+    
     def _find_segments(
         self,
         recording: RecordingInfo
     ) -> List[Path]:
-        """Trouver tous les segments d'un enregistrement"""
-        pattern = f"segment_{recording.recording_id}_*.mp4"
-        segments = sorted(recording.tmp_dir.glob(pattern))
+        """Trouver tous les segments d'un enregistrement (MP4 ou TS/HLS)"""
+        pattern = f"segment_{recording.recording_id}_*"
+        segments = sorted(
+            p for p in recording.tmp_dir.glob(pattern)
+            if p.suffix in ('.mp4', '.ts')
+        )
         return segments
     
     def _validate_segments(
@@ -803,10 +1016,11 @@ class RecordingManager:
     def _cleanup_tmp_files(self, recording: RecordingInfo):
         """Nettoyer les fichiers temporaires"""
         try:
-            # Supprimer segments originaux
-            for segment in recording.tmp_dir.glob(
-                f"segment_{recording.recording_id}_*.mp4"
-            ):
+            # Supprimer segments originaux (et playlists HLS locales)
+            for segment in [
+                *self._find_segments(recording),
+                *recording.tmp_dir.glob(f"{recording.recording_id}*.m3u8")
+            ]:
                 try:
                     segment.unlink()
                     logger.debug(f"🗑️ Supprimé: {segment.name}")
@@ -886,6 +1100,13 @@ class RecordingManager:
                             reason="timeout"
                         )
                         continue
+                    
+                    # Prolonger la réservation du terrain (TTL du registre)
+                    if not recording_registry.heartbeat(recording.terrain_id, recording_id):
+                        logger.warning(
+                            f"⚠️ Réservation du terrain {recording.terrain_id} "
+                            f"perdue pour {recording_id}"
+                        )
                 
                 # Pause
                 time.sleep(config.PROCESS_CHECK_INTERVAL)
@@ -1,129 +1,297 @@
 """
-Gestionnaire d'état partagé pour les enregistrements actifs
-Permet de partager l'état entre différents modules
+Registre partagé des terrains en cours d'enregistrement
+
+Remplace les dictionnaires propres à chaque processus: sous gunicorn, tous
+les workers et l'enregistreur voient le même état "ce terrain est-il pris ?".
+
+- claim_court(): réservation atomique d'un terrain; échoue s'il est déjà
+  réservé par un autre enregistrement (idempotent pour le même recording_id)
+- heartbeat(): prolonge la réservation tant que l'enregistreur tourne; si le
+  processus meurt, le terrain est libéré à l'expiration du TTL
+- release_court(): libération par le détenteur (ou forcée sans recording_id)
+- lectures (is_court_recording, get_courts, ...): cache local de
+  CACHE_SECONDS, mis à jour immédiatement par les écritures du processus
+
+Stockage: hashes Redis si disponible, sinon fichier SQLite en mode WAL
+partagé par tous les processus de la machine (RECORDING_REGISTRY_PATH).
 """
 
-from typing import Dict, Optional
-from datetime import datetime
+import json
 import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from .redis_client import get_redis_client
 
 logger = logging.getLogger(__name__)
 
-# État global partagé des enregistrements
-_active_recordings: Dict[int, Dict] = {}  # court_id -> recording_session
-_recording_sessions: Dict[str, Dict] = {}  # recording_id -> recording_session
-
-class RecordingStateManager:
-    """Gestionnaire centralisé de l'état des enregistrements"""
-    
-    @staticmethod
-    def add_recording(court_id: int, recording_session: Dict) -> None:
-        """Ajouter un enregistrement actif"""
-        global _active_recordings, _recording_sessions
-        
-        recording_id = recording_session.get('recording_id')
-        _active_recordings[court_id] = recording_session
-        _recording_sessions[recording_id] = recording_session
-        
-        logger.info(f"📝 Recording added: {recording_id} on court {court_id}")
-        logger.info(f"📊 Total active recordings: {len(_active_recordings)}")
-    
-    @staticmethod
-    def remove_recording(court_id: int = None, recording_id: str = None) -> Optional[Dict]:
-        """Supprimer un enregistrement actif"""
-        global _active_recordings, _recording_sessions
-        
-        session = None
-        
-        # Chercher par court_id ou recording_id
-        if court_id and court_id in _active_recordings:
-            session = _active_recordings.pop(court_id)
-            recording_id = session.get('recording_id')
-        elif recording_id and recording_id in _recording_sessions:
-            session = _recording_sessions[recording_id]
-            court_id = session.get('court_id')
-            if court_id in _active_recordings:
-                _active_recordings.pop(court_id)
-        
-        # Supprimer de recording_sessions
-        if recording_id and recording_id in _recording_sessions:
-            _recording_sessions.pop(recording_id)
-        
-        if session:
-            logger.info(f"🗑️ Recording removed: {recording_id} from court {court_id}")
-            logger.info(f"📊 Total active recordings: {len(_active_recordings)}")
-        
-        return session
-    
-    @staticmethod
-    def is_court_recording(court_id: int) -> bool:
-        """Vérifier si un terrain est en cours d'enregistrement"""
-        return court_id in _active_recordings
-    
-    @staticmethod
-    def get_court_recording(court_id: int) -> Optional[Dict]:
-        """Récupérer l'enregistrement actif d'un terrain"""
-        return _active_recordings.get(court_id)
-    
-    @staticmethod
-    def get_recording_by_id(recording_id: str) -> Optional[Dict]:
-        """Récupérer un enregistrement par son ID"""
-        return _recording_sessions.get(recording_id)
-    
-    @staticmethod
-    def get_all_active_recordings() -> Dict[int, Dict]:
-        """Récupérer tous les enregistrements actifs"""
-        return _active_recordings.copy()
-    
-    @staticmethod
-    def get_all_recording_sessions() -> Dict[str, Dict]:
-        """Récupérer toutes les sessions d'enregistrement"""
-        return _recording_sessions.copy()
-    
-    @staticmethod
-    def cleanup_expired_recordings(max_age_hours: int = 24) -> int:
-        """Nettoyer les enregistrements expirés"""
-        global _recording_sessions
-        
-        cutoff_time = datetime.utcnow().timestamp() - (max_age_hours * 3600)
-        expired_sessions = []
-        
-        for recording_id, session in _recording_sessions.items():
-            if session.get('status') == 'stopped':
-                try:
-                    end_time_str = session.get('end_time')
-                    if end_time_str:
-                        end_time = datetime.fromisoformat(end_time_str.replace('Z', '+00:00'))
-                        if end_time.timestamp() < cutoff_time:
-                            expired_sessions.append(recording_id)
-                except Exception:
-                    pass
-        
-        # Supprimer les sessions expirées
-        for recording_id in expired_sessions:
-            if recording_id in _recording_sessions:
-                session = _recording_sessions.pop(recording_id)
-                court_id = session.get('court_id')
-                if court_id in _active_recordings:
-                    _active_recordings.pop(court_id)
-        
-        if expired_sessions:
-            logger.info(f"🧹 Cleaned up {len(expired_sessions)} expired recordings")
-        
-        return len(expired_sessions)
-    
-    @staticmethod
-    def get_stats() -> Dict:
-        """Obtenir les statistiques des enregistrements"""
-        total_sessions = len(_recording_sessions)
-        active_count = len(_active_recordings)
-        stopped_count = len([s for s in _recording_sessions.values() if s.get('status') == 'stopped'])
-        
-        return {
-            'total_sessions': total_sessions,
-            'active_recordings': active_count,
-            'stopped_recordings': stopped_count
+COURT_PREFIX = 'recording:court:'
+RECORDING_PREFIX = 'recording:id:'
+COURTS_KEY = 'recording:courts'
+
+HEARTBEAT_TTL_SECONDS = int(os.environ.get('RECORDING_HEARTBEAT_TTL', '90'))
+HEARTBEAT_INTERVAL_SECONDS = HEARTBEAT_TTL_SECONDS / 3
+CACHE_SECONDS = float(os.environ.get('RECORDING_REGISTRY_CACHE_SECONDS', '1'))
+REGISTRY_PATH = os.environ.get(
+    'RECORDING_REGISTRY_PATH', os.path.join(tempfile.gettempdir(), 'padelvar_recording_registry.db'))
+
+# Réservation: libre, ou déjà détenue par le même enregistrement (TTL renouvelé)
+_CLAIM_SCRIPT = """
+local holder = redis.call('HGET', KEYS[1], 'recording_id')
+if holder and holder ~= ARGV[1] then return 0 end
+redis.call('HSET', KEYS[1], 'recording_id', ARGV[1], 'data', ARGV[2])
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+redis.call('SET', KEYS[2], ARGV[4], 'PX', ARGV[3])
+redis.call('SADD', KEYS[3], ARGV[4])
+return 1
+"""
+
+_HEARTBEAT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'recording_id') ~= ARGV[1] then return 0 end
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+redis.call('PEXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# ARGV[1] vide: libération forcée quel que soit le détenteur
+_RELEASE_SCRIPT = """
+local holder = redis.call('HGET', KEYS[1], 'recording_id')
+if not holder or (ARGV[1] ~= '' and holder ~= ARGV[1]) then return 0 end
+redis.call('DEL', KEYS[1], ARGV[3] .. holder)
+redis.call('SREM', KEYS[2], ARGV[2])
+return 1
+"""
+
+
+class RedisRegistryStore:
+    """Un hash par terrain réservé (recording_id, data) + index recording_id -> terrain"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def claim(self, court_id: int, recording_id: str, data: str, ttl: float) -> bool:
+        keys = [COURT_PREFIX + str(court_id), RECORDING_PREFIX + recording_id, COURTS_KEY]
+        return bool(self.client.eval(_CLAIM_SCRIPT, len(keys), *keys,
+                                     recording_id, data, int(ttl * 1000), court_id))
+
+    def heartbeat(self, court_id: int, recording_id: str, ttl: float) -> bool:
+        keys = [COURT_PREFIX + str(court_id), RECORDING_PREFIX + recording_id]
+        return bool(self.client.eval(_HEARTBEAT_SCRIPT, len(keys), *keys, recording_id, int(ttl * 1000)))
+
+    def release(self, court_id: int, recording_id: Optional[str]) -> bool:
+        keys = [COURT_PREFIX + str(court_id), COURTS_KEY]
+        return bool(self.client.eval(_RELEASE_SCRIPT, len(keys), *keys,
+                                     recording_id or '', court_id, RECORDING_PREFIX))
+
+    def get_courts(self, court_ids) -> Dict[int, Optional[str]]:
+        pipe = self.client.pipeline(transaction=False)
+        for court_id in court_ids:
+            pipe.hget(COURT_PREFIX + str(court_id), 'data')
+        return dict(zip(court_ids, pipe.execute()))
+
+    def court_of(self, recording_id: str) -> Optional[int]:
+        court_id = self.client.get(RECORDING_PREFIX + recording_id)
+        return int(court_id) if court_id else None
+
+    def get_all(self) -> Dict[int, str]:
+        court_ids = sorted(int(court_id) for court_id in self.client.smembers(COURTS_KEY))
+        records = self.get_courts(court_ids)
+        expired = [court_id for court_id, data in records.items() if data is None]
+        if expired:
+            self.client.srem(COURTS_KEY, *expired)
+        return {court_id: data for court_id, data in records.items() if data is not None}
+
+
+class SqliteRegistryStore:
+    """Table unique dans un fichier SQLite WAL, une connexion par thread"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS court_recording ('
+                ' court_id INTEGER PRIMARY KEY,'
+                ' recording_id TEXT NOT NULL UNIQUE,'
+                ' data TEXT NOT NULL,'
+                ' expires_at REAL NOT NULL)'
+            )
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def claim(self, court_id: int, recording_id: str, data: str, ttl: float) -> bool:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM court_recording WHERE expires_at <= ? AND (court_id = ? OR recording_id = ?)',
+                         (now, court_id, recording_id))
+            row = conn.execute('SELECT recording_id FROM court_recording WHERE court_id = ?', (court_id,)).fetchone()
+            if row and row[0] != recording_id:
+                return False
+            conn.execute('INSERT OR REPLACE INTO court_recording VALUES (?, ?, ?, ?)',
+                         (court_id, recording_id, data, now + ttl))
+            return True
+
+    def heartbeat(self, court_id: int, recording_id: str, ttl: float) -> bool:
+        now = time.time()
+        cursor = self._conn().execute(
+            'UPDATE court_recording SET expires_at = ? WHERE court_id = ? AND recording_id = ? AND expires_at > ?',
+            (now + ttl, court_id, recording_id, now))
+        return cursor.rowcount == 1
+
+    def release(self, court_id: int, recording_id: Optional[str]) -> bool:
+        if recording_id:
+            cursor = self._conn().execute('DELETE FROM court_recording WHERE court_id = ? AND recording_id = ?',
+                                          (court_id, recording_id))
+        else:
+            cursor = self._conn().execute('DELETE FROM court_recording WHERE court_id = ?', (court_id,))
+        return cursor.rowcount == 1
+
+    def get_courts(self, court_ids) -> Dict[int, Optional[str]]:
+        records = dict.fromkeys(court_ids)
+        if court_ids:
+            placeholders = ','.join('?' * len(court_ids))
+            rows = self._conn().execute(
+                f'SELECT court_id, data FROM court_recording WHERE expires_at > ? AND court_id IN ({placeholders})',
+                (time.time(), *court_ids))
+            records.update(rows)
+        return records
+
+    def court_of(self, recording_id: str) -> Optional[int]:
+        row = self._conn().execute('SELECT court_id FROM court_recording WHERE recording_id = ? AND expires_at > ?',
+                                   (recording_id, time.time())).fetchone()
+        return row[0] if row else None
+
+    def get_all(self) -> Dict[int, str]:
+        rows = self._conn().execute('SELECT court_id, data FROM court_recording WHERE expires_at > ? ORDER BY court_id',
+                                    (time.time(),))
+        return dict(rows)
+
+
+class RecordingRegistry:
+    """Réservations de terrains partagées entre processus, lectures en cache local"""
+
+    def __init__(self, path: str = REGISTRY_PATH, cache_seconds: float = CACHE_SECONDS):
+        self.path = path
+        self.cache_seconds = cache_seconds
+        self._sqlite = None
+        self._cache: Dict[int, tuple] = {}  # court_id -> (lu à, enregistrement ou None)
+        self._lock = threading.Lock()
+
+    def _sqlite_store(self) -> SqliteRegistryStore:
+        if self._sqlite is None or self._sqlite.path != self.path:
+            self._sqlite = SqliteRegistryStore(self.path)
+        return self._sqlite
+
+    def _call(self, method: str, *args):
+        client = get_redis_client()
+        if client is not None:
+            try:
+                return getattr(RedisRegistryStore(client), method)(*args)
+            except Exception as e:
+                logger.warning(f"⚠️ Registre Redis indisponible ({e}), fallback SQLite")
+        return getattr(self._sqlite_store(), method)(*args)
+
+    def _remember(self, court_id: int, record: Optional[Dict]):
+        with self._lock:
+            self._cache[court_id] = (time.monotonic(), record)
+
+    # --- Écritures (toujours sur le stockage partagé) ---
+
+    def claim_court(self, court_id: int, recording_id: str, club_id: int = None, user_id: int = None,
+                    ttl: float = HEARTBEAT_TTL_SECONDS) -> bool:
+        """Réserver un terrain; False s'il est déjà pris par un autre enregistrement"""
+        record = {
+            'recording_id': recording_id, 'court_id': court_id, 'club_id': club_id, 'user_id': user_id,
+            'claimed_at': datetime.utcnow().isoformat(), 'pid': os.getpid(),
         }
+        claimed = self._call('claim', court_id, recording_id, json.dumps(record), ttl)
+        if claimed:
+            self._remember(court_id, record)
+            logger.info(f"📝 Terrain {court_id} réservé par {recording_id}")
+        else:
+            with self._lock:
+                self._cache.pop(court_id, None)
+        return claimed
+
+    def heartbeat(self, court_id: int, recording_id: str, ttl: float = HEARTBEAT_TTL_SECONDS) -> bool:
+        """Prolonger la réservation; False si elle a expiré ou changé de détenteur"""
+        return self._call('heartbeat', court_id, recording_id, ttl)
+
+    def release_court(self, court_id: int, recording_id: str = None) -> bool:
+        """Libérer un terrain (seulement si `recording_id` en est le détenteur, s'il est fourni)"""
+        released = self._call('release', court_id, recording_id)
+        with self._lock:
+            self._cache.pop(court_id, None)
+        if released:
+            logger.info(f"🔓 Terrain {court_id} libéré dans le registre ({recording_id or 'forcé'})")
+        return released
+
+    # --- Lectures ---
+
+    def get_courts(self, court_ids: Iterable[int]) -> Dict[int, Optional[Dict]]:
+        """{court_id: enregistrement actif ou None}, un seul aller-retour pour les absents du cache"""
+        now = time.monotonic()
+        result, missing = {}, []
+        with self._lock:
+            for court_id in court_ids:
+                cached = self._cache.get(court_id)
+                if cached and now - cached[0] < self.cache_seconds:
+                    result[court_id] = cached[1]
+                else:
+                    missing.append(court_id)
+        if missing:
+            for court_id, data in self._call('get_courts', missing).items():
+                record = json.loads(data) if data else None
+                self._remember(court_id, record)
+                result[court_id] = record
+        return result
+
+    def get_court_recording(self, court_id: int) -> Optional[Dict]:
+        return self.get_courts([court_id])[court_id]
+
+    def is_court_recording(self, court_id: int) -> bool:
+        return self.get_court_recording(court_id) is not None
+
+    def get_recording_by_id(self, recording_id: str) -> Optional[Dict]:
+        court_id = self._call('court_of', recording_id)
+        if court_id is None:
+            return None
+        record = self.get_court_recording(court_id)
+        return record if record and record['recording_id'] == recording_id else None
+
+    def get_all_active_recordings(self) -> Dict[int, Dict]:
+        return {court_id: json.loads(data) for court_id, data in self._call('get_all').items()}
+
+    def get_stats(self) -> Dict:
+        return {'active_recordings': len(self.get_all_active_recordings())}
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
 
-# Instance globale du gestionnaire
-recording_state = RecordingStateManager()
\ No newline at end of file
+# Instance globale du registre
+recording_registry = RecordingRegistry()
@@ -0,0 +1,523 @@
+"""
+Superviseur des enregistrements FFmpeg
+
+Une seule boucle (selectors) suit tous les processus FFmpeg en cours au lieu
+d'une tâche Celery bloquée par enregistrement qui interroge la base toutes
+les 5 secondes:
+
+- Fin de processus: notification par pidfd (Linux), sinon un thread waiter
+  par processus qui réveille la boucle
+- Durée maximale: échéancier (heap), aucune attente active
+- Arrêt demandé par un utilisateur/club: message Redis pub/sub sur
+  STOP_CHANNEL (ou appel direct dans le même processus). Le superviseur
+  local écoute aussi STOP_CHANNEL: stop_video_recording peut tourner dans
+  un autre worker Celery. Sans Redis, il relit le statut des sessions en
+  base toutes les STOP_CHECK_INTERVAL secondes
+- Démarrages: file Redis START_QUEUE (survit à un redémarrage du superviseur),
+  utilisée seulement si le superviseur dédié est vivant (clé HEARTBEAT_KEY
+  rafraîchie toutes les HEARTBEAT_INTERVAL secondes); sinon le démarrage se
+  fait dans le superviseur local du processus
+- stderr de FFmpeg vidé dans la même boucle (évite le blocage du pipe)
+
+À la fin d'un enregistrement, `on_finished(event)` est appelé (par défaut:
+tâche Celery finalize_video_recording: upload, base, notifications).
+
+Usage (processus dédié):
+    python -m src.services.recording_supervisor
+"""
+
+import heapq
+import json
+import logging
+import os
+import selectors
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from .redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+STOP_CHANNEL = 'padelvar:recording:stop'
+START_QUEUE = 'padelvar:recording:start'
+HEARTBEAT_KEY = 'padelvar:recording:supervisor'
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TTL = 15
+STOP_CHECK_INTERVAL = 5
+
+# Motifs de fin transmis à on_finished
+REASON_EXITED = 'exited'      # FFmpeg s'est arrêté seul (-t atteint, erreur caméra...)
+REASON_STOPPED = 'stopped'    # Arrêt demandé (utilisateur, club, admin)
+REASON_TIMEOUT = 'timeout'    # Durée maximale dépassée
+REASON_FAILED = 'failed_to_start'
+
+STDERR_TAIL_BYTES = 4096
+# FFmpeg s'arrête seul à -t; l'échéance du superviseur n'est qu'un filet
+TIMEOUT_GRACE_SECONDS = 30
+
+
+@dataclass
+class SupervisedRecording:
+    """Enregistrement suivi par le superviseur"""
+    session_id: str
+    process: subprocess.Popen
+    deadline: Optional[float] = None
+    info: Dict = field(default_factory=dict)
+    started_at: float = field(default_factory=time.time)
+    stop_reason: Optional[str] = None
+    stopped_by: Optional[str] = None
+    stderr_tail: bytes = b''
+    pidfd: Optional[int] = None
+
+
+class RecordingSupervisor:
+    """
+    Boucle unique de supervision des processus FFmpeg
+
+    Args:
+        on_finished: Callback(event) à la fin de chaque enregistrement
+        redis_client: Client Redis (arrêts pub/sub + file de démarrage), optionnel
+        runner: FFmpegRunner (création à la demande)
+        dedicated: Superviseur dédié (file de démarrage + heartbeat); False pour
+            le superviseur local, qui n'écoute que les arrêts
+        stop_check: Callback(session_ids) -> {session_id: stopped_by} des sessions
+            à arrêter, appelé toutes les STOP_CHECK_INTERVAL secondes (sans Redis)
+    """
+
+    def __init__(self, on_finished: Callable[[Dict], None], redis_client=None, runner=None,
+                 dedicated: bool = True,
+                 stop_check: Optional[Callable[[List[str]], Dict[str, str]]] = None):
+        self.on_finished = on_finished
+        self.redis = redis_client
+        self._runner = runner
+        self.dedicated = dedicated
+        self.stop_check = stop_check
+
+        self._recordings: Dict[str, SupervisedRecording] = {}
+        self._deadlines: List = []  # heap (échéance, session_id)
+        self._lock = threading.Lock()
+        self._selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, ('wake', None))
+        self._pending: List = []  # Actions à appliquer dans la boucle
+        self._stoppers = ThreadPoolExecutor(max_workers=4, thread_name_prefix='RecordingStop')
+        self._running = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+        self.stats = {'supervised': 0, 'finished': 0, 'stops_received': 0, 'timeouts': 0}
+
+    @property
+    def runner(self):
+        if self._runner is None:
+            from .ffmpeg_runner import FFmpegRunner
+            self._runner = FFmpegRunner()
+        return self._runner
+
+    # Cycle de vie
+
+    def start(self):
+        self._running.set()
+        targets = [('RecordingSupervisor', self._loop)]
+        if self.redis is not None:
+            targets.append(('RecordingSupervisor-stop', self._listen_stops))
+            if self.dedicated:
+                targets += [('RecordingSupervisor-start', self._listen_starts),
+                            ('RecordingSupervisor-heartbeat', self._heartbeat)]
+        if self.stop_check is not None:
+            targets.append(('RecordingSupervisor-check', self._check_stops))
+        for name, target in targets:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"🎬 Superviseur d'enregistrements démarré (redis: {self.redis is not None})")
+        return self
+
+    def shutdown(self, stop_recordings: bool = True, timeout: float = 15):
+        """Arrêter la boucle (et, par défaut, les enregistrements en cours)"""
+        if stop_recordings:
+            for session_id in list(self._recordings):
+                self.request_stop(session_id, stopped_by='system')
+            deadline = time.monotonic() + timeout
+            while self._recordings and time.monotonic() < deadline:
+                time.sleep(0.05)
+        self._running.clear()
+        self._stopping.set()
+        self._wake()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._stoppers.shutdown(wait=False)
+        if self.redis is not None and self.dedicated:
+            try:
+                self.redis.delete(HEARTBEAT_KEY)
+            except Exception as e:
+                logger.warning(f"⚠️ Suppression heartbeat superviseur: {e}")
+
+    # API
+
+    def launch(self, session_id: str, camera_url: str, output_path: str,
+               max_duration_seconds: int, **info) -> SupervisedRecording:
+        """Démarrer FFmpeg pour une session puis la superviser"""
+        process = self.runner.start_recording(
+            camera_url=camera_url,
+            output_path=output_path,
+            max_duration=max_duration_seconds
+        )
+        logger.info(f"FFmpeg lancé avec PID: {process.pid} pour session {session_id}")
+        return self.watch(session_id, process, max_duration_seconds + TIMEOUT_GRACE_SECONDS,
+                          output_path=output_path, **info)
+
+    def watch(self, session_id: str, process: subprocess.Popen,
+              max_duration_seconds: Optional[float] = None, **info) -> SupervisedRecording:
+        """Superviser un processus déjà lancé"""
+        recording = SupervisedRecording(session_id=session_id, process=process, info=info)
+        if max_duration_seconds:
+            recording.deadline = time.monotonic() + max_duration_seconds
+        with self._lock:
+            self._recordings[session_id] = recording
+            self._pending.append(('watch', session_id))
+            self.stats['supervised'] += 1
+        self._wake()
+        return recording
+
+    def request_stop(self, session_id: str, stopped_by: str = 'user',
+                     reason: str = REASON_STOPPED) -> bool:
+        """Demander l'arrêt d'un enregistrement supervisé par ce processus"""
+        with self._lock:
+            recording = self._recordings.get(session_id)
+            if recording is None or recording.stop_reason is not None:
+                return False
+            recording.stop_reason = reason
+            recording.stopped_by = stopped_by
+        logger.info(f"⏹️ Arrêt session {session_id} ({reason}, par {stopped_by})")
+        self._stoppers.submit(self._stop_process, recording)
+        return True
+
+    def active_sessions(self) -> List[Dict]:
+        with self._lock:
+            recordings = list(self._recordings.values())
+        return [{
+            'session_id': r.session_id,
+            'pid': r.process.pid,
+            'elapsed_seconds': int(time.time() - r.started_at),
+            'stopping': r.stop_reason is not None,
+        } for r in recordings]
+
+    # Boucle
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # Réveil déjà en attente
+
+    def _stop_process(self, recording: SupervisedRecording):
+        try:
+            self.runner.stop_recording(recording.process)
+        except Exception as e:
+            logger.error(f"❌ Arrêt FFmpeg session {recording.session_id}: {e}")
+            recording.process.kill()
+
+    def _register(self, session_id: str):
+        recording = self._recordings.get(session_id)
+        if recording is None:
+            return
+        process = recording.process
+
+        if recording.deadline is not None:
+            heapq.heappush(self._deadlines, (recording.deadline, session_id))
+
+        if process.stderr is not None:
+            os.set_blocking(process.stderr.fileno(), False)
+            self._selector.register(process.stderr.fileno(), selectors.EVENT_READ, ('stderr', session_id))
+
+        try:
+            recording.pidfd = os.pidfd_open(process.pid)
+            self._selector.register(recording.pidfd, selectors.EVENT_READ, ('exit', session_id))
+        except (AttributeError, OSError):
+            # Pas de pidfd: un thread bloqué dans wait() réveille la boucle
+            def waiter():
+                process.wait()
+                with self._lock:
+                    self._pending.append(('exit', session_id))
+                self._wake()
+            threading.Thread(target=waiter, daemon=True, name=f"RecordingWait-{session_id}").start()
+
+    def _loop(self):
+        while self._running.is_set():
+            timeout = None
+            if self._deadlines:
+                timeout = max(0.0, self._deadlines[0][0] - time.monotonic())
+            for key, _ in self._selector.select(timeout):
+                kind, session_id = key.data
+                if kind == 'wake':
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                elif kind == 'stderr':
+                    self._read_stderr(session_id, key.fd)
+                elif kind == 'exit':
+                    self._finish(session_id)
+
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for action, session_id in pending:
+                if action == 'watch':
+                    self._register(session_id)
+                else:
+                    self._finish(session_id)
+
+            self._check_deadlines()
+
+    def _check_deadlines(self):
+        now = time.monotonic()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, session_id = heapq.heappop(self._deadlines)
+            if session_id in self._recordings:
+                logger.warning(f"Timeout atteint pour session {session_id}, arrêt forcé")
+                if self.request_stop(session_id, stopped_by='auto', reason=REASON_TIMEOUT):
+                    self.stats['timeouts'] += 1
+
+    def _read_stderr(self, session_id: str, fd: int):
+        recording = self._recordings.get(session_id)
+        try:
+            data = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(fd)
+            return
+        if recording is not None:
+            recording.stderr_tail = (recording.stderr_tail + data)[-STDERR_TAIL_BYTES:]
+
+    def _finish(self, session_id: str):
+        with self._lock:
+            recording = self._recordings.pop(session_id, None)
+        if recording is None:
+            return
+
+        process = recording.process
+        returncode = process.wait()
+        if recording.pidfd is not None:
+            self._selector.unregister(recording.pidfd)
+            os.close(recording.pidfd)
+        if process.stderr is not None:
+            try:
+                self._read_stderr(session_id, process.stderr.fileno())
+                self._selector.unregister(process.stderr.fileno())
+            except (KeyError, ValueError, OSError):
+                pass
+
+        self.stats['finished'] += 1
+        event = dict(recording.info,
+                     session_id=session_id,
+                     reason=recording.stop_reason or REASON_EXITED,
+                     stopped_by=recording.stopped_by,
+                     returncode=returncode,
+                     duration_seconds=round(time.time() - recording.started_at, 1),
+                     stderr_tail=recording.stderr_tail.decode('utf-8', 'replace'))
+        logger.info(f"🏁 Enregistrement {session_id} terminé ({event['reason']}, code {returncode})")
+        try:
+            self.on_finished(event)
+        except Exception as e:
+            logger.error(f"❌ Finalisation session {session_id}: {e}")
+
+    # Redis
+
+    def _listen_stops(self):
+        """Arrêts publiés par n'importe quel processus (API, tâches Celery)"""
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(STOP_CHANNEL)
+        try:
+            while self._running.is_set():
+                try:
+                    message = pubsub.get_message(timeout=1.0)
+                except Exception as e:
+                    logger.error(f"❌ Pub/sub arrêts: {e}")
+                    time.sleep(1)
+                    continue
+                if not message or message.get('type') != 'message':
+                    continue
+                try:
+                    payload = json.loads(message['data'])
+                except (TypeError, ValueError):
+                    continue
+                self.stats['stops_received'] += 1
+                self.request_stop(str(payload.get('session_id')), payload.get('stopped_by') or 'user')
+        finally:
+            pubsub.close()
+
+    def _check_stops(self):
+        """Arrêts enregistrés ailleurs (statut en base) quand Redis est absent"""
+        while not self._stopping.wait(STOP_CHECK_INTERVAL):
+            with self._lock:
+                session_ids = [r.session_id for r in self._recordings.values() if r.stop_reason is None]
+            if not session_ids:
+                continue
+            try:
+                stops = self.stop_check(session_ids)
+            except Exception as e:
+                logger.error(f"❌ Vérification des arrêts: {e}")
+                continue
+            for session_id, stopped_by in stops.items():
+                self.request_stop(session_id, stopped_by or 'user')
+
+    def _heartbeat(self):
+        """Signaler aux API que la file de démarrage est consommée"""
+        while self._running.is_set():
+            try:
+                self.redis.set(HEARTBEAT_KEY, json.dumps({'pid': os.getpid(), 'at': time.time()}),
+                               ex=HEARTBEAT_TTL)
+            except Exception as e:
+                logger.error(f"❌ Heartbeat superviseur: {e}")
+            self._stopping.wait(HEARTBEAT_INTERVAL)
+
+    def _listen_starts(self):
+        """Démarrages déposés par process_video_recording"""
+        while self._running.is_set():
+            try:
+                item = self.redis.blpop(START_QUEUE, timeout=1)
+            except Exception as e:
+                logger.error(f"❌ File de démarrage: {e}")
+                time.sleep(1)
+                continue
+            if not item:
+                continue
+            try:
+                command = json.loads(item[1])
+            except (TypeError, ValueError):
+                logger.error(f"❌ Commande de démarrage invalide: {item[1]!r}")
+                continue
+            try:
+                self.launch(**command)
+            except Exception as e:
+                logger.error(f"❌ Démarrage enregistrement {command.get('session_id')}: {e}")
+                self.on_finished(dict(command, reason=REASON_FAILED, error=str(e)))
+
+
+def publish_stop(session_id: str, stopped_by: str = 'user', redis_client=None) -> bool:
+    """
+    Diffuser une demande d'arrêt au superviseur
+
+    Returns:
+        True si un superviseur a reçu le message (ou l'a traité localement)
+    """
+    if _local_supervisor is not None and _local_supervisor.request_stop(str(session_id), stopped_by):
+        return True
+    client = redis_client if redis_client is not None else get_redis_client()
+    if client is None:
+        return False
+    payload = json.dumps({'session_id': str(session_id), 'stopped_by': stopped_by})
+    return client.publish(STOP_CHANNEL, payload) > 0
+
+
+def supervisor_alive(redis_client=None) -> bool:
+    """Le superviseur dédié a-t-il signalé sa présence récemment (HEARTBEAT_KEY)"""
+    client = redis_client if redis_client is not None else get_redis_client()
+    if client is None:
+        return False
+    try:
+        return bool(client.exists(HEARTBEAT_KEY))
+    except Exception as e:
+        logger.warning(f"⚠️ Heartbeat superviseur illisible: {e}")
+        return False
+
+
+def submit_start(command: Dict, redis_client=None) -> str:
+    """
+    Confier un démarrage au superviseur dédié (file Redis) s'il est vivant,
+    sinon au superviseur local du processus (pas de Redis, ou pas de
+    processus superviseur déployé)
+
+    Returns:
+        'supervisor' ou 'local'
+    """
+    client = redis_client if redis_client is not None else get_redis_client()
+    if client is not None and supervisor_alive(client):
+        client.rpush(START_QUEUE, json.dumps(command))
+        return 'supervisor'
+    get_local_supervisor().launch(**command)
+    return 'local'
+
+
+def dispatch_finished(event: Dict):
+    """on_finished par défaut: tâche Celery de finalisation"""
+    from ..celery_app import celery_app
+    celery_app.send_task('src.tasks.video_processing.finalize_video_recording',
+                         kwargs={'event': event})
+
+
+_local_supervisor: Optional[RecordingSupervisor] = None
+_local_lock = threading.Lock()
+
+
+def db_stop_check(app) -> Callable[[List[str]], Dict[str, str]]:
+    """stop_check lisant le statut des RecordingSession (arrêt hors de ce processus)"""
+    from ..models.database import db
+    from ..models.user import RecordingSession
+
+    def check(session_ids: List[str]) -> Dict[str, str]:
+        with app.app_context():
+            try:
+                sessions = RecordingSession.query.filter(
+                    RecordingSession.recording_id.in_(session_ids),
+                    RecordingSession.status != 'active'
+                ).all()
+                return {s.recording_id: s.stopped_by for s in sessions}
+            finally:
+                db.session.remove()
+    return check
+
+
+def get_local_supervisor() -> RecordingSupervisor:
+    """
+    Superviseur dans le processus courant (pas de superviseur dédié / tests)
+
+    Écoute STOP_CHANNEL si Redis est joignable (sans consommer la file de
+    démarrage ni publier de heartbeat), sinon relit le statut en base.
+    """
+    global _local_supervisor
+    with _local_lock:
+        if _local_supervisor is None:
+            redis_client = get_redis_client()
+            stop_check = None
+            if redis_client is None:
+                from flask import current_app, has_app_context
+                if has_app_context():
+                    stop_check = db_stop_check(current_app._get_current_object())
+                else:
+                    logger.warning("⚠️ Superviseur local sans Redis ni contexte Flask: "
+                                   "arrêts limités à ce processus")
+            _local_supervisor = RecordingSupervisor(on_finished=dispatch_finished,
+                                                    redis_client=redis_client, dedicated=False,
+                                                    stop_check=stop_check).start()
+        return _local_supervisor
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    redis_client = get_redis_client()
+    if redis_client is None:
+        raise SystemExit("Redis requis pour le superviseur dédié")
+
+    supervisor = RecordingSupervisor(on_finished=dispatch_finished, redis_client=redis_client).start()
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+    supervisor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Client Redis partagé (un pool de connexions par processus)
+
+Redis est optionnel: si le module redis ou le serveur est absent,
+get_redis_client() retourne None et les appelants utilisent leur fallback
+(base de données, mémoire). Une connexion en échec n'est retentée qu'après
+RETRY_AFTER_SECONDS pour ne pas ajouter un timeout à chaque requête.
+"""
+
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_AFTER_SECONDS = 30
+
+_client = None
+_failed_at = 0.0
+_lock = threading.Lock()
+
+
+def redis_url() -> str:
+    url = os.environ.get('REDIS_URL')
+    if url:
+        return url
+    from ..config import Config
+    return Config.CELERY_BROKER_URL
+
+
+def get_redis_client():
+    """Client Redis (decode_responses=True) ou None si indisponible"""
+    global _client, _failed_at
+    if _client is not None:
+        return _client
+    if _failed_at and time.monotonic() - _failed_at < RETRY_AFTER_SECONDS:
+        return None
+
+    with _lock:
+        if _client is not None:
+            return _client
+        try:
+            import redis
+            client = redis.from_url(redis_url(), decode_responses=True,
+                                    socket_connect_timeout=1, socket_timeout=2)
+            client.ping()
+        except Exception as e:
+            _failed_at = time.monotonic()
+            logger.warning(f"⚠️ Redis indisponible ({e}), fallback local")
+            return None
+        _client = client
+        _failed_at = 0.0
+        return _client
+
+
+class ScriptCache:
+    """Scripts Lua enregistrés (register_script), par client Redis"""
+
+    def __init__(self):
+        self._scripts = {}
+
+    def get(self, client, source: str):
+        cached = self._scripts.get(source)
+        if cached is None or cached[0] is not client:
+            cached = (client, client.register_script(source))
+            self._scripts[source] = cached
+        return cached[1]
+
+    def clear(self):
+        self._scripts.clear()
+
+
+def reset_redis_client(client=None):
+    """Remplacer le client (tests) ou forcer une reconnexion"""
+    global _client, _failed_at
+    with _lock:
+        _client = client
+        _failed_at = 0.0
@@ -0,0 +1,231 @@
+"""
+Upload continu des segments HLS pendant l'enregistrement
+
+FFmpeg (muxer hls) ferme un segment toutes les SEGMENT_DURATION_SECONDS et
+réécrit la playlist locale. Chaque segment fermé est envoyé immédiatement
+vers le stockage Bunny (edge storage) par un pool partagé. À l'arrêt, il ne
+reste que le dernier segment et la playlist à envoyer: le délai
+"stop -> lecture" ne dépend plus de la durée du match.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from .bunny_resumable_upload import create_session
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {
+    '.ts': 'video/mp2t',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+}
+
+
+class BunnyEdgeStorage:
+    """Client minimal de Bunny Storage (PUT de fichiers, session keep-alive)"""
+
+    def __init__(self, zone: Optional[str] = None, password: Optional[str] = None,
+                 hostname: Optional[str] = None, cdn_hostname: Optional[str] = None,
+                 max_retries: int = 3, timeout: float = 120):
+        self.zone = zone or os.environ.get('BUNNY_STORAGE_ZONE', 'padelvar-videos')
+        self.password = password or os.environ.get('BUNNY_STORAGE_PASSWORD', '')
+        hostname = hostname or os.environ.get('BUNNY_HOSTNAME', 'ny.storage.bunnycdn.com')
+        self.base_url = hostname if hostname.startswith('http') else f"https://{hostname}"
+        self.cdn_hostname = cdn_hostname or os.environ.get(
+            'BUNNY_STORAGE_CDN_HOSTNAME', f"{self.zone}.b-cdn.net")
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = create_session()
+
+    def is_configured(self) -> bool:
+        return bool(self.zone and self.password)
+
+    def upload_file(self, local_path: Path, remote_path: str):
+        """PUT d'un fichier (retry avec backoff), lève requests.RequestException"""
+        url = f"{self.base_url}/{self.zone}/{remote_path.lstrip('/')}"
+        headers = {
+            'AccessKey': self.password,
+            'Content-Type': CONTENT_TYPES.get(Path(local_path).suffix, 'application/octet-stream'),
+        }
+        for attempt in range(self.max_retries + 1):
+            try:
+                with open(local_path, 'rb') as f:
+                    response = self.session.put(url, data=f, headers=headers, timeout=self.timeout)
+                if response.status_code in (200, 201):
+                    return
+                raise requests.HTTPError(f"PUT {remote_path}: {response.status_code}", response=response)
+            except requests.exceptions.RequestException:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(min(2 ** attempt, 10))
+
+    def public_url(self, remote_path: str) -> str:
+        return f"https://{self.cdn_hostname}/{remote_path.lstrip('/')}"
+
+
+def read_closed_segments(playlist_path: Path) -> List[str]:
+    """
+    Segments fermés listés dans une playlist HLS locale
+
+    FFmpeg n'ajoute un segment à la playlist qu'une fois celui-ci fermé.
+    Une dernière ligne incomplète (réécriture en cours) est ignorée.
+    """
+    try:
+        content = playlist_path.read_text(encoding='utf-8')
+    except (FileNotFoundError, UnicodeDecodeError):
+        return []
+    lines = content.split('\n')
+    if not content.endswith('\n'):
+        lines = lines[:-1]
+    return [os.path.basename(line.strip()) for line in lines
+            if line.strip() and not line.startswith('#')]
+
+
+class SegmentStreamUploader:
+    """
+    Surveille la playlist d'un enregistrement et envoie chaque segment fermé
+
+    Args:
+        playlist_path: Playlist HLS écrite par FFmpeg
+        remote_dir: Dossier distant (ex: matches/<club_id>/<recording_id>)
+        storage: Client BunnyEdgeStorage
+        executor: Pool d'upload partagé entre enregistrements
+        on_segment: Callback(chemin local) après chaque segment envoyé
+    """
+
+    def __init__(self, playlist_path: Path, remote_dir: str, storage: BunnyEdgeStorage,
+                 executor: ThreadPoolExecutor, on_segment: Optional[Callable[[Path], None]] = None,
+                 poll_interval: float = 1.0):
+        self.playlist_path = Path(playlist_path)
+        self.segment_dir = self.playlist_path.parent
+        self.remote_dir = remote_dir.strip('/')
+        self.storage = storage
+        self.executor = executor
+        self.on_segment = on_segment
+        self.poll_interval = poll_interval
+
+        self._futures: Dict[str, Future] = {}
+        self._uploaded: List[str] = []
+        self._failed: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {
+            'segments_uploaded': 0,
+            'bytes_uploaded': 0,
+            'last_upload_seconds': 0.0,
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, daemon=True,
+                                        name=f"SegmentUpload-{self.playlist_path.stem}")
+        self._thread.start()
+        return self
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"❌ Surveillance segments {self.playlist_path.name}: {e}")
+
+    def poll(self) -> int:
+        """Soumettre les segments nouvellement fermés; retourne leur nombre"""
+        submitted = 0
+        for name in read_closed_segments(self.playlist_path):
+            with self._lock:
+                if name in self._futures:
+                    continue
+                self._futures[name] = self.executor.submit(self._upload_segment, name)
+            submitted += 1
+        return submitted
+
+    def _upload_segment(self, name: str):
+        path = self.segment_dir / name
+        started = time.perf_counter()
+        try:
+            self.storage.upload_file(path, f"{self.remote_dir}/{name}")
+        except Exception as e:
+            logger.warning(f"⚠️ Upload segment {name} échoué: {e}")
+            with self._lock:
+                self._failed.append(name)
+            raise
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._uploaded.append(name)
+            self.stats['segments_uploaded'] += 1
+            self.stats['bytes_uploaded'] += path.stat().st_size
+            self.stats['last_upload_seconds'] = round(elapsed, 3)
+        logger.info(f"☁️ Segment envoyé: {name} ({elapsed:.1f}s)")
+        if self.on_segment:
+            self.on_segment(path)
+
+    def finish(self, timeout: float = 600) -> Dict[str, object]:
+        """
+        Après l'arrêt de FFmpeg: envoyer les derniers segments, rejouer les
+        échecs puis publier la playlist
+
+        Returns:
+            {'success', 'playlist_url', 'segments', 'failed'}
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self.poll()
+
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            futures = dict(self._futures)
+        for name, future in futures.items():
+            try:
+                future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                if not future.done():
+                    # Upload toujours en cours: pas de second PUT concurrent,
+                    # le segment reste non envoyé (playlist non publiée)
+                    logger.warning(f"⚠️ Upload segment {name} toujours en cours après le délai")
+                    continue
+                # Échec terminé: dernière chance, de façon synchrone
+                try:
+                    self._upload_segment(name)
+                    with self._lock:
+                        self._failed.remove(name)
+                except Exception:
+                    pass
+
+        segments = read_closed_segments(self.playlist_path)
+        with self._lock:
+            failed = [name for name in segments if name not in self._uploaded]
+        if failed or not segments:
+            logger.error(f"❌ Segments non envoyés: {failed or 'aucun segment'}")
+            return {'success': False, 'playlist_url': None, 'segments': len(segments), 'failed': failed}
+
+        remote_playlist = f"{self.remote_dir}/{self.playlist_path.name}"
+        self.storage.upload_file(self._publishable_playlist(), remote_playlist)
+        playlist_url = self.storage.public_url(remote_playlist)
+        logger.info(f"✅ Playlist publiée: {playlist_url} ({len(segments)} segments)")
+        return {'success': True, 'playlist_url': playlist_url, 'segments': len(segments), 'failed': []}
+
+    def _publishable_playlist(self) -> Path:
+        """Playlist avec URIs relatives (segments dans le même dossier distant) et ENDLIST"""
+        lines = []
+        for line in self.playlist_path.read_text(encoding='utf-8').splitlines():
+            if line.strip() and not line.startswith('#'):
+                line = os.path.basename(line.strip())
+            lines.append(line)
+        if '#EXT-X-ENDLIST' not in lines:
+            lines.append('#EXT-X-ENDLIST')
+        published = self.playlist_path.with_suffix('.published.m3u8')
+        published.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+        return published
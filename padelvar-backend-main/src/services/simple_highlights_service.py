@@ -10,11 +10,13 @@ from datetime import datetime
 from typing import List, Dict, Optional
 import json
 import logging
+from bisect import bisect_right
 
 from src.models.database import db
 from src.models.user import Video, HighlightVideo, HighlightJob
 from src.config.highlights_config import HighlightsConfig
 from src.services.bunny_storage_service import bunny_storage_service
+from src.services.mp4_index import Mp4IndexError, load_file_index
 
 logger = logging.getLogger(__name__)
 
@@ -151,7 +153,7 @@ class SimpleHighlightsService:
         response.raise_for_status()
         
         with open(local_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
                 f.write(chunk)
         
         logger.info(f"✅ Video downloaded to: {local_path}")
@@ -168,16 +170,39 @@ class SimpleHighlightsService:
         logger.info(f"  Video duration: {duration}s")
         
         # 2. Calculer les intervalles pour extraire les clips
+        clips = self._plan_clips(duration, target_duration)
+        logger.info(f"  Extracting {len(clips)} clips of ~{target_duration / self.config.SIMPLE_CLIPS_COUNT:.1f}s")
+        
+        output_path = os.path.join(
+            self.config.TEMP_DIR,
+            f"highlights_{os.path.basename(video_path)}"
+        )
+        
+        # 3. Mode rapide: une seule passe FFmpeg sans réencodage
+        if self.config.SIMPLE_STREAM_COPY:
+            try:
+                keyframes = self._probe_keyframes(video_path)
+                segments = self._snap_to_keyframes(clips, keyframes, duration)
+                self._extract_stream_copy(video_path, segments, output_path)
+                logger.info(f"✅ Highlights generated (stream copy): {output_path}")
+                return output_path
+            except (subprocess.CalledProcessError, ValueError, OSError) as e:
+                logger.warning(f"⚠️ Stream copy impossible ({e}), fallback réencodage")
+        
+        # 4. Fallback: réencodage clip par clip puis concaténation
+        self._generate_reencoded_highlights(video_path, clips, output_path)
+        
+        logger.info(f"✅ Highlights generated: {output_path}")
+        
+        return output_path
+    
+    def _plan_clips(self, duration: float, target_duration: int) -> List[Dict]:
+        """Clips à intervalles réguliers: [{'start', 'end', 'clip_index'}]"""
         clips_count = self.config.SIMPLE_CLIPS_COUNT
         clip_duration = target_duration / clips_count  # ~15s par clip
         interval = duration / clips_count
         
-        logger.info(f"  Extracting {clips_count} clips of ~{clip_duration:.1f}s")
-        
-        # 3. Extraire les clips
-        clip_paths = []
-        timestamps = []
-        
+        clips = []
         for i in range(clips_count):
             start_time = i * interval
             
@@ -185,40 +210,126 @@ class SimpleHighlightsService:
             if start_time + clip_duration > duration:
                 break
             
-            clip_path = os.path.join(
-                self.config.TEMP_DIR,
-                f"clip_{i}_{os.path.basename(video_path)}"
-            )
-            
-            # Extraire avec FFmpeg
-            self._extract_clip(video_path, start_time, clip_duration, clip_path)
-            
-            clip_paths.append(clip_path)
-            timestamps.append({
+            clips.append({
                 'start': start_time,
                 'end': start_time + clip_duration,
                 'clip_index': i
             })
+        return clips
+    
+    def _probe_keyframes(self, video_path: str) -> List[float]:
+        """
+        Instants de présentation des keyframes
         
-        # 4. Concaténer les clips
-        output_path = os.path.join(
-            self.config.TEMP_DIR,
-            f"highlights_{os.path.basename(video_path)}"
-        )
+        MP4: lus dans l'index moov (aucun décodage). Autres conteneurs: un
+        seul ffprobe sur les paquets (sans décoder les images).
+        """
+        try:
+            track = load_file_index(video_path).video_track
+            if track is not None:
+                return track.keyframe_presentation_times()
+        except (Mp4IndexError, OSError) as e:
+            logger.debug(f"Index MP4 indisponible ({e}), ffprobe")
         
-        self._concatenate_clips(clip_paths, output_path)
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            video_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        keyframes = []
+        for line in result.stdout.splitlines():
+            pts, _, flags = line.partition(',')
+            if 'K' in flags and pts not in ('', 'N/A'):
+                keyframes.append(float(pts))
+        if not keyframes:
+            raise ValueError("Aucune keyframe trouvée")
+        return sorted(keyframes)
+    
+    def _snap_to_keyframes(self, clips: List[Dict], keyframes: List[float],
+                           duration: float) -> List[Dict]:
+        """
+        Aligner les clips sur les GOPs: début sur la keyframe précédente,
+        fin sur la keyframe suivante; les clips qui se chevauchent fusionnent
+        """
+        segments = []
+        for clip in clips:
+            pos = bisect_right(keyframes, clip['start'] + 1e-6) - 1
+            start = keyframes[max(pos, 0)]
+            pos = bisect_right(keyframes, clip['end'] - 1e-6)
+            end = keyframes[pos] if pos < len(keyframes) else duration
+            if segments and start <= segments[-1]['end']:
+                segments[-1]['end'] = max(segments[-1]['end'], end)
+            else:
+                segments.append({'start': start, 'end': end})
+        if not segments:
+            raise ValueError("Aucun clip à extraire")
+        return segments
+    
+    def _extract_stream_copy(self, video_path: str, segments: List[Dict], output_path: str):
+        """Toute la sélection en un seul FFmpeg (concat demuxer inpoint/outpoint, -c copy)"""
         
-        # 5. Nettoyer les clips individuels
-        for clip_path in clip_paths:
-            if os.path.exists(clip_path):
-                os.remove(clip_path)
+        list_file = f"{output_path}.ffconcat"
+        escaped = os.path.abspath(video_path).replace("'", "'\\''")
+        with open(list_file, 'w') as f:
+            f.write("ffconcat version 1.0\n")
+            for segment in segments:
+                f.write(f"file '{escaped}'\n")
+                f.write(f"inpoint {segment['start']:.6f}\n")
+                f.write(f"outpoint {segment['end']:.6f}\n")
         
-        logger.info(f"✅ Highlights generated: {output_path}")
+        cmd = [
+            'ffmpeg',
+            '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_file,
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            '-movflags', '+faststart',
+            output_path
+        ]
         
-        return output_path
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+        finally:
+            if os.path.exists(list_file):
+                os.remove(list_file)
+    
+    def _generate_reencoded_highlights(self, video_path: str, clips: List[Dict], output_path: str):
+        """Ancien mode: un réencodage libx264 par clip puis concaténation"""
+        clip_paths = []
+        
+        try:
+            for clip in clips:
+                clip_path = os.path.join(
+                    self.config.TEMP_DIR,
+                    f"clip_{clip['clip_index']}_{os.path.basename(video_path)}"
+                )
+                
+                # Extraire avec FFmpeg
+                self._extract_clip(video_path, clip['start'], clip['end'] - clip['start'], clip_path)
+                clip_paths.append(clip_path)
+            
+            self._concatenate_clips(clip_paths, output_path)
+        finally:
+            # Nettoyer les clips individuels
+            for clip_path in clip_paths:
+                if os.path.exists(clip_path):
+                    os.remove(clip_path)
     
     def _get_video_duration(self, video_path: str) -> float:
-        """Obtient la durée d'une vidéo avec FFprobe"""
+        """Obtient la durée d'une vidéo (index MP4, sinon FFprobe)"""
+        
+        try:
+            duration = load_file_index(video_path).duration
+            if duration > 0:
+                return duration
+        except (Mp4IndexError, OSError):
+            pass
         
         cmd = [
             'ffprobe',
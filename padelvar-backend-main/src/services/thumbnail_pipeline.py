@@ -0,0 +1,289 @@
+"""
+Pipeline de vignettes: poster, sprite de navigation (WebVTT) et bande basse
+résolution, en une seule passe FFmpeg par vidéo
+
+- une passe: seules les keyframes sont décodées (-skip_frame nokey), puis un
+  filtre split alimente les trois sorties (poster, planches du sprite, bande)
+- poster: keyframe la plus proche du milieu du match (index moov, sans
+  décodage; ffprobe sur les paquets pour les autres conteneurs)
+- sprite: une vignette toutes les SPRITE_INTERVAL secondes, planches de
+  SPRITE_COLUMNS x SPRITE_ROWS, décrites par un fichier WebVTT (#xywh=)
+- bande: STRIP_FRAMES vignettes réparties sur toute la durée, une image
+- pool borné de MAX_WORKERS générations; une même vidéo en cours n'est
+  générée qu'une fois
+- cache par empreinte du contenu: CACHE_DIR/<empreinte>/manifest.json; une
+  vidéo déjà traitée (même contenu, mêmes paramètres) ne relance pas FFmpeg
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .mp4_index import Mp4IndexError, load_file_index
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+FFPROBE_PATH = os.getenv('FFPROBE_PATH', 'ffprobe')
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+CACHE_DIR = Path(os.getenv('THUMBNAIL_CACHE_DIR', str(BACKEND_ROOT / 'static' / 'previews')))
+MAX_WORKERS = int(os.getenv('THUMBNAIL_MAX_WORKERS', '2'))
+FFMPEG_TIMEOUT = 1800
+
+POSTER_MAX_WIDTH = 1280
+SPRITE_INTERVAL = 10          # secondes entre deux vignettes du sprite
+SPRITE_MAX_THUMBS = 600       # au-delà, l'intervalle est élargi
+SPRITE_TILE = (160, 90)
+SPRITE_COLUMNS, SPRITE_ROWS = 10, 10
+STRIP_FRAMES = 20
+STRIP_TILE = (96, 54)
+
+# Échantillons lus pour l'empreinte (début, milieu, fin)
+FINGERPRINT_CHUNK = 1024 * 1024
+PIPELINE_VERSION = 1
+
+MANIFEST = 'manifest.json'
+POSTER = 'poster.jpg'
+STRIP = 'strip.jpg'
+VTT = 'sprites.vtt'
+SPRITE_PATTERN = 'sprite_%03d.jpg'
+
+
+class ThumbnailError(RuntimeError):
+    """Échec de génération des vignettes"""
+
+
+def _params_signature() -> str:
+    return json.dumps([PIPELINE_VERSION, POSTER_MAX_WIDTH, SPRITE_INTERVAL, SPRITE_MAX_THUMBS, SPRITE_TILE,
+                       SPRITE_COLUMNS, SPRITE_ROWS, STRIP_FRAMES, STRIP_TILE])
+
+
+def content_key(path: str) -> str:
+    """Empreinte du contenu (taille + début, milieu et fin du fichier) et des paramètres"""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(f"{size}:{_params_signature()}".encode())
+    with open(path, 'rb') as f:
+        for offset in sorted({0, max(0, size // 2 - FINGERPRINT_CHUNK // 2), max(0, size - FINGERPRINT_CHUNK)}):
+            f.seek(offset)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+def probe(path: str) -> Tuple[float, List[float]]:
+    """Durée et instants des keyframes, sans décoder d'image"""
+    try:
+        index = load_file_index(path)
+        track = index.video_track
+        if track is not None:
+            return index.duration, track.keyframe_presentation_times()
+    except (Mp4IndexError, OSError) as e:
+        logger.debug(f"Index MP4 indisponible ({e}), ffprobe")
+
+    result = subprocess.run([
+        FFPROBE_PATH, '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'format=duration:packet=pts_time,flags', '-of', 'json', path
+    ], capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout or '{}')
+    keyframes = sorted(float(p['pts_time']) for p in data.get('packets', [])
+                       if 'K' in p.get('flags', '') and p.get('pts_time') not in (None, 'N/A'))
+    return float(data.get('format', {}).get('duration') or 0), keyframes
+
+
+def poster_time(duration: float, keyframes: List[float]) -> float:
+    """Keyframe la plus proche du milieu de la vidéo"""
+    middle = duration / 2
+    if not keyframes:
+        return middle
+    pos = bisect_left(keyframes, middle)
+    candidates = keyframes[max(0, pos - 1):pos + 1]
+    return min(candidates, key=lambda t: abs(t - middle))
+
+
+def sprite_interval(duration: float) -> float:
+    return max(SPRITE_INTERVAL, math.ceil(duration / SPRITE_MAX_THUMBS))
+
+
+def _fit(size: Tuple[int, int]) -> str:
+    width, height = size
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2")
+
+
+def build_command(video_path: str, output_dir: str, duration: float, poster_at: float) -> List[str]:
+    """Commande FFmpeg unique: poster + planches du sprite + bande"""
+    interval = sprite_interval(duration)
+    strip_rate = STRIP_FRAMES / max(duration, 1.0)
+    graph = ';'.join([
+        '[0:v]split=3[p][s][b]',
+        f"[p]select='gte(t\\,{poster_at:.3f})',scale='min({POSTER_MAX_WIDTH}\\,iw)':-2[poster]",
+        f"[s]fps=1/{interval},{_fit(SPRITE_TILE)},tile={SPRITE_COLUMNS}x{SPRITE_ROWS}[sprite]",
+        f"[b]fps={strip_rate:.6f},{_fit(STRIP_TILE)},tile={STRIP_FRAMES}x1[strip]",
+    ])
+    out = Path(output_dir)
+    return [
+        FFMPEG_PATH, '-v', 'error', '-y',
+        '-skip_frame', 'nokey', '-i', video_path,
+        '-filter_complex', graph,
+        '-map', '[poster]', '-frames:v', '1', '-q:v', '3', str(out / POSTER),
+        '-map', '[sprite]', '-q:v', '5', str(out / SPRITE_PATTERN),
+        '-map', '[strip]', '-frames:v', '1', '-q:v', '5', str(out / STRIP),
+    ]
+
+
+def _timestamp(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}.{millis % 1000:03d}"
+
+
+def build_vtt(duration: float, sprites: List[str]) -> str:
+    """WebVTT de navigation: une cue par vignette, pointant dans sa planche"""
+    interval = sprite_interval(duration)
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    count = min(max(1, math.ceil(duration / interval)), len(sprites) * per_sheet)
+    width, height = SPRITE_TILE
+    lines = ['WEBVTT', '']
+    for n in range(count):
+        sheet, cell = divmod(n, per_sheet)
+        row, column = divmod(cell, SPRITE_COLUMNS)
+        start, end = n * interval, min((n + 1) * interval, duration)
+        lines += [f"{_timestamp(start)} --> {_timestamp(max(end, start + 0.001))}",
+                  f"{sprites[sheet]}#xywh={column * width},{row * height},{width},{height}", '']
+    return '\n'.join(lines)
+
+
+class ThumbnailPipeline:
+    """Génération en pool borné, cache par empreinte de contenu"""
+
+    def __init__(self, cache_dir: Path = CACHE_DIR, max_workers: int = MAX_WORKERS):
+        self.cache_dir = Path(cache_dir)
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[str, Future] = {}
+        self._keys: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='thumbnails')
+            return self._executor
+
+    def key_for(self, video_path: str) -> str:
+        """Empreinte mémorisée par (chemin, mtime, taille)"""
+        stat = os.stat(video_path)
+        file_id = (os.path.abspath(video_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            key = self._keys.get(file_id)
+        if key is None:
+            key = content_key(video_path)
+            with self._lock:
+                self._keys[file_id] = key
+                while len(self._keys) > 256:
+                    self._keys.popitem(last=False)
+        return key
+
+    def directory_for(self, key: str) -> Path:
+        return self.cache_dir / key
+
+    def _manifest(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self.directory_for(key) / MANIFEST, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def cached(self, video_path: str) -> Optional[Dict]:
+        """Manifeste déjà généré pour ce contenu, sans rien lancer"""
+        return self._manifest(self.key_for(video_path))
+
+    def submit(self, video_path: str) -> Future:
+        """Générer (ou relire du cache) en arrière-plan; Future du manifeste"""
+        key = self.key_for(video_path)
+        manifest = self._manifest(key)
+        if manifest is not None:
+            future = Future()
+            future.set_result(manifest)
+            return future
+
+        pool = self._pool()
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = pool.submit(self._build, video_path, key)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _, key=key: self._forget(key))
+        return future
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def generate(self, video_path: str, timeout: Optional[float] = None) -> Dict:
+        """Manifeste des vignettes de la vidéo (bloquant)"""
+        return self.submit(video_path).result(timeout)
+
+    def poster_path(self, manifest: Dict) -> Path:
+        return self.directory_for(manifest['key']) / manifest['poster']
+
+    def _build(self, video_path: str, key: str) -> Dict:
+        duration, keyframes = probe(video_path)
+        if duration <= 0:
+            raise ThumbnailError(f"Durée inconnue: {video_path}")
+        poster_at = poster_time(duration, keyframes)
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.cache_dir)
+        try:
+            result = subprocess.run(build_command(video_path, work_dir, duration, poster_at),
+                                    capture_output=True, text=True, timeout=FFMPEG_TIMEOUT)
+            sprites = sorted(name for name in os.listdir(work_dir) if name.startswith('sprite_'))
+            if result.returncode != 0 or not sprites or not os.path.exists(os.path.join(work_dir, POSTER)):
+                raise ThumbnailError(f"FFmpeg a échoué ({result.returncode}): {result.stderr[-500:]}")
+
+            with open(os.path.join(work_dir, VTT), 'w', encoding='utf-8') as f:
+                f.write(build_vtt(duration, sprites))
+            manifest = {
+                'key': key,
+                'duration': duration,
+                'poster': POSTER,
+                'poster_time': poster_at,
+                'sprites': sprites,
+                'vtt': VTT,
+                'strip': STRIP if os.path.exists(os.path.join(work_dir, STRIP)) else None,
+                'sprite_interval': sprite_interval(duration),
+                'sprite_tile': list(SPRITE_TILE),
+                'strip_tile': list(STRIP_TILE),
+                'strip_frames': STRIP_FRAMES,
+            }
+            with open(os.path.join(work_dir, MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+
+            try:
+                os.rename(work_dir, self.directory_for(key))
+            except OSError:
+                # Généré entre-temps par un autre processus: on garde le sien
+                shutil.rmtree(work_dir, ignore_errors=True)
+            logger.info(f"🖼️ Vignettes générées: {os.path.basename(video_path)} "
+                        f"({len(sprites)} planche(s), poster à {poster_at:.1f}s)")
+            return self._manifest(key) or manifest
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+
+# Instance globale
+thumbnail_pipeline = ThumbnailPipeline()
@@ -0,0 +1,329 @@
+"""
+File d'upload persistante pour BunnyStorageService (SQLite en mode WAL)
+
+- Survit aux redémarrages: les tâches interrompues sont remises en file
+- Voies de priorité: clips courts avant les matchs complets
+- Équité par club: à priorité égale, le club servi le moins récemment passe
+- Réservation atomique (BEGIN IMMEDIATE): plusieurs workers gunicorn peuvent
+  partager la même file
+- Historique des tâches terminées plafonné (éviction LRU)
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from queue import Empty
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DB_PATH = BACKEND_ROOT / 'instance' / 'bunny_upload_queue.db'
+
+# Voies de priorité (plus petit = servi en premier)
+PRIORITY_CLIP = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_MATCH = 2
+PRIORITY_NAMES = {'clip': PRIORITY_CLIP, 'default': PRIORITY_DEFAULT, 'match': PRIORITY_MATCH}
+
+CLIP_MAX_BYTES = int(os.environ.get('UPLOAD_CLIP_MAX_BYTES', 300 * 1024 * 1024))
+HISTORY_CAP = int(os.environ.get('UPLOAD_HISTORY_CAP', 500))
+LEASE_SECONDS = 600           # Réservation considérée abandonnée sans heartbeat
+THROUGHPUT_WINDOW = 900       # Fenêtre de calcul du débit (secondes)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_queue (
+    id TEXT PRIMARY KEY,
+    local_path TEXT NOT NULL,
+    title TEXT,
+    metadata TEXT,
+    club_id TEXT,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    total_bytes INTEGER DEFAULT 0,
+    retries INTEGER DEFAULT 0,
+    owner TEXT,
+    heartbeat_at REAL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    accessed_at REAL,
+    bunny_video_id TEXT,
+    bunny_url TEXT,
+    error_message TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_upload_queue_pending ON upload_queue (status, priority, created_at);
+CREATE INDEX IF NOT EXISTS ix_upload_queue_history ON upload_queue (finished_at, accessed_at);
+CREATE TABLE IF NOT EXISTS upload_club_turns (
+    club_id TEXT PRIMARY KEY,
+    last_served_at REAL NOT NULL
+);
+"""
+
+# États (alignés sur UploadStatus)
+PENDING = 'pending'
+CLAIMED = 'uploading'
+FINISHED = ('completed', 'failed')
+
+
+def classify_priority(metadata: Dict[str, Any], total_bytes: int) -> int:
+    """Voie d'une tâche: metadata['priority'] explicite, sinon taille du fichier"""
+    priority = metadata.get('priority')
+    if isinstance(priority, int):
+        return priority
+    if priority in PRIORITY_NAMES:
+        return PRIORITY_NAMES[priority]
+    if total_bytes and total_bytes <= CLIP_MAX_BYTES:
+        return PRIORITY_CLIP
+    return PRIORITY_MATCH if total_bytes else PRIORITY_DEFAULT
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PersistentUploadQueue:
+    """
+    File d'upload durable partagée entre processus
+
+    Interface proche de queue.Queue (put / get(timeout) / qsize) pour les
+    workers de BunnyStorageService.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, history_cap: int = HISTORY_CAP,
+                 lease_seconds: float = LEASE_SECONDS):
+        self.db_path = str(db_path or os.environ.get('BUNNY_UPLOAD_QUEUE_DB', DEFAULT_DB_PATH))
+        self.history_cap = history_cap
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._local = threading.local()
+        self._cond = threading.Condition()
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion par thread (sqlite3 n'est pas partageable entre threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # Écriture
+
+    def put(self, task_id: str, local_path: str, title: str = None,
+            metadata: Dict[str, Any] = None, total_bytes: int = 0,
+            priority: Optional[int] = None):
+        """Ajouter (ou remettre en file) une tâche"""
+        metadata = metadata or {}
+        if priority is None:
+            priority = classify_priority(metadata, total_bytes)
+        club_id = metadata.get('club_id')
+        now = time.time()
+        self._connect().execute(
+            """INSERT INTO upload_queue (id, local_path, title, metadata, club_id, priority,
+                                         status, total_bytes, created_at, accessed_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET status = excluded.status, owner = NULL,
+                                             heartbeat_at = NULL, finished_at = NULL""",
+            (task_id, local_path, title, json.dumps(metadata, default=str),
+             None if club_id is None else str(club_id), priority, PENDING,
+             total_bytes, now, now)
+        )
+        with self._cond:
+            self._cond.notify()
+
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Réserver la prochaine tâche (priorité, puis club servi le moins
+        récemment, puis ancienneté)
+        """
+        conn = self._connect()
+        # Lecture sans verrou d'abord: le sondage d'une file vide ne bloque pas les écritures
+        if conn.execute('SELECT 1 FROM upload_queue WHERE status = ? LIMIT 1', (PENDING,)).fetchone() is None:
+            return None
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                """SELECT q.* FROM upload_queue q
+                   LEFT JOIN upload_club_turns t ON t.club_id = q.club_id
+                   WHERE q.status = ?
+                   ORDER BY q.priority, COALESCE(t.last_served_at, 0), q.created_at
+                   LIMIT 1""",
+                (PENDING,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                """UPDATE upload_queue SET status = ?, owner = ?, heartbeat_at = ?,
+                          started_at = COALESCE(started_at, ?) WHERE id = ?""",
+                (CLAIMED, self.owner, now, now, row['id'])
+            )
+            if row['club_id'] is not None:
+                conn.execute(
+                    """INSERT INTO upload_club_turns (club_id, last_served_at) VALUES (?, ?)
+                       ON CONFLICT(club_id) DO UPDATE SET last_served_at = excluded.last_served_at""",
+                    (row['club_id'], now)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        task = dict(row)
+        task['metadata'] = json.loads(task['metadata'] or '{}')
+        return task
+
+    def get(self, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Réserver une tâche en attendant au plus timeout secondes (sinon Empty)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            task = self.claim()
+            if task:
+                return task
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise Empty
+            # Réveil sur put() local, sinon sondage (tâches ajoutées par un autre processus)
+            with self._cond:
+                self._cond.wait(min(remaining, 1.0) if remaining is not None else 1.0)
+
+    def wake_all(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def heartbeat(self, task_id: str):
+        """Prolonger la réservation d'une tâche en cours"""
+        self._connect().execute(
+            'UPDATE upload_queue SET heartbeat_at = ? WHERE id = ? AND owner = ?',
+            (time.time(), task_id, self.owner)
+        )
+
+    def update(self, task_id: str, **fields):
+        """Mettre à jour des champs (retries, bunny_video_id...)"""
+        if not fields:
+            return
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        self._connect().execute(f'UPDATE upload_queue SET {columns} WHERE id = ?',
+                                (*fields.values(), task_id))
+
+    def finish(self, task_id: str, status: str, **fields):
+        """Marquer une tâche terminée puis plafonner l'historique"""
+        now = time.time()
+        self.update(task_id, status=status, owner=None, finished_at=now, accessed_at=now, **fields)
+        self.prune_history()
+
+    def prune_history(self):
+        """Éviction LRU des tâches terminées au-delà de history_cap"""
+        self._connect().execute(
+            """DELETE FROM upload_queue WHERE id IN (
+                   SELECT id FROM upload_queue WHERE status IN (?, ?)
+                   ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)""",
+            (*FINISHED, self.history_cap)
+        )
+
+    def recover(self) -> List[str]:
+        """
+        Remettre en file les tâches interrompues (processus mort ou
+        réservation expirée)
+
+        Returns:
+            IDs des tâches remises en file
+        """
+        conn = self._connect()
+        now = time.time()
+        hostname = socket.gethostname()
+        recovered = []
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute('SELECT id, owner, heartbeat_at FROM upload_queue WHERE status = ?',
+                                (CLAIMED,)).fetchall()
+            for row in rows:
+                host, _, pid = (row['owner'] or '').rpartition(':')
+                dead = host == hostname and pid.isdigit() and not _pid_alive(int(pid))
+                expired = (row['heartbeat_at'] or 0) < now - self.lease_seconds
+                if row['owner'] == self.owner or dead or expired:
+                    conn.execute('UPDATE upload_queue SET status = ?, owner = NULL WHERE id = ?',
+                                 (PENDING, row['id']))
+                    recovered.append(row['id'])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if recovered:
+            with self._cond:
+                self._cond.notify_all()
+        return recovered
+
+    # Lecture
+
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """Tâche par ID (rafraîchit sa position LRU)"""
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM upload_queue WHERE id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        conn.execute('UPDATE upload_queue SET accessed_at = ? WHERE id = ?', (time.time(), task_id))
+        task = dict(row)
+        task['metadata'] = json.loads(task['metadata'] or '{}')
+        return task
+
+    def is_queued(self, local_path: str) -> bool:
+        """Une tâche en attente ou en cours existe-t-elle pour ce fichier"""
+        return self._connect().execute(
+            'SELECT 1 FROM upload_queue WHERE local_path = ? AND status IN (?, ?) LIMIT 1',
+            (local_path, PENDING, CLAIMED)
+        ).fetchone() is not None
+
+    def qsize(self) -> int:
+        return self._connect().execute('SELECT COUNT(*) FROM upload_queue WHERE status = ?',
+                                       (PENDING,)).fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Profondeur par voie, âge de la plus ancienne tâche, débit"""
+        conn = self._connect()
+        now = time.time()
+        lanes = {name: 0 for name in PRIORITY_NAMES}
+        by_priority = {v: k for k, v in PRIORITY_NAMES.items()}
+        for row in conn.execute('SELECT priority, COUNT(*) AS n FROM upload_queue WHERE status = ? '
+                                'GROUP BY priority', (PENDING,)):
+            lanes[by_priority.get(row['priority'], str(row['priority']))] = row['n']
+
+        oldest = conn.execute('SELECT MIN(created_at) FROM upload_queue WHERE status IN (?, ?)',
+                              (PENDING, CLAIMED)).fetchone()[0]
+        active = conn.execute('SELECT COUNT(*) FROM upload_queue WHERE status = ?',
+                              (CLAIMED,)).fetchone()[0]
+
+        window_start = now - THROUGHPUT_WINDOW
+        done = conn.execute(
+            """SELECT COALESCE(SUM(total_bytes), 0), MIN(started_at) FROM upload_queue
+               WHERE status = 'completed' AND finished_at >= ?""",
+            (window_start,)
+        ).fetchone()
+        elapsed = now - max(window_start, done[1] or now)
+        throughput = done[0] / elapsed if elapsed > 0 else 0.0
+
+        return {
+            'queue_depth': sum(lanes.values()),
+            'queue_lanes': lanes,
+            'in_progress': active,
+            'oldest_task_age_seconds': round(now - oldest, 1) if oldest else 0.0,
+            'throughput_bytes_per_sec': round(throughput, 1),
+        }
@@ -0,0 +1,269 @@
+"""
+Service de diffusion des vidéos stockées localement (static/videos)
+
+- Requêtes HTTP Range (simples et multiples, multipart/byteranges)
+- ETag / Last-Modified, If-None-Match / If-Modified-Since / If-Range
+- Envoi zéro-copie via wsgi.file_wrapper (os.sendfile sous gunicorn)
+- Mode ?t=début-fin: intervalle de temps -> plage d'octets via l'index moov
+"""
+
+import logging
+import mimetypes
+import os
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+from flask import Response, request
+
+from .mp4_index import Mp4IndexError, load_file_index
+
+logger = logging.getLogger(__name__)
+
+# Répertoires où les moteurs d'enregistrement écrivent les vidéos
+BACKEND_ROOT = Path(__file__).resolve().parent.parent.parent
+VIDEO_DIRS = [
+    Path('static/videos'),                  # VideoRecordingEngine / enregistreurs (cwd)
+    BACKEND_ROOT / 'static' / 'videos',     # VideoConfig.VIDEOS_DIR (VideoRecorder)
+    BACKEND_ROOT / 'src' / 'static' / 'videos',
+]
+
+READ_CHUNK_SIZE = 256 * 1024
+MAX_RANGES = 16
+
+
+def resolve_local_video(filename: str) -> Optional[Path]:
+    """
+    Trouver un fichier vidéo local à partir de son nom
+
+    Cherche dans les répertoires vidéo et leurs sous-dossiers par club
+    (static/videos/<club_id>/). Refuse tout chemin hors de ces dossiers.
+    """
+    name = os.path.basename(filename or '')
+    if not name or name != filename.replace('\\', '/').split('/')[-1] or name.startswith('.'):
+        return None
+
+    for base in VIDEO_DIRS:
+        if not base.is_dir():
+            continue
+        candidate = base / name
+        if candidate.is_file():
+            return candidate
+        for club_dir in base.iterdir():
+            candidate = club_dir / name
+            if club_dir.is_dir() and candidate.is_file():
+                return candidate
+    return None
+
+
+def local_path_from_url(file_url: Optional[str]) -> Optional[Path]:
+    """Chemin local d'une vidéo si son file_url pointe vers static/videos"""
+    if not file_url or file_url.startswith(('http://', 'https://')):
+        return None
+    return resolve_local_video(file_url.rstrip('/').split('/')[-1])
+
+
+def make_etag(stat: os.stat_result) -> str:
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def parse_time_range(value: str) -> Tuple[float, Optional[float]]:
+    """Parser ?t=début-fin (secondes, fin optionnelle)"""
+    start, _, end = value.partition('-')
+    start_s = float(start) if start else 0.0
+    end_s = float(end) if end else None
+    if start_s < 0 or (end_s is not None and end_s <= start_s):
+        raise ValueError(f"Intervalle de temps invalide: {value}")
+    return start_s, end_s
+
+
+def parse_range_header(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parser un header Range (bytes=...)
+
+    Returns:
+        Liste de (début, fin incluse), [] si non satisfiable, None si header ignoré
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition('-')
+        if not sep:
+            return None
+        try:
+            if first == '':
+                # Suffixe: N derniers octets
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(0, size - length), size - 1))
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if start >= size:
+                    continue
+                if start > end:
+                    return None
+                ranges.append((start, min(end, size - 1)))
+        except ValueError:
+            return None
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Fusionner les plages qui se chevauchent (évite les abus multi-range)
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _not_modified(etag: str, mtime: float) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        return etag in [t.strip() for t in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _if_range_ok(etag: str, last_modified: str) -> bool:
+    """If-Range: la plage n'est servie que si la ressource n'a pas changé"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag  # Comparaison forte
+    return if_range == last_modified
+
+
+def _read_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Lire [start, end] par blocs (sans charger le fichier en mémoire)"""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _file_body(path: Path, start: int, end: int, size: int):
+    """
+    Corps de réponse pour une plage unique
+
+    Sous gunicorn, wsgi.file_wrapper envoie le fichier avec os.sendfile en
+    partant de la position courante et en s'arrêtant à Content-Length.
+    Ailleurs, le file_wrapper lirait jusqu'à EOF: on ne l'utilise alors
+    que si la plage va jusqu'à la fin du fichier.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    honours_length = request.environ.get('SERVER_SOFTWARE', '').startswith('gunicorn')
+    if file_wrapper and (honours_length or end == size - 1):
+        f = open(path, 'rb')
+        f.seek(start)
+        return file_wrapper(f, READ_CHUNK_SIZE)
+    return _read_range(path, start, end)
+
+
+def _multipart_body(path: Path, ranges, size: int, mimetype: str, boundary: str):
+    parts = []
+    for start, end in ranges:
+        header = (f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                  f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n").encode()
+        parts.append((header, start, end))
+    closing = f"\r\n--{boundary}--\r\n".encode()
+    length = sum(len(h) + e - s + 1 for h, s, e in parts) + len(closing)
+
+    def generate():
+        for header, start, end in parts:
+            yield header
+            yield from _read_range(path, start, end)
+        yield closing
+
+    return generate(), length
+
+
+def serve_video_file(path: Path, download_name: Optional[str] = None,
+                     as_attachment: bool = False) -> Response:
+    """
+    Réponse Flask pour un fichier vidéo local avec support Range complet
+
+    Args:
+        path: Chemin du fichier
+        download_name: Nom proposé au client
+        as_attachment: Content-Disposition attachment (téléchargement)
+    """
+    stat = path.stat()
+    size = stat.st_size
+    etag = make_etag(stat)
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    mimetype = mimetypes.guess_type(path.name)[0] or 'video/mp4'
+
+    disposition = 'attachment' if as_attachment else 'inline'
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Last-Modified': last_modified,
+        'Cache-Control': 'private, max-age=3600',
+        'Content-Disposition': f'{disposition}; filename="{download_name or path.name}"',
+    }
+
+    if _not_modified(etag, stat.st_mtime):
+        return Response(status=304, headers=headers)
+
+    ranges = None
+    time_range = request.args.get('t')
+    if time_range:
+        try:
+            start_s, end_s = parse_time_range(time_range)
+            index = load_file_index(str(path))
+            first, last, actual_start = index.byte_range_for_time(start_s, end_s or index.duration)
+            ranges = [(first, last)]
+            headers['X-Time-Range-Start'] = f"{actual_start:.3f}"
+        except (ValueError, Mp4IndexError) as e:
+            return Response(f"Intervalle de temps invalide: {e}", status=416, headers=headers)
+    elif 'Range' in request.headers and _if_range_ok(etag, last_modified):
+        ranges = parse_range_header(request.headers['Range'], size)
+        if ranges == []:
+            headers['Content-Range'] = f'bytes */{size}'
+            return Response(status=416, headers=headers)
+
+    # Fichier complet
+    if not ranges:
+        headers['Content-Length'] = str(size)
+        return Response(_file_body(path, 0, size - 1, size), status=200,
+                        mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    # Plage unique
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+        return Response(_file_body(path, start, end, size), status=206,
+                        mimetype=mimetype, headers=headers, direct_passthrough=True)
+
+    # Plages multiples: multipart/byteranges
+    boundary = uuid.uuid4().hex
+    body, length = _multipart_body(path, ranges, size, mimetype, boundary)
+    headers['Content-Length'] = str(length)
+    return Response(body, status=206, headers=headers, direct_passthrough=True,
+                    content_type=f'multipart/byteranges; boundary={boundary}')
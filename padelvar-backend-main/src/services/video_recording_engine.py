@@ -67,6 +67,8 @@ from ..models.database import db
 from ..models.user import Video, Court, User
 from .bunny_storage_service import bunny_storage_service
 from .logging_service import get_logger, LogLevel
+from .event_stream import publish_event
+from .thumbnail_pipeline import thumbnail_pipeline
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -311,7 +313,7 @@ class VideoRecordingEngine:
                 logger.info(f"⏹️ Arrêt enregistrement: {session_id}")
 
                 # 1. MARQUER COMME EN COURS D'ARRÊT
-                recording['state'] = RecordingState.STOPPING
+                self._set_state(recording, RecordingState.STOPPING)
                 recording['end_time'] = datetime.now()
 
                 # 2. ARRÊTER LE PROCESSUS
@@ -335,8 +337,7 @@ class VideoRecordingEngine:
 
             except Exception as e:
                 logger.error(f"❌ Erreur arrêt enregistrement {session_id}: {e}")
-                recording['state'] = RecordingState.ERROR
-                recording['error'] = str(e)
+                self._set_state(recording, RecordingState.ERROR, error=str(e))
                 return {
                     'status': 'error',
                     'error': str(e),
@@ -418,6 +419,18 @@ class VideoRecordingEngine:
         else:
             return 'opencv_fallback'
 
+    def _set_state(self, recording: Dict[str, Any], state: RecordingState, error: str = None):
+        """Changer l'état d'un enregistrement et le publier sur le flux SSE du joueur"""
+        recording['state'] = state
+        if error is not None:
+            recording['error'] = error
+        publish_event(recording.get('user_id'), 'recording', {
+            'recording_id': recording['session_id'],
+            'court_id': recording.get('court_id'),
+            'status': state.value,
+            'error': recording.get('error'),
+        })
+
     def _start_recording_process(self, recording: Dict[str, Any]) -> bool:
         """Démarre le processus d'enregistrement selon la méthode"""
         try:
@@ -430,8 +443,7 @@ class VideoRecordingEngine:
 
         except Exception as e:
             logger.error(f"❌ Erreur démarrage processus {recording['session_id']}: {e}")
-            recording['state'] = RecordingState.ERROR
-            recording['error'] = str(e)
+            self._set_state(recording, RecordingState.ERROR, error=str(e))
             return False
 
     def _start_ffmpeg_recording(self, recording: Dict[str, Any]) -> bool:
@@ -498,15 +510,14 @@ class VideoRecordingEngine:
             # Enregistrer le processus
             self._recording_processes[session_id] = process
             recording['process_pid'] = process.pid
-            recording['state'] = RecordingState.RECORDING
+            self._set_state(recording, RecordingState.RECORDING)
 
             logger.info(f"✅ FFmpeg démarré (PID: {process.pid}): {session_id}")
             return True
 
         except Exception as e:
             logger.error(f"❌ Erreur FFmpeg pour {session_id}: {e}")
-            recording['state'] = RecordingState.ERROR
-            recording['error'] = str(e)
+            self._set_state(recording, RecordingState.ERROR, error=str(e))
             return False
 
     def _start_opencv_recording(self, recording: Dict[str, Any]) -> bool:
@@ -523,14 +534,13 @@ class VideoRecordingEngine:
             )
             opencv_thread.start()
 
-            recording['state'] = RecordingState.RECORDING
+            self._set_state(recording, RecordingState.RECORDING)
             logger.info(f"✅ OpenCV démarré: {session_id}")
             return True
 
         except Exception as e:
             logger.error(f"❌ Erreur OpenCV pour {session_id}: {e}")
-            recording['state'] = RecordingState.ERROR
-            recording['error'] = str(e)
+            self._set_state(recording, RecordingState.ERROR, error=str(e))
             return False
 
     def _opencv_recording_worker(self, recording: Dict[str, Any]):
@@ -609,8 +619,7 @@ class VideoRecordingEngine:
             logger.error(f"❌ Erreur dans worker OpenCV {session_id}: {e}")
             with self._state_lock:
                 if session_id in self._active_recordings:
-                    self._active_recordings[session_id]['state'] = RecordingState.ERROR
-                    self._active_recordings[session_id]['error'] = str(e)
+                    self._set_state(self._active_recordings[session_id], RecordingState.ERROR, error=str(e))
         finally:
             # Nettoyage
             if cap:
@@ -698,7 +707,7 @@ class VideoRecordingEngine:
 
             logger.info(f"📊 Vidéo créée: ID {video.id}, Durée: {duration}s, Taille: {file_size} bytes")
 
-            recording['state'] = RecordingState.COMPLETED
+            self._set_state(recording, RecordingState.COMPLETED)
 
             return {
                 'status': 'completed',
@@ -713,8 +722,7 @@ class VideoRecordingEngine:
         except Exception as e:
             logger.error(f"❌ Erreur finalisation {session_id}: {e}")
             if session_id in self._active_recordings:
-                self._active_recordings[session_id]['state'] = RecordingState.ERROR
-                self._active_recordings[session_id]['error'] = str(e)
+                self._set_state(self._active_recordings[session_id], RecordingState.ERROR, error=str(e))
 
             return {
                 'status': 'error',
@@ -817,28 +825,19 @@ class VideoRecordingEngine:
             logger.error(f"❌ Erreur programmation upload: {e}")
 
     def _generate_thumbnail(self, video_path: str, session_id: str) -> Optional[str]:
-        """Génère une miniature pour la vidéo"""
+        """Génère une miniature pour la vidéo (poster du pipeline de vignettes)"""
         try:
             thumbnail_path = self.thumbnail_dir / f"{session_id}.jpg"
 
-            # Essayer avec FFmpeg d'abord
-            ffmpeg_cmd = [
-                FFMPEG_PATH,
-                '-i', video_path,
-                '-vf', 'select=eq(n\\,0)',
-                '-vframes', '1',
-                '-f', 'image2',
-                '-y',
-                str(thumbnail_path)
-            ]
-
-            result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, timeout=30)
-
-            if result.returncode == 0 and thumbnail_path.exists():
-                logger.info(f"📸 Miniature FFmpeg créée: {thumbnail_path}")
+            # Poster, sprite et bande en une passe FFmpeg (mis en cache par contenu)
+            try:
+                previews = thumbnail_pipeline.generate(video_path)
+                shutil.copyfile(thumbnail_pipeline.poster_path(previews), thumbnail_path)
+                logger.info(f"📸 Miniature créée: {thumbnail_path}")
                 return str(thumbnail_path)
-            else:
+            except Exception as e:
                 # Fallback OpenCV
+                logger.warning(f"⚠️ Pipeline de vignettes indisponible: {e}")
                 return self._generate_thumbnail_opencv(video_path, str(thumbnail_path))
 
         except Exception as e:
@@ -905,8 +904,7 @@ class VideoRecordingEngine:
                 process = self._recording_processes[session_id]
                 if process.poll() is not None:
                     logger.warning(f"⚠️ Processus FFmpeg terminé prématurément: {session_id}")
-                    recording['state'] = RecordingState.ERROR
-                    recording['error'] = "Processus FFmpeg terminé prématurément"
+                    self._set_state(recording, RecordingState.ERROR, error="Processus FFmpeg terminé prématurément")
                     self._thread_pool.submit(self.stop_recording, session_id)
 
     def _cleanup_recording_state(self, session_id: str):
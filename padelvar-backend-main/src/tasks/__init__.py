@@ -7,4 +7,7 @@ Tâches asynchrones Celery pour PadelVar
 from .video_processing import *
 from .notification_tasks import *
 from .maintenance_tasks import *
-from .payment_tasks import *
\ No newline at end of file
+from .payment_tasks import *
+
+# Publication des changements de modèles (notifications, jobs, clips) vers le flux SSE
+from ..services import event_stream  # noqa: F401
@@ -19,6 +19,9 @@ from ..models.user import (
     Transaction, TransactionStatus, UserStatus
 )
 from ..middleware.idempotence import IdempotenceMiddleware
+from ..services.leaderboard import leaderboard
+from ..services.popular_clubs import popular_clubs
+from ..services.recording_state import recording_registry
 from .notification_tasks import send_notification
 
 logger = logging.getLogger(__name__)
@@ -95,6 +98,7 @@ def cleanup_zombie_sessions():
                     session.end_time = datetime.utcnow()
                     
                     # Libérer le terrain
+                    recording_registry.release_court(session.court_id, session.recording_id)
                     if session.court:
                         session.court.is_recording = False
                         session.court.recording_session_id = None
@@ -167,6 +171,32 @@ def cleanup_expired_idempotency_keys():
         logger.error(f"Erreur lors du nettoyage des clés d'idempotence: {str(e)}")
         return {'error': str(e)}
 
+@celery_app.task
+def refresh_popular_clubs():
+    """
+    Recalcule le classement des clubs populaires (recommandations du dashboard joueur)
+    """
+    try:
+        ranking = popular_clubs.refresh()
+        return {'popular_clubs': len(ranking)}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors du rafraîchissement des clubs populaires: {str(e)}")
+        return {'error': str(e)}
+
+@celery_app.task
+def rebuild_leaderboards():
+    """
+    Reconstruit les classements joueurs (sorted sets Redis) depuis la base
+    """
+    try:
+        players_count = leaderboard.rebuild()
+        return {'leaderboard_players': players_count}
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de la reconstruction des classements: {str(e)}")
+        return {'error': str(e)}
+
 @celery_app.task
 def cleanup_old_notifications():
     """
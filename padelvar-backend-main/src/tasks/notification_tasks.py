@@ -12,6 +12,10 @@ from typing import Optional
 from ..celery_app import celery_app
 from ..models.database import db
 from ..models.user import User, Notification, NotificationType
+from ..services.bulk_notification_service import (
+    EMAIL_BATCH_SIZE, EMAIL_PRIORITIES, NOTIFICATION_BATCH_SIZE,
+    chunked, insert_notification_batch, send_email_batch
+)
 
 logger = logging.getLogger(__name__)
 
@@ -146,31 +150,96 @@ def send_email_notification(self, user_id, title, message, notification_id=None)
 def send_bulk_notification(self, user_ids, notification_type, title, message, **kwargs):
     """
     Envoie une notification à plusieurs utilisateurs
+    
+    Une tâche par lot de NOTIFICATION_BATCH_SIZE utilisateurs (et non une
+    par utilisateur): 20k abonnés = 20 messages broker et 20 transactions.
     """
     try:
+        user_ids = list(dict.fromkeys(user_ids))  # Dédoublonner en gardant l'ordre
         logger.info(f"Envoi de notification en masse à {len(user_ids)} utilisateurs")
         
-        results = []
-        for user_id in user_ids:
-            result = send_notification.delay(
-                user_id=user_id,
+        batches = []
+        for batch in chunked(user_ids, NOTIFICATION_BATCH_SIZE):
+            result = send_notification_batch.delay(
+                user_ids=list(batch),
                 notification_type=notification_type,
                 title=title,
                 message=message,
                 **kwargs
             )
-            results.append({'user_id': user_id, 'task_id': result.id})
+            batches.append({'size': len(batch), 'task_id': result.id})
         
         return {
             'status': 'scheduled',
             'total_users': len(user_ids),
-            'tasks': results
+            'batches': batches
         }
         
     except Exception as e:
         logger.error(f"Erreur lors de l'envoi en masse: {str(e)}")
         return {'status': 'failed', 'error': str(e)}
 
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=30)
+def send_notification_batch(self, user_ids, notification_type, title, message,
+                            priority='normal', **kwargs):
+    """
+    Crée les notifications d'un lot (un INSERT multi-lignes, un commit) puis
+    planifie les emails par groupes de EMAIL_BATCH_SIZE
+    """
+    try:
+        recipients = insert_notification_batch(
+            user_ids, notification_type, title, message, priority=priority, **kwargs
+        )
+        logger.info(f"{len(recipients)}/{len(user_ids)} notifications créées ({notification_type})")
+        
+        email_batches = 0
+        if priority in EMAIL_PRIORITIES:
+            for group in chunked(recipients, EMAIL_BATCH_SIZE):
+                send_email_batch_notification.delay(
+                    recipients=[list(r) for r in group],
+                    title=title,
+                    message=message
+                )
+                email_batches += 1
+        
+        return {
+            'status': 'sent',
+            'created': len(recipients),
+            'skipped': len(user_ids) - len(recipients),
+            'email_batches': email_batches
+        }
+        
+    except ValueError as e:
+        logger.error(f"Type de notification invalide: {notification_type}")
+        return {'status': 'error', 'message': str(e)}
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur lors de l'envoi du lot de notifications: {str(e)}")
+        
+        # Retry si possible (le lot entier, la transaction ayant été annulée)
+        if self.request.retries < self.max_retries:
+            logger.info(f"Retry {self.request.retries + 1}/{self.max_retries}")
+            raise self.retry(exc=e)
+        
+        return {'status': 'failed', 'error': str(e)}
+
+@celery_app.task(bind=True, max_retries=2)
+def send_email_batch_notification(self, recipients, title, message):
+    """
+    Envoie un groupe d'emails de notification sur une connexion SMTP partagée
+    
+    Args:
+        recipients: [[user_id, email, nom], ...]
+    """
+    try:
+        result = send_email_batch(recipients, title, message)
+        logger.info(f"Emails de notification: {result['sent']} envoyés, {result['failed']} en échec")
+        return dict(result, status='sent')
+        
+    except Exception as e:
+        logger.error(f"Erreur lors de l'envoi d'emails groupés: {str(e)}")
+        return {'status': 'failed', 'error': str(e)}
+
 @celery_app.task
 def notify_recording_reminder(session_id, minutes_before_end=10):
     """
@@ -211,14 +280,12 @@ def notify_system_maintenance(start_time, end_time, description):
     try:
         from ..models.user import UserStatus
         
-        # Récupérer tous les utilisateurs actifs
-        active_users = User.query.filter_by(status=UserStatus.ACTIVE).all()
+        # Récupérer les ids des utilisateurs actifs (sans charger les objets)
+        user_ids = [row.id for row in db.session.query(User.id).filter_by(status=UserStatus.ACTIVE)]
         
-        if not active_users:
+        if not user_ids:
             return {'status': 'no_users', 'total': 0}
         
-        user_ids = [user.id for user in active_users]
-        
         # Envoyer la notification en masse
         result = send_bulk_notification.delay(
             user_ids=user_ids,
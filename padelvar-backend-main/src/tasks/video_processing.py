@@ -7,8 +7,6 @@ Gère l'enregistrement, la conversion et l'upload vers Bunny CDN
 
 import os
 import logging
-import subprocess
-import time
 from datetime import datetime, timedelta
 from celery import current_task
 from sqlalchemy.exc import SQLAlchemyError
@@ -17,8 +15,8 @@ from ..celery_app import celery_app
 from ..models.database import db
 from ..models.user import User, RecordingSession, Notification, NotificationType
 from ..models.recording import Recording
-from ..services.ffmpeg_runner import FFmpegRunner
 from ..services.bunny_storage_service import BunnyStorageService
+from ..services.recording_supervisor import REASON_FAILED, REASON_TIMEOUT, publish_stop, submit_start
 from ..tasks.notification_tasks import send_notification
 
 logger = logging.getLogger(__name__)
@@ -26,11 +24,14 @@ logger = logging.getLogger(__name__)
 @celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
 def process_video_recording(self, session_id):
     """
-    Traite une session d'enregistrement vidéo de manière asynchrone
-    1. Lance l'enregistrement FFmpeg
-    2. Surveille le processus
-    3. Upload vers Bunny CDN
-    4. Met à jour les statuts et notifie l'utilisateur
+    Lance une session d'enregistrement vidéo de manière asynchrone
+    1. Vérifie la session
+    2. Confie FFmpeg au superviseur d'enregistrements (pas de polling ici)
+    3. Notifie l'utilisateur
+    
+    La tâche rend la main immédiatement: le superviseur suit la fin du
+    processus, la durée maximale et les demandes d'arrêt (Redis pub/sub),
+    puis déclenche finalize_video_recording.
     """
     task_id = self.request.id
     logger.info(f"Démarrage tâche traitement vidéo - Session: {session_id}, Task: {task_id}")
@@ -46,9 +47,6 @@ def process_video_recording(self, session_id):
             logger.warning(f"Session {session_id} n'est pas active (statut: {session.status})")
             return {'status': 'skipped', 'reason': 'session_not_active'}
         
-        # Mise à jour du statut
-        current_task.update_state(state='PROGRESS', meta={'step': 'initializing', 'progress': 0})
-        
         # 1. Configuration FFmpeg
         court = session.court
         user = session.user
@@ -58,17 +56,16 @@ def process_video_recording(self, session_id):
         filename = f"recording_{session_id}_{timestamp}.mp4"
         temp_path = os.path.join("/tmp", filename)
         
-        # 2. Lancement de l'enregistrement FFmpeg
-        current_task.update_state(state='PROGRESS', meta={'step': 'recording', 'progress': 10})
-        
-        ffmpeg = FFmpegRunner()
-        process = ffmpeg.start_recording(
-            camera_url=court.camera_url,
-            output_path=temp_path,
-            duration_minutes=session.planned_duration
-        )
+        # 2. Lancement de l'enregistrement par le superviseur
+        supervised_by = submit_start({
+            'session_id': str(session_id),
+            'camera_url': court.camera_url,
+            'output_path': temp_path,
+            'filename': filename,
+            'max_duration_seconds': session.max_duration * 60,
+        })
         
-        logger.info(f"FFmpeg lancé avec PID: {process.pid} pour session {session_id}")
+        logger.info(f"Enregistrement confié au superviseur ({supervised_by}) pour session {session_id}")
         
         # Notifier l'utilisateur du démarrage
         send_notification.delay(
@@ -80,45 +77,61 @@ def process_video_recording(self, session_id):
             related_resource_id=session_id
         )
         
-        # 3. Surveillance du processus d'enregistrement
-        start_time = time.time()
-        max_duration_seconds = session.max_duration * 60
+        return {
+            'status': 'recording',
+            'session_id': session_id,
+            'output_path': temp_path,
+            'supervised_by': supervised_by
+        }
         
-        while process.poll() is None:  # Processus encore en cours
-            elapsed = time.time() - start_time
-            progress = min(90, int((elapsed / max_duration_seconds) * 80) + 10)
-            
-            current_task.update_state(
-                state='PROGRESS',
-                meta={
-                    'step': 'recording',
-                    'progress': progress,
-                    'elapsed_seconds': int(elapsed),
-                    'max_duration_seconds': max_duration_seconds
-                }
-            )
-            
-            # Vérifier si la session a été arrêtée
-            db.session.refresh(session)
-            if session.status != 'active':
-                logger.info(f"Session {session_id} arrêtée, terminaison de FFmpeg")
-                ffmpeg.stop_recording(process)
-                break
-            
-            # Vérifier timeout
-            if elapsed > max_duration_seconds:
-                logger.warning(f"Timeout atteint pour session {session_id}, arrêt forcé")
-                ffmpeg.stop_recording(process)
-                session.status = 'completed'
-                session.stopped_by = 'auto'
-                session.end_time = datetime.utcnow()
-                break
-                
-            time.sleep(5)  # Vérification toutes les 5 secondes
+    except Exception as e:
+        logger.error(f"Erreur lors du lancement de l'enregistrement pour session {session_id}: {str(e)}")
+        _fail_session(session_id)
+        
+        # Retry si possible
+        if self.request.retries < self.max_retries:
+            logger.info(f"Retry {self.request.retries + 1}/{self.max_retries} pour session {session_id}")
+            raise self.retry(exc=e)
+        
+        return {'status': 'failed', 'error': str(e)}
+
+@celery_app.task(bind=True, max_retries=3, default_retry_delay=60)
+def finalize_video_recording(self, event):
+    """
+    Finalise un enregistrement terminé (déclenchée par le superviseur)
+    1. Vérifie le fichier de sortie
+    2. Upload vers Bunny CDN
+    3. Met à jour les statuts et notifie l'utilisateur
+    
+    Args:
+        event: {'session_id', 'output_path', 'filename', 'reason',
+                'stopped_by', 'returncode', 'duration_seconds'}
+    """
+    session_id = event['session_id']
+    temp_path = event.get('output_path')
+    filename = event.get('filename') or os.path.basename(temp_path or '')
+    logger.info(f"Finalisation session {session_id} (fin: {event.get('reason')}, code: {event.get('returncode')})")
+    
+    try:
+        if event.get('reason') == REASON_FAILED:
+            raise Exception(f"FFmpeg n'a pas démarré: {event.get('error')}")
+        
+        session = RecordingSession.query.filter_by(recording_id=session_id).first()
+        if not session:
+            raise ValueError(f"Session d'enregistrement non trouvée: {session_id}")
+        
+        court = session.court
+        user = session.user
+        
+        # Timeout: arrêt forcé par le superviseur
+        if event.get('reason') == REASON_TIMEOUT and session.status == 'active':
+            session.status = 'completed'
+            session.stopped_by = 'auto'
+            session.end_time = datetime.utcnow()
         
         # 4. Vérification du fichier de sortie
-        if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
-            raise Exception(f"Fichier vidéo non créé ou vide: {temp_path}")
+        if not temp_path or not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+            raise Exception(f"Fichier vidéo non créé ou vide: {temp_path} ({event.get('stderr_tail', '')[-300:]})")
         
         file_size = os.path.getsize(temp_path)
         logger.info(f"Enregistrement terminé - Taille: {file_size} bytes")
@@ -202,39 +215,41 @@ def process_video_recording(self, session_id):
     except Exception as e:
         logger.error(f"Erreur lors du traitement vidéo pour session {session_id}: {str(e)}")
         
-        # Nettoyage en cas d'erreur
-        try:
-            session = RecordingSession.query.filter_by(recording_id=session_id).first()
-            if session and session.status == 'active':
-                session.status = 'failed'
-                session.end_time = datetime.utcnow()
-                
-                # Libérer le terrain
-                if session.court:
-                    session.court.is_recording = False
-                    session.court.recording_session_id = None
-                    session.court.current_recording_id = None
-                
-                # Notification d'erreur
-                send_notification.delay(
-                    user_id=session.user_id,
-                    notification_type=NotificationType.RECORDING_STOPPED.value,
-                    title="Enregistrement échoué",
-                    message="Une erreur s'est produite lors de l'enregistrement. Nos équipes ont été notifiées.",
-                    priority="high"
-                )
-                
-                db.session.commit()
-        except Exception as cleanup_error:
-            logger.error(f"Erreur lors du nettoyage: {cleanup_error}")
-        
-        # Retry si possible
-        if self.request.retries < self.max_retries:
+        # Upload en échec: retry tant que le fichier existe
+        if temp_path and os.path.exists(temp_path) and self.request.retries < self.max_retries:
             logger.info(f"Retry {self.request.retries + 1}/{self.max_retries} pour session {session_id}")
             raise self.retry(exc=e)
         
+        _fail_session(session_id)
         return {'status': 'failed', 'error': str(e)}
 
+def _fail_session(session_id):
+    """Marque la session en échec, libère le terrain et notifie l'utilisateur"""
+    try:
+        session = RecordingSession.query.filter_by(recording_id=session_id).first()
+        if session and session.status == 'active':
+            session.status = 'failed'
+            session.end_time = datetime.utcnow()
+            
+            # Libérer le terrain
+            if session.court:
+                session.court.is_recording = False
+                session.court.recording_session_id = None
+                session.court.current_recording_id = None
+            
+            # Notification d'erreur
+            send_notification.delay(
+                user_id=session.user_id,
+                notification_type=NotificationType.RECORDING_STOPPED.value,
+                title="Enregistrement échoué",
+                message="Une erreur s'est produite lors de l'enregistrement. Nos équipes ont été notifiées.",
+                priority="high"
+            )
+            
+            db.session.commit()
+    except Exception as cleanup_error:
+        logger.error(f"Erreur lors du nettoyage: {cleanup_error}")
+
 @celery_app.task(bind=True, max_retries=2)
 def stop_video_recording(self, session_id, stopped_by='user'):
     """
@@ -257,8 +272,13 @@ def stop_video_recording(self, session_id, stopped_by='user'):
         
         db.session.commit()
         
+        # Signal d'arrêt au superviseur (pub/sub): FFmpeg est arrêté sans attendre de polling
+        delivered = publish_stop(session_id, stopped_by)
+        if not delivered:
+            logger.warning(f"Aucun superviseur n'a reçu l'arrêt de la session {session_id}")
+        
         logger.info(f"Session {session_id} marquée comme arrêtée")
-        return {'status': 'stopped', 'session_id': session_id}
+        return {'status': 'stopped', 'session_id': session_id, 'signal_delivered': delivered}
         
     except Exception as e:
         logger.error(f"Erreur lors de l'arrêt de l'enregistrement {session_id}: {str(e)}")
@@ -30,6 +30,8 @@ class VideoConfig:
     # Proxy settings - UN SEUL TYPE: video_proxy_server.py
     PROXY_BASE_PORT = 8080  # Port de départ pour les proxies MJPEG internes
     PROXY_TYPE = "internal"  # Toujours utiliser le proxy interne
+    # Sources MJPEG: relayer les JPEG caméra sans décodage/ré-encodage
+    MJPEG_PASSTHROUGH = os.getenv('MJPEG_PASSTHROUGH', 'true').lower() == 'true'
     
     # Recording settings
     DEFAULT_DURATION_SECONDS = 90 * 60  # 90 minutes
@@ -47,6 +49,14 @@ class VideoConfig:
     PREVIEW_FPS = 5  # Frames par seconde pour preview
     PREVIEW_JPEG_QUALITY = 70
     PREVIEW_MAX_CLIENTS = 5  # Max viewers simultanés par session
+    PREVIEW_SNAPSHOT_MAX_AGE = 1  # Cache-Control max-age (s) des snapshots
+    PREVIEW_FEED_IDLE_SECONDS = 30  # Fermer la connexion proxy sans viewer/snapshot
+    # Serveur asyncio de fan-out, actif par défaut (hors plage des proxies).
+    # 0 = désactivé: stream servi par Flask, un thread gunicorn par viewer
+    PREVIEW_HUB_PORT = int(os.getenv('PREVIEW_HUB_PORT', '9200'))
+    # URL publique du hub: '/' derrière le reverse proxy (location /preview/),
+    # vide = hôte de la requête + PREVIEW_HUB_PORT
+    PREVIEW_HUB_PUBLIC_URL = os.getenv('PREVIEW_HUB_PUBLIC_URL', '')
     
     # Ports alloués dynamiquement
     _allocated_ports = set()
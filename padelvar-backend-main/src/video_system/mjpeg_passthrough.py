@@ -0,0 +1,381 @@
+"""
+MJPEG Passthrough - Relais MJPEG sans transcodage
+=================================================
+
+Responsabilités:
+- Parser le flux multipart/x-mixed-replace d'une caméra MJPEG
+- Découper un flux de JPEG concaténés (sortie FFmpeg -f mjpeg)
+- Conserver les octets JPEG originaux (aucun décodage / ré-encodage)
+- Lire les dimensions depuis l'en-tête SOF du JPEG
+
+Module sans dépendance interne: il est importé à la fois par le package
+video_system et par les scripts proxy lancés en subprocess.
+"""
+
+import logging
+import re
+from typing import Iterator, List, Optional, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+MULTIPART_CONTENT_TYPE = 'multipart/x-mixed-replace'
+
+# Taille max d'une part non terminée avant abandon (protection mémoire)
+MAX_PART_SIZE = 8 * 1024 * 1024
+READ_CHUNK_SIZE = 64 * 1024
+
+_BOUNDARY_RE = re.compile(r'boundary="?([^";,]+)"?', re.IGNORECASE)
+_CONTENT_LENGTH_RE = re.compile(rb'content-length:\s*(\d+)', re.IGNORECASE)
+
+JPEG_SOI = b'\xff\xd8'
+JPEG_EOI = b'\xff\xd9'
+
+# Marqueurs SOF (Start Of Frame) portant les dimensions, hors DHT/JPG/DAC
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def is_mjpeg_content_type(content_type: Optional[str]) -> bool:
+    """Vérifier si un Content-Type correspond à un flux MJPEG multipart"""
+    return bool(content_type) and content_type.lower().startswith(MULTIPART_CONTENT_TYPE)
+
+
+def parse_boundary(content_type: Optional[str]) -> Optional[bytes]:
+    """
+    Extraire le boundary d'un Content-Type multipart
+
+    Returns:
+        Boundary sans le préfixe '--', ou None
+    """
+    if not content_type:
+        return None
+    match = _BOUNDARY_RE.search(content_type)
+    if not match:
+        return None
+    boundary = match.group(1).strip()
+    # Certaines caméras incluent déjà le '--' dans le header
+    if boundary.startswith('--'):
+        boundary = boundary[2:]
+    return boundary.encode('latin-1')
+
+
+def read_jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Lire (hauteur, largeur) depuis le segment SOF d'un JPEG, sans décoder
+
+    Returns:
+        (H, W) ou None si l'en-tête est invalide
+    """
+    size = len(data)
+    if size < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+
+    pos = 2
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+
+        # Octets de remplissage 0xFF
+        if marker == 0xFF:
+            pos += 1
+            continue
+
+        # Marqueurs sans longueur (RSTn, TEM)
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+            continue
+
+        # SOS / EOI: plus d'en-tête après
+        if marker in (0xDA, 0xD9):
+            return None
+
+        seg_len = (data[pos + 2] << 8) | data[pos + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > size:
+                return None
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return height, width
+
+        pos += 2 + seg_len
+
+    return None
+
+
+class MJPEGPartParser:
+    """
+    Parser incrémental d'un flux multipart MJPEG
+
+    Les octets reçus sont accumulés dans un bytearray avec un curseur de
+    lecture; la recherche du prochain boundary reprend là où elle s'était
+    arrêtée au lieu de re-scanner tout le buffer à chaque chunk.
+    """
+
+    def __init__(self, boundary: bytes, max_part_size: int = MAX_PART_SIZE):
+        self.delimiter = b'--' + boundary
+        self.max_part_size = max_part_size
+
+        self._buf = bytearray()
+        self._pos = 0           # Début de la part courante
+        self._scan_from = 0     # Reprise de la recherche
+        self._body_start = None
+        self._body_length = None
+
+        self.parts_parsed = 0
+        self.bytes_discarded = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """
+        Ajouter des octets et retourner les JPEG complets trouvés
+        """
+        self._buf += chunk
+        frames = []
+
+        while True:
+            frame = self._next_part()
+            if frame is None:
+                break
+            if frame:
+                frames.append(frame)
+
+        self._compact()
+        return frames
+
+    def _next_part(self) -> Optional[bytes]:
+        """Extraire la prochaine part; b'' si part vide, None si incomplète"""
+        buf = self._buf
+
+        # 1. Localiser les headers de la part
+        if self._body_start is None:
+            start = buf.find(self.delimiter, self._pos)
+            if start < 0:
+                # Garder la fin au cas où le délimiteur serait coupé
+                keep = len(self.delimiter)
+                if len(buf) - self._pos > keep:
+                    self.bytes_discarded += len(buf) - self._pos - keep
+                    self._pos = len(buf) - keep
+                return None
+
+            headers_end = buf.find(b'\r\n\r\n', start)
+            if headers_end < 0:
+                self._pos = start
+                return None
+
+            headers = bytes(buf[start:headers_end])
+            match = _CONTENT_LENGTH_RE.search(headers)
+            self._body_length = int(match.group(1)) if match else None
+            self._body_start = headers_end + 4
+            self._scan_from = self._body_start
+
+        # 2. Extraire le corps (Content-Length si présent, sinon boundary suivant)
+        body_start = self._body_start
+        if self._body_length is not None:
+            body_end = body_start + self._body_length
+            if body_end > len(buf):
+                return self._check_overflow()
+            next_pos = body_end
+        else:
+            # Reprendre la recherche en reculant de la taille du délimiteur
+            scan = max(body_start, self._scan_from - len(self.delimiter))
+            body_end = buf.find(self.delimiter, scan)
+            if body_end < 0:
+                self._scan_from = len(buf)
+                return self._check_overflow()
+            next_pos = body_end
+            # Retirer le CRLF qui précède le délimiteur
+            while body_end > body_start and buf[body_end - 1] in (0x0A, 0x0D):
+                body_end -= 1
+
+        frame = bytes(buf[body_start:body_end])
+        self._pos = next_pos
+        self._body_start = None
+        self._body_length = None
+        self.parts_parsed += 1
+        return frame
+
+    def _check_overflow(self) -> None:
+        """Abandonner une part trop grande (flux corrompu)"""
+        if len(self._buf) - self._body_start > self.max_part_size:
+            logger.warning("⚠️ Part MJPEG trop grande, resynchronisation sur le boundary suivant")
+            self.bytes_discarded += len(self._buf) - self._pos
+            self._pos = self._body_start
+            self._body_start = None
+            self._body_length = None
+        return None
+
+    def _compact(self):
+        """Libérer les octets déjà consommés"""
+        if self._pos == 0:
+            return
+        del self._buf[:self._pos]
+        if self._body_start is not None:
+            self._body_start -= self._pos
+        self._scan_from = max(0, self._scan_from - self._pos)
+        self._pos = 0
+
+
+class JPEGFrameParser:
+    """
+    Parser incrémental de JPEG concaténés (SOI 0xFFD8 ... EOI 0xFFD9)
+
+    - bytearray + curseur de lecture: pas de copie du buffer à chaque frame
+    - recherche de l'EOI reprise à la position précédente (O(n) au total)
+    - frames retournées en memoryview (zéro copie)
+    - en cas de débordement, resynchronisation sur le dernier SOI au lieu
+      de jeter tout le buffer
+
+    Les memoryview restent valides après les appels suivants à feed():
+    le buffer n'est jamais redimensionné tant qu'il a des vues exportées,
+    il est remplacé par un nouveau bytearray contenant la frame en cours.
+    """
+
+    def __init__(self, max_buffer_size: int = MAX_PART_SIZE):
+        self.max_buffer_size = max_buffer_size
+
+        self._buf = bytearray()
+        self._pos = 0           # Début des octets non consommés
+        self._start = -1        # Position du SOI de la frame en cours
+        self._scan_from = 0     # Reprise de la recherche d'EOI
+        self._exported = False  # memoryview exportées sur self._buf
+
+        self.frames_parsed = 0
+        self.bytes_discarded = 0
+        self.overflows = 0
+
+    def feed(self, chunk: bytes) -> List[memoryview]:
+        """Ajouter des octets et retourner les JPEG complets trouvés"""
+        self._compact()
+        self._buf += chunk
+
+        frames = []
+        view = None
+        buf = self._buf
+
+        while True:
+            if self._start < 0:
+                start = buf.find(JPEG_SOI, self._pos)
+                if start < 0:
+                    # Garder le dernier octet (SOI coupé entre deux chunks)
+                    end = len(buf) - 1
+                    if end > self._pos:
+                        self.bytes_discarded += end - self._pos
+                        self._pos = end
+                    break
+                if start > self._pos:
+                    self.bytes_discarded += start - self._pos
+                self._start = start
+                self._pos = start
+                self._scan_from = start + 2
+
+            end = buf.find(JPEG_EOI, self._scan_from)
+            if end < 0:
+                # Reprendre la recherche au dernier octet (EOI coupé)
+                self._scan_from = max(self._start + 2, len(buf) - 1)
+                break
+
+            if view is None:
+                view = memoryview(buf)
+                self._exported = True
+            frames.append(view[self._start:end + 2])
+            self.frames_parsed += 1
+            self._pos = end + 2
+            self._start = -1
+
+        if self._start >= 0 and len(buf) - self._start > self.max_buffer_size:
+            self._resync()
+
+        return frames
+
+    def _resync(self):
+        """Frame en cours trop grande: repartir du dernier SOI trouvé"""
+        self.overflows += 1
+        last_soi = self._buf.rfind(JPEG_SOI, self._start + 2)
+        new_pos = last_soi if last_soi >= 0 else len(self._buf)
+        logger.warning(f"⚠️ Frame JPEG > {self.max_buffer_size} octets, resynchronisation")
+        self.bytes_discarded += new_pos - self._pos
+        self._pos = new_pos
+        self._start = -1
+
+    def _compact(self):
+        """Libérer les octets consommés (copie de la seule frame en cours)"""
+        if self._pos == 0:
+            return
+        if self._exported:
+            # Des memoryview pointent sur l'ancien buffer: on en crée un neuf
+            self._buf = bytearray(memoryview(self._buf)[self._pos:])
+            self._exported = False
+        else:
+            del self._buf[:self._pos]
+        if self._start >= 0:
+            self._start -= self._pos
+        self._scan_from = max(0, self._scan_from - self._pos)
+        self._pos = 0
+
+    @property
+    def buffered(self) -> int:
+        """Octets en attente dans le buffer"""
+        return len(self._buf) - self._pos
+
+
+class MJPEGPassthroughReader:
+    """
+    Lecteur HTTP d'une caméra MJPEG qui renvoie les JPEG originaux
+
+    Usage:
+        reader = MJPEGPassthroughReader(url)
+        for jpeg in reader.iter_frames(stop_event):
+            ...
+    """
+
+    def __init__(self, url: str, timeout: float = 10.0, chunk_size: int = READ_CHUNK_SIZE):
+        self.url = url
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.content_type: Optional[str] = None
+        self.frames_read = 0
+        self.last_shape: Optional[Tuple[int, int]] = None
+
+    def open(self) -> requests.Response:
+        """
+        Ouvrir le flux et vérifier qu'il s'agit bien de MJPEG multipart
+
+        Raises:
+            ValueError: si la source n'est pas un flux multipart MJPEG
+        """
+        response = requests.get(self.url, stream=True, timeout=self.timeout)
+        response.raise_for_status()
+
+        self.content_type = response.headers.get('Content-Type', '')
+        if not is_mjpeg_content_type(self.content_type):
+            response.close()
+            raise ValueError(f"Source non MJPEG multipart (Content-Type: {self.content_type})")
+
+        return response
+
+    def iter_frames(self, stop_event=None) -> Iterator[bytes]:
+        """
+        Générer les JPEG bruts du flux jusqu'à stop_event ou fin du flux
+        """
+        response = self.open()
+        boundary = parse_boundary(self.content_type) or b'frame'
+        parser = MJPEGPartParser(boundary)
+
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if stop_event is not None and stop_event.is_set():
+                    break
+                if not chunk:
+                    continue
+
+                for jpeg in parser.feed(chunk):
+                    shape = read_jpeg_dimensions(jpeg)
+                    if shape is None:
+                        continue  # Part non JPEG ou tronquée
+                    self.last_shape = shape
+                    self.frames_read += 1
+                    yield jpeg
+        finally:
+            response.close()
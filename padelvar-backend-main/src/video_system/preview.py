@@ -8,18 +8,387 @@ Responsabilités:
 - Streamer via WebSocket
 - Gérer multiple viewers simultanés
 - Reconnection automatique
+
+PreviewHub (fan-out asyncio):
+- UNE connexion amont par session vers le proxy local, partagée par tous
+  les viewers (Flask, WebSocket, serveur de fan-out)
+- Cache de la dernière frame pour les snapshots (ETag = numéro de séquence)
+- Fermeture automatique de la connexion amont sans viewer
+- Serveur HTTP asyncio (PREVIEW_HUB_PORT, actif par défaut) qui sert les
+  streams sans occuper de worker gunicorn
 """
 
 import logging
 import time
-import requests
 import asyncio
-from typing import Optional, Set
-import io
-from PIL import Image
+import threading
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from .config import VideoConfig
+from .mjpeg_passthrough import MJPEGPartParser, parse_boundary, read_jpeg_dimensions
 
 logger = logging.getLogger(__name__)
 
+HUB_TOKEN_SALT = 'preview-hub-stream'
+HUB_TOKEN_MAX_AGE = 60  # secondes pour ouvrir le stream après émission du token
+UPSTREAM_READ_SIZE = 64 * 1024
+
+
+class PreviewFeed:
+    """
+    Flux amont d'une session: dernière frame JPEG + numéro de séquence
+
+    Les viewers synchrones (threads Flask) attendent sur une
+    threading.Condition, les viewers asyncio sur une asyncio.Condition.
+    """
+
+    def __init__(self, session_id: str, local_url: str):
+        self.session_id = session_id
+        self.local_url = local_url
+
+        self.jpeg: Optional[bytes] = None
+        self.seq = 0
+        self.shape: Optional[Tuple[int, int]] = None
+        self.updated_at = 0.0
+        self.last_access = time.time()
+
+        self.viewers = 0
+        self.connections = 0
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+
+        self._cond = threading.Condition()
+        self._viewers_lock = threading.Lock()
+        self._async_cond: Optional[asyncio.Condition] = None
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.session_id}-{self.seq}"'
+
+    def touch(self):
+        self.last_access = time.time()
+
+    def add_viewer(self, limit: int = 0) -> bool:
+        """Réserver une place de viewer (threads Flask et boucle du hub)"""
+        with self._viewers_lock:
+            if limit and self.viewers >= limit:
+                return False
+            self.viewers += 1
+            return True
+
+    def remove_viewer(self):
+        with self._viewers_lock:
+            self.viewers -= 1
+
+    def is_idle(self) -> bool:
+        idle_for = time.time() - self.last_access
+        return self.viewers == 0 and idle_for > VideoConfig.PREVIEW_FEED_IDLE_SECONDS
+
+    async def publish(self, jpeg: bytes):
+        """Publier une frame (appelé dans la boucle du hub)"""
+        with self._cond:
+            self.jpeg = jpeg
+            self.seq += 1
+            self.updated_at = time.time()
+            self._cond.notify_all()
+        if self._async_cond is not None:
+            async with self._async_cond:
+                self._async_cond.notify_all()
+
+    def wait_frame(self, last_seq: int, timeout: float) -> Tuple[int, Optional[bytes]]:
+        """Attendre (thread) une frame plus récente que last_seq"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.seq > last_seq or self.closed, timeout=timeout)
+            if self.seq > last_seq:
+                return self.seq, self.jpeg
+        return last_seq, None
+
+    async def wait_frame_async(self, last_seq: int, timeout: float) -> Tuple[int, Optional[bytes]]:
+        """Attendre (asyncio, boucle du hub) une frame plus récente que last_seq"""
+        if self._async_cond is None:
+            self._async_cond = asyncio.Condition()
+        async with self._async_cond:
+            try:
+                await asyncio.wait_for(
+                    self._async_cond.wait_for(lambda: self.seq > last_seq or self.closed),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+        if self.seq > last_seq:
+            return self.seq, self.jpeg
+        return last_seq, None
+
+    def close(self):
+        self.closed = True
+        with self._cond:
+            self._cond.notify_all()
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.session_id,
+            'viewers': self.viewers,
+            'sequence': self.seq,
+            'upstream_connections': self.connections,
+            'frame_shape': self.shape,
+            'last_frame_age': round(time.time() - self.updated_at, 2) if self.updated_at else None
+        }
+
+
+class PreviewHub:
+    """Fan-out asyncio des previews: une connexion amont par session"""
+
+    def __init__(self):
+        self.feeds: Dict[str, PreviewFeed] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._server = None
+        self._token_secret: Optional[str] = None
+
+    # ------------------------------------------------------------------
+    # Boucle asyncio (thread dédié)
+    # ------------------------------------------------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="preview-hub", daemon=True
+                )
+                self._thread.start()
+                asyncio.run_coroutine_threadsafe(self._reaper(), self._loop)
+                logger.info("👁️ PreviewHub démarré")
+            return self._loop
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    async def _reaper(self):
+        """Fermer les flux amont inutilisés"""
+        while True:
+            await asyncio.sleep(5)
+            for session_id, feed in list(self.feeds.items()):
+                if feed.is_idle():
+                    logger.info(f"🧹 Preview {session_id}: plus de viewer, fermeture du flux amont")
+                    self.close_feed(session_id)
+
+    # ------------------------------------------------------------------
+    # Gestion des flux
+    # ------------------------------------------------------------------
+
+    def get_feed(self, session_id: str, local_url: str) -> PreviewFeed:
+        """Obtenir (ou ouvrir) le flux partagé d'une session"""
+        with self._lock:
+            feed = self.feeds.get(session_id)
+            if feed is None or feed.closed:
+                feed = PreviewFeed(session_id, local_url)
+                self.feeds[session_id] = feed
+                created = True
+            else:
+                created = False
+        feed.touch()
+        if created:
+            self._submit(self._start_feed(feed))
+        return feed
+
+    async def _start_feed(self, feed: PreviewFeed):
+        feed.task = asyncio.ensure_future(self._run_upstream(feed))
+
+    def close_feed(self, session_id: str):
+        """Fermer le flux d'une session (fin de session ou inactivité)"""
+        with self._lock:
+            feed = self.feeds.pop(session_id, None)
+        if feed is None:
+            return
+        feed.close()
+        if feed.task is not None and self._loop is not None:
+            self._loop.call_soon_threadsafe(feed.task.cancel)
+
+    async def _run_upstream(self, feed: PreviewFeed):
+        """Lire le stream MJPEG du proxy local et publier chaque frame"""
+        url = urlparse(feed.local_url)
+        host, port = url.hostname, url.port or 80
+        path = url.path or '/'
+
+        while not feed.closed:
+            writer = None
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout=5)
+                writer.write(f"GET {path} HTTP/1.0\r\nHost: {host}:{port}\r\n\r\n".encode())
+                await writer.drain()
+
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+                status_line, _, raw_headers = head.decode('latin-1').partition("\r\n")
+                if " 200 " not in f"{status_line} ":
+                    raise ConnectionError(f"Proxy: {status_line.strip()}")
+
+                content_type = ''
+                for line in raw_headers.split("\r\n"):
+                    name, _, value = line.partition(":")
+                    if name.strip().lower() == 'content-type':
+                        content_type = value.strip()
+
+                parser = MJPEGPartParser(parse_boundary(content_type) or b'frame')
+                feed.connections += 1
+                logger.info(f"📡 Preview {feed.session_id}: connecté au proxy ({feed.local_url})")
+
+                while not feed.closed:
+                    chunk = await asyncio.wait_for(reader.read(UPSTREAM_READ_SIZE), timeout=10)
+                    if not chunk:
+                        break
+                    for jpeg in parser.feed(chunk):
+                        if feed.shape is None:
+                            feed.shape = read_jpeg_dimensions(jpeg)
+                        await feed.publish(jpeg)
+
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning(f"⚠️ Preview {feed.session_id}: flux amont interrompu ({e})")
+            finally:
+                if writer is not None:
+                    writer.close()
+
+            if not feed.closed:
+                await asyncio.sleep(1)
+
+        logger.info(f"🛑 Preview {feed.session_id}: flux amont fermé")
+
+    # ------------------------------------------------------------------
+    # API synchrone (routes Flask)
+    # ------------------------------------------------------------------
+
+    def get_snapshot(self, session_id: str, local_url: str, wait: float = 3.0) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Dernière frame en cache (sans aller-retour HTTP vers le proxy)
+
+        Returns:
+            (jpeg, etag) ou (None, None) si aucune frame disponible
+        """
+        feed = self.get_feed(session_id, local_url)
+        if feed.jpeg is None:
+            feed.wait_frame(0, timeout=wait)
+        if feed.jpeg is None:
+            return None, None
+        return feed.jpeg, feed.etag
+
+    def iter_mjpeg(self, session_id: str, local_url: str, boundary: bytes = b'frame', max_viewers: int = 0):
+        """
+        Générateur multipart pour une réponse Flask (viewer synchrone)
+
+        Chaque viewer occupe un thread gunicorn: au-delà de max_viewers
+        le générateur se termine sans frame.
+        """
+        feed = self.get_feed(session_id, local_url)
+        if not feed.add_viewer(max_viewers):
+            return
+        last_seq = 0
+        try:
+            while not feed.closed:
+                seq, jpeg = feed.wait_frame(last_seq, timeout=5.0)
+                if jpeg is None:
+                    continue
+                last_seq = seq
+                feed.touch()
+                yield (b'--' + boundary + b'\r\nContent-Type: image/jpeg\r\n'
+                       + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b'\r\n')
+        finally:
+            feed.remove_viewer()
+
+    def get_stats(self) -> dict:
+        return {
+            'feeds': [feed.to_dict() for feed in list(self.feeds.values())],
+            'hub_server': self._server is not None
+        }
+
+    # ------------------------------------------------------------------
+    # Serveur HTTP asyncio de fan-out (optionnel)
+    # ------------------------------------------------------------------
+
+    def _serializer(self):
+        from itsdangerous import URLSafeTimedSerializer
+        return URLSafeTimedSerializer(self._token_secret, salt=HUB_TOKEN_SALT)
+
+    def start_server(self, secret_key: str, port: int = None) -> bool:
+        """
+        Démarrer le serveur de fan-out sur PREVIEW_HUB_PORT
+
+        Un seul process (worker gunicorn) obtient le port; les autres
+        redirigent leurs viewers vers ce même port.
+        """
+        port = port or VideoConfig.PREVIEW_HUB_PORT
+        if not port or self._server is not None:
+            return self._server is not None
+        self._token_secret = secret_key
+        try:
+            self._server = self._submit(
+                asyncio.start_server(self._handle_client, '0.0.0.0', port)
+            ).result(timeout=5)
+            logger.info(f"👁️ Serveur PreviewHub en écoute sur le port {port}")
+            return True
+        except OSError as e:
+            logger.info(f"PreviewHub: port {port} déjà utilisé ({e}), fan-out servi par un autre worker")
+            return False
+
+    def make_stream_token(self, secret_key: str, session_id: str, local_url: str) -> str:
+        """Token signé (courte durée) autorisant l'ouverture du stream sur le hub"""
+        from itsdangerous import URLSafeTimedSerializer
+        serializer = URLSafeTimedSerializer(secret_key, salt=HUB_TOKEN_SALT)
+        return serializer.dumps({'sid': session_id, 'url': local_url})
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """GET /preview/<session_id>/stream.mjpeg?token=..."""
+        feed = None
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=10)
+            request_line = request.split(b"\r\n", 1)[0].decode('latin-1')
+            method, target, _ = (request_line.split(" ") + ["", ""])[:3]
+            url = urlparse(target)
+            token = parse_qs(url.query).get('token', [''])[0]
+
+            try:
+                payload = self._serializer().loads(token, max_age=HUB_TOKEN_MAX_AGE)
+            except Exception:
+                payload = None
+
+            parts = url.path.strip('/').split('/')
+            if method != 'GET' or not payload or len(parts) != 3 or parts[1] != payload.get('sid'):
+                writer.write(b"HTTP/1.0 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+                await writer.drain()
+                return
+
+            feed = self.get_feed(payload['sid'], payload['url'])
+            feed.add_viewer()
+            writer.write(
+                b"HTTP/1.0 200 OK\r\n"
+                b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+                b"Cache-Control: no-cache, no-store, must-revalidate\r\n"
+                b"Connection: close\r\n\r\n"
+            )
+            last_seq = 0
+            while not feed.closed:
+                seq, jpeg = await feed.wait_frame_async(last_seq, timeout=5.0)
+                if jpeg is None:
+                    continue
+                last_seq = seq
+                feed.touch()
+                writer.write(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                             + f"Content-Length: {len(jpeg)}\r\n\r\n".encode() + jpeg + b"\r\n")
+                # Backpressure: un viewer lent saute des frames au lieu d'accumuler
+                await writer.drain()
+
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"❌ PreviewHub client: {e}")
+        finally:
+            if feed is not None:
+                feed.remove_viewer()
+            writer.close()
+
 
 class PreviewManager:
     """Gestionnaire de preview vidéo WebSocket"""
@@ -66,6 +435,9 @@ class PreviewManager:
         """
         Streamer la preview via WebSocket
         
+        Les frames viennent du flux partagé du PreviewHub (pas de requête
+        HTTP vers le proxy par frame et par viewer).
+        
         Args:
             session_id: ID de la session
             local_url: URL du proxy local
@@ -73,37 +445,34 @@ class PreviewManager:
         """
         logger.info(f"📡 Démarrage stream preview pour {session_id}")
         
-        # Construire l'URL du snapshot
-        snapshot_url = local_url.replace('/stream.mjpg', '/snapshot.jpg')
+        feed = preview_hub.get_feed(session_id, local_url)
+        feed.add_viewer()
+        interval = 1.0 / VideoConfig.PREVIEW_FPS
+        last_seq = 0
         
         try:
-            while True:
-                try:
-                    # Récupérer une frame depuis le proxy
-                    response = requests.get(snapshot_url, timeout=2)
-                    
-                    if response.status_code == 200:
-                        # Envoyer l'image JPEG au client
-                        await websocket.send_bytes(response.content)
-                    else:
-                        logger.warning(f"⚠️ HTTP {response.status_code} pour snapshot")
-                        await asyncio.sleep(1)
-                        continue
-                    
-                except requests.exceptions.RequestException as e:
-                    logger.error(f"❌ Erreur récupération frame: {e}")
-                    await asyncio.sleep(1)
+            while not feed.closed:
+                # Attente de la frame suivante sans bloquer la boucle
+                seq, jpeg = await asyncio.to_thread(feed.wait_frame, last_seq, 2.0)
+                if jpeg is None:
                     continue
+                last_seq = seq
+                feed.touch()
+                
+                # Envoyer l'image JPEG au client
+                await websocket.send_bytes(jpeg)
                 
                 # FPS du preview (configurable)
-                await asyncio.sleep(1.0 / 5)  # 5 FPS
+                await asyncio.sleep(interval)
                 
         except Exception as e:
             logger.error(f"❌ Erreur stream preview: {e}")
         finally:
+            feed.remove_viewer()
             self.remove_viewer(session_id, websocket)
             logger.info(f"🛑 Stream preview arrêté pour {session_id}")
 
 
-# Instance globale (singleton)
+# Instances globales (singletons)
+preview_hub = PreviewHub()
 preview_manager = PreviewManager()
@@ -22,7 +22,12 @@ from .config import VideoConfig
 logger = logging.getLogger(__name__)
 
 
-def start_proxy_server(session_id: str, source_url: str, port: int) -> subprocess.Popen:
+def start_proxy_server(
+    session_id: str,
+    source_url: str,
+    port: int,
+    passthrough: bool = False
+) -> subprocess.Popen:
     """
     Démarrer le serveur proxy FastAPI + uvicorn + OpenCV
     
@@ -30,6 +35,7 @@ def start_proxy_server(session_id: str, source_url: str, port: int) -> subproces
         session_id: ID de la session
         source_url: URL source de la caméra
         port: Port HTTP local
+        passthrough: Relayer les JPEG d'une source MJPEG sans transcodage
         
     Returns:
         Processus subprocess du serveur
@@ -46,9 +52,12 @@ def start_proxy_server(session_id: str, source_url: str, port: int) -> subproces
         "--fps", "25",
         "--quality", "80"
     ]
+    if passthrough:
+        cmd.append("--passthrough")
     
     logger.info(f"🚀 Starting video proxy server on port {port}")
     logger.info(f"   Source: {source_url}")
+    logger.info(f"   Passthrough MJPEG: {passthrough}")
     
     # Démarrer le processus
     process = subprocess.Popen(
@@ -74,7 +83,8 @@ class ProxyManager:
         self,
         session_id: str,
         camera_url: str,
-        port: Optional[int] = None
+        port: Optional[int] = None,
+        passthrough: bool = False
     ) -> Tuple[str, int, subprocess.Popen]:
         """
         Démarrer un proxy vidéo universel
@@ -83,6 +93,7 @@ class ProxyManager:
             session_id: ID de la session
             camera_url: URL de la caméra source (MJPEG, RTSP, HTTP)
             port: Port HTTP local (si None, allocation automatique)
+            passthrough: Source MJPEG relayée sans décodage/ré-encodage
             
         Returns:
             (local_url, port, process)
@@ -100,7 +111,8 @@ class ProxyManager:
             process = start_proxy_server(
                 session_id=session_id,
                 source_url=camera_url,
-                port=port
+                port=port,
+                passthrough=passthrough
             )
             
             # Attendre que le serveur soit prêt
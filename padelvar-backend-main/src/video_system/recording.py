@@ -25,6 +25,7 @@ from datetime import datetime
 
 from .config import VideoConfig
 from .session_manager import VideoSession
+from ..services.recording_state import HEARTBEAT_INTERVAL_SECONDS, recording_registry
 
 logger = logging.getLogger(__name__)
 
@@ -73,6 +74,12 @@ class VideoRecorder:
             
         logger.info(f"🎬 Démarrage enregistrement {session_id}")
         
+        # Réservation partagée du terrain (déjà faite par la route le cas échéant)
+        if not recording_registry.claim_court(session.terrain_id, session_id,
+                                              club_id=session.club_id, user_id=session.user_id):
+            logger.warning(f"⚠️ Terrain {session.terrain_id} déjà en cours d'enregistrement")
+            return False
+        
         # 1. Déterminer l'URL d'entrée (Logique de référence)
         # On utilise le proxy local pour stabiliser le flux (FPS constant)
         input_url = session.local_url
@@ -92,6 +99,7 @@ class VideoRecorder:
             ffmpeg_exec = self._resolve_ffmpeg()
         except Exception as e:
             logger.error(f"❌ Erreur FFmpeg: {e}")
+            recording_registry.release_court(session.terrain_id, session_id)
             return False
 
         # 3. Récupérer les overlays actifs pour le club
@@ -249,6 +257,19 @@ class VideoRecorder:
             
             threading.Thread(target=_close_log_when_done, args=(process, log_file), daemon=True).start()
             
+            # Heartbeat du registre tant que FFmpeg tourne, libération à la fin
+            def _heartbeat_until_done(p, terrain_id, sid):
+                try:
+                    while p.poll() is None:
+                        if not recording_registry.heartbeat(terrain_id, sid):
+                            logger.warning(f"⚠️ Réservation du terrain {terrain_id} perdue pour {sid}")
+                        time.sleep(HEARTBEAT_INTERVAL_SECONDS)
+                finally:
+                    recording_registry.release_court(terrain_id, sid)
+            
+            threading.Thread(target=_heartbeat_until_done, args=(process, session.terrain_id, session_id),
+                             daemon=True).start()
+            
             # Enregistrer état
             self.active_recordings[session_id] = {
                 'process': process,
@@ -267,6 +288,7 @@ class VideoRecorder:
             
         except Exception as e:
             logger.error(f"❌ Erreur démarrage enregistrement: {e}")
+            recording_registry.release_court(session.terrain_id, session_id)
             return False
 
     def stop_recording(self, session_id: str) -> Optional[str]:
@@ -11,6 +11,7 @@ Responsabilités:
 
 import logging
 import re
+import uuid
 import requests
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
@@ -20,6 +21,7 @@ import subprocess
 
 from .config import VideoConfig
 from .proxy_manager import ProxyManager
+from .mjpeg_passthrough import is_mjpeg_content_type
 
 logger = logging.getLogger(__name__)
 
@@ -40,6 +42,7 @@ class VideoSession:
     local_url: str
     proxy_port: int
     proxy_process: Optional[subprocess.Popen] = None
+    passthrough: bool = False  # JPEG caméra relayés sans transcodage
     
     # Recording
     recording_process: Optional[subprocess.Popen] = None
@@ -74,6 +77,7 @@ class VideoSession:
             'camera_type': self.camera_type,
             'local_url': self.local_url,
             'proxy_port': self.proxy_port,
+            'passthrough': self.passthrough,
             'recording_active': self.recording_active,
             'recording_path': str(self.recording_path) if self.recording_path else None,
             'verified': self.verified,
@@ -96,7 +100,8 @@ class SessionManager:
         terrain_id: int,
         camera_url: str,
         club_id: int,
-        user_id: int
+        user_id: int,
+        session_id: Optional[str] = None
     ) -> VideoSession:
         """
         Créer une nouvelle session caméra
@@ -106,13 +111,14 @@ class SessionManager:
             camera_url: URL de la caméra source
             club_id: ID du club
             user_id: ID de l'utilisateur
+            session_id: ID imposé (terrain déjà réservé sous cet ID)
             
         Returns:
             VideoSession créée
         """
         # Générer session ID
-        timestamp = int(datetime.now().timestamp())
-        session_id = f"sess_{club_id}_{terrain_id}_{timestamp}"
+        if not session_id:
+            session_id = self.new_session_id(club_id, terrain_id)
         
         logger.info(f"📹 Création session {session_id}")
         logger.info(f"   Club: {club_id}, Terrain: {terrain_id}, User: {user_id}")
@@ -124,11 +130,15 @@ class SessionManager:
         
         logger.info(f"✅ Caméra validée: type={camera_type}")
         
+        # MJPEG: le proxy relaie les JPEG originaux (aucun décodage)
+        passthrough = camera_type == 'mjpeg' and VideoConfig.MJPEG_PASSTHROUGH
+        
         # Démarrer proxy universel (supporte tous les types)
         try:
             local_url, proxy_port, proxy_process = self.proxy_manager.start_proxy(
                 session_id=session_id,
-                camera_url=camera_url
+                camera_url=camera_url,
+                passthrough=passthrough
             )
             
             logger.info(f"✅ Proxy démarré: {local_url}")
@@ -148,6 +158,7 @@ class SessionManager:
             local_url=local_url,
             proxy_port=proxy_port,
             proxy_process=proxy_process,
+            passthrough=passthrough,
             verified=True
         )
         
@@ -156,6 +167,12 @@ class SessionManager:
         
         return session
     
+    @staticmethod
+    def new_session_id(club_id: int, terrain_id: int) -> str:
+        """ID de session: sess_<club>_<terrain>_<timestamp>_<aléa> (unique même à la seconde près)"""
+        timestamp = int(datetime.now().timestamp())
+        return f"sess_{club_id}_{terrain_id}_{timestamp}_{uuid.uuid4().hex[:6]}"
+    
     def validate_camera(self, camera_url: str) -> Tuple[bool, str]:
         """
         Valider une caméra et détecter son type
@@ -180,9 +197,13 @@ class SessionManager:
             # Tester la connexion HTTP
             try:
                 response = requests.get(camera_url, timeout=5, stream=True)
+                response.close()
                 if response.status_code == 200:
                     content_type = response.headers.get('Content-Type', '')
                     logger.info(f"   Content-Type: {content_type}")
+                    if not is_mjpeg_content_type(content_type):
+                        # Pas de multipart: le proxy décodera avec OpenCV
+                        camera_type = 'http'
                     return True, camera_type
             except Exception as e:
                 logger.error(f"❌ Erreur validation MJPEG: {e}")
@@ -194,6 +215,9 @@ class SessionManager:
             try:
                 response = requests.head(camera_url, timeout=5)
                 if response.status_code < 400:
+                    if is_mjpeg_content_type(response.headers.get('Content-Type')):
+                        logger.info("✅ Flux MJPEG multipart détecté")
+                        return True, 'mjpeg'
                     logger.info(f"✅ HTTP générique validé")
                     return True, camera_type
             except Exception as e:
@@ -227,6 +251,10 @@ class SessionManager:
             logger.error(f"❌ Enregistrement encore actif! Impossible de fermer la session.")
             raise RuntimeError("Recording still active")
         
+        # Fermer le flux preview partagé
+        from .preview import preview_hub
+        preview_hub.close_feed(session_id)
+        
         # Arrêter le proxy
         if session.proxy_port:
             try:
@@ -19,6 +19,12 @@ from fastapi import FastAPI
 from fastapi.responses import StreamingResponse
 import uvicorn
 
+try:
+    from .mjpeg_passthrough import MJPEGPassthroughReader
+except ImportError:
+    # Lancé comme script (subprocess du ProxyManager)
+    from mjpeg_passthrough import MJPEGPassthroughReader
+
 
 @dataclass
 class ProxyConfig:
@@ -27,6 +33,7 @@ class ProxyConfig:
     buffer_size: int = 50  # frames (encoded JPEG)
     jpeg_quality: int = 80
     reconnect_interval: float = 5.0  # seconds
+    passthrough: bool = False  # MJPEG: relayer les JPEG caméra sans décodage
 
 
 class VideoProxy:
@@ -87,6 +94,13 @@ class VideoProxy:
         self._latest_jpeg = self._black_jpeg(640, 480)
         self._latest_shape = (480, 640)
 
+        if self.cfg.passthrough:
+            self._passthrough_loop()
+            # Retour ici = source non MJPEG, on bascule sur OpenCV
+            if not self._running.is_set():
+                logging.info("Capture loop arrêtée.")
+                return
+
         while self._running.is_set():
             # Assurer cap ouvert
             if self._cap is None or not self._cap.isOpened():
@@ -121,6 +135,35 @@ class VideoProxy:
 
         logging.info("Capture loop arrêtée.")
 
+    def _passthrough_loop(self):
+        """
+        Relais MJPEG sans transcodage: les JPEG originaux de la caméra sont
+        gardés dans le buffer et envoyés tels quels aux viewers et à FFmpeg.
+        Retourne si la source n'est pas du MJPEG multipart.
+        """
+        reader = MJPEGPassthroughReader(self.cfg.source, timeout=self.cfg.reconnect_interval * 2)
+        logging.info(f"Mode passthrough MJPEG: {self.cfg.source}")
+
+        while self._running.is_set():
+            try:
+                for jpeg in reader.iter_frames():
+                    if not self._running.is_set():
+                        break
+                    with self._lock:
+                        self._latest_raw = None  # Décodé à la demande seulement
+                        self._latest_shape = reader.last_shape
+                        self._latest_jpeg = jpeg
+                        self._buffer.append(jpeg)
+            except ValueError as e:
+                logging.warning(f"{e} - passage en mode décodage OpenCV")
+                self.cfg.passthrough = False
+                return
+            except Exception as e:
+                logging.warning(f"Perte du flux MJPEG ({e}). Reconnexion dans {self.cfg.reconnect_interval}s…")
+
+            if self._running.is_set():
+                time.sleep(self.cfg.reconnect_interval)
+
     def _black_jpeg(self, w: int, h: int) -> bytes:
         frame = np.zeros((h, w, 3), dtype=np.uint8)
         ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 70])
@@ -136,8 +179,15 @@ class VideoProxy:
     def get_latest_raw(self) -> Tuple[Optional[np.ndarray], Optional[Tuple[int, int]]]:
         with self._lock:
             if self._latest_raw is None:
-                return None, self._latest_shape
-            return self._latest_raw.copy(), self._latest_shape
+                if not self.cfg.passthrough or self._latest_jpeg is None:
+                    return None, self._latest_shape
+                jpeg = self._latest_jpeg
+            else:
+                return self._latest_raw.copy(), self._latest_shape
+
+        # Passthrough: décodage paresseux, uniquement si quelqu'un le demande
+        frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return frame, self._latest_shape
 
     def mjpeg_generator(self, fps: Optional[int] = None):
         boundary = "frame"
@@ -173,7 +223,7 @@ def build_app(proxy: VideoProxy, fps: int) -> FastAPI:
 
     @app.get("/health")
     def health():
-        return {"status": "ok", "fps": fps}
+        return {"status": "ok", "fps": fps, "passthrough": proxy.cfg.passthrough}
 
     return app
 
@@ -185,6 +235,8 @@ def parse_args():
     p.add_argument("--fps", type=int, default=25, help="Fréquence d'images de sortie (par défaut 25)")
     p.add_argument("--buffer", type=int, default=50, help="Taille du tampon circulaire (frames JPEG)")
     p.add_argument("--quality", type=int, default=80, help="Qualité JPEG (0-100, par défaut 80)")
+    p.add_argument("--passthrough", action="store_true",
+                   help="Source MJPEG: relayer les JPEG originaux sans décodage/ré-encodage")
     return p.parse_args()
 
 
@@ -202,6 +254,7 @@ def main():
         fps=args.fps,
         buffer_size=args.buffer,
         jpeg_quality=args.quality,
+        passthrough=args.passthrough,
     )
     proxy = VideoProxy(cfg)
     proxy.start()
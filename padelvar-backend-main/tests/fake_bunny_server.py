@@ -0,0 +1,256 @@
+"""
+Faux serveur Bunny Stream pour les tests d'upload
+
+- POST /library/<id>/videos: création de vidéo (retourne un guid)
+- PUT /library/<id>/videos/<guid>: upload direct (ancien mode)
+- PUT /<storage_zone>/<chemin>: Bunny Storage (segments HLS, playlists)
+- GET /library/<id>/videos/<guid>/mp4/original: téléchargement de l'original,
+  requêtes Range supportées (octets servis comptés dans `bytes_served`)
+- OPTIONS/POST/HEAD/PATCH /tusupload[/<id>]: protocole TUS 1.0.0
+  (creation + concatenation), signature Bunny vérifiée
+- Injection de pannes: coupure de connexion au milieu du corps avec une
+  probabilité `failure_rate` par bloc de `block_size` octets reçu, ou une
+  seule fois après `drop_after_bytes` octets reçus
+
+Usage:
+    with FakeBunnyServer(api_key, library_id, failure_rate=0.01) as server:
+        os.environ['BUNNY_API_HOST'] = server.url
+"""
+import hashlib
+import random
+import socket
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Upload:
+    def __init__(self, length, video_id, partial=False):
+        self.length = length
+        self.video_id = video_id
+        self.partial = partial
+        self.data = bytearray()
+        self.lock = threading.Lock()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self) -> 'FakeBunnyServer':
+        return self.server.fake
+
+    def _reply(self, status, headers=None, body=b''):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _drop_connection(self):
+        """Coupure brutale (aucune réponse HTTP)"""
+        self.close_connection = True
+        self.fake.failures_injected += 1
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _read_exact(self, remaining, sink):
+        while remaining > 0:
+            block = self.rfile.read(min(self.fake.block_size, remaining))
+            if not block:
+                return False
+            if self.fake.should_fail(len(block)):
+                self._drop_connection()
+                return False
+            sink(block)
+            remaining -= len(block)
+        return True
+
+    def _read_body(self, sink):
+        """Lire le corps par blocs; False si une panne a été injectée"""
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            return self._read_exact(int(self.headers.get('Content-Length', 0)), sink)
+        while True:
+            size = int(self.rfile.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                self.rfile.readline()
+                return True
+            if not self._read_exact(size, sink):
+                return False
+            self.rfile.readline()
+
+    def _check_signature(self):
+        video_id = self.headers.get('VideoId', '')
+        expire = self.headers.get('AuthorizationExpire', '')
+        expected = hashlib.sha256(
+            f"{self.fake.library_id}{self.fake.api_key}{expire}{video_id}".encode()).hexdigest()
+        return self.headers.get('AuthorizationSignature') == expected and video_id in self.fake.videos
+
+    def _upload(self):
+        upload_id = self.path.rstrip('/').split('/')[-1]
+        return self.fake.uploads.get(upload_id)
+
+    # Endpoints
+
+    def do_OPTIONS(self):
+        extensions = 'creation,concatenation' if self.fake.concatenation else 'creation'
+        self._reply(204, {'Tus-Resumable': '1.0.0', 'Tus-Version': '1.0.0', 'Tus-Extension': extensions})
+
+    def do_POST(self):
+        self.fake.requests += 1
+        if self.path.endswith('/videos'):
+            if self.headers.get('AccessKey') != self.fake.api_key:
+                return self._reply(401)
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            guid = str(uuid.uuid4())
+            self.fake.videos[guid] = None
+            return self._reply(200, {'Content-Type': 'application/json'}, f'{{"guid": "{guid}"}}'.encode())
+
+        if not self._check_signature():
+            return self._reply(401)
+        video_id = self.headers['VideoId']
+        concat = self.headers.get('Upload-Concat', '')
+        upload_id = uuid.uuid4().hex
+
+        if concat.startswith('final;'):
+            ids = [url.rstrip('/').split('/')[-1] for url in concat[len('final;'):].split()]
+            parts = [self.fake.uploads.get(i) for i in ids]
+            if any(p is None or len(p.data) != p.length for p in parts):
+                return self._reply(400)
+            self.fake.videos[video_id] = b''.join(bytes(p.data) for p in parts)
+        else:
+            upload = _Upload(int(self.headers['Upload-Length']), video_id, partial=concat == 'partial')
+            self.fake.uploads[upload_id] = upload
+        self._reply(201, {'Location': f'/tusupload/{upload_id}', 'Tus-Resumable': '1.0.0'})
+
+    def do_HEAD(self):
+        upload = self._upload()
+        if upload is None:
+            return self._reply(404)
+        self._reply(200, {'Upload-Offset': str(len(upload.data)), 'Upload-Length': str(upload.length),
+                          'Tus-Resumable': '1.0.0', 'Cache-Control': 'no-store'})
+
+    def do_PATCH(self):
+        self.fake.requests += 1
+        upload = self._upload()
+        if upload is None or not self._check_signature():
+            return self._reply(404)
+        with upload.lock:
+            if int(self.headers.get('Upload-Offset', -1)) != len(upload.data):
+                return self._reply(409)
+            # Comme tusd: les octets reçus avant une coupure sont conservés
+            if not self._read_body(upload.data.extend):
+                return
+            if len(upload.data) == upload.length and not upload.partial:
+                self.fake.videos[upload.video_id] = bytes(upload.data)
+            self._reply(204, {'Upload-Offset': str(len(upload.data)), 'Tus-Resumable': '1.0.0'})
+
+    def do_GET(self):
+        self.fake.requests += 1
+        parts = self.path.rstrip('/').split('/')
+        if len(parts) < 3 or parts[-2:] != ['mp4', 'original']:
+            return self._reply(404)
+        data = self.fake.videos.get(parts[-3])
+        if self.headers.get('AccessKey') != self.fake.api_key or data is None:
+            return self._reply(401 if data is not None else 404)
+
+        range_header = self.headers.get('Range', '')
+        if not self.fake.range_support or not range_header.startswith('bytes='):
+            self.fake.bytes_served += len(data)
+            return self._reply(200, {'Content-Type': 'video/mp4', 'Accept-Ranges': 'bytes'}, data)
+
+        first, _, last = range_header[len('bytes='):].partition('-')
+        first = int(first)
+        last = min(int(last) if last else len(data) - 1, len(data) - 1)
+        if first >= len(data):
+            return self._reply(416, {'Content-Range': f'bytes */{len(data)}'})
+        body = data[first:last + 1]
+        self.fake.range_requests += 1
+        self.fake.bytes_served += len(body)
+        self._reply(206, {'Content-Type': 'video/mp4',
+                          'Content-Range': f'bytes {first}-{last}/{len(data)}'}, body)
+
+    def do_PUT(self):
+        self.fake.requests += 1
+        zone_prefix = f"/{self.fake.storage_zone}/"
+        if self.path.startswith(zone_prefix):
+            if self.headers.get('AccessKey') != self.fake.api_key:
+                return self._reply(401)
+            received = bytearray()
+            if not self._read_body(received.extend):
+                return
+            self.fake.files[self.path[len(zone_prefix):]] = bytes(received)
+            return self._reply(201, {'Content-Type': 'application/json'}, b'{"HttpCode": 201}')
+
+        guid = self.path.rstrip('/').split('/')[-1]
+        if self.headers.get('AccessKey') != self.fake.api_key or guid not in self.fake.videos:
+            return self._reply(401)
+        received = bytearray()
+        if not self._read_body(received.extend):
+            return
+        self.fake.videos[guid] = bytes(received)
+        self._reply(200, {'Content-Type': 'application/json'}, b'{"success": true}')
+
+
+class FakeBunnyServer:
+    """Serveur HTTP local imitant l'API Bunny Stream (thread d'arrière-plan)"""
+
+    def __init__(self, api_key, library_id, failure_rate=0.0, block_size=64 * 1024,
+                 concatenation=True, seed=None, drop_after_bytes=None, storage_zone='padelvar-videos',
+                 range_support=True):
+        self.api_key = api_key
+        self.library_id = str(library_id)
+        self.failure_rate = failure_rate
+        self.block_size = block_size
+        self.concatenation = concatenation
+        self.drop_after_bytes = drop_after_bytes
+        self.bytes_received = 0
+        self.storage_zone = storage_zone
+        self.range_support = range_support
+        self.range_requests = 0
+        self.bytes_served = 0
+        self.videos = {}
+        self.files = {}
+        self.uploads = {}
+        self.requests = 0
+        self.failures_injected = 0
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def should_fail(self, block_length):
+        with self._random_lock:
+            self.bytes_received += block_length
+            if self.drop_after_bytes is not None and self.bytes_received >= self.drop_after_bytes:
+                self.drop_after_bytes = None
+                return True
+            return bool(self.failure_rate) and self._random.random() < self.failure_rate
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
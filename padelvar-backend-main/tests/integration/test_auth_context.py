@@ -0,0 +1,119 @@
+"""
+Tests d'intégration du contexte d'authentification
+(utilisateur chargé une fois par requête, snapshot entre requêtes invalidé
+après commit d'une modification de l'utilisateur)
+"""
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask, jsonify, session
+from sqlalchemy import event
+
+from src.middleware import auth_context
+from src.middleware.auth_context import (
+    get_current_user, get_current_user_snapshot, require_admin, require_auth
+)
+from src.models.database import db
+from src.models.user import User, UserRole
+from src.services import config_cache as config_cache_module
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(config_cache_module, 'get_redis_client', lambda: None)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+
+    @app.route('/whoami')
+    @require_auth
+    def whoami():
+        first, second = get_current_user(), get_current_user()
+        assert first is second
+        return jsonify({'id': first.id, 'credits': get_current_user_snapshot().credits_balance})
+
+    @app.route('/admin-only')
+    @require_admin
+    def admin_only():
+        return jsonify({'ok': True})
+
+    @app.route('/switch/<int:user_id>')
+    def switch(user_id):
+        before = get_current_user()
+        session['user_id'] = user_id
+        return jsonify({'before': before.id, 'after': get_current_user().id})
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(id=1, email='joueur@test.tn', name='Joueur', credits_balance=5),
+                            User(id=2, email='admin@test.tn', name='Admin', role=UserRole.SUPER_ADMIN)])
+        db.session.commit()
+        auth_context.user_snapshots.clear()
+    yield app
+    with app.app_context():
+        auth_context.user_snapshots.clear()
+        db.drop_all()
+
+
+def login(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = user_id
+    return client
+
+
+@pytest.mark.integration
+class TestAuthContext:
+    """Un chargement de l'utilisateur par requête, snapshot en cache entre requêtes"""
+
+    def test_user_loaded_once_per_request(self, app):
+        client = login(app, 1)
+        client.get('/whoami')                                    # snapshot en cache
+
+        with app.app_context(), count_queries() as statements:
+            response = client.get('/whoami')
+
+        assert response.get_json() == {'id': 1, 'credits': 5}
+        assert len(statements) == 1
+
+    def test_access_checks_use_snapshot_without_query(self, app):
+        player, admin = login(app, 1), login(app, 2)
+        assert player.get('/admin-only').status_code == 403
+        assert admin.get('/admin-only').status_code == 200
+        assert app.test_client().get('/admin-only').status_code == 401
+
+        with app.app_context(), count_queries() as statements:
+            assert admin.get('/admin-only').status_code == 200
+        assert statements == []
+
+    def test_user_update_invalidates_snapshot(self, app):
+        client = login(app, 1)
+        assert client.get('/admin-only').status_code == 403
+
+        with app.app_context():
+            db.session.get(User, 1).role = UserRole.SUPER_ADMIN
+            db.session.commit()
+        assert client.get('/admin-only').status_code == 200
+
+        with app.app_context():
+            db.session.get(User, 1).role = UserRole.PLAYER
+            db.session.rollback()                                # rien à invalider
+        assert client.get('/admin-only').status_code == 200
+
+    def test_session_change_during_request(self, app):
+        assert login(app, 1).get('/switch/2').get_json() == {'before': 1, 'after': 2}
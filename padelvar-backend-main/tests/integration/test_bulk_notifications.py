@@ -0,0 +1,66 @@
+"""
+Tests d'intégration de l'envoi de notifications en masse par lots
+"""
+from unittest.mock import patch
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.user import Notification, NotificationType, User
+from src.services.bulk_notification_service import SmtpBatchSender, insert_notification_batch, send_email_batch
+
+
+@pytest.fixture
+def app_db():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.session.bulk_insert_mappings(User, [
+            {'id': i, 'email': f'user{i}@test.tn', 'name': f'User {i}'} for i in range(1, 501)
+        ])
+        db.session.commit()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.integration
+@pytest.mark.notifications
+class TestBulkNotifications:
+    """Tests de insert_notification_batch et SmtpBatchSender"""
+
+    def test_batch_inserted_in_one_statement(self, app_db):
+        """Un lot = une vérification des utilisateurs + un INSERT, ids inconnus ignorés"""
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        recipients = insert_notification_batch(
+            list(range(1, 501)) + [9999], NotificationType.SYSTEM_MAINTENANCE.value,
+            'Maintenance', 'Dimanche 2h-4h', priority='high', related_resource_id=12
+        )
+
+        assert len(recipients) == 500
+        assert recipients[0] == (1, 'user1@test.tn', 'User 1')
+        assert len([s for s in statements if s.startswith('INSERT INTO notification')]) == 1
+        assert Notification.query.count() == 500
+        notification = Notification.query.filter_by(user_id=250).one()
+        assert notification.notification_type == NotificationType.SYSTEM_MAINTENANCE
+        assert notification.related_resource_id == '12'
+        assert notification.is_read is False
+        assert notification.expires_at > notification.created_at
+
+    def test_emails_share_one_smtp_connection(self):
+        recipients = [(i, f'user{i}@test.tn', f'User {i}') for i in range(50)]
+        with patch('src.services.bulk_notification_service.smtplib.SMTP') as smtp:
+            with SmtpBatchSender(username='u', password='p') as sender:
+                result = send_email_batch(recipients, 'Titre', 'Message', sender=sender)
+
+        assert result == {'sent': 50, 'failed': 0}
+        assert smtp.call_count == 1
+        assert smtp.return_value.send_message.call_count == 50
+        smtp.return_value.quit.assert_called_once()
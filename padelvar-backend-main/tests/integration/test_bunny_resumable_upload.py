@@ -0,0 +1,120 @@
+"""
+Tests d'intégration de l'upload reprenable vers Bunny (TUS)
+Utilise le faux serveur Bunny local avec pannes injectées
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_bunny_server import FakeBunnyServer
+from src.services.bunny_resumable_upload import (
+    ResumableUploader, ResumableUploadError, UploadStateStore,
+    bunny_tus_headers, create_session, resume_key_for
+)
+
+API_KEY = 'test-api-key-0000-0000'
+LIBRARY_ID = '4242'
+CHUNK_SIZE = 256 * 1024
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    data = os.urandom(3 * 1024 * 1024 + 123)
+    path = tmp_path / 'match.mp4'
+    path.write_bytes(data)
+    return str(path), data
+
+
+@pytest.fixture
+def bunny_server():
+    with FakeBunnyServer(API_KEY, LIBRARY_ID, block_size=16 * 1024, seed=7) as server:
+        yield server
+
+
+def make_uploader(server, state_dir, **kwargs):
+    options = {'chunk_size': CHUNK_SIZE, 'retry_delay': 0, **kwargs}
+    return ResumableUploader(create_session(), UploadStateStore(state_dir),
+                             endpoint=f"{server.url}/tusupload", **options)
+
+
+def new_video(server):
+    video_id = f"video-{len(server.videos)}"
+    server.videos[video_id] = None
+    return video_id, bunny_tus_headers(LIBRARY_ID, API_KEY, video_id)
+
+
+@pytest.mark.integration
+@pytest.mark.video
+class TestBunnyResumableUpload:
+    """Tests d'intégration de ResumableUploader"""
+
+    def test_upload_survives_injected_failures(self, bunny_server, video_file, tmp_path):
+        """Coupures réseau: seuls les chunks en échec sont renvoyés"""
+        path, data = video_file
+        bunny_server.failure_rate = 0.02
+        video_id, headers = new_video(bunny_server)
+        uploader = make_uploader(bunny_server, tmp_path / 'state', chunk_retries=20)
+
+        uploader.upload(path, resume_key_for(path), headers)
+
+        assert bunny_server.videos[video_id] == data
+        assert bunny_server.failures_injected > 0
+        assert uploader.stats['chunks_retried'] > 0
+        # Les octets déjà reçus par le serveur ne sont jamais renvoyés
+        assert uploader.stats['bytes_sent'] == len(data)
+        # État supprimé une fois l'upload terminé
+        assert UploadStateStore(tmp_path / 'state').list_states() == []
+
+    def test_resume_after_worker_restart(self, bunny_server, video_file, tmp_path):
+        """Un nouveau processus reprend à l'offset persisté"""
+        path, data = video_file
+        key = resume_key_for(path)
+        video_id, headers = new_video(bunny_server)
+
+        # Coupure au milieu du 5e chunk, sans retry: l'upload échoue
+        bunny_server.drop_after_bytes = 4 * CHUNK_SIZE + CHUNK_SIZE // 2
+        with pytest.raises(ResumableUploadError):
+            make_uploader(bunny_server, tmp_path / 'state', chunk_retries=0).upload(
+                path, key, headers, extra_state={'bunny_video_id': video_id})
+
+        state = UploadStateStore(tmp_path / 'state').load(key)
+        assert state['bunny_video_id'] == video_id
+        persisted = sum(part['offset'] for part in state['parts'])
+        assert persisted == 4 * CHUNK_SIZE
+
+        # "Redémarrage": nouvelle session, nouvel uploader, même répertoire d'état
+        uploader = make_uploader(bunny_server, tmp_path / 'state')
+        uploader.upload(path, key, headers)
+
+        assert uploader.stats['uploads_resumed'] == 1
+        # Le serveur a conservé le début du 5e chunk: il n'est pas renvoyé
+        assert uploader.stats['bytes_sent'] < len(data) - persisted
+        assert bunny_server.videos[video_id] == data
+
+    def test_parallel_parts_with_concatenation(self, bunny_server, video_file, tmp_path):
+        """Parties parallèles assemblées par Upload-Concat: final"""
+        path, data = video_file
+        bunny_server.failure_rate = 0.01
+        video_id, headers = new_video(bunny_server)
+        uploader = make_uploader(bunny_server, tmp_path / 'state', parallel_parts=4, chunk_retries=20)
+
+        state = uploader.upload(path, resume_key_for(path), headers)
+
+        assert state['concat'] is True
+        assert len(state['parts']) == 4
+        assert bunny_server.videos[video_id] == data
+
+    def test_single_part_without_concatenation_extension(self, bunny_server, video_file, tmp_path):
+        """Sans l'extension concatenation, upload séquentiel"""
+        path, data = video_file
+        bunny_server.concatenation = False
+        video_id, headers = new_video(bunny_server)
+        uploader = make_uploader(bunny_server, tmp_path / 'state', parallel_parts=4)
+
+        state = uploader.upload(path, resume_key_for(path), headers)
+
+        assert state['concat'] is False
+        assert bunny_server.videos[video_id] == data
@@ -0,0 +1,128 @@
+"""
+Test de régression: tableau de bord club en lecture seule
+Le nombre de requêtes doit rester fixe quel que soit le nombre de terrains,
+de joueurs, de vidéos ou de sessions d'enregistrement, et aucune écriture
+ne doit être émise pendant un GET.
+"""
+import json
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.user import Club, ClubActionHistory, ClubOverlay, Court, RecordingSession, User, UserRole, Video
+from src.routes.clubs import clubs_bp
+
+# utilisateur + club (+ overlays) + joueurs + terrains + sessions actives (avec joueur)
+# + compteurs agrégés + vidéos récentes (avec joueur) + crédits offerts
+QUERY_BUDGET = 9
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(clubs_bp, url_prefix='/api/clubs')
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([Club(id=1, name='Padel Tunis'), Club(id=2, name='Padel Sousse')])
+        db.session.add(ClubOverlay(club_id=1, image_url='/logos/1.png'))
+        db.session.add(User(id=1, email='club@test.tn', name='Club', role=UserRole.CLUB, club_id=1))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def seed(courts, players, first_id=0):
+    """Terrains du club 1 (un sur deux occupé), joueurs, vidéos et crédits"""
+    now = datetime.utcnow()
+    for n in range(first_id, first_id + courts):
+        court = Court(id=100 + n, club_id=1, name=f'Terrain {n}', qr_code=f'qr-{n}', camera_url='rtsp://cam')
+        db.session.add(court)
+    for n in range(first_id, first_id + players):
+        db.session.add(User(id=1000 + n, email=f'p{n}@test.tn', name=f'Joueur {n}', club_id=1))
+    db.session.flush()
+    for n in range(first_id, first_id + courts):
+        db.session.add(Video(title=f'Match {n}', user_id=1000 + first_id + n % players, court_id=100 + n))
+        if n % 2 == 0:
+            db.session.add(RecordingSession(
+                recording_id=f'rec-{n}', user_id=1000 + first_id + n % players, court_id=100 + n, club_id=1,
+                planned_duration=60, start_time=now - timedelta(minutes=10)))
+        db.session.add(ClubActionHistory(user_id=1000 + first_id, club_id=1, performed_by_id=1,
+                                         action_type='add_credits',
+                                         action_details=json.dumps({'credits_added': 3})))
+    db.session.commit()
+
+
+def get_dashboard(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    db.session.expire_all()
+    with count_queries() as statements:
+        response = client.get('/api/clubs/dashboard')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), statements
+
+
+@pytest.mark.integration
+class TestClubDashboardQueries:
+    """Budget fixe de requêtes et absence d'écriture"""
+
+    def test_query_budget_independent_of_club_size(self, app):
+        seed(courts=6, players=4)
+        data, statements = get_dashboard(app)
+        assert len(statements) <= QUERY_BUDGET, (len(statements), '\n\n'.join(statements))
+
+        seed(courts=30, players=20, first_id=6)
+        more_data, more_statements = get_dashboard(app)
+        assert len(more_statements) == len(statements)
+
+        stats = more_data['stats']
+        assert (stats['total_courts'], stats['total_players'], stats['total_videos']) == (36, 24, 36)
+        assert stats['total_credits_offered'] == 36 * 3
+        assert len(more_data['videos']) == 36
+        assert all(video['player_name'].startswith('Joueur ') and video['club_id'] == 1
+                   for video in more_data['videos'])
+        assert data['club']['overlays'][0]['image_url'] == '/logos/1.png'
+
+        occupied = [court for court in more_data['courts'] if court['is_occupied']]
+        assert len(occupied) == 18
+        assert occupied[0]['recording_player'] == 'Joueur 0'
+        assert occupied[0]['recording_total'] == 60
+
+    def test_expired_session_shown_available_without_writes(self, app):
+        seed(courts=2, players=1)
+        expired = RecordingSession.query.filter_by(court_id=100).one()
+        expired.start_time = datetime.utcnow() - timedelta(hours=3)
+        db.session.get(Court, 100).is_recording = True
+        db.session.commit()
+
+        data, statements = get_dashboard(app)
+
+        court = next(court for court in data['courts'] if court['id'] == 100)
+        assert court['is_occupied'] is False
+        assert court['occupation_status'] == 'Disponible'
+        assert all(statement.lstrip().upper().startswith('SELECT') for statement in statements)
+        # Clôture laissée au nettoyage en arrière-plan
+        assert db.session.get(RecordingSession, expired.id).status == 'active'
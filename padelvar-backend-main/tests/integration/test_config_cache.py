@@ -0,0 +1,131 @@
+"""
+Tests d'intégration du cache de configuration système
+(lectures sans requête ni déchiffrement, invalidation versionnée locale et
+diffusée aux autres processus)
+"""
+import json
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.system_configuration import ConfigType, SystemConfiguration
+from src.services import config_cache as config_cache_module
+from src.services.config_cache import CHANNEL, ConfigCache, config_cache
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.version = 0
+        self.published = []
+
+    def incr(self, key):
+        self.version += 1
+        return self.version
+
+    def publish(self, channel, payload):
+        self.published.append((channel, payload))
+        return 1
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(config_cache_module, 'get_redis_client', lambda: None)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        config_cache.clear()
+        SystemConfiguration.set_bunny_cdn_config(api_key='secret-key', library_id='42',
+                                                 cdn_hostname='cdn.example.com')
+        yield app
+        config_cache.clear()
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.mark.integration
+class TestConfigCache:
+    """Cache des valeurs déchiffrées, invalidation locale et inter-processus"""
+
+    def test_repeated_lookups_skip_query_and_decrypt(self, app, monkeypatch):
+        decrypts = []
+        original = SystemConfiguration.decrypt_value
+        monkeypatch.setattr(SystemConfiguration, 'decrypt_value',
+                            lambda self, value: decrypts.append(value) or original(self, value))
+
+        with count_queries() as statements:
+            first = SystemConfiguration.get_bunny_cdn_config()
+            for _ in range(50):
+                assert SystemConfiguration.get_bunny_cdn_config() == first
+
+        assert first['api_key'] == 'secret-key'
+        assert first['storage_zone'] == 'padel-videos'           # défaut, clé absente
+        assert len(statements) == 4
+        assert len(decrypts) == 1
+
+    def test_set_config_invalidates_and_broadcasts_key_only(self, app, monkeypatch):
+        redis = FakeRedis()
+        monkeypatch.setattr(config_cache_module, 'get_redis_client', lambda: redis)
+        monkeypatch.setattr(config_cache, '_ensure_listener', lambda: None)
+        assert SystemConfiguration.get_config('bunny_cdn_api_key') == 'secret-key'
+
+        SystemConfiguration.set_config('bunny_cdn_api_key', 'new-key', ConfigType.BUNNY_CDN, encrypt=True)
+
+        assert SystemConfiguration.get_config('bunny_cdn_api_key') == 'new-key'
+        assert redis.published == [(CHANNEL, json.dumps({'key': 'bunny_cdn_api_key', 'version': 1}))]
+        assert 'new-key' not in redis.published[0][1]
+
+    def test_remote_invalidation_drops_entry(self, app):
+        SystemConfiguration.get_config('bunny_cdn_library_id')
+        # Écriture par un autre processus (sans passer par ce cache)
+        row = SystemConfiguration.query.filter_by(config_key='bunny_cdn_library_id').first()
+        row.config_value = '43'
+        db.session.commit()
+        assert SystemConfiguration.get_config('bunny_cdn_library_id') == '42'
+
+        config_cache._on_message(json.dumps({'key': 'bunny_cdn_library_id', 'version': 7}))
+
+        assert SystemConfiguration.get_config('bunny_cdn_library_id') == '43'
+
+    def test_write_during_load_is_not_overwritten(self):
+        cache = ConfigCache(ttl=60)
+        cache._ensure_listener = lambda: None
+        values = ['old']
+
+        def slow_load():
+            value = values[0]
+            values[0] = 'new'
+            cache.invalidate('key')                              # set_config pendant la lecture
+            return value
+
+        assert cache.get(('key', True), slow_load) == 'old'
+        assert cache.get(('key', True), lambda: values[0]) == 'new'
+
+    def test_ttl_expiry(self, monkeypatch):
+        cache = ConfigCache(ttl=60)
+        cache._ensure_listener = lambda: None
+        now = [1000.0]
+        monkeypatch.setattr(config_cache_module.time, 'monotonic', lambda: now[0])
+
+        assert cache.get('key', lambda: 'a') == 'a'
+        assert cache.get('key', lambda: 'b') == 'a'
+        now[0] += 61
+        assert cache.get('key', lambda: 'b') == 'b'
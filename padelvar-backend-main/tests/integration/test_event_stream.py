@@ -0,0 +1,156 @@
+"""
+Tests d'intégration du flux SSE (mode sans Redis: journal et diffusion en mémoire)
+"""
+import json
+
+import pytest
+from flask import Flask
+
+from src.models.database import db
+from src.models.notification import Notification, NotificationType
+from src.models.user import HighlightJob, User, UserClip
+from src.routes import events as events_module
+from src.routes.events import events_bp
+from src.services import event_stream as event_stream_module
+from src.services.event_stream import EventBroker, publish_event
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = EventBroker()
+    monkeypatch.setattr(event_stream_module, 'get_redis_client', lambda: None)
+    monkeypatch.setattr(event_stream_module, 'event_broker', broker)
+    monkeypatch.setattr(events_module, 'event_broker', broker)
+    monkeypatch.setattr(events_module, 'MAX_STREAM_SECONDS', 0.2)
+    return broker
+
+
+@pytest.fixture
+def app(broker):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(events_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email='player@test.tn', name='Player'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def parse_frames(body):
+    """[(id, event, data)] depuis le corps SSE"""
+    frames = []
+    for block in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+        if 'event' in fields:
+            frames.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+    return frames
+
+
+def drain(subscription):
+    events = []
+    while (live_event := subscription.get(timeout=0)) is not None:
+        events.append(live_event)
+    return events
+
+
+@pytest.mark.integration
+@pytest.mark.notifications
+class TestEventStream:
+    """Publication après commit, diffusion et reprise Last-Event-ID"""
+
+    def test_model_changes_published_after_commit(self, app, broker):
+        subscription = broker.subscribe(1)
+
+        job = HighlightJob(video_id=1, user_id=1, status='queued', progress=0)
+        db.session.add(job)
+        db.session.commit()
+        job.progress = 30
+        db.session.commit()
+        job.error_message = 'sans effet'  # ni status ni progress: pas d'événement
+        db.session.commit()
+
+        job.status = 'failed'
+        db.session.flush()
+        db.session.rollback()  # annulé: rien de publié
+
+        clip = UserClip(video_id=1, user_id=1, title='Smash', start_time=10, end_time=20)
+        db.session.add(clip)
+        db.session.commit()
+        clip.status = 'completed'
+        db.session.commit()
+
+        Notification.create_notification(1, NotificationType.VIDEO, 'Vidéo prête', 'Votre match est en ligne')
+        db.session.commit()
+
+        events = [(e.event, json.loads(e.data)) for e in drain(subscription)]
+        assert [(name, data.get('status', data.get('title'))) for name, data in events] == [
+            ('highlight_job', 'queued'),
+            ('highlight_job', 'queued'),
+            ('clip', 'pending'),
+            ('clip', 'completed'),
+            ('notification', 'Vidéo prête'),
+        ]
+        assert events[1][1]['progress'] == 30
+        assert broker.subscribe(2).get(timeout=0) is None
+
+    def test_stream_replays_from_last_event_id_then_goes_live(self, client):
+        ids = [publish_event(1, 'notification', {'n': i}) for i in range(3)]
+        publish_event(2, 'notification', {'n': 'autre joueur'})
+
+        response = client.get('/api/events/stream', headers={'Last-Event-ID': ids[0]}, buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        publish_event(1, 'recording', {'status': 'recording'})
+
+        body = ''.join(chunk.decode() for chunk in response.response)
+        response.close()
+
+        frames = parse_frames(body)
+        assert body.startswith('retry: ')
+        assert [(name, data) for _, name, data in frames] == [
+            ('notification', {'n': 1}),
+            ('notification', {'n': 2}),
+            ('recording', {'status': 'recording'}),
+        ]
+        assert frames[0][0] == ids[1]
+
+    def test_subscription_released_and_limit_enforced(self, client, broker, monkeypatch):
+        response = client.get('/api/events/stream', buffered=False)
+        assert broker.connection_count() == 1
+        response.close()
+        assert broker.connection_count() == 0
+
+        monkeypatch.setattr(events_module, 'MAX_CONNECTIONS', 1)
+        broker.subscribe(5)
+        response = client.get('/api/events/stream')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+
+    def test_requires_authentication(self, app):
+        assert app.test_client().get('/api/events/stream').status_code == 401
+
+    def test_redis_message_dispatched_to_local_subscribers(self, broker):
+        subscription = broker.subscribe(7)
+        broker._on_message('padelvar:events:7', json.dumps({
+            'id': '1700000000000-0', 'event': 'clip', 'data': '{"id": 3, "status": "completed"}'
+        }))
+        broker._on_message('padelvar:events:7', 'pas du json')
+
+        events = drain(subscription)
+        assert len(events) == 1
+        assert events[0].format() == (
+            'id: 1700000000000-0\nevent: clip\ndata: {"id": 3, "status": "completed"}\n\n'
+        )
@@ -0,0 +1,86 @@
+"""
+Tests d'intégration du proxy vidéo Flask (passthrough MJPEG)
+Le JPEG d'une caméra n'est plus relayé après un arrêt ou un changement d'URL.
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.services import flask_video_proxy_server as proxy_module
+from src.services.flask_video_proxy_server import FlaskVideoProxyServer
+
+
+class FakeReader:
+    """Caméra MJPEG: un JPEG toutes les 10 ms"""
+
+    def __init__(self, url):
+        self.url = url
+
+    def iter_frames(self):
+        while True:
+            time.sleep(0.01)
+            yield b'\xff\xd8' + self.url.encode() + b'\xff\xd9'
+
+
+class ClosedCapture:
+    """cv2.VideoCapture d'une caméra RTSP injoignable"""
+
+    def __init__(self, *args):
+        pass
+
+    def isOpened(self):
+        return False
+
+    def set(self, *args):
+        return True
+
+    def release(self):
+        pass
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    monkeypatch.setattr(proxy_module, 'MJPEGPassthroughReader', FakeReader)
+    monkeypatch.setattr(proxy_module.cv2, 'VideoCapture', ClosedCapture)
+    monkeypatch.setattr(FlaskVideoProxyServer, '_handle_connection_loss', lambda self: time.sleep(0.01))
+    proxy = FlaskVideoProxyServer(court_id=1)
+    yield proxy
+    asyncio.run(proxy.shutdown())
+
+
+@pytest.mark.integration
+class TestFlaskVideoProxyPassthrough:
+    """Réinitialisation du dernier JPEG à l'arrêt et au changement de caméra"""
+
+    def test_switch_to_rtsp_drops_previous_jpeg(self, proxy):
+        asyncio.run(proxy.set_camera_url('http://cam-a/mjpeg'))
+        wait_for(lambda: proxy.last_jpeg is not None)
+        assert proxy.get_health_status()['passthrough'] is True
+
+        asyncio.run(proxy.set_camera_url('rtsp://cam-b/stream'))
+        time.sleep(0.1)
+
+        assert proxy.last_jpeg is None
+        assert proxy.get_health_status()['passthrough'] is False
+        assert proxy.get_health_status()['connected'] is False
+
+    def test_stop_clears_frames_and_old_thread_stays_silent(self, proxy):
+        asyncio.run(proxy.set_camera_url('http://cam-a/mjpeg'))
+        wait_for(lambda: proxy.last_jpeg is not None)
+        old_thread = proxy.capture_thread
+
+        asyncio.run(proxy.set_camera_url('http://cam-b/mjpeg'))
+        wait_for(lambda: proxy.last_jpeg is not None)
+        assert not old_thread.is_alive()
+        assert b'cam-b' in proxy.last_jpeg
+
+        asyncio.run(proxy.shutdown())
+        assert (proxy.last_jpeg, proxy.last_frame, proxy.last_frame_time) == (None, None, 0)
@@ -0,0 +1,158 @@
+"""
+Tests d'intégration de l'idempotence sous concurrence (100 doublons simultanés)
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask import Flask, jsonify
+
+from src.middleware import idempotence as idempotence_module
+from src.middleware.idempotence import IdempotencyStore, with_idempotence
+from src.models.database import db
+from src.models.user import IdempotencyKey
+from src.services.redis_client import reset_redis_client
+
+DUPLICATES = 100
+
+
+class FakeRedis:
+    """SET NX/EX, GET et script de libération, thread-safe"""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, nx=False, ex=None):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value
+            return True
+
+    def get(self, key):
+        with self.lock:
+            return self.values.get(key)
+
+    def register_script(self, source):
+        assert source == idempotence_module._RELEASE
+
+        def release(keys, args):
+            with self.lock:
+                value = self.values.get(keys[0])
+                if value and json.loads(value).get('token') == args[0]:
+                    del self.values[keys[0]]
+                    return 1
+                return 0
+        return release
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = IdempotencyStore()
+    monkeypatch.setattr(idempotence_module, 'idempotency_store', store)
+    monkeypatch.setattr(idempotence_module, 'POLL_INTERVAL_SECONDS', 0.01)
+    yield store
+    reset_redis_client(None)
+
+
+@pytest.fixture
+def app(store):
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Fichier SQLite: connexions réelles par thread
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'idem.db')}"
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+        app.config['SECRET_KEY'] = 'test'
+        db.init_app(app)
+        app.executions = 0
+        app.fail_next = False
+        counter_lock = threading.Lock()
+
+        @app.route('/credits/buy', methods=['POST'])
+        @with_idempotence(persist=True)
+        def buy():
+            with counter_lock:
+                app.executions += 1
+                execution = app.executions
+            time.sleep(0.2)  # Fenêtre large: tous les doublons arrivent pendant l'exécution
+            if app.fail_next:
+                app.fail_next = False
+                return jsonify({'error': 'Paiement refusé'}), 402
+            return jsonify({'transaction_id': execution, 'credits': 10}), 201
+
+        with app.app_context():
+            db.create_all()
+            yield app
+            db.session.remove()
+            db.drop_all()
+            db.engine.dispose()
+
+
+def fire_duplicates(app, key, count=DUPLICATES):
+    barrier = threading.Barrier(count)
+
+    def call(_):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/credits/buy', json={'package_id': 'pack_10'},
+                               headers={'Idempotency-Key': key})
+        return response.status_code, response.get_json(), response.headers.get('X-Idempotent')
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        return list(pool.map(call, range(count)))
+
+
+@pytest.mark.integration
+class TestIdempotencyConcurrency:
+    """Une seule exécution pour N requêtes identiques simultanées"""
+
+    def test_redis_tier_single_execution_and_write_behind(self, app, store):
+        reset_redis_client(FakeRedis())
+
+        results = fire_duplicates(app, 'pay-123')
+
+        assert app.executions == 1
+        assert {(status, body['transaction_id']) for status, body, _ in results} == {(201, 1)}
+        assert sum(1 for *_, replayed in results if replayed == 'true') == DUPLICATES - 1
+
+        # Copie durable écrite en arrière-plan pour les paiements
+        store.flush()
+        record = IdempotencyKey.query.one()
+        assert record.response_status_code == 201
+        assert json.loads(record.response_body)['transaction_id'] == 1
+
+    def test_database_tier_without_redis(self, app, monkeypatch):
+        monkeypatch.setattr(idempotence_module, 'get_redis_client', lambda: None)
+
+        results = fire_duplicates(app, 'pay-456')
+
+        assert app.executions == 1
+        assert {(status, body['transaction_id']) for status, body, _ in results} == {(201, 1)}
+        assert IdempotencyKey.query.count() == 1
+
+    def test_failed_request_releases_key(self, app):
+        reset_redis_client(FakeRedis())
+        client = app.test_client()
+        headers = {'Idempotency-Key': 'pay-789'}
+
+        app.fail_next = True
+        assert client.post('/credits/buy', json={}, headers=headers).status_code == 402
+        retry = client.post('/credits/buy', json={}, headers=headers)
+        replay = client.post('/credits/buy', json={}, headers=headers)
+
+        assert retry.status_code == 201
+        assert replay.status_code == 201 and replay.headers['X-Idempotent'] == 'true'
+        assert replay.get_json() == retry.get_json()
+        assert app.executions == 2
+
+    def test_requests_without_key_are_not_deduplicated(self, app):
+        reset_redis_client(FakeRedis())
+        client = app.test_client()
+        client.post('/credits/buy', json={})
+        client.post('/credits/buy', json={})
+        assert app.executions == 2
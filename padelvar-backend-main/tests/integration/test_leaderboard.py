@@ -0,0 +1,202 @@
+"""
+Tests d'intégration du classement joueurs (sorted sets Redis et fallback SQL)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+from src.models.database import db
+from src.models.user import Club, User, UserRole, Video
+from src.routes.players import players_bp
+from src.services import leaderboard as leaderboard_module
+from src.services.leaderboard import MEMBERS_KEY, board_key, leaderboard
+
+
+class FakeRedis:
+    """Sorted sets, hashes, sets et pipelines (exécution séquentielle)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+    def exists(self, key):
+        return int(key in self.data)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        return True
+
+    def rename(self, src, dst):
+        self.data[dst] = self.data.pop(src)
+
+    def zadd(self, key, mapping):
+        board = self.data.setdefault(key, {})
+        for member, score in mapping.items():
+            board[str(member)] = float(score)
+
+    def zincrby(self, key, amount, member):
+        board = self.data.setdefault(key, {})
+        board[str(member)] = board.get(str(member), 0.0) + amount
+
+    def zrem(self, key, member):
+        self.data.get(key, {}).pop(str(member), None)
+
+    def zscore(self, key, member):
+        return self.data.get(key, {}).get(str(member))
+
+    def _ordered(self, key):
+        return [m for m, _ in sorted(self.data.get(key, {}).items(), key=lambda kv: (kv[1], kv[0]), reverse=True)]
+
+    def zrevrange(self, key, start, end):
+        return self._ordered(key)[start:end + 1]
+
+    def zrevrank(self, key, member):
+        ordered = self._ordered(key)
+        return ordered.index(str(member)) if str(member) in ordered else None
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        values = self.data.setdefault(key, {})
+        for f, v in (mapping or {field: value}).items():
+            values[str(f)] = str(v)
+
+    def hmget(self, key, fields):
+        return [self.data.get(key, {}).get(str(f)) for f in fields]
+
+    def hdel(self, key, field):
+        self.data.get(key, {}).pop(str(field), None)
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(str(m) for m in members)
+
+    def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(players_bp)
+    with app.app_context():
+        db.create_all()
+        now = datetime(2026, 1, 1)
+        db.session.add_all([Club(id=1, name='Padel Tunis'), Club(id=2, name='Padel Sousse')])
+        db.session.add_all(
+            User(id=n, email=f'p{n}@test.tn', name=f'Joueur {n}', credits_balance=n * 10,
+                 club_id=1 if n % 2 else 2, last_login_at=now + timedelta(hours=n))
+            for n in range(1, 21)
+        )
+        db.session.add(User(id=99, email='club@test.tn', name='Club', role=UserRole.CLUB, credits_balance=10000))
+        db.session.add_all(Video(title='Match', user_id=n) for n in (3, 3, 3, 5, 5))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(leaderboard_module, 'get_redis_client', lambda: fake)
+    return fake
+
+
+def get_leaderboard(app, user_id=1, **params):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    response = client.get('/api/players/social/leaderboard', query_string=params)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+@pytest.mark.integration
+class TestLeaderboard:
+    """Top N, rang hors top N et mises à jour incrémentales"""
+
+    def test_sql_fallback_without_redis(self, app, monkeypatch):
+        monkeypatch.setattr(leaderboard_module, 'get_redis_client', lambda: None)
+
+        data = get_leaderboard(app, user_id=1, limit=3)
+        assert [p['name'] for p in data['leaderboard']] == ['Joueur 20', 'Joueur 19', 'Joueur 18']
+        assert data['current_user_rank'] == 20  # hors du top 3, compte de rôle CLUB exclu
+
+        data = get_leaderboard(app, user_id=5, sort_by='videos', club_id=1, limit=2)
+        assert [(p['name'], p['videos_count'], p['club_name']) for p in data['leaderboard']] == [
+            ('Joueur 3', 3, 'Padel Tunis'), ('Joueur 5', 2, 'Padel Tunis')]
+        assert data['current_user_rank'] == 2
+
+    def test_redis_rebuild_and_rank_outside_top(self, app, redis):
+        assert leaderboard.rebuild(batch_size=7) == 20
+
+        data = get_leaderboard(app, user_id=2, limit=3)
+        assert [p['name'] for p in data['leaderboard']] == ['Joueur 20', 'Joueur 19', 'Joueur 18']
+        assert data['current_user_rank'] == 19
+
+        data = get_leaderboard(app, user_id=3, sort_by='activity', club_id=1, limit=1)
+        assert [p['name'] for p in data['leaderboard']] == ['Joueur 19']
+        assert data['current_user_rank'] == 9
+        assert '99' not in redis.data[MEMBERS_KEY]
+
+    def test_incremental_updates_match_rebuild(self, app, redis):
+        leaderboard.rebuild()
+
+        player = db.session.get(User, 1)
+        player.credits_balance = 500      # nouveau premier
+        player.club_id = 2                 # change de club
+        db.session.add(Video(title='Nouveau', user_id=1))
+        db.session.delete(Video.query.filter_by(user_id=3).first())
+        db.session.get(User, 20).role = UserRole.CLUB  # n'est plus classé
+        db.session.commit()
+
+        rejected = db.session.get(User, 2)
+        rejected.credits_balance = 9999
+        db.session.flush()
+        db.session.rollback()              # annulé: rien appliqué
+
+        data = get_leaderboard(app, user_id=1, limit=2)
+        assert [p['name'] for p in data['leaderboard']] == ['Joueur 1', 'Joueur 19']
+        assert data['current_user_rank'] == 1
+        assert redis.zscore(board_key('credits', 1), 1) is None
+        assert redis.zscore(board_key('videos', 2), 1) == 1
+        assert redis.zscore(board_key('videos'), 3) == 2
+
+        incremental = {key: value for key, value in redis.data.items() if key != 'leaderboard:built'}
+        leaderboard.rebuild()
+        rebuilt = {key: value for key, value in redis.data.items() if key != 'leaderboard:built'}
+        assert incremental == rebuilt
+
+    def test_not_built_falls_back_to_sql_and_triggers_rebuild(self, app, redis, monkeypatch):
+        triggered = []
+        monkeypatch.setattr(leaderboard, 'rebuild_in_background', lambda: triggered.append(True))
+
+        data = get_leaderboard(app, user_id=1, limit=1)
+
+        assert [p['name'] for p in data['leaderboard']] == ['Joueur 20']
+        assert triggered == [True]
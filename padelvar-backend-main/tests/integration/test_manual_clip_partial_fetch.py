@@ -0,0 +1,102 @@
+"""
+Tests d'intégration du découpage de clips par lecture partielle (HTTP Range)
+Le faux serveur Bunny sert des MP4 de test générés par FFmpeg
+"""
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_bunny_server import FakeBunnyServer
+from src.services.mp4_index import load_file_index
+
+API_KEY = 'test-api-key-0000-0000'
+LIBRARY_ID = '4242'
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg requis')
+
+
+@pytest.fixture(scope='module', params=['moov_end', 'faststart'])
+def source_video(request, tmp_path_factory):
+    """MP4 de 60s (GOP 2s, B-frames, audio), moov en fin ou en début de fichier"""
+    path = tmp_path_factory.mktemp('source') / f'{request.param}.mp4'
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', 'testsrc2=size=320x240:rate=25:duration=60',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:duration=60',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '50', '-bf', '2',
+        '-c:a', 'aac', '-shortest'
+    ]
+    if request.param == 'faststart':
+        cmd += ['-movflags', '+faststart']
+    subprocess.run(cmd + [str(path)], check=True)
+    return path.read_bytes()
+
+
+@pytest.fixture
+def bunny_server(source_video):
+    with FakeBunnyServer(API_KEY, LIBRARY_ID) as server:
+        server.videos['match-1'] = source_video
+        yield server
+
+
+@pytest.fixture
+def clip_service(bunny_server, tmp_path, monkeypatch):
+    monkeypatch.setenv('BUNNY_API_HOST', bunny_server.url)
+    from src.services.manual_clip_service import ManualClipService
+    service = ManualClipService()
+    service.temp_dir = str(tmp_path)
+    return service
+
+
+def cut(service, start, end):
+    return service._cut_video_from_bunny_api('match-1', start, end, {'library_id': LIBRARY_ID, 'api_key': API_KEY})
+
+
+def sample_tables(path):
+    return [list(track.sample_sizes) for track in load_file_index(path).tracks]
+
+
+@pytest.mark.integration
+@pytest.mark.video
+class TestManualClipPartialFetch:
+    """Tests de ManualClipService._cut_video_from_bunny_api"""
+
+    def test_clip_matches_full_download(self, clip_service, bunny_server, source_video, tmp_path, monkeypatch):
+        """Clip identique à celui découpé depuis l'original complet, une fraction des octets lue"""
+        partial_clip = cut(clip_service, 30.5, 45.5)
+        served = bunny_server.bytes_served
+        assert served < len(source_video) * 0.4
+
+        monkeypatch.setattr('src.services.manual_clip_service.PARTIAL_FETCH_ENABLED', False)
+        full_clip = cut(clip_service, 30.5, 45.5)
+        assert bunny_server.bytes_served - served == len(source_video)
+
+        assert sample_tables(partial_clip) == sample_tables(full_clip)
+        assert 14.5 <= load_file_index(partial_clip).duration <= 17.5
+        # Les sources temporaires sont supprimées
+        assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(partial_clip), os.path.basename(full_clip)])
+
+    def test_moov_index_cached_per_video(self, clip_service, bunny_server):
+        """Deuxième clip du même match: ni relecture ni re-parsing du moov"""
+        cut(clip_service, 5, 20)
+        requests_before = bunny_server.range_requests
+
+        cut(clip_service, 40, 55)
+
+        # Premier bloc (validation taille/redirection) + plage du clip
+        assert bunny_server.range_requests - requests_before == 2
+        assert list(clip_service._index_cache) == ['match-1']
+
+    def test_fallback_without_range_support(self, clip_service, bunny_server, source_video):
+        """Serveur sans Range: téléchargement complet puis découpe"""
+        bunny_server.range_support = False
+
+        clip = cut(clip_service, 10, 25)
+
+        assert bunny_server.bytes_served >= len(source_video)
+        assert 14.5 <= load_file_index(clip).duration <= 17.5
@@ -0,0 +1,207 @@
+"""
+Tests d'intégration des compteurs de notifications et de la pagination keyset
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.notification import Notification, NotificationType
+from src.models.user import User
+from src.routes.notifications import notifications_bp
+from src.services import notification_counters as counters_module
+from src.services.bulk_notification_service import insert_notification_batch
+from src.services.notification_counters import counter_key, notification_counters
+from src.services.redis_client import reset_redis_client
+
+
+class FakeRedis:
+    """Hash Redis en mémoire; les scripts Lua sont rejoués en Python"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+
+    def register_script(self, source):
+        fill = source == counters_module._FILL
+
+        def run(keys, args, client=None):
+            values = self.hashes.get(keys[0])
+            if fill:
+                if values is None:
+                    self.hashes[keys[0]] = {'total': str(args[0]), 'unread': str(args[1])}
+                return self.hmget(keys[0], 'total', 'unread')
+            if values is None:
+                return 0
+            values['total'] = str(int(values['total']) + int(args[0]))
+            values['unread'] = str(int(values['unread']) + int(args[1]))
+            return 1
+        return run
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def execute(self):
+        return []
+
+
+@pytest.fixture
+def fake_redis():
+    redis = FakeRedis()
+    reset_redis_client(redis)
+    notification_counters._scripts.clear()
+    yield redis
+    reset_redis_client(None)
+    notification_counters._scripts.clear()
+
+
+@pytest.fixture
+def app(fake_redis):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(notifications_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email='player@test.tn', name='Player'))
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+
+def seed(count, read_every=3):
+    start = datetime(2025, 1, 1)
+    db.session.bulk_insert_mappings(Notification, [{
+        'user_id': 1,
+        'notification_type': NotificationType.INFO,
+        'title': f'Notification {i}',
+        'message': 'Message',
+        'is_read': i % read_every == 0,
+        # Horodatages en double pour vérifier le départage par id
+        'created_at': start + timedelta(minutes=i // 2),
+    } for i in range(count)])
+    db.session.commit()
+
+
+@pytest.mark.integration
+@pytest.mark.notifications
+class TestNotificationCounters:
+    """Compteurs matérialisés (Redis) et pagination (created_at, id)"""
+
+    def test_counters_follow_create_read_delete(self, app, fake_redis):
+        seed(30)
+        assert notification_counters.get(1) == {'total': 30, 'unread': 20}
+        assert fake_redis.hashes[counter_key(1)] == {'total': '30', 'unread': '20'}
+
+        notification = Notification.create_notification(1, NotificationType.VIDEO, 'Vidéo', 'Prête')
+        db.session.commit()
+        assert notification_counters.get(1) == {'total': 31, 'unread': 21}
+
+        assert Notification.mark_as_read(notification.id, 1)
+        assert notification_counters.get(1) == {'total': 31, 'unread': 20}
+
+        db.session.delete(notification)
+        db.session.commit()
+        assert notification_counters.get(1) == {'total': 30, 'unread': 20}
+
+        Notification.mark_all_as_read(1)
+        assert notification_counters.get(1) == {'total': 30, 'unread': 0}
+        assert notification_counters.get(1) == notification_counters.count_from_db(1)
+
+    def test_rollback_leaves_counters_untouched(self, app):
+        seed(10)
+        assert notification_counters.get(1) == {'total': 10, 'unread': 6}
+
+        db.session.add(Notification(user_id=1, notification_type=NotificationType.INFO,
+                                    title='Annulée', message='...'))
+        db.session.flush()
+        db.session.rollback()
+        db.session.add(Notification(user_id=1, notification_type=NotificationType.INFO,
+                                    title='Gardée', message='...'))
+        db.session.commit()
+
+        assert notification_counters.get(1) == {'total': 11, 'unread': 7}
+
+    def test_bulk_batch_resets_recipient_counters(self, app, fake_redis):
+        """bulk_insert_mappings ne déclenche pas les événements mapper: compteurs recalculés"""
+        db.session.add(User(id=2, email='other@test.tn', name='Other'))
+        db.session.commit()
+        seed(6)
+        assert notification_counters.get(1) == {'total': 6, 'unread': 4}
+        assert notification_counters.get(2) == {'total': 0, 'unread': 0}
+        fake_redis.hashes[counter_key(1)]['unread'] = '40'           # compteur faux
+
+        insert_notification_batch([1, 2, 999], 'system_maintenance', 'Maintenance', 'Dimanche 2h-4h')
+
+        assert counter_key(1) not in fake_redis.hashes
+        assert counter_key(2) not in fake_redis.hashes
+        assert notification_counters.get(1) == notification_counters.count_from_db(1) == {'total': 6, 'unread': 4}
+        assert notification_counters.get(2) == notification_counters.count_from_db(2)
+
+    def test_falls_back_to_database_without_redis(self, app, monkeypatch):
+        monkeypatch.setattr(counters_module, 'get_redis_client', lambda: None)
+        seed(9)
+        assert notification_counters.get(1) == {'total': 9, 'unread': 6}
+
+    def test_keyset_pages_cover_every_notification_once(self, app, client):
+        seed(95)
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            statements.clear()
+            url = '/api/notifications?limit=20' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            pages += 1
+            seen += [n['id'] for n in data['notifications']]
+            assert data['pagination']['total'] == 95
+            assert data['stats']['unread_count'] == 63
+            # Compteurs lus dans Redis: plus aucun COUNT après la 1re page
+            assert pages == 1 or not any('count(' in s.lower() for s in statements)
+            cursor = data['pagination']['next_cursor']
+            if not cursor:
+                assert data['pagination']['has_more'] is False
+                break
+
+        assert pages == 5
+        assert len(seen) == len(set(seen)) == 95
+        expected = [n.id for n in Notification.query.order_by(
+            Notification.created_at.desc(), Notification.id.desc())]
+        assert seen == expected
+
+    def test_mark_all_read_and_stats(self, app, client):
+        seed(12)
+        response = client.post('/api/notifications/mark-all-read')
+        assert response.get_json()['marked_count'] == 8
+
+        stats = client.get('/api/notifications/stats').get_json()
+        assert stats['total_notifications'] == 12
+        assert stats['unread_count'] == 0
+
+        unread = client.get('/api/notifications?unread_only=true').get_json()
+        assert unread['notifications'] == []
+        assert unread['pagination']['total'] == 0
+
+    def test_invalid_cursor_rejected(self, app, client):
+        assert client.get('/api/notifications?cursor=@@@').status_code == 400
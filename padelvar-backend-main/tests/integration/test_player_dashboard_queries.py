@@ -0,0 +1,137 @@
+"""
+Test de régression: nombre de requêtes SQL du dashboard joueur
+Le nombre de requêtes doit rester fixe quel que soit le nombre de clubs,
+de vidéos ou d'actions du joueur.
+"""
+import json
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.user import Club, ClubActionHistory, ClubOverlay, Court, User, Video
+from src.routes.players import players_bp
+from src.services import popular_clubs as popular_clubs_module
+from src.services.popular_clubs import popular_clubs
+
+# user + clubs suivis + club principal (+ overlays) + agrégat vidéos + 5 dernières vidéos
+# + activité (avec clubs) + crédits du mois; classement des clubs déjà calculé
+QUERY_BUDGET = 8
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(popular_clubs_module, 'get_redis_client', lambda: None)
+    popular_clubs.invalidate()
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(players_bp)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    popular_clubs.invalidate()
+
+
+def seed(clubs, videos, activities):
+    """Joueur id=1 rattaché au club 1, abonné aux clubs impairs"""
+    for i in range(1, clubs + 1):
+        club = Club(id=i, name=f'Club {i}')
+        club.courts = [Court(name=f'Terrain {n}', qr_code=f'qr-{i}-{n}', camera_url='rtsp://cam')
+                       for n in range(i % 3)]
+        db.session.add(club)
+        db.session.add(ClubOverlay(club_id=i, image_url=f'/logos/{i}.png'))
+    db.session.flush()
+
+    player = User(id=1, email='player@test.tn', name='Player', club_id=1, credits_balance=12)
+    db.session.add(player)
+    fans = [User(id=100 + n, email=f'fan{n}@test.tn', name=f'Fan {n}') for n in range(10)]
+    db.session.add_all(fans)
+    db.session.flush()
+    for i in range(1, clubs + 1):
+        if i % 2:
+            player.followed_clubs.append(db.session.get(Club, i))
+        for fan in fans[: i % 7]:
+            fan.followed_clubs.append(db.session.get(Club, i))
+
+    db.session.add_all(Video(title=f'Match {n}', user_id=1, duration=60, is_unlocked=n % 2 == 0)
+                       for n in range(videos))
+    db.session.add_all(ClubActionHistory(user_id=1, club_id=1 + n % clubs, performed_by_id=1,
+                                         action_type='add_credits',
+                                         action_details=json.dumps({'credits_added': 2}))
+                       for n in range(activities))
+    db.session.commit()
+
+
+def get_dashboard(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    db.session.expire_all()
+    with count_queries() as statements:
+        response = client.get('/api/players/dashboard')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json(), statements
+
+
+@pytest.mark.integration
+class TestPlayerDashboardQueries:
+    """Budget fixe de requêtes par chargement du dashboard"""
+
+    def test_query_budget_independent_of_data_size(self, app):
+        seed(clubs=40, videos=30, activities=25)
+        popular_clubs.refresh()
+
+        data, statements = get_dashboard(app)
+        assert len(statements) <= QUERY_BUDGET, (len(statements), '\n\n'.join(statements))
+
+        # Deux fois plus de clubs et de vidéos: même nombre de requêtes
+        new_clubs = [Club(id=100 + i, name=f'Nouveau {i}') for i in range(40)]
+        db.session.add_all(new_clubs)
+        db.session.add_all(Video(title='Bonus', user_id=1, duration=30) for _ in range(30))
+        db.session.commit()
+        popular_clubs.refresh()
+
+        _, more_statements = get_dashboard(app)
+        assert len(more_statements) == len(statements)
+
+        assert data['videos_statistics']['total_videos'] == 30
+        assert data['videos_statistics']['unlocked_videos'] == 15
+        assert data['videos_statistics']['total_duration'] == 1800
+        assert len(data['videos_statistics']['recent_videos']) == 5
+        assert data['clubs_statistics']['followed_clubs_count'] == 20
+        assert data['clubs_statistics']['primary_club']['overlays'][0]['image_url'] == '/logos/1.png'
+        assert data['credits_statistics']['credits_earned_this_month'] == 50
+        assert len(data['recent_activity']) == 10
+        assert all(a['club_name'].startswith('Club ') for a in data['recent_activity'])
+
+    def test_recommendations_exclude_followed_and_rank_by_followers(self, app):
+        seed(clubs=20, videos=0, activities=0)
+
+        data, statements = get_dashboard(app)
+
+        recommended = data['recommended_clubs']
+        assert [club['id'] for club in recommended] == [6, 20, 12, 4, 18]
+        assert [club['followers_count'] for club in recommended] == [6, 6, 5, 4, 4]
+        assert all(club['id'] % 2 == 0 for club in recommended)
+        # Premier chargement: classement calculé à la demande (2 requêtes de plus)
+        assert len(statements) <= QUERY_BUDGET + 2
@@ -0,0 +1,132 @@
+"""
+Tests d'intégration du stream de preview
+(redirection vers le serveur de fan-out par défaut, compteur de viewers
+partagé entre threads, limite des viewers servis par Flask)
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+from src.models.user import UserRole
+from src.routes import video_preview as video_preview_module
+from src.routes.video_preview import preview_bp
+from src.video_system.config import VideoConfig
+from src.video_system.preview import PreviewFeed, PreviewHub
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = PreviewHub()
+    monkeypatch.setattr(hub, 'start_server', lambda secret_key, port=None: True)
+    monkeypatch.setattr(hub, '_submit', lambda coro: coro.close())    # pas de flux amont
+    monkeypatch.setattr(video_preview_module, 'preview_hub', hub)
+    return hub
+
+
+@pytest.fixture
+def client(hub, monkeypatch):
+    session = SimpleNamespace(session_id='sess-1', user_id=1, club_id=7,
+                              local_url='http://127.0.0.1:8080/stream.mjpeg')
+    monkeypatch.setattr(video_preview_module.session_manager, 'get_session',
+                        lambda session_id: session if session_id == 'sess-1' else None)
+    monkeypatch.setattr(video_preview_module, 'get_current_user',
+                        lambda: SimpleNamespace(id=1, role=UserRole.PLAYER, club_id=None))
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.register_blueprint(preview_bp)
+    return app.test_client()
+
+
+@pytest.mark.integration
+class TestPreviewStream:
+    """GET /api/preview/<session_id>/stream.mjpeg"""
+
+    def test_redirects_to_hub_by_default(self, client, monkeypatch):
+        monkeypatch.setattr(VideoConfig, 'PREVIEW_HUB_PUBLIC_URL', '')
+
+        response = client.get('/api/preview/sess-1/stream.mjpeg', base_url='http://club.local:5000')
+
+        assert response.status_code == 307
+        location = response.headers['Location']
+        assert location.startswith(f'http://club.local:{VideoConfig.PREVIEW_HUB_PORT}/preview/sess-1/stream.mjpeg?token=')
+
+        monkeypatch.setattr(VideoConfig, 'PREVIEW_HUB_PUBLIC_URL', '/')
+        location = client.get('/api/preview/sess-1/stream.mjpeg').headers['Location']
+        assert location.startswith('/preview/sess-1/stream.mjpeg?token=')
+
+    def test_other_club_is_refused(self, client, hub, monkeypatch):
+        monkeypatch.setattr(VideoConfig, 'PREVIEW_HUB_PORT', 0)
+        feed = hub.get_feed('sess-1', 'http://127.0.0.1:8080/stream.mjpeg')
+        feed.jpeg, feed.seq = b'\xff\xd8jpeg\xff\xd9', 1
+        urls = ('/api/preview/sess-1/stream.mjpeg', '/api/preview/sess-1/snapshot.jpg', '/api/preview/sess-1/info')
+
+        for user, allowed in ((SimpleNamespace(id=50, role=UserRole.CLUB, club_id=8), False),
+                              (SimpleNamespace(id=2, role=UserRole.PLAYER, club_id=None), False),
+                              (SimpleNamespace(id=51, role=UserRole.CLUB, club_id=7), True),
+                              (SimpleNamespace(id=99, role=UserRole.SUPER_ADMIN, club_id=None), True)):
+            monkeypatch.setattr(video_preview_module, 'get_current_user', lambda user=user: user)
+            for url in urls:
+                response = client.get(url, buffered=False)
+                assert (response.status_code != 403) is allowed, (user, url)
+                response.close()
+
+    def test_flask_stream_is_capped_without_hub(self, client, hub, monkeypatch):
+        monkeypatch.setattr(VideoConfig, 'PREVIEW_HUB_PORT', 0)
+        monkeypatch.setattr(VideoConfig, 'PREVIEW_MAX_CLIENTS', 2)
+        feed = hub.get_feed('sess-1', 'http://127.0.0.1:8080/stream.mjpeg')
+        feed.jpeg, feed.seq = b'\xff\xd8jpeg\xff\xd9', 1
+
+        streams = [client.get('/api/preview/sess-1/stream.mjpeg', buffered=False) for _ in range(2)]
+        for response in streams:
+            assert response.status_code == 200
+            assert next(response.response).endswith(b'\xff\xd8jpeg\xff\xd9\r\n')
+        assert feed.viewers == 2
+        assert client.get('/api/preview/sess-1/stream.mjpeg').status_code == 503
+
+        for response in streams:
+            response.close()
+        assert feed.viewers == 0
+
+
+@pytest.mark.integration
+class TestPreviewFeedViewers:
+    """Compteur de viewers incrémenté depuis plusieurs threads"""
+
+    def test_concurrent_add_remove_keeps_count(self):
+        feed = PreviewFeed('sess-1', 'http://127.0.0.1:8080/stream.mjpeg')
+        barrier = threading.Barrier(8)
+
+        def viewer():
+            barrier.wait()
+            for _ in range(20_000):
+                feed.add_viewer()
+                feed.remove_viewer()
+
+        threads = [threading.Thread(target=viewer) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert feed.viewers == 0
+
+    def test_limit_is_enforced_atomically(self):
+        feed = PreviewFeed('sess-1', 'http://127.0.0.1:8080/stream.mjpeg')
+        results = []
+        barrier = threading.Barrier(16)
+
+        def viewer():
+            barrier.wait()
+            results.append(feed.add_viewer(limit=5))
+
+        threads = [threading.Thread(target=viewer) for _ in range(16)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert results.count(True) == 5
+        assert feed.viewers == 5
@@ -0,0 +1,124 @@
+"""
+Tests d'intégration du rate limiting GCRA (mémoire LRU borné et script Redis)
+"""
+import pytest
+from flask import Flask, jsonify
+
+from src.middleware import rate_limit_engine as engine_module
+from src.middleware import rate_limiting as rate_limiting_module
+from src.middleware.rate_limit_engine import Limit, MemoryGcraStore, RateLimiter
+from src.middleware.rate_limiting import RateLimitMiddleware, rate_limit
+
+
+class FakeRedis:
+    """Émule le script GCRA (une seule évaluation par vérification)"""
+
+    def __init__(self):
+        self.store = MemoryGcraStore()
+        self.calls = 0
+
+    def register_script(self, source):
+        assert source == engine_module._GCRA_SCRIPT
+
+        def gcra(keys, args):
+            self.calls += 1
+            limits = [Limit(key, int(args[2 * i]), int(args[2 * i + 1]) // 1000) for i, key in enumerate(keys)]
+            result = self.store.check(limits)
+            index = limits.index(result.limit) + 1
+            return [int(result.allowed), index, result.remaining,
+                    int(result.retry_after * 1000), int(result.reset_after * 1000)]
+        return gcra
+
+
+def make_app(middleware):
+    app = Flask(__name__)
+    middleware.init_app(app)
+
+    @app.route('/api/auth/login', methods=['POST'])
+    def login():
+        return jsonify({'ok': True})
+
+    @app.route('/api/clubs', methods=['GET'])
+    def clubs():
+        return jsonify([])
+
+    @app.route('/api/contact', methods=['POST'])
+    @rate_limit(requests=2, window=60)
+    def contact():
+        return jsonify({'sent': True})
+
+    return app
+
+
+@pytest.fixture
+def memory_app(monkeypatch):
+    monkeypatch.setattr(rate_limiting_module.Config, 'RATELIMIT_STORAGE_URL', None)
+    monkeypatch.setattr(rate_limiting_module.Config, 'CELERY_BROKER_URL', None)
+    monkeypatch.setattr(rate_limiting_module, '_custom_limiter', RateLimiter())
+    return make_app(RateLimitMiddleware())
+
+
+@pytest.mark.integration
+class TestRateLimiting:
+    """Limites glissantes, en-têtes et bornes mémoire"""
+
+    def test_login_limit_with_accurate_retry_after(self, memory_app):
+        client = memory_app.test_client()
+        headers = {'X-Forwarded-For': '41.226.1.1'}
+
+        responses = [client.post('/api/auth/login', headers=headers) for _ in range(11)]
+
+        assert [r.status_code for r in responses[:10]] == [200] * 10
+        assert [r.headers['X-RateLimit-Remaining'] for r in responses[8:10]] == ['1', '0']
+        assert responses[10].status_code == 429
+        # 10 requêtes / 900 s: une nouvelle requête possible après 90 s, pas 900
+        assert 1 <= int(responses[10].headers['Retry-After']) <= 90
+        # Un autre client n'est pas affecté
+        assert client.post('/api/auth/login', headers={'X-Forwarded-For': '41.226.1.2'}).status_code == 200
+
+    def test_rejected_request_does_not_consume_other_limits(self, memory_app):
+        client = memory_app.test_client()
+        headers = {'X-Forwarded-For': '41.226.1.3'}
+        for _ in range(12):
+            client.post('/api/auth/login', headers=headers)
+
+        # 10 acceptées seulement: le quota POST (200) n'a consommé que celles-ci
+        response = client.get('/api/clubs', headers=headers)
+        assert response.headers['X-RateLimit-Remaining'] == '499'
+        assert response.status_code == 200
+
+    def test_decorator_enforces_custom_limit(self, memory_app):
+        client = memory_app.test_client()
+        statuses = [client.post('/api/contact').status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+
+    def test_redis_single_script_call_per_request(self, monkeypatch):
+        fake = FakeRedis()
+        app = make_app(RateLimitMiddleware(redis_client=fake))
+        client = app.test_client()
+
+        responses = [client.post('/api/auth/login', headers={'X-Forwarded-For': '41.226.9.9'}) for _ in range(11)]
+
+        # global + endpoint + méthode vérifiés en un seul appel
+        assert fake.calls == 11
+        assert responses[9].headers['X-RateLimit-Remaining'] == '0'
+        assert responses[10].status_code == 429
+
+    def test_memory_store_is_bounded_lru(self):
+        store = MemoryGcraStore(max_keys=1000)
+        for client_id in range(5000):
+            store.check([Limit(f'rate_limit:global:{client_id}', 100, 60)], now=1000.0)
+        assert len(store) == 1000
+
+        # Le client le plus récent est conservé, le plus ancien évincé
+        assert 'rate_limit:global:4999' in store._tats
+        assert 'rate_limit:global:0' not in store._tats
+
+    def test_sliding_window_recovers_gradually(self):
+        store = MemoryGcraStore()
+        limit = Limit('k', 4, 60)  # une requête toutes les 15 s
+        assert all(store.check([limit], now=0).allowed for _ in range(4))
+        rejected = store.check([limit], now=1)
+        assert not rejected.allowed and rejected.retry_after == pytest.approx(14)
+        assert store.check([limit], now=15).allowed
+        assert not store.check([limit], now=16).allowed
@@ -0,0 +1,88 @@
+"""
+Tests d'intégration du registre partagé des terrains en enregistrement
+(fallback SQLite WAL, plusieurs processus sur le même fichier)
+"""
+import multiprocessing
+import time
+
+import pytest
+
+from src.services import recording_state as recording_state_module
+from src.services.recording_state import RecordingRegistry
+
+
+@pytest.fixture(autouse=True)
+def no_redis(monkeypatch):
+    monkeypatch.setattr(recording_state_module, 'get_redis_client', lambda: None)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'registry.db')
+
+
+def _claim_in_process(path, court_id, recording_id, start, results):
+    recording_state_module.get_redis_client = lambda: None
+    while time.time() < start:
+        time.sleep(0.001)
+    results.put((recording_id, RecordingRegistry(path).claim_court(court_id, recording_id)))
+
+
+@pytest.mark.integration
+class TestRecordingRegistry:
+    """Réservation atomique, TTL, libération par le détenteur, cache local"""
+
+    def test_claim_is_exclusive_and_idempotent(self, path):
+        worker_a, worker_b = RecordingRegistry(path), RecordingRegistry(path)
+
+        assert worker_a.claim_court(1, 'rec-a', club_id=7, user_id=3)
+        assert worker_a.claim_court(1, 'rec-a')              # même détenteur: renouvelé
+        assert not worker_b.claim_court(1, 'rec-b')
+        assert worker_b.get_court_recording(1)['recording_id'] == 'rec-a'
+        assert worker_b.get_recording_by_id('rec-a')['court_id'] == 1
+
+        assert not worker_b.release_court(1, 'rec-b')        # pas le détenteur
+        assert worker_b.release_court(1, 'rec-a')
+        assert worker_b.claim_court(1, 'rec-b')
+        assert worker_a.release_court(1)                      # libération forcée
+        assert worker_a.get_all_active_recordings() == {}
+
+    def test_expired_claim_frees_court_until_heartbeat(self, path):
+        recorder, web = RecordingRegistry(path), RecordingRegistry(path, cache_seconds=0)
+
+        assert recorder.claim_court(2, 'rec-a', ttl=0.2)
+        assert recorder.heartbeat(2, 'rec-a', ttl=0.2)
+        time.sleep(0.3)                                        # enregistreur mort: plus de heartbeat
+
+        assert not web.is_court_recording(2)
+        assert not recorder.heartbeat(2, 'rec-a')
+        assert web.claim_court(2, 'rec-b')
+
+    def test_reads_are_cached_and_own_writes_are_visible(self, path):
+        web, other = RecordingRegistry(path, cache_seconds=60), RecordingRegistry(path)
+
+        assert web.get_courts([1, 2, 3]) == {1: None, 2: None, 3: None}
+        assert web.claim_court(3, 'rec-web')
+        assert web.is_court_recording(3)                       # écriture locale: cache à jour
+
+        other.claim_court(1, 'rec-other')
+        assert not web.is_court_recording(1)                   # cache encore valide
+        web.clear_cache()
+        assert web.is_court_recording(1)
+
+    def test_concurrent_claims_from_processes(self, path):
+        RecordingRegistry(path).get_all_active_recordings()   # création du fichier
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        start = time.time() + 1.5
+        workers = [ctx.Process(target=_claim_in_process, args=(path, 5, f'rec-{n}', start, results))
+                   for n in range(6)]
+        for worker in workers:
+            worker.start()
+        outcomes = dict(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join(timeout=10)
+
+        winners = [recording_id for recording_id, claimed in outcomes.items() if claimed]
+        assert len(winners) == 1
+        assert RecordingRegistry(path).get_court_recording(5)['recording_id'] == winners[0]
@@ -0,0 +1,295 @@
+"""
+Tests d'intégration du superviseur d'enregistrements
+Des processus Python factices remplacent FFmpeg (stdin 'q' = arrêt propre)
+"""
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from src.models.database import db
+from src.models.user import RecordingSession
+from src.services import recording_supervisor as recording_supervisor_module
+from src.services.recording_supervisor import (
+    HEARTBEAT_KEY, REASON_EXITED, REASON_STOPPED, REASON_TIMEOUT, START_QUEUE, STOP_CHANNEL,
+    RecordingSupervisor, publish_stop, submit_start
+)
+
+# Écrit sur stderr comme FFmpeg (-stats) et s'arrête sur 'q' ou après `duration`
+FAKE_FFMPEG = """
+import os, sys, threading, time
+duration = float(sys.argv[1])
+threading.Thread(target=lambda: (sys.stdin.readline(), os._exit(0)), daemon=True).start()
+end = time.time() + duration
+while time.time() < end:
+    sys.stderr.write('frame=  100 fps=25 size=1024kB time=00:00:04.00 bitrate=2000kbits/s\\n' * 50)
+    sys.stderr.flush()
+    time.sleep(0.01)
+"""
+
+
+class FakeRunner:
+    def start_recording(self, camera_url, output_path, max_duration):
+        return spawn(float(camera_url))
+
+    def stop_recording(self, process, timeout=10):
+        process.stdin.write('q\n')
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+        return True
+
+
+class FakeRedis:
+    """Sous-ensemble pub/sub + listes + clés à TTL de redis-py utilisé par le superviseur"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.lists = {}
+        self.keys = {}
+        self.lock = threading.Lock()
+
+    def set(self, key, value, ex=None):
+        self.keys[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def exists(self, key):
+        value = self.keys.get(key)
+        return int(value is not None and (value[1] is None or value[1] > time.monotonic()))
+
+    def delete(self, key):
+        return int(self.keys.pop(key, None) is not None)
+
+    def publish(self, channel, payload):
+        with self.lock:
+            targets = [q for c, q in self.subscribers if c == channel]
+        for q in targets:
+            q.put({'type': 'message', 'channel': channel, 'data': payload})
+        return len(targets)
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        redis = self
+
+        class PubSub:
+            def __init__(self):
+                self.queue = queue.Queue()
+
+            def subscribe(self, channel):
+                with redis.lock:
+                    redis.subscribers.append((channel, self.queue))
+
+            def get_message(self, timeout=0.0):
+                try:
+                    return self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    return None
+
+            def close(self):
+                with redis.lock:
+                    redis.subscribers = [s for s in redis.subscribers if s[1] is not self.queue]
+
+        return PubSub()
+
+    def rpush(self, key, value):
+        with self.lock:
+            self.lists.setdefault(key, queue.Queue()).put(value)
+
+    def blpop(self, key, timeout=0):
+        with self.lock:
+            items = self.lists.setdefault(key, queue.Queue())
+        try:
+            return key, items.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def spawn(duration):
+    return subprocess.Popen([sys.executable, '-c', FAKE_FFMPEG, str(duration)],
+                            stdin=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+
+@pytest.fixture
+def events():
+    return queue.Queue()
+
+
+@pytest.fixture
+def supervisor(events):
+    supervisor = RecordingSupervisor(on_finished=events.put, runner=FakeRunner()).start()
+    yield supervisor
+    supervisor.shutdown(timeout=5)
+
+
+@pytest.mark.integration
+class TestRecordingSupervisor:
+    """Tests de RecordingSupervisor"""
+
+    def test_process_exit_is_notified(self, supervisor, events):
+        """Fin de FFmpeg notifiée sans polling, stderr vidé sans blocage du pipe"""
+        started = time.monotonic()
+        supervisor.watch('s1', spawn(0.5), 60, output_path='/tmp/s1.mp4')
+
+        event = events.get(timeout=10)
+        assert event['session_id'] == 's1'
+        assert event['reason'] == REASON_EXITED
+        assert event['returncode'] == 0
+        assert event['output_path'] == '/tmp/s1.mp4'
+        assert 'frame=' in event['stderr_tail']
+        assert time.monotonic() - started < 5
+        assert supervisor.active_sessions() == []
+
+    def test_stop_request_and_deadline(self, supervisor, events):
+        supervisor.watch('stop-me', spawn(60))
+        supervisor.watch('too-long', spawn(60), max_duration_seconds=0.3)
+        assert supervisor.request_stop('stop-me', stopped_by='club') is True
+
+        finished = {e['session_id']: e for e in (events.get(timeout=10), events.get(timeout=10))}
+        assert finished['stop-me']['reason'] == REASON_STOPPED
+        assert finished['stop-me']['stopped_by'] == 'club'
+        assert finished['too-long']['reason'] == REASON_TIMEOUT
+        assert finished['too-long']['stopped_by'] == 'auto'
+
+    def test_many_recordings_single_loop(self, supervisor, events):
+        """N enregistrements: aucun thread supplémentaire par enregistrement"""
+        threads_before = threading.active_count()
+        for i in range(20):
+            supervisor.watch(f'm{i}', spawn(60))
+        time.sleep(0.5)
+        assert threading.active_count() <= threads_before
+        assert len(supervisor.active_sessions()) == 20
+
+        for i in range(20):
+            supervisor.request_stop(f'm{i}')
+        assert sorted(events.get(timeout=20)['session_id'] for _ in range(20)) == sorted(f'm{i}' for i in range(20))
+
+    def test_redis_start_queue_and_stop_channel(self, events):
+        """Démarrage par file Redis, arrêt publié depuis un autre processus"""
+        redis = FakeRedis()
+        supervisor = RecordingSupervisor(on_finished=events.put, redis_client=redis,
+                                         runner=FakeRunner()).start()
+        try:
+            redis.rpush(START_QUEUE, json.dumps({'session_id': '42', 'camera_url': '60',
+                                                 'output_path': '/tmp/42.mp4', 'max_duration_seconds': 600}))
+            deadline = time.monotonic() + 5
+            while not supervisor.active_sessions() or not redis.subscribers:
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+
+            assert publish_stop(42, 'user', redis_client=redis) is True
+            event = events.get(timeout=10)
+            assert event['session_id'] == '42'
+            assert event['reason'] == REASON_STOPPED
+            assert supervisor.stats['stops_received'] == 1
+            assert redis.publish(STOP_CHANNEL, 'not json') == 1
+        finally:
+            supervisor.shutdown(timeout=5)
+
+    def test_start_queued_only_while_supervisor_heartbeat_is_live(self, events, monkeypatch):
+        """Sans superviseur dédié vivant, le démarrage se fait localement"""
+        redis = FakeRedis()
+        local = RecordingSupervisor(on_finished=events.put, runner=FakeRunner()).start()
+        monkeypatch.setattr(recording_supervisor_module, 'get_local_supervisor', lambda: local)
+        command = {'session_id': 'local', 'camera_url': '60', 'output_path': '/tmp/l.mp4',
+                   'max_duration_seconds': 600}
+        try:
+            assert submit_start(command, redis_client=redis) == 'local'
+            assert [s['session_id'] for s in local.active_sessions()] == ['local']
+            assert START_QUEUE not in redis.lists
+
+            dedicated = RecordingSupervisor(on_finished=events.put, redis_client=redis,
+                                            runner=FakeRunner()).start()
+            deadline = time.monotonic() + 5
+            while not redis.exists(HEARTBEAT_KEY):
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+            assert submit_start(dict(command, session_id='queued'), redis_client=redis) == 'supervisor'
+            while not dedicated.active_sessions():
+                assert time.monotonic() < deadline
+                time.sleep(0.02)
+
+            dedicated.shutdown(timeout=5)
+            assert not redis.exists(HEARTBEAT_KEY)
+            assert submit_start(dict(command, session_id='after'), redis_client=redis) == 'local'
+        finally:
+            local.shutdown(timeout=5)
+
+
+@pytest.fixture
+def local_supervisor(events, monkeypatch):
+    """get_local_supervisor() avec on_finished/runner de test"""
+    monkeypatch.setattr(recording_supervisor_module, '_local_supervisor', None)
+    monkeypatch.setattr(recording_supervisor_module, 'dispatch_finished', events.put)
+    created = []
+
+    def get():
+        local = recording_supervisor_module.get_local_supervisor()
+        local._runner = FakeRunner()
+        created.append(local)
+        return local
+
+    yield get
+    for local in created:
+        local.shutdown(timeout=5)
+
+
+@pytest.mark.integration
+class TestLocalSupervisorStops:
+    """Arrêt d'une session lancée par le superviseur local depuis un autre worker"""
+
+    def test_stop_published_by_another_process(self, events, local_supervisor, monkeypatch):
+        redis = FakeRedis()
+        monkeypatch.setattr(recording_supervisor_module, 'get_redis_client', lambda: redis)
+        local = local_supervisor()
+        local.watch('remote-stop', spawn(60))
+        redis.rpush(START_QUEUE, json.dumps({'session_id': 'queued'}))
+        deadline = time.monotonic() + 5
+        while not redis.subscribers:
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+
+        # Autre worker Celery: pas de superviseur local dans ce processus
+        monkeypatch.setattr(recording_supervisor_module, '_local_supervisor', None)
+        assert publish_stop('remote-stop', 'club', redis_client=redis) is True
+
+        event = events.get(timeout=10)
+        assert event['session_id'] == 'remote-stop'
+        assert event['reason'] == REASON_STOPPED
+        assert event['stopped_by'] == 'club'
+        # Ni file de démarrage consommée ni heartbeat: réservés au superviseur dédié
+        assert redis.lists[START_QUEUE].qsize() == 1
+        assert not redis.exists(HEARTBEAT_KEY)
+
+    def test_stop_read_from_database_without_redis(self, events, local_supervisor, monkeypatch, tmp_path):
+        monkeypatch.setattr(recording_supervisor_module, 'get_redis_client', lambda: None)
+        monkeypatch.setattr(recording_supervisor_module, 'STOP_CHECK_INTERVAL', 0.05)
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'padelvar.db'}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(RecordingSession(recording_id='db-stop', user_id=1, court_id=1, club_id=1,
+                                            planned_duration=60))
+            db.session.commit()
+            local = local_supervisor()
+        try:
+            local.watch('db-stop', spawn(60))
+            time.sleep(0.2)
+            assert events.empty()
+
+            # stop_video_recording dans un autre worker: statut en base, pas de pub/sub
+            with app.app_context():
+                session = RecordingSession.query.filter_by(recording_id='db-stop').first()
+                session.status, session.stopped_by = 'stopped', 'player'
+                db.session.commit()
+
+            event = events.get(timeout=10)
+            assert event['session_id'] == 'db-stop'
+            assert event['reason'] == REASON_STOPPED
+            assert event['stopped_by'] == 'player'
+        finally:
+            with app.app_context():
+                db.drop_all()
@@ -0,0 +1,312 @@
+"""
+Tests d'intégration de l'upload continu des segments HLS
+Simule la sortie du muxer hls de FFmpeg (segments + playlist réécrite) et
+la finalisation en arrière-plan de /v3/stop
+"""
+import os
+import stat
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_bunny_server import FakeBunnyServer
+from src.models.database import db
+from src.models.user import Club, Court, RecordingSession, User, Video
+from src.routes import recording as recording_module
+from src.services import recording_manager_v2, recording_state
+from src.services.recording_manager_v2 import RecordingInfo, RecordingManager
+from src.services.segment_uploader import BunnyEdgeStorage, SegmentStreamUploader, read_closed_segments
+
+API_KEY = 'storage-password-0000'
+ZONE = 'padelvar-videos'
+
+# Muxer hls factice: un segment toutes les 0,2 s jusqu'à SIGINT, puis le
+# dernier segment et ENDLIST; "-f concat" copie les segments listés
+FAKE_FFMPEG = """
+import signal, sys, time
+args = sys.argv[1:]
+if 'concat' in args:
+    with open(args[-1], 'wb') as out:
+        for line in open(args[args.index('-i') + 1]):
+            out.write(open(line.strip()[len("file '"):-1], 'rb').read())
+    sys.exit(0)
+pattern, playlist = args[args.index('-hls_segment_filename') + 1], args[-1]
+stopped, names = [], []
+signal.signal(signal.SIGINT, lambda *_: stopped.append(True))
+
+def close_segment():
+    path = pattern % len(names)
+    open(path, 'wb').write(bytes([len(names)]) * 64 * 1024)
+    names.append(path.replace('\\\\', '/').rsplit('/', 1)[-1])
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1']
+    for name in names:
+        lines += ['#EXTINF:0.2,', name]
+    if stopped:
+        lines.append('#EXT-X-ENDLIST')
+    open(playlist, 'w').write('\\n'.join(lines) + '\\n')
+
+while not stopped:
+    close_segment()
+    time.sleep(0.2)
+close_segment()
+"""
+
+
+def write_playlist(path, segments, ended=False):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:60', '#EXT-X-PLAYLIST-TYPE:EVENT']
+    for name in segments:
+        lines += ['#EXTINF:60.000000,', name]
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    path.write_text('\n'.join(lines) + '\n')
+
+
+@pytest.fixture
+def storage_server():
+    with FakeBunnyServer(API_KEY, '1', storage_zone=ZONE, failure_rate=0.01,
+                         block_size=16 * 1024, seed=3) as server:
+        yield server
+
+
+@pytest.fixture
+def storage(storage_server):
+    return BunnyEdgeStorage(zone=ZONE, password=API_KEY, hostname=storage_server.url,
+                            cdn_hostname='cdn.example.test', max_retries=5)
+
+
+@pytest.mark.integration
+@pytest.mark.video
+class TestSegmentStreamUploader:
+    """Tests de SegmentStreamUploader"""
+
+    def test_incomplete_last_line_is_ignored(self, tmp_path):
+        playlist = tmp_path / 'rec.m3u8'
+        playlist.write_text('#EXTM3U\n#EXTINF:60.0,\nsegment_rec_00000.ts\n#EXTINF:60.0,\nsegment_rec_000')
+        assert read_closed_segments(playlist) == ['segment_rec_00000.ts']
+
+    def test_segments_uploaded_while_recording(self, storage_server, storage, tmp_path):
+        """Chaque segment fermé est envoyé avant l'arrêt; à l'arrêt seul le dernier reste"""
+        playlist = tmp_path / 'rec.m3u8'
+        names = [f'segment_rec_{i:05d}.ts' for i in range(4)]
+        contents = {name: os.urandom(512 * 1024) for name in names}
+        uploaded = []
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            uploader = SegmentStreamUploader(playlist, 'matches/1/rec', storage, pool,
+                                             on_segment=uploaded.append, poll_interval=0.05).start()
+            for i, name in enumerate(names):
+                (tmp_path / name).write_bytes(contents[name])
+                write_playlist(playlist, names[:i + 1], ended=i == len(names) - 1)
+                if i < len(names) - 1:
+                    deadline = time.monotonic() + 10
+                    while len(uploaded) < i + 1 and time.monotonic() < deadline:
+                        time.sleep(0.02)
+                    assert len(uploaded) == i + 1
+
+            result = uploader.finish(timeout=30)
+
+        assert result['success'] is True
+        assert result['playlist_url'] == 'https://cdn.example.test/matches/1/rec/rec.m3u8'
+        for name in names:
+            assert storage_server.files[f'matches/1/rec/{name}'] == contents[name]
+        published = storage_server.files['matches/1/rec/rec.m3u8'].decode()
+        assert published.rstrip().endswith('#EXT-X-ENDLIST')
+        assert 'segment_rec_00003.ts' in published
+
+    def test_playlist_not_published_when_segment_missing(self, storage_server, storage, tmp_path):
+        playlist = tmp_path / 'rec.m3u8'
+        (tmp_path / 'segment_rec_00000.ts').write_bytes(b'x' * 1024)
+        write_playlist(playlist, ['segment_rec_00000.ts', 'segment_rec_00001.ts'], ended=True)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            result = SegmentStreamUploader(playlist, 'matches/1/rec', storage, pool).finish(timeout=10)
+
+        assert result['success'] is False
+        assert result['failed'] == ['segment_rec_00001.ts']
+        assert 'matches/1/rec/rec.m3u8' not in storage_server.files
+
+    def test_running_upload_is_not_duplicated_after_timeout(self, tmp_path):
+        """Segment encore en cours d'envoi au délai: pas de second PUT synchrone"""
+        release = threading.Event()
+        calls = []
+
+        class SlowStorage:
+            def upload_file(self, local_path, remote_path):
+                calls.append(remote_path)
+                if remote_path.endswith('00001.ts'):
+                    release.wait(10)
+
+            def public_url(self, remote_path):
+                return f'https://cdn.example.test/{remote_path}'
+
+        playlist = tmp_path / 'rec.m3u8'
+        names = ['segment_rec_00000.ts', 'segment_rec_00001.ts']
+        for name in names:
+            (tmp_path / name).write_bytes(b'x' * 1024)
+        write_playlist(playlist, names, ended=True)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            result = SegmentStreamUploader(playlist, 'matches/1/rec', SlowStorage(), pool).finish(timeout=0.3)
+            release.set()
+
+        assert result['success'] is False
+        assert result['failed'] == ['segment_rec_00001.ts']
+        assert calls.count('matches/1/rec/segment_rec_00001.ts') == 1
+        assert 'matches/1/rec/rec.m3u8' not in calls
+
+
+class FinishedProcess:
+    pid = 4242
+
+    def poll(self):
+        return 0
+
+
+@pytest.fixture
+def v3_app(tmp_path, monkeypatch):
+    manager = RecordingManager()
+    monkeypatch.setattr(recording_manager_v2, 'get_recording_manager', lambda: manager)
+    monkeypatch.setattr(recording_module, 'get_current_user', lambda: db.session.get(User, 1))
+    monkeypatch.setattr(recording_state, 'get_redis_client', lambda: None)
+    monkeypatch.setattr(recording_state.recording_registry, 'path', str(tmp_path / 'registry.db'))
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(recording_module.recording_bp)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email='joueur@test.tn', name='Joueur', credits_balance=5))
+        db.session.add(Club(id=1, name='Club Test'))
+        db.session.add(Court(id=3, name='Terrain 3', qr_code='qr-3', club_id=1,
+                             camera_url='http://camera.local/stream'))
+        db.session.commit()
+    app.manager = manager
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.mark.integration
+@pytest.mark.video
+class TestV3StopFinalization:
+    """POST /api/recording/v3/start puis /v3/stop: segments envoyés, finalisation en arrière-plan, URL HLS sur la vidéo"""
+
+    def test_stop_returns_before_concat_and_persists_playback_url(self, v3_app, tmp_path, monkeypatch):
+        manager = v3_app.manager
+        tmp_dir, final_dir = tmp_path / 'tmp', tmp_path / 'final'
+        tmp_dir.mkdir()
+        final_dir.mkdir()
+        (tmp_dir / 'segment_rec_1_00000.ts').write_bytes(b'x' * 1024)
+        playlist_url = 'https://cdn.example.test/matches/1/rec_1/rec_1.m3u8'
+
+        concat_started, release_concat = threading.Event(), threading.Event()
+
+        def slow_concat(segments, recording):
+            concat_started.set()
+            release_concat.wait(10)
+            return final_dir / 'rec_1.mp4'
+
+        monkeypatch.setattr(manager, '_stop_ffmpeg_process', lambda recording: True)
+        monkeypatch.setattr(manager, '_concatenate_segments', slow_concat)
+        now = datetime.now()
+        manager.recordings['rec_1'] = RecordingInfo(
+            recording_id='rec_1', match_id='rec_1', terrain_id=3, club_id=1, user_id=1,
+            proxy_url='http://127.0.0.1:8000/video/3', duration_seconds=3600,
+            tmp_dir=tmp_dir, final_dir=final_dir, process=FinishedProcess(), pid=4242,
+            start_time=now - timedelta(minutes=60), expected_end_time=now,
+            status='recording', segments_written=[], final_video_path=None, errors=[],
+            playlist_path=tmp_dir / 'rec_1.m3u8',
+            segment_uploader=SimpleNamespace(finish=lambda: {'success': True, 'playlist_url': playlist_url})
+        )
+
+        response = v3_app.test_client().post('/api/recording/v3/stop', json={'recording_id': 'rec_1'})
+
+        assert response.status_code == 200
+        assert response.get_json()['status'] == 'finalizing'
+        assert concat_started.wait(5)
+
+        # Playlist publiée: la vidéo est jouable avant la fin de la concaténation
+        with v3_app.app_context():
+            video = Video.query.filter_by(recording_id='rec_1').one()
+            assert video.file_url == playlist_url
+            assert video.user_id == 1 and video.court_id == 3
+        assert manager.recordings['rec_1'].status == 'finalizing'
+
+        release_concat.set()
+        finalizer = next(t for t in threading.enumerate() if t.name == 'Finalize-rec_1')
+        finalizer.join(5)
+        info = manager.get_recording_info('rec_1')
+        assert info['status'] == 'stopped'
+        assert info['playback_url'] == playlist_url
+        assert info['final_video_path'] == str(final_dir / 'rec_1.mp4')
+
+    def test_start_to_stop_uploads_segments(self, v3_app, storage_server, storage, tmp_path, monkeypatch):
+        """/v3/start lance le mode segments: envoi pendant le match, playlist publiée à l'arrêt"""
+        manager = v3_app.manager
+        ffmpeg = tmp_path / 'ffmpeg'
+        ffmpeg.write_text(f"#!{sys.executable}\n{FAKE_FFMPEG}")
+        ffmpeg.chmod(ffmpeg.stat().st_mode | stat.S_IEXEC)
+        config = recording_manager_v2.config
+        monkeypatch.setattr(config, 'FFMPEG_PATH', str(ffmpeg))
+        monkeypatch.setattr(config, 'SEGMENT_STREAMING_UPLOAD', True)
+        monkeypatch.setattr(config, 'get_match_tmp_dir', lambda club_id, match_id: tmp_path / 'tmp' / match_id)
+        monkeypatch.setattr(config, 'get_match_final_dir', lambda club_id, match_id: tmp_path / 'final')
+        monkeypatch.setattr(config, 'has_sufficient_disk_space', lambda: True)
+        manager.segment_storage = storage
+        manager.segment_executor = ThreadPoolExecutor(max_workers=2)
+
+        from src.video_system.session_manager import session_manager
+        monkeypatch.setattr(session_manager, 'create_session', lambda session_id, **kwargs: SimpleNamespace(
+            session_id=session_id, local_url='http://127.0.0.1:8080/stream.mjpeg'))
+
+        client = v3_app.test_client()
+        response = client.post('/api/recording/v3/start', json={'court_id': 3, 'duration_minutes': 60})
+        assert response.status_code == 201
+        recording_id = response.get_json()['recording_id']
+        remote_dir = f'matches/1/{recording_id}/'
+        try:
+            assert manager.get_recording_info(recording_id)['segment_mode'] is True
+            assert recording_state.recording_registry.is_court_recording(3)
+
+            # Segments envoyés pendant le match, avant tout arrêt
+            deadline = time.monotonic() + 10
+            while sum(name.startswith(remote_dir) for name in storage_server.files) < 2:
+                assert time.monotonic() < deadline
+                time.sleep(0.05)
+            assert f'{remote_dir}{recording_id}.m3u8' not in storage_server.files
+
+            response = client.post('/api/recording/v3/stop', json={'recording_id': recording_id})
+            assert response.status_code == 200
+            next(t for t in threading.enumerate() if t.name == f'Finalize-{recording_id}').join(30)
+        finally:
+            for recording in manager.recordings.values():
+                if recording.process.poll() is None:
+                    recording.process.kill()
+            manager.segment_executor.shutdown(wait=False)
+
+        published = storage_server.files[f'{remote_dir}{recording_id}.m3u8'].decode()
+        segments = [line for line in published.splitlines() if line and not line.startswith('#')]
+        assert len(segments) >= 3 and published.rstrip().endswith('#EXT-X-ENDLIST')
+        for i, name in enumerate(segments):
+            assert storage_server.files[remote_dir + name] == bytes([i]) * 64 * 1024
+
+        info = manager.get_recording_info(recording_id)
+        assert info['status'] == 'stopped'
+        assert info['playback_url'] == f'https://cdn.example.test/{remote_dir}{recording_id}.m3u8'
+        assert not recording_state.recording_registry.is_court_recording(3)
+        with v3_app.app_context():
+            assert Video.query.filter_by(recording_id=recording_id).one().file_url == info['playback_url']
+            session = RecordingSession.query.filter_by(recording_id=recording_id).one()
+            assert (session.status, session.stopped_by) == ('stopped', 'player')
+            assert db.session.get(Court, 3).is_recording is False
+            assert db.session.get(User, 1).credits_balance == 4
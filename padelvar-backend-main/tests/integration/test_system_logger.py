@@ -0,0 +1,124 @@
+"""
+Tests d'intégration du pipeline de logging système
+(file bornée, écrivain unique par lots, rotation par taille, détection des
+problèmes hors du thread appelant, lecture depuis la fin du fichier)
+"""
+import json
+import os
+import threading
+
+import pytest
+from flask import Flask
+
+from src.routes.admin import admin_bp
+from src.services.logging_service import LogLevel, SystemLogger, tail_lines
+
+
+@pytest.fixture
+def system_logger(tmp_path):
+    system_logger = SystemLogger(str(tmp_path), console=False)
+    yield system_logger
+    system_logger.close()
+
+
+def read_entries(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.integration
+class TestSystemLogger:
+    """Pipeline asynchrone: file bornée, écriture JSON par lots, rotation"""
+
+    def test_json_lines_written_by_single_writer(self, system_logger):
+        for i in range(500):
+            system_logger.log(LogLevel.INFO, f"Segment {i} envoyé", {"segment": i})
+        system_logger.flush()
+
+        entries = read_entries(system_logger.log_file)
+        messages = [e['message'] for e in entries if e['message'].startswith('Segment')]
+        assert messages == [f"Segment {i} envoyé" for i in range(500)]
+        assert entries[-1]['extra_data'] == {"segment": 499}
+        assert {e['thread'] for e in entries} == {threading.current_thread().name}
+
+    def test_full_queue_drops_without_blocking(self, tmp_path):
+        system_logger = SystemLogger(str(tmp_path), queue_size=10, console=False)
+        system_logger.close()                                    # plus de consommateur
+
+        for i in range(50):
+            system_logger.log(LogLevel.DEBUG, f"debug {i}")
+
+        assert system_logger.dropped_logs == 50 - system_logger._queue.qsize()
+        assert system_logger.get_system_health()['dropped_logs'] == system_logger.dropped_logs
+
+    def test_size_rotation_and_reads_across_backups(self, tmp_path):
+        system_logger = SystemLogger(str(tmp_path), max_bytes=4000, backup_count=3, batch_size=8, console=False)
+        try:
+            for i in range(100):
+                system_logger.log(LogLevel.INFO, f"ligne {i:03d}")
+            logs = system_logger.get_recent_logs(count=60)
+        finally:
+            system_logger.close()
+
+        assert os.path.exists(system_logger.log_file + '.1')
+        assert all(os.path.getsize(p) <= 4000 for p in tmp_path.glob('system_*.log*'))
+        assert [e['message'] for e in logs] == [f"ligne {i:03d}" for i in range(40, 100)]
+
+    def test_problem_detection_off_caller_thread(self, system_logger):
+        system_logger.log(LogLevel.ERROR, "FFmpeg error: crash du processus terrain 3", {"court_id": 3})
+        system_logger.flush()
+
+        problems = system_logger.get_problems()
+        assert [p['problem_type'] for p in problems] == ['FFMPEG_CRASH']
+        assert problems[0]['extra_data'] == {"court_id": 3}
+        alert, = system_logger.get_recent_logs(level='critical')
+        assert alert['message'].startswith('🚨 PROBLÈME DÉTECTÉ: FFMPEG_CRASH')
+        assert alert['thread'] != threading.current_thread().name
+
+    def test_recent_logs_filters(self, system_logger):
+        system_logger.log(LogLevel.WARNING, "Caméra lente")
+        system_logger.log(LogLevel.INFO, "Enregistrement démarré")
+
+        warnings = system_logger.get_recent_logs(level='WARNING', hours=1)
+        assert [e['message'] for e in warnings] == ["Caméra lente"]
+
+
+@pytest.mark.integration
+class TestTailLines:
+    """Lecture depuis la fin du fichier, par blocs"""
+
+    def test_reads_backwards_across_blocks(self, tmp_path):
+        path = tmp_path / 'app.log'
+        lines = [f"{i} " + 'x' * (i % 37) for i in range(1000)] + ['y' * 300]
+        path.write_text('\n'.join(lines) + '\n\n', encoding='utf-8')
+
+        assert list(tail_lines(str(path), block_size=64)) == lines[::-1]
+        assert list(tail_lines(str(tmp_path / 'absent.log'))) == []
+
+    def test_scan_limit_skips_partial_line(self, tmp_path):
+        path = tmp_path / 'app.log'
+        path.write_bytes(b'premiere\r\ndeuxieme\r\ntroisieme')
+
+        assert list(tail_lines(str(path), max_scan_bytes=14)) == ['troisieme']
+        assert list(tail_lines(str(path), max_scan_bytes=None)) == ['troisieme', 'deuxieme', 'premiere']
+
+    def test_admin_logs_endpoint(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        system_logger = SystemLogger('logs', console=False)
+        for i in range(300):
+            system_logger.log(LogLevel.ERROR if i % 100 == 0 else LogLevel.INFO, f"message {i}")
+        system_logger.close()
+
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'test'
+        app.register_blueprint(admin_bp, url_prefix='/api/admin')
+        client = app.test_client()
+        with client.session_transaction() as s:
+            s['user_id'], s['user_role'] = 1, 'super_admin'
+
+        data = client.get('/api/admin/logs?lines=5').get_json()
+        assert [log['message'] for log in data['logs']] == [f"message {i}" for i in range(295, 300)]
+
+        data = client.get('/api/admin/logs?lines=10&level=error').get_json()
+        assert [(log['level'], log['message']) for log in data['logs']] == \
+            [('ERROR', 'message 0'), ('ERROR', 'message 100'), ('ERROR', 'message 200')]
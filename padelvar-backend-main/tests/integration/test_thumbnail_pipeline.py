@@ -0,0 +1,122 @@
+"""
+Tests d'intégration du pipeline de vignettes (une passe FFmpeg, WebVTT,
+cache par empreinte de contenu, déduplication des générations en cours)
+"""
+import os
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.services import thumbnail_pipeline as thumbnail_pipeline_module
+from src.services.thumbnail_pipeline import (
+    ThumbnailPipeline, build_command, build_vtt, content_key, poster_time
+)
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'match.mp4'
+    path.write_bytes(os.urandom(3 * 1024 * 1024))
+    return str(path)
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """FFmpeg simulé: écrit les fichiers attendus et compte les passes"""
+    calls = []
+    release = threading.Event()
+    release.set()
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        release.wait(5)
+        for arg in cmd:
+            if arg.endswith('.jpg'):
+                Path(arg.replace('%03d', '001')).write_bytes(b'jpg')
+        return subprocess.CompletedProcess(cmd, 0, '', '')
+
+    monkeypatch.setattr(thumbnail_pipeline_module, 'probe', lambda path: (600.0, [0.0, 296.0, 302.0, 310.0]))
+    monkeypatch.setattr(thumbnail_pipeline_module.subprocess, 'run', run)
+    return calls, release
+
+
+@pytest.mark.integration
+class TestThumbnailPipeline:
+    """Une passe par vidéo, WebVTT du sprite, cache et déduplication"""
+
+    def test_single_pass_command(self, tmp_path):
+        cmd = build_command('/videos/match.mp4', str(tmp_path), 600.0, 302.0)
+
+        assert cmd.count('-i') == 1
+        assert cmd[cmd.index('-i') - 2:cmd.index('-i')] == ['-skip_frame', 'nokey']
+        assert [cmd[n + 1] for n, arg in enumerate(cmd) if arg == '-map'] == ['[poster]', '[sprite]', '[strip]']
+        assert "gte(t\\,302.000)" in cmd[cmd.index('-filter_complex') + 1]
+
+    def test_poster_is_keyframe_nearest_middle(self):
+        assert poster_time(600.0, [0.0, 296.0, 302.0, 310.0]) == 302.0
+        assert poster_time(600.0, [0.0, 10.0]) == 10.0
+        assert poster_time(600.0, []) == 300.0
+
+    def test_vtt_cues_cover_sheets(self):
+        vtt = build_vtt(1005.0, ['sprite_001.jpg', 'sprite_002.jpg'])
+        cues = vtt.split('\n\n')[1:]
+
+        assert vtt.startswith('WEBVTT')
+        assert len([c for c in cues if c.strip()]) == 101
+        assert cues[0] == '00:00:00.000 --> 00:00:10.000\nsprite_001.jpg#xywh=0,0,160,90'
+        assert cues[11] == '00:01:50.000 --> 00:02:00.000\nsprite_001.jpg#xywh=160,90,160,90'
+        assert cues[100].strip() == '00:16:40.000 --> 00:16:45.000\nsprite_002.jpg#xywh=0,0,160,90'
+
+    def test_cached_by_content_and_deduplicated(self, tmp_path, video, fake_ffmpeg):
+        calls, release = fake_ffmpeg
+        pipeline = ThumbnailPipeline(cache_dir=tmp_path / 'previews', max_workers=2)
+
+        release.clear()
+        futures = [pipeline.submit(video) for _ in range(4)]
+        release.set()
+        manifests = [f.result(10) for f in futures]
+        assert len(calls) == 1
+        assert all(m == manifests[0] for m in manifests)
+        assert manifests[0]['poster_time'] == 302.0
+
+        # Re-run: lu depuis le cache, même après copie du fichier (même contenu)
+        copy = str(tmp_path / 'copy.mp4')
+        shutil.copyfile(video, copy)
+        assert pipeline.generate(copy) == manifests[0]
+        assert ThumbnailPipeline(cache_dir=tmp_path / 'previews').cached(video) == manifests[0]
+        assert len(calls) == 1
+
+        with open(video, 'r+b') as f:
+            f.write(b'\0' * 16)
+        assert content_key(video) != manifests[0]['key']
+        pipeline.generate(video)
+        assert len(calls) == 2
+
+    def test_failed_pass_leaves_no_cache_entry(self, tmp_path, video, monkeypatch):
+        monkeypatch.setattr(thumbnail_pipeline_module, 'probe', lambda path: (60.0, []))
+        monkeypatch.setattr(thumbnail_pipeline_module.subprocess, 'run',
+                            lambda cmd, **kw: subprocess.CompletedProcess(cmd, 1, '', 'Invalid data'))
+        pipeline = ThumbnailPipeline(cache_dir=tmp_path / 'previews')
+
+        with pytest.raises(thumbnail_pipeline_module.ThumbnailError):
+            pipeline.generate(video)
+        assert pipeline.cached(video) is None
+        assert os.listdir(tmp_path / 'previews') == []
+
+    @pytest.mark.skipif(shutil.which(thumbnail_pipeline_module.FFMPEG_PATH) is None, reason='FFmpeg absent')
+    def test_real_ffmpeg_pass(self, tmp_path):
+        path = str(tmp_path / 'clip.mp4')
+        subprocess.run([thumbnail_pipeline_module.FFMPEG_PATH, '-v', 'error', '-f', 'lavfi',
+                        '-i', 'testsrc2=size=640x360:rate=25:duration=30', '-g', '50', path], check=True)
+
+        manifest = ThumbnailPipeline(cache_dir=tmp_path / 'previews').generate(path)
+        directory = tmp_path / 'previews' / manifest['key']
+
+        assert manifest['poster_time'] in (14.0, 16.0)
+        assert manifest['sprites'] == ['sprite_001.jpg']
+        assert (directory / 'poster.jpg').stat().st_size > 0
+        assert (directory / 'strip.jpg').stat().st_size > 0
+        assert (directory / 'sprites.vtt').read_text().count('#xywh=') == 3
@@ -0,0 +1,81 @@
+"""
+Tests d'intégration de la file d'upload persistante (SQLite WAL)
+"""
+import socket
+from queue import Empty
+
+import pytest
+
+from src.services.upload_queue import PRIORITY_CLIP, PRIORITY_MATCH, PersistentUploadQueue
+
+CLIP = 50 * 1024 * 1024
+MATCH = 3 * 1024 * 1024 * 1024
+
+
+@pytest.fixture
+def queue_db(tmp_path):
+    return str(tmp_path / 'upload_queue.db')
+
+
+@pytest.mark.integration
+class TestPersistentUploadQueue:
+    """Tests de PersistentUploadQueue"""
+
+    def test_clips_before_matches_with_club_fairness(self, queue_db):
+        """Voie clip prioritaire, puis alternance entre clubs"""
+        queue = PersistentUploadQueue(queue_db)
+        queue.put('match-1', '/v/match1.mp4', metadata={'club_id': 1}, total_bytes=MATCH)
+        queue.put('clip-1a', '/v/clip1a.mp4', metadata={'club_id': 1}, total_bytes=CLIP)
+        queue.put('clip-1b', '/v/clip1b.mp4', metadata={'club_id': 1}, total_bytes=CLIP)
+        queue.put('clip-2a', '/v/clip2a.mp4', metadata={'club_id': 2}, total_bytes=CLIP)
+
+        stats = queue.get_stats()
+        assert stats['queue_depth'] == 4
+        assert stats['queue_lanes']['clip'] == 3
+
+        order = [queue.get(timeout=0.1)['id'] for _ in range(4)]
+        assert order == ['clip-1a', 'clip-2a', 'clip-1b', 'match-1']
+
+        with pytest.raises(Empty):
+            queue.get(timeout=0.1)
+
+    def test_interrupted_tasks_are_recovered(self, queue_db):
+        """Les tâches d'un processus mort sont remises en file au démarrage"""
+        queue = PersistentUploadQueue(queue_db)
+        queue.put('match-1', '/v/match1.mp4', total_bytes=MATCH)
+        task = queue.get(timeout=0.1)
+        assert task['priority'] == PRIORITY_MATCH
+        queue.update('match-1', owner=f"{socket.gethostname()}:999999")
+
+        restarted = PersistentUploadQueue(queue_db)
+        restarted.owner = f"{socket.gethostname()}:1"
+        assert restarted.recover() == ['match-1']
+        assert restarted.get(timeout=0.1)['id'] == 'match-1'
+
+    def test_live_claims_are_not_recovered(self, queue_db):
+        """Une réservation active d'un autre worker n'est pas volée"""
+        queue = PersistentUploadQueue(queue_db)
+        queue.put('clip-1', '/v/clip1.mp4', total_bytes=CLIP, priority=PRIORITY_CLIP)
+        queue.get(timeout=0.1)
+
+        other = PersistentUploadQueue(queue_db)
+        other.owner = 'other-host:1234'
+        assert other.recover() == []
+
+    def test_history_is_capped_lru(self, queue_db):
+        """Historique plafonné: la tâche consultée récemment est conservée"""
+        queue = PersistentUploadQueue(queue_db, history_cap=2)
+        for name in ('a', 'b'):
+            queue.put(name, f'/v/{name}.mp4', total_bytes=CLIP)
+            queue.get(timeout=0.1)
+            queue.finish(name, 'completed', total_bytes=CLIP)
+
+        queue.get_task('a')  # 'a' devient la plus récemment utilisée
+        queue.put('c', '/v/c.mp4', total_bytes=CLIP)
+        queue.get(timeout=0.1)
+        queue.finish('c', 'completed', total_bytes=CLIP)
+
+        assert queue.get_task('b') is None
+        assert queue.get_task('a') is not None
+        assert queue.get_task('c') is not None
+        assert queue.get_stats()['throughput_bytes_per_sec'] > 0
@@ -0,0 +1,96 @@
+"""
+Tests d'intégration de la diffusion des vidéos locales
+(blueprint enregistré sous /api/videos: Range, ETag, téléchargement)
+"""
+import os
+
+import pytest
+from flask import Flask
+
+from src.models.database import db
+from src.models.user import User, Video
+from src.routes.videos import videos_bp
+from src.services import config_cache as config_cache_module
+from src.services import video_file_service
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_cache_module, 'get_redis_client', lambda: None)
+    videos_dir = tmp_path / 'videos'
+    (videos_dir / '1').mkdir(parents=True)
+    (videos_dir / '1' / 'match_1.mp4').write_bytes(os.urandom(10_000))
+    (videos_dir / '1' / 'match_2.mp4').write_bytes(os.urandom(1_000))
+    (videos_dir / '1' / 'orphan.mp4').write_bytes(os.urandom(1_000))
+    monkeypatch.setattr(video_file_service, 'VIDEO_DIRS', [videos_dir])
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(videos_bp, url_prefix='/api/videos')    # comme src/main.py
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, email='joueur@test.tn', name='Joueur'))
+        db.session.add(User(id=2, email='autre@test.tn', name='Autre'))
+        db.session.add(Video(id=1, title='Finale', user_id=1, file_url='/static/videos/1/match_1.mp4'))
+        db.session.add(Video(id=2, title='Privée', user_id=2, file_url='/static/videos/1/match_2.mp4',
+                             is_unlocked=False))
+        db.session.commit()
+    app.video_bytes = (videos_dir / '1' / 'match_1.mp4').read_bytes()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s['user_id'] = 1
+    return client
+
+
+@pytest.mark.integration
+class TestVideoFileServing:
+    """Routes /stream et /download du blueprint vidéos enregistré"""
+
+    def test_stream_range_returns_206(self, app, client):
+        response = client.get('/api/videos/stream/match_1.mp4', headers={'Range': 'bytes=100-199'})
+
+        assert response.status_code == 206
+        assert response.headers['Content-Range'] == 'bytes 100-199/10000'
+        assert response.data == app.video_bytes[100:200]
+
+    def test_stream_conditional_requests(self, client):
+        full = client.get('/api/videos/stream/match_1.mp4')
+        assert full.status_code == 200
+        assert full.headers['Accept-Ranges'] == 'bytes'
+
+        etag = full.headers['ETag']
+        assert client.get('/api/videos/stream/match_1.mp4',
+                          headers={'If-None-Match': etag}).status_code == 304
+        stale = client.get('/api/videos/stream/match_1.mp4',
+                           headers={'Range': 'bytes=0-9', 'If-Range': '"autre"'})
+        assert stale.status_code == 200
+
+    def test_stream_requires_login_and_existing_file(self, app, client):
+        assert app.test_client().get('/api/videos/stream/match_1.mp4').status_code == 401
+        assert client.get('/api/videos/stream/absent.mp4').status_code == 404
+        # Fichier présent sur disque mais sans vidéo associée
+        assert client.get('/api/videos/stream/orphan.mp4').status_code == 404
+
+    def test_stream_refuses_other_users_locked_video(self, app, client):
+        assert client.get('/api/videos/stream/match_2.mp4').status_code == 403
+
+        owner = app.test_client()
+        with owner.session_transaction() as s:
+            s['user_id'] = 2
+        assert owner.get('/api/videos/stream/match_2.mp4').status_code == 200
+
+    def test_download_resumes_with_range(self, app, client):
+        response = client.get('/api/videos/download/1', headers={'Range': 'bytes=9000-'})
+
+        assert response.status_code == 206
+        assert response.headers['Content-Disposition'] == 'attachment; filename="Finale.mp4"'
+        assert response.data == app.video_bytes[9000:]
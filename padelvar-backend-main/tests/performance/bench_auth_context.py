@@ -0,0 +1,155 @@
+"""
+Contexte d'authentification: requêtes SQL par requête HTTP, avant / après
+Profile 20 endpoints GET courants (joueur et club) et compte, pour chacun,
+les requêtes SQL émises et le nombre de chargements de l'utilisateur.
+
+- legacy: utilisateur rechargé par chaque helper (pas de flask.g), pas de
+  snapshot entre requêtes
+- actuel: middleware/auth_context.py (flask.g + snapshot AUTH_SNAPSHOT_TTL)
+
+Usage:
+    python tests/performance/bench_auth_context.py
+    python tests/performance/bench_auth_context.py --runs 20
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.middleware import auth_context
+from src.models.database import db
+from src.models.user import Club, Court, User, UserRole, Video
+from src.routes.auth import auth_bp
+from src.routes.clip_routes import clip_bp
+from src.routes.clubs import clubs_bp
+from src.routes.notifications import notifications_bp
+from src.routes.players import players_bp
+from src.routes.recording import recording_bp
+from src.routes.support import support_bp
+from src.routes.tutorial_routes import tutorial_bp
+from src.routes.video_sharing_routes import video_sharing_bp
+from src.routes.videos import videos_bp
+from src.services import config_cache as config_cache_module
+
+PLAYER_ENDPOINTS = [
+    '/api/auth/me', '/api/players/dashboard', '/api/players/videos', '/api/players/clubs/followed',
+    '/api/players/credits/balance', '/api/players/credits/history', '/api/players/clubs/available',
+    '/api/players/social/leaderboard', '/api/videos/my-videos', '/api/videos/shared-with-me', '/api/videos/1',
+    '/api/clips/my-clips', '/api/notifications', '/api/notifications/stats', '/api/recording/my-active',
+    '/api/tutorial/status',
+]
+CLUB_ENDPOINTS = ['/api/auth/me', '/api/clubs/info', '/api/clubs/courts', '/api/clubs/players']
+
+
+class NoRequestCache:
+    """flask.g sans mémoire (comportement legacy)"""
+
+    def get(self, name, default=None):
+        return default
+
+    def __setattr__(self, name, value):
+        pass
+
+
+def seed():
+    db.session.add(Club(id=1, name='Padel Tunis'))
+    db.session.add(User(id=1, email='club@bench.tn', name='Club', role=UserRole.CLUB, club_id=1))
+    db.session.add(User(id=2, email='joueur@bench.tn', name='Joueur', role=UserRole.PLAYER, credits_balance=10))
+    db.session.add_all(User(id=10 + n, email=f'p{n}@bench.tn', name=f'P{n}', club_id=1) for n in range(20))
+    db.session.add_all(Court(id=n, club_id=1, name=f'Terrain {n}', qr_code=f'qr-{n}', camera_url='rtsp://cam')
+                       for n in range(1, 5))
+    db.session.add_all(Video(id=n, title=f'Match {n}', user_id=2, court_id=1 + n % 4, is_unlocked=True)
+                       for n in range(1, 11))
+    db.session.commit()
+
+
+def profile(app, engine, user_id, endpoints, runs):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    results = {}
+    for url in endpoints:
+        client.get(url)                                          # chauffe
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        counts, user_loads, samples = [], [], []
+        event.listen(engine, 'before_cursor_execute', listener)
+        try:
+            for _ in range(runs):
+                statements.clear()
+                t0 = time.perf_counter()
+                response = client.get(url)
+                samples.append((time.perf_counter() - t0) * 1000)
+                counts.append(len(statements))
+                user_loads.append(sum(1 for s in statements
+                                      if s.lstrip().startswith('SELECT') and 'FROM user' in s and 'user.id = ?' in s))
+        finally:
+            event.remove(engine, 'before_cursor_execute', listener)
+        results[url] = (response.status_code, statistics.median(counts), statistics.median(user_loads),
+                        statistics.median(samples))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    config_cache_module.get_redis_client = lambda: None
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SECRET_KEY'] = 'bench'
+        db.init_app(app)
+        app.register_blueprint(auth_bp, url_prefix='/api/auth')
+        app.register_blueprint(players_bp, url_prefix='/api/players')
+        app.register_blueprint(clubs_bp, url_prefix='/api/clubs')
+        app.register_blueprint(videos_bp, url_prefix='/api/videos')
+        app.register_blueprint(video_sharing_bp, url_prefix='/api/videos')
+        app.register_blueprint(recording_bp, url_prefix='/api/recording')
+        app.register_blueprint(notifications_bp)
+        app.register_blueprint(clip_bp)
+        app.register_blueprint(support_bp, url_prefix='/api/support')
+        app.register_blueprint(tutorial_bp, url_prefix='/api/tutorial')
+        with app.app_context():
+            db.create_all()
+            seed()
+            engine = db.engine
+
+        # Chaque requête du client de test a son propre contexte (flask.g, session SQLAlchemy)
+        modes = {}
+        for mode in ('legacy', 'actuel'):
+            if mode == 'legacy':
+                real_g, auth_context.g = auth_context.g, NoRequestCache()
+                auth_context.user_snapshots.ttl = 0
+            else:
+                auth_context.g = real_g
+                auth_context.user_snapshots.ttl = auth_context.SNAPSHOT_TTL_SECONDS
+                auth_context.user_snapshots.clear()
+            modes[mode] = {('joueur', url): r for url, r in profile(app, engine, 2, PLAYER_ENDPOINTS, args.runs).items()}
+            modes[mode].update({('club', url): r for url, r in profile(app, engine, 1, CLUB_ENDPOINTS, args.runs).items()})
+
+        print(f"{'endpoint':<38} {'code':>4}  {'req legacy':>10} {'req actuel':>10}  "
+              f"{'user legacy':>11} {'user actuel':>11}  {'ms legacy':>9} {'ms actuel':>9}")
+        totals = [0, 0]
+        for key, (code, legacy_q, legacy_u, legacy_ms) in modes['legacy'].items():
+            _, current_q, current_u, current_ms = modes['actuel'][key]
+            totals[0] += legacy_q
+            totals[1] += current_q
+            label = f"{key[0]} {key[1]}"
+            print(f"{label:<38} {code:>4}  {legacy_q:>10.0f} {current_q:>10.0f}  "
+                  f"{legacy_u:>11.0f} {current_u:>11.0f}  {legacy_ms:>9.2f} {current_ms:>9.2f}")
+        print(f"{'total':<38} {'':>4}  {totals[0]:>10.0f} {totals[1]:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Notification en masse: une transaction par utilisateur vs lots bulk INSERT
+Mesure la création des notifications pour N utilisateurs synthétiques et
+l'envoi des emails (une connexion SMTP par email vs connexion partagée).
+
+Profils de base:
+- sqlite: fichier SQLite local
+- postgres-like: SQLite + latence réseau simulée à chaque aller-retour
+  (requête ou commit), ce qui domine le coût d'une transaction par ligne
+  sur un Postgres distant
+- --database-url postgresql://...: vraie base (tables créées puis supprimées)
+
+Usage:
+    python tests/performance/bench_bulk_notifications.py
+    python tests/performance/bench_bulk_notifications.py --users 50000 --rtt-ms 0.5
+"""
+import argparse
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.user import Notification, NotificationType, User
+from src.services.bulk_notification_service import (
+    SmtpBatchSender, chunked, insert_notification_batch, send_email_batch
+)
+
+TITLE = "Maintenance système programmée"
+MESSAGE = "Maintenance prévue dimanche de 2h à 4h."
+
+
+class _SmtpSink(socketserver.StreamRequestHandler):
+    """Serveur SMTP minimal (sans TLS/auth) qui compte connexions et messages"""
+
+    def handle(self):
+        self.server.connections += 1
+        self.wfile.write(b'220 sink ESMTP\r\n')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command == b'DATA':
+                self.wfile.write(b'354 go ahead\r\n')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.wfile.write(b'250 OK\r\n')
+            elif command == b'QUIT':
+                self.wfile.write(b'221 bye\r\n')
+                return
+            elif command == b'EHLO':
+                self.wfile.write(b'250-sink\r\n250 AUTH PLAIN\r\n')
+            elif command == b'AUTH':
+                self.wfile.write(b'235 OK\r\n')
+            else:
+                self.wfile.write(b'250 OK\r\n')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SmtpSink)
+        self.connections = 0
+        self.messages = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+
+def make_app(database_url, rtt_ms):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+    db.init_app(app)
+    with app.app_context():
+        if rtt_ms:
+            @event.listens_for(db.engine, 'before_cursor_execute')
+            def _rtt(*args):
+                time.sleep(rtt_ms / 1000)
+
+            @event.listens_for(db.engine, 'commit')
+            def _rtt_commit(*args):
+                time.sleep(rtt_ms / 1000)
+    return app
+
+
+def seed_users(count):
+    db.drop_all()
+    db.create_all()
+    db.session.bulk_insert_mappings(User, [
+        {'email': f'user{i}@bench.test', 'name': f'User {i}'} for i in range(count)
+    ])
+    db.session.commit()
+    return [row.id for row in db.session.query(User.id).order_by(User.id)]
+
+
+def legacy_notify(user_ids):
+    """Corps de send_notification, exécuté une fois par utilisateur"""
+    for user_id in user_ids:
+        if not db.session.get(User, user_id):
+            continue
+        db.session.add(Notification(user_id=user_id, title=TITLE, message=MESSAGE,
+                                    notification_type=NotificationType.SYSTEM_MAINTENANCE,
+                                    priority='high'))
+        db.session.commit()
+
+
+def batched_notify(user_ids, batch_size):
+    recipients = []
+    for batch in chunked(user_ids, batch_size):
+        recipients += insert_notification_batch(batch, NotificationType.SYSTEM_MAINTENANCE.value,
+                                                TITLE, MESSAGE, priority='high')
+    return recipients
+
+
+def smtp_sender(sink):
+    return SmtpBatchSender(server='127.0.0.1', port=sink.server_address[1],
+                           username='bench', password='bench', use_tls=False)
+
+
+def run_profile(label, database_url, rtt_ms, args):
+    app = make_app(database_url, rtt_ms)
+    with app.app_context():
+        user_ids = seed_users(args.users)
+        sample = user_ids[:args.legacy_sample]
+
+        started = time.perf_counter()
+        legacy_notify(sample)
+        legacy = (time.perf_counter() - started) * len(user_ids) / len(sample)
+        db.session.query(Notification).delete()
+        db.session.commit()
+
+        started = time.perf_counter()
+        recipients = batched_notify(user_ids, args.batch_size)
+        batched = time.perf_counter() - started
+        assert db.session.query(Notification).count() == len(user_ids)
+
+        db.drop_all()
+
+    estimated = ' (extrapolé)' if len(sample) < len(user_ids) else ''
+    batches = -(-len(user_ids) // args.batch_size)
+    print(f"[{label}] {len(user_ids)} utilisateurs")
+    print(f"  1 tâche/transaction par utilisateur: {legacy:8.2f}s{estimated}, "
+          f"{len(user_ids)} messages broker, {len(user_ids)} commits")
+    print(f"  lots bulk INSERT ({args.batch_size}):        {batched:8.2f}s, "
+          f"{batches} messages broker, {batches} commits")
+    return recipients
+
+
+def run_emails(recipients, args):
+    recipients = recipients[:args.emails]
+    group = args.email_batch_size
+
+    sink = SmtpSink()
+    started = time.perf_counter()
+    for recipient in recipients:
+        with smtp_sender(sink) as sender:
+            send_email_batch([recipient], TITLE, MESSAGE, sender=sender)
+    legacy = time.perf_counter() - started
+    legacy_connections = sink.connections
+
+    sink.connections = 0
+    started = time.perf_counter()
+    for batch in chunked(recipients, group):
+        with smtp_sender(sink) as sender:
+            send_email_batch(batch, TITLE, MESSAGE, sender=sender)
+    batched = time.perf_counter() - started
+    sink.shutdown()
+
+    print(f"[smtp] {len(recipients)} emails")
+    print(f"  connexion par email:   {legacy:6.2f}s, {legacy_connections} connexions")
+    print(f"  connexion partagée:    {batched:6.2f}s, {sink.connections} connexions (groupes de {group})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=50000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--legacy-sample', type=int, default=5000,
+                        help='Utilisateurs traités en mode legacy (temps extrapolé)')
+    parser.add_argument('--rtt-ms', type=float, default=0.5, help='Latence simulée du profil postgres-like')
+    parser.add_argument('--database-url', help='Base supplémentaire (ex: postgresql://...)')
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--email-batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        profiles = [('sqlite', f"sqlite:///{os.path.join(tmp, 'sqlite.db')}", 0),
+                    ('postgres-like', f"sqlite:///{os.path.join(tmp, 'pglike.db')}", args.rtt_ms)]
+        if args.database_url:
+            profiles.append(('database-url', args.database_url, 0))
+        recipients = []
+        for label, url, rtt in profiles:
+            recipients = run_profile(label, url, rtt, args)
+        run_emails(recipients, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Temps d'upload vers Bunny avec pannes réseau injectées (faux serveur local)
+Compare l'ancien PUT unique (reprise depuis l'octet 0 à chaque retry) avec
+l'upload TUS reprenable, séquentiel et en parties parallèles.
+
+Usage:
+    python tests/performance/bench_bunny_upload.py
+    python tests/performance/bench_bunny_upload.py --size 256 --failure-rate 0.01
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fake_bunny_server import FakeBunnyServer
+
+API_KEY = 'bench-api-key-0000-0000'
+LIBRARY_ID = '424242'
+
+
+def make_service(server, state_dir, resumable, parallel_parts):
+    os.environ.update({
+        'BUNNY_API_KEY': API_KEY,
+        'BUNNY_LIBRARY_ID': LIBRARY_ID,
+        'BUNNY_API_HOST': server.url,
+        'BUNNY_UPLOAD_STATE_DIR': state_dir,
+        'BUNNY_UPLOAD_QUEUE_DB': os.path.join(state_dir, 'queue.db'),
+        'BUNNY_RESUMABLE_UPLOADS': 'true' if resumable else 'false',
+        'BUNNY_UPLOAD_PARALLEL_PARTS': str(parallel_parts),
+    })
+    from src.services.bunny_storage_service import BunnyStorageService
+    service = BunnyStorageService()
+    service.config.retry_delay = 0  # Mesurer le transfert, pas le backoff
+    service.config.max_retries = 10
+    service.uploader.retry_delay = 0.01
+    return service
+
+
+def run(label, path, expected, failure_rate, resumable, parallel_parts, seed, block_size):
+    from src.services.bunny_storage_service import UploadStatus, UploadTask
+
+    with FakeBunnyServer(API_KEY, LIBRARY_ID, failure_rate=failure_rate,
+                         block_size=block_size, seed=seed) as server, \
+            tempfile.TemporaryDirectory() as state_dir:
+        service = make_service(server, state_dir, resumable, parallel_parts)
+        task = UploadTask(path, 'bench')
+        started = time.perf_counter()
+        service._process_upload(task, 'bench')
+        elapsed = time.perf_counter() - started
+        service.shutdown()
+
+        ok = task.status == UploadStatus.COMPLETED and server.videos.get(task.bunny_video_id) == expected
+        print(f"  {label:<22} {'OK ' if ok else 'KO '} {elapsed:>7.2f} s  "
+              f"{len(expected) / elapsed / 1024 / 1024:>7.1f} MB/s  "
+              f"retries={task.retries:<3} requêtes={server.requests:<5} pannes={server.failures_injected}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark upload Bunny avec pannes injectées")
+    parser.add_argument("--size", type=int, default=128, help="Taille du fichier (MB)")
+    parser.add_argument("--failure-rate", type=float, default=0.01,
+                        help="Probabilité de coupure par bloc reçu")
+    parser.add_argument("--block", type=int, default=64 * 1024, help="Taille d'un bloc (octets)")
+    parser.add_argument("--parts", type=int, default=4, help="Parties parallèles (TUS concatenation)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    expected = os.urandom(args.size * 1024 * 1024)
+    with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as f:
+        f.write(expected)
+        path = f.name
+
+    try:
+        for rate in (0.0, args.failure_rate):
+            print(f"{args.size} MB, coupure {rate:.1%} par bloc de {args.block // 1024} KB")
+            run("PUT unique (ancien)", path, expected, rate, False, 1, args.seed, args.block)
+            run("TUS séquentiel", path, expected, rate, True, 1, args.seed, args.block)
+            run(f"TUS {args.parts} parties", path, expected, rate, True, args.parts, args.seed, args.block)
+    finally:
+        os.unlink(path)
+        from src.services.bunny_storage_service import bunny_storage_service
+        bunny_storage_service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
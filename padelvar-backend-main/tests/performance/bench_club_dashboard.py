@@ -0,0 +1,141 @@
+"""
+Tableau de bord club: requêtes par terrain et commit vs lecture seule agrégée
+Mesure, pour plusieurs tailles de club, le nombre de requêtes SQL et la
+latence de GET /api/clubs/dashboard.
+
+- legacy: parcours de toutes les sessions actives (tous clubs) pour les
+  expirer avec commit, une requête RecordingSession par terrain + chargement
+  paresseux du joueur, joueurs/vidéos/followers chargés pour être comptés
+- actuel: routes/clubs.py get_club_dashboard (nombre de requêtes constant)
+
+Usage:
+    python tests/performance/bench_club_dashboard.py
+    python tests/performance/bench_club_dashboard.py --sizes 10 100 400 --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from src.models.database import db
+from src.models.user import Club, ClubActionHistory, Court, RecordingSession, User, UserRole, Video
+from src.routes.clubs import clubs_bp
+
+
+def legacy_dashboard(club_id):
+    """Ancienne route (sans les print de debug)"""
+    club = Club.query.get(club_id)
+    players = User.query.filter_by(club_id=club.id, role=UserRole.PLAYER).all()
+    courts = Court.query.filter_by(club_id=club.id).all()
+    changed = False
+    for recording in RecordingSession.query.filter_by(status='active').all():
+        if recording.is_expired():
+            recording.status = 'completed'
+            Court.query.get(recording.court_id).is_recording = False
+            changed = True
+    if changed:
+        db.session.commit()
+    courts_with_status = []
+    for court in courts:
+        court_dict = court.to_dict()
+        active = RecordingSession.query.filter_by(court_id=court.id, status='active').first()
+        court_dict['recording_player'] = active.user.name if active and not active.is_expired() else None
+        courts_with_status.append(court_dict)
+    videos = db.session.query(Video).options(joinedload(Video.owner)).join(Court, Video.court_id == Court.id) \
+        .filter(Court.club_id == club.id).all()
+    followers = club.followers.all()
+    credits = sum(json.loads(e.action_details).get('credits_added', 0)
+                  for e in ClubActionHistory.query.filter_by(club_id=club.id, action_type='add_credits'))
+    return {'club': club.to_dict(), 'players': [p.to_dict() for p in players], 'courts': courts_with_status,
+            'videos': [dict(v.to_dict(), player_name=v.owner.name) for v in videos],
+            'stats': {'followers': len(followers), 'credits': credits}}
+
+
+def seed(club_id, courts, players):
+    """Club `club_id`: terrains (un sur deux occupé), joueurs, 5 vidéos par terrain, crédits"""
+    now = datetime.utcnow()
+    base = club_id * 100000
+    db.session.add(Club(id=club_id, name=f'Club {club_id}'))
+    db.session.add(User(id=base, email=f'club{club_id}@bench.tn', name='Club', role=UserRole.CLUB, club_id=club_id))
+    db.session.execute(User.__table__.insert(), [{
+        'id': base + 1 + n, 'email': f'p{club_id}-{n}@bench.tn', 'name': f'Joueur {n}', 'role': UserRole.PLAYER,
+        'club_id': club_id, 'email_verified': False, 'tutorial_completed': False, 'credits_balance': 0,
+    } for n in range(players)])
+    db.session.execute(Court.__table__.insert(), [{
+        'id': base + n, 'club_id': club_id, 'name': f'Terrain {n}', 'qr_code': f'qr-{club_id}-{n}',
+        'camera_url': 'rtsp://cam', 'is_recording': n % 2 == 0,
+    } for n in range(courts)])
+    db.session.execute(Video.__table__.insert(), [{
+        'title': 'Match', 'user_id': base + 1 + n % players, 'court_id': base + n % courts,
+    } for n in range(courts * 5)])
+    db.session.execute(RecordingSession.__table__.insert(), [{
+        'recording_id': f'rec-{club_id}-{n}', 'user_id': base + 1 + n % players, 'court_id': base + n,
+        'club_id': club_id, 'planned_duration': 90, 'status': 'active', 'start_time': now - timedelta(minutes=5),
+    } for n in range(0, courts, 2)])
+    db.session.execute(ClubActionHistory.__table__.insert(), [{
+        'user_id': base + 1, 'club_id': club_id, 'performed_by_id': base, 'action_type': 'add_credits',
+        'action_details': json.dumps({'credits_added': 5}), 'performed_at': now,
+    } for _ in range(courts)])
+    db.session.commit()
+
+
+def measure(fn, runs):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    samples = []
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        for _ in range(runs):
+            statements.clear()
+            db.session.expire_all()
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements), statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 20, 100, 400], help='Terrains par club')
+    parser.add_argument('--players', type=int, default=5, help='Joueurs par terrain')
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SECRET_KEY'] = 'bench'
+        db.init_app(app)
+        app.register_blueprint(clubs_bp, url_prefix='/api/clubs')
+        with app.app_context():
+            db.create_all()
+            print(f"{'terrains':>8}  {'legacy req':>10} {'legacy ms':>10}  {'actuel req':>10} {'actuel ms':>10}")
+            for club_id, courts in enumerate(args.sizes, start=1):
+                seed(club_id, courts, courts * args.players)
+                client = app.test_client()
+                with client.session_transaction() as session:
+                    session['user_id'] = club_id * 100000
+
+                def current():
+                    response = client.get('/api/clubs/dashboard')
+                    assert response.status_code == 200, response.get_json()
+
+                legacy_q, legacy_ms = measure(lambda: legacy_dashboard(club_id), args.runs)
+                current_q, current_ms = measure(current, args.runs)
+                print(f"{courts:>8}  {legacy_q:>10} {legacy_ms:>10.1f}  {current_q:>10} {current_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Configuration système: requête + déchiffrement à chaque lecture vs cache
+Mesure les lectures de configuration des chemins chauds des clips manuels.
+
+- création de clip: _get_bunny_config x4 (source, découpe, upload, statut)
+- début d'upload: _get_bunny_config x1
+- get_config chiffré isolé
+
+"sans cache" = CONFIG_CACHE_TTL=0 (comportement précédent: une requête SQL
+et un déchiffrement Fernet par clé et par appel).
+
+Usage:
+    python tests/performance/bench_config_cache.py
+    python tests/performance/bench_config_cache.py --calls 5000
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+
+from src.models.database import db
+from src.models.system_configuration import SystemConfiguration
+from src.services import config_cache as config_cache_module
+from src.services.config_cache import config_cache
+from src.services.manual_clip_service import ManualClipService
+
+
+def timed(fn, calls):
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    config_cache_module.get_redis_client = lambda: None
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            SystemConfiguration.set_bunny_cdn_config(api_key='a' * 36 + '-bench', library_id='123456',
+                                                     cdn_hostname='vz-bench.b-cdn.net', storage_zone='bench')
+            service = ManualClipService()
+            paths = (
+                ('création de clip (config x4)', lambda: [service._get_bunny_config() for _ in range(4)]),
+                ('début d\'upload (config x1)', service._get_bunny_config),
+                ('get_config chiffré', lambda: SystemConfiguration.get_config('bunny_cdn_api_key')),
+            )
+
+            print(f"{'chemin':<32} {'sans cache µs':>14} {'cache µs':>10} {'gain':>7}")
+            for label, fn in paths:
+                config_cache.ttl = 0
+                before = timed(fn, max(1, args.calls // 10))
+                config_cache.ttl = 300
+                config_cache.clear()
+                after = timed(fn, args.calls)
+                print(f"{label:<32} {before:>14.1f} {after:>10.2f} {before / after:>6.0f}x")
+            print(f"cache: {config_cache.stats}")
+
+
+if __name__ == '__main__':
+    main()
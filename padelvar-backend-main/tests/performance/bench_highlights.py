@@ -0,0 +1,72 @@
+"""
+Génération de highlights simples: réencodage clip par clip vs stream copy
+Mesure le temps réel et le temps CPU (processus FFmpeg enfants) des deux
+modes sur une vidéo synthétique longue (testsrc2, GOP de 2s).
+
+Usage:
+    python tests/performance/bench_highlights.py
+    python tests/performance/bench_highlights.py --duration 3600 --video match.mp4
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def make_video(path, duration, fps=25):
+    subprocess.run([
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate={fps}:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-g', str(fps * 2),
+        '-c:a', 'aac', '-shortest', path
+    ], check=True)
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_mode(service, video_path, target, stream_copy):
+    service.config.SIMPLE_STREAM_COPY = stream_copy
+    wall, cpu = time.perf_counter(), children_cpu()
+    output = service._generate_simple_highlights(video_path, target)
+    wall, cpu = time.perf_counter() - wall, children_cpu() - cpu
+    size = os.path.getsize(output)
+    duration = service._get_video_duration(output)
+    os.remove(output)
+    return wall, cpu, size, duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--duration', type=int, default=1200, help='Durée de la vidéo synthétique (s)')
+    parser.add_argument('--target', type=int, default=90, help='Durée cible des highlights (s)')
+    parser.add_argument('--video', help='Vidéo existante (sinon générée)')
+    args = parser.parse_args()
+
+    from src.services.simple_highlights_service import SimpleHighlightsService
+    service = SimpleHighlightsService()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        service.config.TEMP_DIR = tmp
+        video_path = args.video
+        if not video_path:
+            video_path = os.path.join(tmp, 'synthetic_match.mp4')
+            print(f"Génération de {args.duration}s de vidéo synthétique...")
+            make_video(video_path, args.duration)
+
+        print(f"{'mode':<12} {'wall (s)':>9} {'cpu (s)':>9} {'taille':>10} {'durée':>8}")
+        for label, stream_copy in (('reencode', False), ('stream-copy', True)):
+            wall, cpu, size, duration = run_mode(service, video_path, args.target, stream_copy)
+            print(f"{label:<12} {wall:>9.2f} {cpu:>9.2f} {size / 1e6:>8.1f}MB {duration:>7.1f}s")
+
+
+if __name__ == '__main__':
+    main()
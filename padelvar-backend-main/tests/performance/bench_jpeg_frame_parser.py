@@ -0,0 +1,100 @@
+"""
+Micro-benchmark du découpage de flux MJPEG (sortie FFmpeg -f mjpeg)
+Compare l'ancien découpage de Go2RTCProxyService (bytes immuables,
+re-scan depuis le début) avec JPEGFrameParser (bytearray + curseur).
+
+Usage:
+    python tests/performance/bench_jpeg_frame_parser.py
+    python tests/performance/bench_jpeg_frame_parser.py --input capture.mjpeg
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.video_system.mjpeg_passthrough import JPEGFrameParser
+
+
+def legacy_split(chunks, buffer_size):
+    """Ancien algorithme de _mjpeg_generator (avant JPEGFrameParser)"""
+    frames = 0
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            start_idx = buffer.find(b'\xff\xd8')
+            if start_idx == -1:
+                break
+            end_idx = buffer.find(b'\xff\xd9', start_idx)
+            if end_idx == -1:
+                break
+            jpeg_frame = buffer[start_idx:end_idx + 2]
+            if len(jpeg_frame) > 0:
+                frames += 1
+            buffer = buffer[end_idx + 2:]
+        if len(buffer) > buffer_size:
+            buffer = b""
+    return frames
+
+
+def parser_split(chunks, buffer_size):
+    """Découpage avec JPEGFrameParser"""
+    parser = JPEGFrameParser(max_buffer_size=buffer_size)
+    frames = 0
+    for chunk in chunks:
+        frames += len(parser.feed(chunk))
+    return frames
+
+
+def synthetic_stream(frame_count, frame_size):
+    """Flux de JPEG concaténés de taille fixe (contenu sans marqueur parasite)"""
+    body = bytes((i * 7) % 0xFE for i in range(frame_size - 4))
+    frame = b'\xff\xd8' + body + b'\xff\xd9'
+    return frame * frame_count
+
+
+def run(name, func, chunks, buffer_size, total_bytes, repeat):
+    best = None
+    frames = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        frames = func(chunks, buffer_size)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {name:<18} {frames:>6} frames  {best * 1000:>9.1f} ms  "
+          f"{total_bytes / best / 1024 / 1024:>8.1f} MB/s")
+    return frames, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark découpage MJPEG")
+    parser.add_argument("--input", help="Flux MJPEG enregistré (ffmpeg ... -f mjpeg out.mjpeg)")
+    parser.add_argument("--frames", type=int, default=250, help="Frames synthétiques")
+    parser.add_argument("--chunk", type=int, default=8192, help="Taille des lectures (ancien: 8192)")
+    parser.add_argument("--buffer", type=int, default=1024 * 1024, help="ProxyConfig.buffer_size")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input, 'rb') as f:
+            data = f.read()
+        streams = {os.path.basename(args.input): data}
+    else:
+        streams = {
+            f"{size // 1024} KB/frame": synthetic_stream(args.frames, size)
+            for size in (50 * 1024, 200 * 1024, 600 * 1024)
+        }
+
+    for label, data in streams.items():
+        chunks = [data[i:i + args.chunk] for i in range(0, len(data), args.chunk)]
+        print(f"{label}: {len(data) / 1024 / 1024:.1f} MB, {len(chunks)} chunks de {args.chunk} o")
+        legacy_frames, legacy_time = run("legacy bytes", legacy_split, chunks, args.buffer, len(data), args.repeat)
+        new_frames, new_time = run("JPEGFrameParser", parser_split, chunks, args.buffer, len(data), args.repeat)
+        print(f"  speedup x{legacy_time / new_time:.1f}"
+              f"{'' if legacy_frames == new_frames else '  (frames perdues par legacy: %d)' % (new_frames - legacy_frames)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Classement joueurs: tri SQL + N+1 vs sorted sets Redis
+Mesure, pour N joueurs (1 000 000 par défaut), la latence de
+GET /api/players/social/leaderboard (top 10 + rang du joueur courant),
+la reconstruction complète et la mise à jour incrémentale d'un score.
+
+- legacy: ORDER BY credits_balance sur la table users, puis COUNT des vidéos
+  et Club.query.get par joueur classé; rang du joueur par COUNT(*)
+- redis: services/leaderboard.py (ZREVRANGE + ZREVRANK), sur un serveur Redis
+  (--redis-url) ou à défaut sur des sorted sets en mémoire (sortedcontainers)
+
+Usage:
+    python tests/performance/bench_leaderboard.py
+    python tests/performance/bench_leaderboard.py --users 200000 --queries 200
+    python tests/performance/bench_leaderboard.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+from sortedcontainers import SortedList
+from sqlalchemy import desc
+
+from src.models.database import db
+from src.models.user import Club, User, UserRole, UserStatus, Video
+from src.services import leaderboard as leaderboard_module
+from src.services.leaderboard import leaderboard
+
+
+class MemoryRedis:
+    """Sous-ensemble Redis utilisé par le classement (sorted sets en O(log n))"""
+
+    def __init__(self):
+        self.zsets, self.hashes, self.sets, self.strings = {}, {}, {}, {}
+
+    def pipeline(self, transaction=True):
+        return MemoryPipeline(self)
+
+    def _zset(self, key):
+        return self.zsets.setdefault(key, ({}, SortedList()))
+
+    def zadd(self, key, mapping):
+        scores, ordered = self._zset(key)
+        for member, score in mapping.items():
+            member = str(member)
+            if member in scores:
+                ordered.remove((scores[member], member))
+            scores[member] = float(score)
+            ordered.add((float(score), member))
+
+    def zincrby(self, key, amount, member):
+        self.zadd(key, {member: (self.zscore(key, member) or 0) + amount})
+
+    def zrem(self, key, member):
+        scores, ordered = self._zset(key)
+        if str(member) in scores:
+            ordered.remove((scores.pop(str(member)), str(member)))
+
+    def zscore(self, key, member):
+        return self._zset(key)[0].get(str(member))
+
+    def zrevrange(self, key, start, end):
+        ordered = self._zset(key)[1]
+        return [member for _, member in ordered[max(0, len(ordered) - 1 - end):len(ordered) - start][::-1]]
+
+    def zrevrank(self, key, member):
+        scores, ordered = self._zset(key)
+        if str(member) not in scores:
+            return None
+        return len(ordered) - 1 - ordered.index((scores[str(member)], str(member)))
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self.hashes.setdefault(key, {}).update({str(f): str(v) for f, v in (mapping or {field: value}).items()})
+
+    def hmget(self, key, fields):
+        return [self.hashes.get(key, {}).get(str(f)) for f in fields]
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(str(field), None)
+
+    def sadd(self, key, *members):
+        self.sets.setdefault(key, set()).update(map(str, members))
+
+    def smembers(self, key):
+        return set(self.sets.get(key, ()))
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.strings:
+            return None
+        self.strings[key] = str(value)
+        return True
+
+    def exists(self, key):
+        return int(key in self.strings)
+
+    def rename(self, src, dst):
+        for store in (self.zsets, self.hashes):
+            if src in store:
+                store[dst] = store.pop(src)
+
+    def delete(self, *keys):
+        for key in keys:
+            for store in (self.zsets, self.hashes, self.sets, self.strings):
+                store.pop(key, None)
+
+
+class MemoryPipeline:
+    def __init__(self, client):
+        self.client, self.calls = client, []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+
+def legacy_page(user_id, limit=10):
+    """Ancienne route (credits) + rang du joueur par COUNT(*)"""
+    players = User.query.filter(User.role == 'PLAYER').order_by(desc(User.credits_balance)).limit(limit).all()
+    data = []
+    for player in players:
+        entry = {'name': player.name, 'videos_count': Video.query.filter_by(user_id=player.id).count()}
+        if player.club_id:
+            club = Club.query.get(player.club_id)
+            entry['club_name'] = club.name if club else None
+        data.append(entry)
+    me = db.session.get(User, user_id)
+    rank = User.query.filter(User.role == 'PLAYER', User.credits_balance > me.credits_balance).count() + 1
+    return data, rank
+
+
+def seed(users, clubs, rng):
+    db.session.execute(Club.__table__.insert(), [{'id': c, 'name': f'Club {c}', 'credits_balance': 0}
+                                                 for c in range(1, clubs + 1)])
+    start = datetime(2026, 1, 1)
+    for offset in range(0, users, 50000):
+        db.session.execute(User.__table__.insert(), [{
+            'id': n, 'email': f'p{n}@bench.tn', 'name': f'Joueur {n}', 'role': UserRole.PLAYER,
+            'status': UserStatus.ACTIVE, 'credits_balance': rng.randint(0, 100000),
+            'club_id': rng.randint(1, clubs), 'email_verified': False, 'tutorial_completed': False,
+            'last_login_at': start + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        } for n in range(offset + 1, min(users, offset + 50000) + 1)])
+    db.session.execute(Video.__table__.insert(), [{
+        'title': 'Match', 'user_id': rng.randint(1, users), 'is_unlocked': True, 'credits_cost': 1,
+    } for _ in range(users // 4)])
+    db.session.commit()
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1 if len(samples) > 1 else 0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--clubs', type=int, default=500)
+    parser.add_argument('--queries', type=int, default=100, help='Appels mesurés par variante')
+    parser.add_argument('--legacy-queries', type=int, default=5)
+    parser.add_argument('--redis-url', help='Serveur Redis (base vidée!) au lieu des sorted sets en mémoire')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    if args.redis_url:
+        import redis
+        client = redis.from_url(args.redis_url, decode_responses=True)
+        client.flushdb()
+    else:
+        client = MemoryRedis()
+    leaderboard_module.get_redis_client = lambda: client
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            t0 = time.perf_counter()
+            seed(args.users, args.clubs, rng)
+            print(f"{args.users} joueurs, {args.clubs} clubs, {args.users // 4} vidéos "
+                  f"(seed {time.perf_counter() - t0:.1f} s), stockage: {'redis' if args.redis_url else 'mémoire'}")
+
+            users = [rng.randint(1, args.users) for _ in range(max(args.queries, args.legacy_queries))]
+            it = iter(users * 2)
+            p50, p95 = timed(lambda: legacy_page(next(it)), args.legacy_queries)
+            print(f"legacy   top 10 + rang        p50 {p50:9.1f} ms   p95 {p95:9.1f} ms")
+
+            t0 = time.perf_counter()
+            leaderboard.rebuild(batch_size=10000)
+            print(f"rebuild  {args.users} joueurs         {time.perf_counter() - t0:9.1f} s")
+
+            it = iter(users * 2)
+            p50, p95 = timed(lambda: leaderboard.page('credits', None, 10, next(it)), args.queries)
+            print(f"redis    top 10 + rang        p50 {p50:9.2f} ms   p95 {p95:9.2f} ms")
+            it = iter(users * 2)
+            p50, p95 = timed(lambda: leaderboard.page('videos', rng.randint(1, args.clubs), 10, next(it)), args.queries)
+            print(f"redis    top 10 club (vidéos) p50 {p50:9.2f} ms   p95 {p95:9.2f} ms")
+
+            it = iter(users * 2)
+
+            def update():
+                player = db.session.get(User, next(it))
+                player.credits_balance += 500
+                db.session.commit()
+            p50, p95 = timed(update, args.queries)
+            print(f"update   crédits + commit     p50 {p50:9.2f} ms   p95 {p95:9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
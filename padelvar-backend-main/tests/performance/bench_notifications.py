@@ -0,0 +1,157 @@
+"""
+Liste des notifications: OFFSET + COUNT(*) vs keyset + compteurs matérialisés
+Mesure la latence (p50/p95) de GET /api/notifications pour un utilisateur
+ayant N notifications, en parcourant les pages comme le frontend.
+
+- legacy: ORDER BY created_at + OFFSET, COUNT total + COUNT non lues à chaque
+  appel, sans index composite
+- keyset: curseur (created_at, id), compteurs lus dans un hash Redis en
+  mémoire (mêmes scripts que la production), index composites
+
+Usage:
+    python tests/performance/bench_notifications.py
+    python tests/performance/bench_notifications.py --notifications 100000 --pages 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+
+from src.models.database import db
+from src.models.notification import Notification, NotificationType
+from src.models.user import User
+from src.routes.notifications import notifications_bp
+from src.services.redis_client import reset_redis_client
+
+
+class MemoryRedis:
+    """Hash Redis en mémoire (scripts des compteurs rejoués en Python)"""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def hmget(self, key, *fields):
+        values = self.hashes.get(key, {})
+        return [values.get(field) for field in fields]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+
+    def register_script(self, source):
+        def fill(keys, args, client=None):
+            self.hashes.setdefault(keys[0], {'total': str(args[0]), 'unread': str(args[1])})
+            return self.hmget(keys[0], 'total', 'unread')
+        return fill
+
+
+def legacy_page(user_id, limit, offset):
+    """Ancienne implémentation de la route (OFFSET + 3 COUNT)"""
+    query = Notification.query.filter_by(user_id=user_id)
+    query.count()  # compteur de debug de l'ancienne route
+    total = query.count()
+    notifications = query.order_by(Notification.created_at.desc()).offset(offset).limit(limit).all()
+    unread = Notification.query.filter_by(user_id=user_id, is_read=False).count()
+    return {
+        'notifications': [n.to_dict() for n in notifications],
+        'pagination': {'total': total, 'has_more': offset + limit < total},
+        'stats': {'unread_count': unread},
+    }
+
+
+def seed(count):
+    db.session.add(User(id=1, email='player@bench.test', name='Player'))
+    # Autres utilisateurs: la table n'appartient pas à un seul joueur
+    db.session.bulk_insert_mappings(User, [
+        {'id': i, 'email': f'user{i}@bench.test', 'name': f'User {i}'} for i in range(2, 50)
+    ])
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count * 2):
+        rows.append({
+            'user_id': 1 if i % 2 == 0 else 2 + i % 48,
+            'notification_type': NotificationType.INFO,
+            'title': f'Notification {i}',
+            'message': 'Votre vidéo est prête',
+            'is_read': i % 7 != 0,
+            'created_at': start + timedelta(seconds=i * 30),
+        })
+        if len(rows) == 20000:
+            db.session.bulk_insert_mappings(Notification, rows)
+            rows = []
+    db.session.bulk_insert_mappings(Notification, rows)
+    db.session.commit()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run(label, app, use_keyset, args):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+
+    timings, cursor, offset = [], None, 0
+    for _ in range(args.pages):
+        started = time.perf_counter()
+        if use_keyset:
+            url = f'/api/notifications?limit={args.limit}' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            cursor = data['pagination']['next_cursor']
+        else:
+            with app.test_request_context():
+                data = legacy_page(1, args.limit, offset)
+            offset += args.limit
+        timings.append((time.perf_counter() - started) * 1000)
+        assert len(data['notifications']) == args.limit
+
+    print(f"  {label:<22} p50 {statistics.median(timings):7.2f} ms   "
+          f"p95 {percentile(timings, 95):7.2f} ms   max {max(timings):7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notifications', type=int, default=100000, help='Notifications du joueur mesuré')
+    parser.add_argument('--pages', type=int, default=200, help='Pages parcourues (profondeur max)')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        app.config['SECRET_KEY'] = 'bench'
+        db.init_app(app)
+        app.register_blueprint(notifications_bp)
+
+        with app.app_context():
+            db.create_all()
+            print(f"Insertion de {args.notifications} notifications (+ autant pour d'autres joueurs)...")
+            seed(args.notifications)
+            indexes = [index for index in Notification.__table__.indexes]
+
+            print(f"{args.pages} pages de {args.limit}:")
+            for index in indexes:
+                index.drop(db.engine)
+            db.session.execute(db.text('ANALYZE'))
+            reset_redis_client(None)
+            run('legacy (offset+count)', app, use_keyset=False, args=args)
+
+            for index in indexes:
+                index.create(db.engine)
+            db.session.execute(db.text('ANALYZE'))
+            reset_redis_client(MemoryRedis())
+            run('keyset + compteurs', app, use_keyset=True, args=args)
+            reset_redis_client(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Rate limiting: listes d'horodatages / ZSET vs GCRA (une valeur par clé)
+Rejoue 10 000 req/s réparties sur 100 000 clients distincts (IP), chaque
+requête vérifiant les limites globale + méthode comme le middleware, et
+mesure la latence ajoutée (p50/p99) et la RSS du processus.
+
+- legacy: ancien stockage mémoire (liste d'horodatages par clé, jamais purgée)
+- gcra: MemoryGcraStore (LRU borné à --max-keys)
+- legacy-redis / gcra-redis (--redis-url): pipeline ZSET vs script Lua unique
+
+Chaque moteur tourne dans un sous-processus pour isoler la RSS.
+
+Usage:
+    python tests/performance/bench_rate_limit.py
+    python tests/performance/bench_rate_limit.py --clients 100000 --rate 10000 --duration 30
+    python tests/performance/bench_rate_limit.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.middleware.rate_limit_engine import Limit, MemoryGcraStore, RateLimiter
+
+LIMITS = (('global', 1000, 3600), ('method_GET', 500, 3600))
+
+
+class LegacyMemoryLimiter:
+    """Ancienne implémentation mémoire (une liste par clé)"""
+
+    def __init__(self):
+        self.memory_store = defaultdict(dict)
+
+    def check(self, limits, now):
+        for limit in limits:
+            current_time = int(now)
+            window_start = current_time - limit.window
+            if limit.key not in self.memory_store:
+                self.memory_store[limit.key] = []
+            self.memory_store[limit.key] = [t for t in self.memory_store[limit.key] if t > window_start]
+            if len(self.memory_store[limit.key]) >= limit.requests:
+                return False
+            self.memory_store[limit.key].append(current_time)
+        return True
+
+    def __len__(self):
+        return len(self.memory_store)
+
+
+class LegacyRedisLimiter:
+    """Ancienne implémentation Redis (pipeline ZSET par limite)"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def check(self, limits, now):
+        for limit in limits:
+            current_time = int(now)
+            window_start = current_time - limit.window
+            pipe = self.client.pipeline()
+            pipe.zremrangebyscore(limit.key, 0, window_start)
+            pipe.zcard(limit.key)
+            pipe.zadd(limit.key, {str(current_time): current_time})
+            pipe.expire(limit.key, 3600)
+            if pipe.execute()[1] >= limit.requests:
+                return False
+        return True
+
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def make_engine(name, args):
+    if name == 'legacy':
+        return LegacyMemoryLimiter()
+    if name == 'gcra':
+        return MemoryGcraStore(max_keys=args.max_keys)
+    import redis
+    client = redis.from_url(args.redis_url, decode_responses=True)
+    client.flushdb()
+    if name == 'legacy-redis':
+        return LegacyRedisLimiter(client)
+    limiter = RateLimiter(redis_client=client)
+    limiter.check_at = lambda limits, now: limiter.check(limits).allowed
+    return limiter
+
+
+def run_engine(name, args):
+    """Exécuté dans le sous-processus: rejoue la charge, renvoie les mesures"""
+    rng = random.Random(args.seed)
+    total = args.rate * args.duration
+    # Tous les clients apparaissent, puis trafic aléatoire (quelques clients très actifs)
+    clients = list(range(args.clients)) + [
+        int(rng.paretovariate(1.2)) % args.clients for _ in range(max(0, total - args.clients))
+    ]
+    requests = [[Limit(f'rate_limit:{n}:10.{c >> 16 & 255}.{c >> 8 & 255}.{c & 255}', r, w) for n, r, w in LIMITS]
+                for c in clients[:total]]
+
+    engine = make_engine(name, args)
+    check = getattr(engine, 'check_at', None) or engine.check
+    rss_before = rss_mb()
+    latencies = []
+    rejected = 0
+    start = time.perf_counter()
+
+    for i, limits in enumerate(requests):
+        now = 1_700_000_000 + i / args.rate  # horloge simulée à --rate req/s
+        t0 = time.perf_counter()
+        result = check(limits, now)
+        latencies.append(time.perf_counter() - t0)
+        allowed = result if isinstance(result, bool) else result.allowed
+        rejected += not allowed
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'engine': name,
+        'requests': len(requests),
+        'throughput': len(requests) / elapsed,
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[int(len(latencies) * 0.99)] * 1e6,
+        'mean_us': statistics.fmean(latencies) * 1e6,
+        'rejected': rejected,
+        'keys': len(engine) if hasattr(engine, '__len__') else None,
+        'rss_delta_mb': rss_mb() - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=100000)
+    parser.add_argument('--rate', type=int, default=10000, help='Requêtes par seconde simulées')
+    parser.add_argument('--duration', type=int, default=20, help='Durée simulée (s)')
+    parser.add_argument('--max-keys', type=int, default=100000, help='Taille du LRU GCRA (RATE_LIMIT_MEMORY_MAX_KEYS)')
+    parser.add_argument('--redis-url', help='Compare aussi les moteurs Redis (base vidée!)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--engine', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        print(json.dumps(run_engine(args.engine, args)))
+        return
+
+    engines = ['legacy', 'gcra'] + (['legacy-redis', 'gcra-redis'] if args.redis_url else [])
+    print(f"{args.rate} req/s x {args.duration} s, {args.clients} clients, {len(LIMITS)} limites par requête")
+    print(f"{'moteur':<14}{'p50 µs':>9}{'p99 µs':>9}{'req/s max':>12}{'clés':>10}{'ΔRSS Mo':>10}{'refusées':>10}")
+    budget_us = 1e6 / args.rate
+    for name in engines:
+        output = subprocess.run([sys.executable, __file__, '--engine', name] + sys.argv[1:],
+                                check=True, capture_output=True, text=True).stdout
+        r = json.loads(output.strip().splitlines()[-1])
+        print(f"{r['engine']:<14}{r['p50_us']:>9.1f}{r['p99_us']:>9.1f}{r['throughput']:>12.0f}"
+              f"{r['keys'] if r['keys'] is not None else '-':>10}{r['rss_delta_mb']:>10.1f}{r['rejected']:>10}"
+              f"   ({r['mean_us'] / budget_us:.1%} du budget {budget_us:.0f} µs/req)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Disponibilité des terrains: requête SQL par terrain vs registre partagé
+Mesure le coût de "ce terrain est-il en cours d'enregistrement ?" et de la
+réservation d'un terrain.
+
+- db: refresh du terrain + requête RecordingSession active (ancienne route)
+- registre sans cache: fichier SQLite WAL partagé (ou Redis avec --redis-url)
+- registre avec cache: lecture locale (CACHE_SECONDS)
+
+Usage:
+    python tests/performance/bench_recording_registry.py
+    python tests/performance/bench_recording_registry.py --courts 200 --checks 50000
+    python tests/performance/bench_recording_registry.py --redis-url redis://localhost:6379/15
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+
+from src.models.database import db
+from src.models.user import Club, Court, RecordingSession, User
+from src.services import recording_state as recording_state_module
+from src.services.recording_state import RecordingRegistry
+
+
+def timed(fn, calls):
+    samples = []
+    for n in range(calls):
+        t0 = time.perf_counter()
+        fn(n)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--courts', type=int, default=50)
+    parser.add_argument('--checks', type=int, default=20000)
+    parser.add_argument('--redis-url', help='Serveur Redis au lieu du fichier SQLite partagé')
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        client = redis.from_url(args.redis_url, decode_responses=True)
+        recording_state_module.get_redis_client = lambda: client
+    else:
+        recording_state_module.get_redis_client = lambda: None
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        db.init_app(app)
+        with app.app_context():
+            db.create_all()
+            db.session.add(Club(id=1, name='Club'))
+            db.session.add(User(id=1, email='p@bench.tn', name='Joueur'))
+            db.session.add_all(Court(id=n, club_id=1, name=f'Terrain {n}', qr_code=f'qr-{n}',
+                                     camera_url='rtsp://cam', is_recording=n % 2 == 0)
+                               for n in range(1, args.courts + 1))
+            db.session.add_all(RecordingSession(recording_id=f'rec-{n}', user_id=1, court_id=n, club_id=1,
+                                                planned_duration=90, start_time=datetime.utcnow())
+                               for n in range(2, args.courts + 1, 2))
+            db.session.commit()
+
+            path = os.path.join(tmp, 'registry.db')
+            uncached = RecordingRegistry(path, cache_seconds=0)
+            cached = RecordingRegistry(path)
+            for n in range(2, args.courts + 1, 2):
+                uncached.claim_court(n, f'rec-{n}', club_id=1, user_id=1, ttl=3600)
+            court_id = lambda n: 1 + n % args.courts
+
+            def db_check(n):
+                court = db.session.get(Court, court_id(n))
+                db.session.refresh(court)
+                return RecordingSession.query.filter_by(court_id=court.id, status='active').first() is not None
+
+            store = 'redis' if args.redis_url else 'sqlite wal'
+            print(f"{args.courts} terrains, moitié occupés, stockage registre: {store}")
+            for label, fn, calls in (
+                ('db (refresh + requête)', db_check, max(1, args.checks // 10)),
+                (f'registre {store} sans cache', lambda n: uncached.is_court_recording(court_id(n)), args.checks),
+                ('registre avec cache', lambda n: cached.is_court_recording(court_id(n)), args.checks),
+                ('réservation + libération', lambda n: (uncached.claim_court(100000 + n, f'b-{n}'),
+                                                       uncached.release_court(100000 + n, f'b-{n}')),
+                 max(1, args.checks // 10)),
+            ):
+                p50, p99 = timed(fn, calls)
+                print(f"  {label:<32} p50 {p50:9.1f} µs   p99 {p99:9.1f} µs")
+
+            t0 = time.perf_counter()
+            cached.clear_cache()
+            cached.get_courts(range(1, args.courts + 1))
+            print(f"  page terrains du club (1 lot)    {(time.perf_counter() - t0) * 1e6:9.1f} µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Logging système: écriture synchrone + readlines vs file bornée + lecture depuis la fin
+Mesure le débit de SystemLogger.log() (appels/s côté appelant et jusqu'à
+écriture sur disque) et la latence de GET /api/admin/logs sur un gros
+fichier de log.
+
+- legacy: FileHandler texte + ouverture du fichier JSON à chaque appel +
+  détection des problèmes sur le thread appelant; route admin en readlines()
+- actuel: QueueHandler / QueueListener (écrivain unique, lots, rotation),
+  route admin avec tail_lines()
+
+readlines() sur 2 Go demande plusieurs Go de mémoire: la mesure legacy de
+la route est faite sur un fichier de --legacy-size-mb (extrapolation
+linéaire affichée).
+
+Usage:
+    python tests/performance/bench_system_logger.py
+    python tests/performance/bench_system_logger.py --size-mb 2048 --calls 50000 --threads 4
+    python tests/performance/bench_system_logger.py --queue-size 50000
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from flask import Flask
+
+from src.routes import admin as admin_module
+from src.routes.admin import admin_bp
+from src.services.logging_service import LEVELS, QUEUE_SIZE, LogLevel, SystemLogger
+
+
+class LegacySystemLogger(SystemLogger):
+    """Comportement précédent de log(): tout sur le thread appelant"""
+
+    def __init__(self, logs_dir):
+        os.makedirs(logs_dir)
+        self.legacy_logger = logging.getLogger('PadelVar.legacy')
+        self.legacy_logger.propagate = False
+        self.legacy_logger.addHandler(logging.FileHandler(
+            os.path.join(logs_dir, f"system_{datetime.now().strftime('%Y%m%d')}.log"), encoding='utf-8'))
+        super().__init__(logs_dir, console=False)
+        self.close()
+
+    def log(self, level, message, extra_data=None):
+        log_entry = {
+            "timestamp": datetime.now().isoformat(),
+            "level": level.value,
+            "message": message,
+            "thread": threading.current_thread().name,
+            "process_id": os.getpid()
+        }
+        if extra_data:
+            log_entry["extra_data"] = extra_data
+        self.legacy_logger.log(LEVELS[level], message)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(log_entry, ensure_ascii=False) + '\n')
+        self._detect_problems(level, message, extra_data)
+
+    def _record_problem(self, problem_type, message, extra_data):
+        pass
+
+
+def legacy_tail(path, *args, **kwargs):
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        lines = f.readlines()
+    return (line.rstrip('\n') for line in reversed(lines) if line.strip())
+
+
+def run_calls(system_logger, calls, threads):
+    """Appels/s côté appelant, messages écrits/s (jusqu'au disque) et messages perdus"""
+    def worker(n):
+        for i in range(n):
+            system_logger.log(LogLevel.INFO, f"📹 Segment {i} envoyé", {"court_id": i % 8, "segment": i})
+
+    workers = [threading.Thread(target=worker, args=(calls // threads,)) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    caller = time.perf_counter() - t0
+    system_logger.flush()
+    total = time.perf_counter() - t0
+    dropped = system_logger.dropped_logs
+    return calls / caller, (calls - dropped) / total, dropped
+
+
+def write_log_file(path, size_mb):
+    """Fichier de lignes JSON (une erreur toutes les 1000 lignes)"""
+    lines = []
+    for i in range(10_000):
+        level = 'ERROR' if i % 1000 == 0 else 'INFO'
+        lines.append(json.dumps({"timestamp": "2025-12-07T10:00:00", "level": level,
+                                 "message": f"📹 Segment {i} envoyé", "thread": "MainThread",
+                                 "process_id": 1, "extra_data": {"segment": i}}, ensure_ascii=False))
+    chunk = ('\n'.join(lines) + '\n').encode('utf-8')
+    with open(path, 'wb') as f:
+        while f.tell() < size_mb * 1024 * 1024:
+            f.write(chunk)
+    return os.path.getsize(path)
+
+
+def time_endpoint(client, url, runs):
+    samples = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        response = client.get(url)
+        samples.append((time.perf_counter() - t0) * 1000)
+        assert response.status_code == 200, response.get_json()
+    return statistics.median(samples), len(response.get_json()['logs'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=20_000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--size-mb', type=int, default=2048)
+    parser.add_argument('--legacy-size-mb', type=int, default=256)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'log()':<28} {'appels/s appelant':>18} {'écrits/s disque':>16} {'perdus':>7}")
+        loggers = (('legacy', LegacySystemLogger(os.path.join(tmp, 'legacy'))),
+                   ('actuel', SystemLogger(os.path.join(tmp, 'actuel'), queue_size=args.queue_size, console=False)))
+        for label, system_logger in loggers:
+            caller, disk, dropped = run_calls(system_logger, args.calls, args.threads)
+            print(f"{label:<28} {caller:>18,.0f} {disk:>16,.0f} {dropped:>7}")
+            system_logger.close()
+
+        os.makedirs(os.path.join(tmp, 'logs'))
+        os.chdir(tmp)
+        log_file = os.path.join('logs', f"system_{datetime.now().strftime('%Y%m%d')}.log")
+        app = Flask(__name__)
+        app.config['SECRET_KEY'] = 'bench'
+        app.register_blueprint(admin_bp, url_prefix='/api/admin')
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'], session['user_role'] = 1, 'super_admin'
+
+        urls = ('/api/admin/logs?lines=100', '/api/admin/logs?lines=1000', '/api/admin/logs?lines=100&level=error')
+        real_tail = admin_module.tail_lines
+        print(f"\n{'GET /api/admin/logs':<40} {'fichier':>9} {'lignes':>6} {'legacy ms':>10} {'actuel ms':>10}")
+        legacy = {}
+        size = write_log_file(log_file, args.legacy_size_mb)
+        admin_module.tail_lines = legacy_tail
+        for url in urls:
+            legacy[url] = time_endpoint(client, url, 3)[0] * args.size_mb / args.legacy_size_mb
+        admin_module.tail_lines = real_tail
+        size = write_log_file(log_file, args.size_mb)
+        for url in urls:
+            current, count = time_endpoint(client, url, args.runs)
+            print(f"{url.split('/logs')[1]:<40} {size / 2**30:>7.2f}Go {count:>6} "
+                  f"{legacy[url]:>9.0f}* {current:>10.2f}")
+        print(f"* readlines() mesuré sur {args.legacy_size_mb} Mo, extrapolé à {args.size_mb} Mo")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Vignettes: un FFmpeg par artefact vs une passe unique sur les keyframes
+Mesure le temps de génération du poster, du sprite de navigation et de la
+bande pour une vidéo de match, puis le coût d'une nouvelle exécution.
+
+- séparé: trois FFmpeg (poster par -ss, sprite et bande en décodage complet)
+- passe unique: ThumbnailPipeline (keyframes seulement, split vers 3 sorties)
+- relance: même contenu, manifeste relu depuis le cache
+- pool: --videos vidéos soumises ensemble (MAX_WORKERS générations en parallèle)
+
+Usage:
+    FFMPEG_PATH=/usr/bin/ffmpeg python tests/performance/bench_thumbnails.py
+    python tests/performance/bench_thumbnails.py --duration 3600 --videos 4
+    python tests/performance/bench_thumbnails.py --video static/videos/match.mp4
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from src.services import thumbnail_pipeline as pipeline_module
+from src.services.thumbnail_pipeline import ThumbnailPipeline, sprite_interval
+
+FFMPEG = pipeline_module.FFMPEG_PATH
+
+
+def separate_runs(video, duration, out):
+    """Un FFmpeg par artefact, sans -skip_frame"""
+    interval = sprite_interval(duration)
+    tile_w, tile_h = pipeline_module.SPRITE_TILE
+    strip_w, strip_h = pipeline_module.STRIP_TILE
+    frames = pipeline_module.STRIP_FRAMES
+    for args in (
+        ['-ss', str(duration / 2), '-i', video, '-frames:v', '1', os.path.join(out, 'poster.jpg')],
+        ['-i', video, '-vf', f"fps=1/{interval},scale={tile_w}:{tile_h},tile=10x10",
+         os.path.join(out, 'sprite_%03d.jpg')],
+        ['-i', video, '-vf', f"fps={frames / duration},scale={strip_w}:{strip_h},tile={frames}x1",
+         '-frames:v', '1', os.path.join(out, 'strip.jpg')],
+    ):
+        subprocess.run([FFMPEG, '-v', 'error', '-y'] + args, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--video', help='Vidéo existante (sinon générée avec testsrc2)')
+    parser.add_argument('--duration', type=int, default=1200, help='Durée de la vidéo générée (s)')
+    parser.add_argument('--videos', type=int, default=3, help='Vidéos soumises ensemble au pool')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = args.video
+        if not video:
+            video = os.path.join(tmp, 'match.mp4')
+            print(f"Génération d'une vidéo 720p de {args.duration}s...")
+            subprocess.run([FFMPEG, '-v', 'error', '-f', 'lavfi',
+                            '-i', f'testsrc2=size=1280x720:rate=25:duration={args.duration}',
+                            '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '50', video], check=True)
+        duration, _ = pipeline_module.probe(video)
+
+        out = tempfile.mkdtemp(dir=tmp)
+        t0 = time.perf_counter()
+        separate_runs(video, duration, out)
+        separate = time.perf_counter() - t0
+
+        pipeline = ThumbnailPipeline(cache_dir=os.path.join(tmp, 'previews'))
+        t0 = time.perf_counter()
+        manifest = pipeline.generate(video)
+        single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        ThumbnailPipeline(cache_dir=os.path.join(tmp, 'previews')).generate(video)
+        rerun = time.perf_counter() - t0
+
+        print(f"vidéo {duration:.0f}s, {len(manifest['sprites'])} planche(s), poster à {manifest['poster_time']:.1f}s")
+        print(f"  séparé (3 FFmpeg)       {separate * 1000:10.0f} ms")
+        print(f"  passe unique            {single * 1000:10.0f} ms   x{separate / single:.1f}")
+        print(f"  relance (cache)         {rerun * 1000:10.2f} ms")
+
+        # Copies modifiées (contenu différent) soumises ensemble au pool borné
+        copies = []
+        for n in range(args.videos):
+            copy = os.path.join(tmp, f'copy_{n}.mp4')
+            shutil.copyfile(video, copy)
+            with open(copy, 'ab') as f:
+                f.write(bytes([n]) * 16)
+            copies.append(copy)
+        for workers in (1, pipeline_module.MAX_WORKERS):
+            pool = ThumbnailPipeline(cache_dir=os.path.join(tmp, f'pool_{workers}'), max_workers=workers)
+            t0 = time.perf_counter()
+            for future in [pool.submit(copy) for copy in copies]:
+                future.result()
+            print(f"  {args.videos} vidéos, {workers} worker(s) {(time.perf_counter() - t0) * 1000:10.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
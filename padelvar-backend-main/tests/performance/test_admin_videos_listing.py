@@ -0,0 +1,161 @@
+"""
+Test de performance: liste des vidéos admin sur 200 000 vidéos
+Nombre de requêtes borné (indépendant du nombre de vidéos par page) et
+mémoire de pointe bornée pour l'export NDJSON en flux.
+"""
+import json
+import tracemalloc
+from contextlib import contextmanager
+
+import pytest
+from flask import Flask
+from sqlalchemy import event
+
+from src.models.database import db
+from src.models.user import Club, Court, User, UserRole, UserStatus, Video
+from src.routes import admin as admin_module
+from src.routes.admin import admin_bp
+
+VIDEOS = 200_000
+EXPORT_PEAK_MEMORY_MB = 16
+
+
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.fixture(scope='module')
+def app():
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    app.config['SECRET_KEY'] = 'test'
+    db.init_app(app)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    with app.app_context():
+        db.create_all()
+        db.session.execute(Club.__table__.insert(), [
+            {'id': c, 'name': f'Club {c}', 'credits_balance': 0} for c in range(1, 51)])
+        db.session.execute(Court.__table__.insert(), [
+            {'id': c, 'club_id': 1 + c % 50, 'name': f'Terrain {c}', 'qr_code': f'qr-{c}', 'camera_url': 'rtsp://cam'}
+            for c in range(1, 201)])
+        db.session.execute(User.__table__.insert(), [
+            {'id': u, 'email': f'p{u}@test.tn', 'name': f'Joueur {u}', 'role': UserRole.PLAYER,
+             'status': UserStatus.ACTIVE, 'email_verified': False, 'tutorial_completed': False}
+            for u in range(1, 1001)])
+        db.session.execute(Video.__table__.insert(), [
+            {'id': v, 'title': f'Match {v}', 'user_id': 1 + v % 1000, 'court_id': 1 + v % 200 if v % 97 else None,
+             'duration': 60, 'file_size': 1000, 'file_url': f'https://cdn/{v}.mp4'}
+            for v in range(1, VIDEOS + 1)])
+        db.session.commit()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['user_role'] = UserRole.SUPER_ADMIN.value
+    return client
+
+
+@pytest.mark.integration
+class TestAdminVideosListing:
+    """Pagination par curseur et export en flux sur un gros catalogue"""
+
+    def test_first_page_uses_two_queries(self, client):
+        with count_queries() as statements:
+            response = client.get('/api/admin/videos?limit=500')
+
+        data = response.get_json()
+        assert response.status_code == 200
+        assert len(statements) == 2  # page projetée + totaux
+        assert len(data['videos']) == 500
+        assert data['videos'][0]['id'] == VIDEOS
+        assert data['videos'][0]['club_name'] == f'Club {1 + (1 + VIDEOS % 200) % 50}'
+        assert data['stats'] == {'total_videos': VIDEOS, 'total_duration': VIDEOS * 60, 'total_size': VIDEOS * 1000}
+
+        # Vidéo sans terrain: valeurs par défaut sans requête supplémentaire
+        orphan = next(v for v in data['videos'] if v['court_id'] is None)
+        assert (orphan['court_name'], orphan['club_name']) == ('Terrain inconnu', 'Club inconnu')
+
+    def test_cursor_walk_is_one_query_per_page(self, client):
+        seen, cursor, pages = 0, None, 0
+        last_id = VIDEOS + 1
+        with count_queries() as statements:
+            while True:
+                response = client.get('/api/admin/videos', query_string={'limit': 1000, 'cursor': cursor} if cursor else {'limit': 1000})
+                data = response.get_json()
+                assert all(v['id'] < last_id for v in data['videos'])
+                last_id = data['videos'][-1]['id']
+                seen += len(data['videos'])
+                pages += 1
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+
+        assert seen == VIDEOS
+        assert len(statements) == pages + 1  # + totaux sur la première page
+
+    def test_ndjson_export_streams_with_bounded_memory(self, client):
+        tracemalloc.start()
+        try:
+            with count_queries() as statements:
+                response = client.get('/api/admin/videos?format=ndjson', buffered=False)
+                lines = 0
+                for chunk in response.response:
+                    lines += chunk.count(b'\n')
+                response.close()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert lines == VIDEOS
+        assert len(statements) == VIDEOS // admin_module.ADMIN_VIDEOS_EXPORT_BATCH + 1
+        assert peak / 1024 / 1024 < EXPORT_PEAK_MEMORY_MB
+
+    def test_ndjson_lines_are_video_objects(self, client):
+        response = client.get('/api/admin/videos', headers={'Accept': 'application/x-ndjson'}, buffered=False)
+        first = json.loads(next(iter(response.response)).decode().split('\n', 1)[0])
+        response.close()
+        assert first['id'] == VIDEOS and first['player_name'] == f'Joueur {1 + VIDEOS % 1000}'
+
+    def test_search_filters_server_side_and_follows_cursor(self, client):
+        """?q= (titre, joueur, club) appliqué en base; le curseur garde la recherche"""
+        users = {u for u in range(1, 1001) if 'joueur 42' in f'Joueur {u}'.lower()}
+        expected = sum(1 for v in range(1, VIDEOS + 1) if 1 + v % 1000 in users)
+
+        seen, cursor = [], None
+        with count_queries() as statements:
+            while True:
+                params = {'limit': 1000, 'cursor': cursor} if cursor else {'limit': 1000, 'q': 'JOUEUR 42'}
+                data = client.get('/api/admin/videos', query_string=params).get_json()
+                seen += data['videos']
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+
+        assert len(seen) == expected
+        assert all(v['player_name'].lower().startswith('joueur 42') for v in seen)
+        assert len(statements) == -(-expected // 1000) + 1
+        assert data.get('stats') is None
+
+        by_club = client.get('/api/admin/videos', query_string={'q': 'club 7', 'limit': 5}).get_json()
+        assert {v['club_name'] for v in by_club['videos']} == {'Club 7'}
+        assert by_club['next_cursor'].endswith(':club 7')
+        assert client.get('/api/admin/videos', query_string={'q': '%'}).get_json()['videos'] == []
+        mismatch = {'q': 'autre', 'cursor': by_club['next_cursor']}
+        assert client.get('/api/admin/videos', query_string=mismatch).status_code == 400
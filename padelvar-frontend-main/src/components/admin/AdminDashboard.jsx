@@ -47,12 +47,12 @@ const AdminDashboard = () => {
       const [usersResponse, clubsResponse, videosResponse] = await Promise.all([
         adminService.getAllUsers(),
         adminService.getAllClubs(),
-        adminService.getAllVideos()
+        adminService.getAllVideos({ limit: 1 }) // Seuls les totaux sont utilisés
       ]);
 
       const allUsers = usersResponse.data.users || [];
       const clubs = clubsResponse.data.clubs || [];
-      const videos = videosResponse.data.videos || [];
+      const videosStats = videosResponse.data.stats || {};
 
       // CORRIGÉ : On calcule le nombre d'utilisateurs qui ne sont PAS des clubs.
       const realUsers = allUsers.filter(user => user.role !== 'club');
@@ -63,7 +63,7 @@ const AdminDashboard = () => {
       setStats({
         totalRealUsers: realUsers.length, // On utilise le nouveau compte
         totalClubs: clubs.length,
-        totalVideos: videos.length,
+        totalVideos: videosStats.total_videos || 0,
         totalCredits
       });
     } catch (error) {
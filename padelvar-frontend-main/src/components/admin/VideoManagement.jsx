@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { adminService } from '../../lib/api';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { 
@@ -10,6 +10,7 @@ import {
   TableRow 
 } from '@/components/ui/table';
 import { Input } from '@/components/ui/input';
+import { Button } from '@/components/ui/button';
 import { Alert, AlertDescription } from '@/components/ui/alert';
 import { 
   Video, 
@@ -26,22 +27,51 @@ const VideoManagement = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [searchTerm, setSearchTerm] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState({ total_videos: 0, total_duration: 0, total_size: 0 });
+  const queryRef = useRef('');
 
+  // Recherche côté serveur (titre, joueur, club), après une courte pause de frappe
   useEffect(() => {
-    loadVideos();
-  }, []);
+    const query = searchTerm.trim();
+    const timer = setTimeout(() => loadVideos(query), query ? 300 : 0);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
-  const loadVideos = async () => {
+  const loadVideos = async (query = '') => {
+    queryRef.current = query;
     try {
       setLoading(true);
-      // NOTE: La route a été modifiée pour récupérer plus d'infos
-      const response = await adminService.getAllVideos(); 
+      // Première page + totaux calculés par le serveur
+      const response = await adminService.getAllVideos(query ? { q: query } : {});
+      if (queryRef.current !== query) return; // Réponse d'une recherche dépassée
       setVideos(response.data.videos || []);
+      setNextCursor(response.data.next_cursor || null);
+      if (response.data.stats) setStats(response.data.stats);
     } catch (error) {
       setError('Erreur lors du chargement des vidéos');
       console.error('Error loading videos:', error);
     } finally {
-      setLoading(false);
+      if (queryRef.current === query) setLoading(false);
+    }
+  };
+
+  const loadMoreVideos = async () => {
+    if (!nextCursor) return;
+    const query = queryRef.current;
+    try {
+      setLoadingMore(true);
+      // Le curseur porte la recherche en cours
+      const response = await adminService.getAllVideos({ cursor: nextCursor });
+      if (queryRef.current !== query) return;
+      setVideos((current) => [...current, ...(response.data.videos || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      setError('Erreur lors du chargement des vidéos');
+      console.error('Error loading more videos:', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -75,16 +105,10 @@ const VideoManagement = () => {
     return `${(bytes / Math.pow(1024, i)).toFixed(1)} ${sizes[i]}`;
   };
 
-  const filteredVideos = videos.filter(video =>
-    video.title?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    video.player_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    video.club_name?.toLowerCase().includes(searchTerm.toLowerCase())
-  );
-
-  // Statistiques simplifiées
-  const totalVideos = videos.length;
-  const totalDuration = videos.reduce((sum, video) => sum + (video.duration || 0), 0);
-  const totalSize = videos.reduce((sum, video) => sum + (video.file_size || 0), 0);
+  // Statistiques simplifiées (toutes les vidéos, pas seulement les pages chargées)
+  const totalVideos = stats.total_videos;
+  const totalDuration = stats.total_duration;
+  const totalSize = stats.total_size;
 
   return (
     <div className="space-y-6">
@@ -150,7 +174,7 @@ const VideoManagement = () => {
             <div className="flex items-center justify-center py-8">
               <Loader2 className="h-8 w-8 animate-spin" />
             </div>
-          ) : filteredVideos.length === 0 ? (
+          ) : videos.length === 0 ? (
             <div className="text-center py-8">
               <Video className="h-12 w-12 text-gray-400 mx-auto mb-4" />
               <h3 className="text-lg font-medium">
@@ -170,7 +194,7 @@ const VideoManagement = () => {
                 </TableRow>
               </TableHeader>
               <TableBody>
-                {filteredVideos.map((video) => (
+                {videos.map((video) => (
                   <TableRow key={video.id}>
                     <TableCell className="font-medium">{video.title}</TableCell>
                     <TableCell>{video.player_name || `ID: ${video.user_id}`}</TableCell>
@@ -183,6 +207,15 @@ const VideoManagement = () => {
               </TableBody>
             </Table>
           )}
+
+          {!loading && nextCursor && (
+            <div className="flex justify-center mt-4">
+              <Button variant="outline" onClick={loadMoreVideos} disabled={loadingMore}>
+                {loadingMore && <Loader2 className="h-4 w-4 mr-2 animate-spin" />}
+                {searchTerm.trim() ? 'Charger plus' : `Charger plus (${videos.length} / ${totalVideos})`}
+              </Button>
+            </div>
+          )}
         </CardContent>
       </Card>
     </div>
@@ -12,6 +12,7 @@ import {
     DropdownMenuTrigger,
 } from '@/components/ui/dropdown-menu';
 import { notificationService } from '@/lib/api';
+import { subscribeServerEvent, isServerEventsConnected } from '@/lib/serverEvents';
 
 const NotificationBell = () => {
     const navigate = useNavigate();  // ✅ Add hook
@@ -21,9 +22,16 @@ const NotificationBell = () => {
 
     useEffect(() => {
         loadNotifications();
-        // Polling toutes les 30 secondes pour les nouvelles notifications
-        const interval = setInterval(loadNotifications, 30000);
-        return () => clearInterval(interval);
+        // Nouvelles notifications poussées par le flux SSE
+        const unsubscribe = subscribeServerEvent('notification', loadNotifications);
+        // Polling de secours (flux indisponible)
+        const interval = setInterval(() => {
+            if (!isServerEventsConnected()) loadNotifications();
+        }, 30000);
+        return () => {
+            unsubscribe();
+            clearInterval(interval);
+        };
     }, []);
 
     const loadNotifications = async () => {
@@ -32,6 +32,8 @@ import {
 
 export default function VideoPlayerModal({ isOpen, onClose, video }) {
   const [overlays, setOverlays] = useState([]); // Ajout état overlays
+  const [previews, setPreviews] = useState(null); // Bande de vignettes pour la navigation
+  const [hoverPreview, setHoverPreview] = useState(null);
   const [isPlaying, setIsPlaying] = useState(false);
   const [currentTime, setCurrentTime] = useState(0);
   const [duration, setDuration] = useState(0);
@@ -111,6 +113,14 @@ export default function VideoPlayerModal({ isOpen, onClose, video }) {
       };
       loadOverlays();
 
+      // Aperçus de navigation (202 tant que le serveur les génère)
+      setPreviews(null);
+      if (video.id) {
+        videoService.getVideoPreviews(video.id)
+          .then(res => setPreviews(res.data?.previews || null))
+          .catch(() => setPreviews(null));
+      }
+
     }
   }, [isOpen, video]);
 
@@ -251,6 +261,14 @@ export default function VideoPlayerModal({ isOpen, onClose, video }) {
     setCurrentTime(time);
   };
 
+  const handleProgressHover = (e) => {
+    if (!previews?.strip_url || !duration) return;
+    const rect = e.currentTarget.getBoundingClientRect();
+    const ratio = Math.min(Math.max((e.clientX - rect.left) / rect.width, 0), 1);
+    const frames = previews.strip_frames || 1;
+    setHoverPreview({ ratio, time: ratio * duration, cell: Math.min(Math.floor(ratio * frames), frames - 1) });
+  };
+
   // Contrôles audio
   const adjustVolume = (delta) => {
     const newVolume = Math.max(0, Math.min(1, volume + delta));
@@ -540,7 +558,28 @@ export default function VideoPlayerModal({ isOpen, onClose, video }) {
             {/* Barre de contrôles */}
             <div className="absolute bottom-0 left-0 right-0 bg-gradient-to-t from-black/80 to-transparent p-4">
               {/* Barre de progression */}
-              <div className="mb-4">
+              <div
+                className="mb-4 relative"
+                onMouseMove={handleProgressHover}
+                onMouseLeave={() => setHoverPreview(null)}
+              >
+                {hoverPreview && previews?.strip_url && (
+                  <div
+                    className="absolute bottom-6 -translate-x-1/2 pointer-events-none flex flex-col items-center"
+                    style={{ left: `${hoverPreview.ratio * 100}%` }}
+                  >
+                    <div
+                      className="rounded border border-white/40 shadow-lg"
+                      style={{
+                        width: 96,
+                        height: 54,
+                        backgroundImage: `url(${getAssetUrl(previews.strip_url)})`,
+                        backgroundPosition: `-${hoverPreview.cell * 96}px 0`,
+                      }}
+                    />
+                    <span className="mt-1 text-xs text-white">{formatTime(hoverPreview.time)}</span>
+                  </div>
+                )}
                 <Slider
                   value={[duration ? (currentTime / duration) * 100 : 0]}
                   onValueChange={handleSeek}
@@ -125,6 +125,8 @@ export const videoService = {
   getMySharedVideos: () => api.get('/videos/my-shared-videos'),
   // Overlays
   getVideoOverlays: (videoId) => api.get(`/videos/${videoId}/overlays`),
+  // Aperçus (poster, sprite WebVTT, bande de navigation)
+  getVideoPreviews: (videoId) => api.get(`/videos/${videoId}/previews`),
 };
 
 export const recordingService = {
@@ -161,7 +163,7 @@ export const adminService = {
   getClubCourts: (clubId) => api.get(`/admin/clubs/${clubId}/courts`),
   updateCourt: (courtId, courtData) => api.put(`/admin/courts/${courtId}`, courtData),
   deleteCourt: (courtId) => api.delete(`/admin/courts/${courtId}`),
-  getAllVideos: () => api.get('/admin/videos'),
+  getAllVideos: (params = {}) => api.get('/admin/videos', { params }), // { limit, cursor, q } -> { videos, next_cursor, stats }
   addCredits: (userId, credits) => api.post(`/admin/users/${userId}/credits`, { credits }),
   addCreditsToClub: (clubId, credits) => api.post(`/admin/clubs/${clubId}/credits`, { credits }),
   getAllClubsHistory: () => api.get('/admin/clubs/history/all'),
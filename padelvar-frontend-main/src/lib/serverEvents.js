@@ -0,0 +1,62 @@
+// padelvar-frontend/src/lib/serverEvents.js
+
+// Flux temps réel (Server-Sent Events) : une seule connexion par onglet,
+// partagée par tous les composants. Le navigateur se reconnecte seul et
+// renvoie Last-Event-ID, le serveur rejoue alors les événements manqués.
+//
+// Événements : notification, recording, highlight_job, clip
+
+const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000/api';
+const STREAM_URL = `${API_BASE_URL.endsWith('/api') ? API_BASE_URL : `${API_BASE_URL}/api`}/events/stream`;
+
+const listeners = new Map(); // nom d'événement -> Set(handler)
+let source = null;
+let connected = false;
+
+const dispatch = (name) => (message) => {
+  let data = null;
+  try {
+    data = JSON.parse(message.data);
+  } catch {
+    return;
+  }
+  (listeners.get(name) || []).forEach((handler) => handler(data, message.lastEventId));
+};
+
+const open = () => {
+  if (source || typeof EventSource === 'undefined') return;
+  source = new EventSource(STREAM_URL, { withCredentials: true });
+  source.onopen = () => { connected = true; };
+  source.onerror = () => { connected = false; };
+  listeners.forEach((_, name) => source.addEventListener(name, dispatch(name)));
+};
+
+const close = () => {
+  if (source) {
+    source.close();
+    source = null;
+    connected = false;
+  }
+};
+
+/**
+ * S'abonner à un type d'événement. Retourne la fonction de désabonnement.
+ * La connexion est ouverte au premier abonnement et fermée au dernier.
+ */
+export const subscribeServerEvent = (name, handler) => {
+  if (!listeners.has(name)) {
+    listeners.set(name, new Set());
+    if (source) source.addEventListener(name, dispatch(name));
+  }
+  listeners.get(name).add(handler);
+  open();
+
+  return () => {
+    listeners.get(name)?.delete(handler);
+    const remaining = [...listeners.values()].some((handlers) => handlers.size > 0);
+    if (!remaining) close();
+  };
+};
+
+// Polling de secours seulement si le flux n'est pas connecté
+export const isServerEventsConnected = () => connected;